@@ -1,11 +1,12 @@
 """
 Runner para ejecutar el agente auditor.
 """
+import asyncio
 import logging
 from typing import Tuple
 from sqlalchemy.orm import Session
 
-from app.rag.case_rag.service import query_case_rag
+from app.rag.case_rag.service import aquery_case_rag, query_case_rag
 from .logic import audit_logic
 from .schema import AuditorResult
 
@@ -42,6 +43,36 @@ def run_auditor(case_id: str, question: str, db: Session) -> Tuple[AuditorResult
         query=question,
     )
 
+    return _complete_audit(case_id, question, context)
+
+
+async def arun_auditor(case_id: str, question: str, db: Session) -> Tuple[AuditorResult, bool]:
+    """
+    Variante async de run_auditor para el endpoint FastAPI.
+
+    La recuperación de contexto no bloquea el event loop; la lógica del
+    auditor (LLM síncrono) se ejecuta en un hilo.
+    """
+    logger.info(
+        "Agente Auditor iniciado",
+        extra={
+            "agent_name": "auditor",
+            "case_id": case_id,
+            "stage": "analysis",
+        }
+    )
+
+    context = await aquery_case_rag(
+        db=db,
+        case_id=case_id,
+        query=question,
+    )
+
+    return await asyncio.to_thread(_complete_audit, case_id, question, context)
+
+
+def _complete_audit(case_id: str, question: str, context: str) -> Tuple[AuditorResult, bool]:
+    """Análisis del auditor a partir del contexto ya recuperado."""
     # Detectar si hay fallback: contexto vacío o muy corto
     auditor_fallback = not context or len(context.strip()) < 100
 
@@ -11,8 +11,9 @@ from __future__ import annotations
 from typing import List, Optional
 from sqlalchemy.orm import Session
 
-from app.rag.case_rag.retrieve import rag_answer_internal
+from app.rag.case_rag.retrieve import rag_answer_batch
 from app.rag.legal_rag.service import query_legal_rag
+from app.services.legal_article_index import get_article_index
 from app.core.database import get_session_factory
 
 from .schema import (
@@ -75,15 +76,22 @@ def gate_1_obligacion_legal(
     GATE 1: Obligación legal definida.
     
     Retorna None si no se puede definir obligación legal concreta.
+    
+    Con índice de artículos del corpus, solo se aceptan citas del RAG legal
+    cuyo artículo existe en el TRLC ingerido (comprobación O(1)).
     """
     if ground not in PREGUNTAS_PROBATORIAS:
         return None
     
-    obligacion_data = PREGUNTAS_PROBATORIAS[ground]["obligacion"]
+    # Copia: la configuración de PREGUNTAS_PROBATORIAS no debe mutarse entre casos
+    obligacion_data = dict(PREGUNTAS_PROBATORIAS[ground]["obligacion"])
+    article_index = get_article_index()
     
     # Enriquecer con artículos del RAG legal si existen
     for result in legal_results:
         if result.get("authority_level") == "norma" and result.get("citation"):
+            if article_index is not None and not article_index.has_article(result["citation"]):
+                continue
             # Si el RAG legal devuelve un artículo más específico, usar ese
             obligacion_data["articulo"] = result["citation"]
             break
@@ -269,7 +277,7 @@ def ejecutar_analisis_prosecutor(
     legal_rag_latency_ms = (time.time() - start_legal_rag_time) * 1000
     
     # [CERT] Emisión de detección de cadena de tools
-    print(f"[CERT] TOOL_CHAIN_DETECTED flow=prosecutor_analysis tools=['rag_answer_internal_x3', 'query_legal_rag_consolidated']")
+    print(f"[CERT] TOOL_CHAIN_DETECTED flow=prosecutor_analysis tools=['rag_answer_batch', 'query_legal_rag_consolidated']")
     
     # [CERT] Reducción de contexto
     before_calls = 3  # Antes: 3 llamadas separadas
@@ -286,16 +294,17 @@ def ejecutar_analisis_prosecutor(
     print(f"[CERT] NO_INTERMEDIATE_LLM_CALLS = OK")
     
     try:
-        for ground, config in PREGUNTAS_PROBATORIAS.items():
-            pregunta = config["pregunta"]
-            
-            # Recuperar contexto crudo
-            rag_result = rag_answer_internal(
-                db=db,
-                case_id=case_id,
-                question=pregunta,
-                top_k=10,
-            )
+        # Recuperar contexto crudo de TODAS las preguntas en una pasada
+        # (mismos resultados que rag_answer_internal pregunta a pregunta:
+        # validación del caso, embeddings y consulta a Chroma una sola vez)
+        rag_results = rag_answer_batch(
+            db=db,
+            case_id=case_id,
+            questions=[config["pregunta"] for config in PREGUNTAS_PROBATORIAS.values()],
+            top_k=10,
+        )
+        
+        for (ground, config), rag_result in zip(PREGUNTAS_PROBATORIAS.items(), rag_results):
             
             # VALIDACIÓN PREVIA: Si RAG ya señala problemas graves → skip
             if not rag_result.sources or not rag_result.context_text:
@@ -4,12 +4,12 @@ Lógica principal del Agente Legal.
 
 import json
 import logging
-import re
 from typing import Dict, Any, Optional, List, Set
 
 from openai import OpenAI
 
 from app.core.variables import RAG_LLM_MODEL, RAG_TEMPERATURE
+from app.services.legal_article_index import extract_article_references, normalize_article_number
 from .prompt import LEGAL_AGENT_PROMPT
 
 logger = logging.getLogger(__name__)
@@ -31,27 +31,8 @@ def _extract_allowed_articles(legal_context: str) -> Set[str]:
     Returns:
         Set de strings normalizados con los artículos encontrados (ej: "165", "166")
     """
-    if not legal_context:
-        return set()
-    
-    # Patrón regex para capturar números de artículos en diferentes formatos
-    # Captura: Art., Artículo, Art seguido de número
-    patterns = [
-        r'Art\.?\s*(\d+)',  # Art. 165, Art 165, Art.165
-        r'Artículo\s*(\d+)',  # Artículo 165
-        r'ART\.?\s*(\d+)',  # ART. 165 (mayúsculas)
-    ]
-    
-    # Validación defensiva
-    if not legal_context or not isinstance(legal_context, str):
-        return set()
-    
-    allowed_articles = set()
-    for pattern in patterns:
-        matches = re.findall(pattern, legal_context, re.IGNORECASE)
-        allowed_articles.update(matches)
-    
-    return allowed_articles
+    # Misma normalización que las claves del índice de artículos del corpus
+    return extract_article_references(legal_context)
 
 
 def _normalize_article_reference(article_str: str) -> Optional[str]:
@@ -69,23 +50,7 @@ def _normalize_article_reference(article_str: str) -> Optional[str]:
     Returns:
         Número del artículo como string, o None si no se puede extraer
     """
-    if not article_str:
-        return None
-    
-    # Intentar extraer el número del artículo
-    patterns = [
-        r'Art\.?\s*(\d+)',
-        r'Artículo\s*(\d+)',
-        r'ART\.?\s*(\d+)',
-        r'(\d+)',  # Solo número
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, article_str, re.IGNORECASE)
-        if match:
-            return match.group(1)
-    
-    return None
+    return normalize_article_number(article_str)
 
 
 def _filter_legal_articles(
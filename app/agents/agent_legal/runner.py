@@ -2,12 +2,13 @@
 Runner del Agente Legal.
 """
 
+import asyncio
 import logging
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 from sqlalchemy.orm import Session
 
-from app.rag.legal_rag.service import query_legal_rag
+from app.rag.legal_rag.service import aquery_legal_rag, query_legal_rag
 from .logic import legal_agent_logic
 from .schema import LegalAgentResult, LegalRisk
 
@@ -51,30 +52,96 @@ def run_legal_agent(
             include_jurisprudencia=True,
         )
 
-        # Construir contexto legal
-        # query_legal_rag retorna una lista de diccionarios con citation, text, etc.
-        legal_context_parts = []
-        for result in legal_results:
-            if isinstance(result, dict):
-                citation = result.get('citation', '')
-                text = result.get('text', '')
-                source = result.get('source', '')
-                authority = result.get('authority_level', '')
-                context_line = f"{citation}"
-                if source:
-                    context_line += f" ({source})"
-                if authority:
-                    context_line += f" [{authority}]"
-                context_line += f": {text}"
-                legal_context_parts.append(context_line)
-            else:
-                legal_context_parts.append(str(result))
-
-        legal_context = "\n\n".join(legal_context_parts) if legal_context_parts else ""
+        legal_context = _build_legal_context(legal_results)
     except Exception as e:
         logger.warning(f"Error consultando RAG Legal: {e}")
         legal_context = ""
 
+    return _complete_legal_analysis(
+        case_id=case_id,
+        question=question,
+        legal_context=legal_context,
+        auditor_summary=auditor_summary,
+        auditor_risks=auditor_risks,
+    )
+
+
+async def arun_legal_agent(
+    case_id: str,
+    question: str,
+    db: Session,
+    auditor_summary: Optional[str] = None,
+    auditor_risks: Optional[List[str]] = None,
+) -> LegalAgentResult:
+    """
+    Variante async de run_legal_agent para el endpoint FastAPI.
+
+    El RAG legal no bloquea el event loop; la lógica del agente (LLM
+    síncrono) se ejecuta en un hilo.
+    """
+    logger.info(
+        "Agente Legal iniciado",
+        extra={
+            "agent_name": "legal",
+            "case_id": case_id,
+            "stage": "analysis",
+        }
+    )
+
+    try:
+        legal_results = await aquery_legal_rag(
+            query=question,
+            include_ley=True,
+            include_jurisprudencia=True,
+        )
+        legal_context = _build_legal_context(legal_results)
+    except Exception as e:
+        logger.warning(f"Error consultando RAG Legal: {e}")
+        legal_context = ""
+
+    return await asyncio.to_thread(
+        _complete_legal_analysis,
+        case_id=case_id,
+        question=question,
+        legal_context=legal_context,
+        auditor_summary=auditor_summary,
+        auditor_risks=auditor_risks,
+    )
+
+
+def _build_legal_context(legal_results: List[Dict[str, Any]]) -> str:
+    """Construye el contexto legal (texto) a partir de los resultados del RAG."""
+    # Construir contexto legal
+    # query_legal_rag retorna una lista de diccionarios con citation, text, etc.
+    legal_context_parts = []
+    for result in legal_results:
+        if isinstance(result, dict):
+            citation = result.get('citation', '')
+            text = result.get('text', '')
+            source = result.get('source', '')
+            authority = result.get('authority_level', '')
+            context_line = f"{citation}"
+            if source:
+                context_line += f" ({source})"
+            if authority:
+                context_line += f" [{authority}]"
+            context_line += f": {text}"
+            legal_context_parts.append(context_line)
+        else:
+            legal_context_parts.append(str(result))
+
+    return "\n\n".join(legal_context_parts) if legal_context_parts else ""
+
+
+def _complete_legal_analysis(
+    *,
+    case_id: str,
+    question: str,
+    legal_context: str,
+    auditor_summary: Optional[str],
+    auditor_risks: Optional[List[str]],
+) -> LegalAgentResult:
+    """Análisis legal a partir del contexto ya recuperado."""
     # Ejecutar lógica del agente
     result_data = legal_agent_logic(
         question=question,
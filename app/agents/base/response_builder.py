@@ -2,30 +2,15 @@
 Generación de respuestas con LLM a partir de contexto recuperado.
 """
 
-from openai import OpenAI
+from typing import Dict, List, Optional
+
+from openai import AsyncOpenAI, OpenAI
 
 from app.core.variables import RAG_LLM_MODEL, RAG_TEMPERATURE
 
 
-def build_llm_answer(
-    *,
-    question: str,
-    context_text: str,
-) -> str:
-    """
-    Genera una respuesta usando LLM a partir de una pregunta y contexto recuperado.
-    
-    REGLA 5: Prohibición explícita de relleno, inferencia o completado sin evidencia.
-    
-    Args:
-        question: Pregunta a responder
-        context_text: Contexto documental recuperado (texto concatenado)
-        
-    Returns:
-        Respuesta generada por el LLM
-    """
-    openai_client = OpenAI()
-
+def _build_messages(*, question: str, context_text: str) -> List[Dict[str, str]]:
+    """Mensajes (system + user) comunes a la variante síncrona y async."""
     # REGLA 5: Prompt ENDURECIDO - Prohibición explícita de relleno
     system_prompt = (
         "Eres un asistente legal especializado en análisis documental.\n\n"
@@ -53,15 +38,63 @@ def build_llm_answer(
         f"- NO completes, NO inferas, NO razones más allá del texto proporcionado."
     )
 
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def build_llm_answer(
+    *,
+    question: str,
+    context_text: str,
+) -> str:
+    """
+    Genera una respuesta usando LLM a partir de una pregunta y contexto recuperado.
+    
+    REGLA 5: Prohibición explícita de relleno, inferencia o completado sin evidencia.
+    
+    Args:
+        question: Pregunta a responder
+        context_text: Contexto documental recuperado (texto concatenado)
+        
+    Returns:
+        Respuesta generada por el LLM
+    """
+    openai_client = OpenAI()
+
     completion = openai_client.chat.completions.create(
         model=RAG_LLM_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+        messages=_build_messages(question=question, context_text=context_text),
         temperature=RAG_TEMPERATURE,
     )
 
     answer = completion.choices[0].message.content.strip()
     return answer
 
+
+_async_client: Optional[AsyncOpenAI] = None
+
+
+async def abuild_llm_answer(
+    *,
+    question: str,
+    context_text: str,
+) -> str:
+    """
+    Variante async de build_llm_answer (mismo prompt, AsyncOpenAI).
+
+    El cliente se comparte en el proceso para reutilizar conexiones HTTP.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI()
+
+    completion = await _async_client.chat.completions.create(
+        model=RAG_LLM_MODEL,
+        messages=_build_messages(question=question, context_text=context_text),
+        temperature=RAG_TEMPERATURE,
+    )
+
+    answer = completion.choices[0].message.content.strip()
+    return answer
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # =========================================================
@@ -18,13 +19,93 @@ LEGAL_JURISPRUDENCIA_VECTORSTORE = LEGAL_VECTORSTORE_BASE / "jurisprudencia"
 # CONFIG EMBEDDINGS (cámbialo si quieres)
 # =========================================================
 EMBEDDING_MODEL = "text-embedding-3-large"
-EMBEDDING_BATCH_SIZE = 64
+# Dimensión reducida solicitada al modelo (text-embedding-3-* admite `dimensions`).
+# None = nativa (3072 para text-embedding-3-large). Se registra por versión en el manifest.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+# Backend de embeddings: "openai" o "local_hash" (CPU, determinista, sin red)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+EMBEDDING_LOCAL_DIM = 512
+EMBEDDING_LOCAL_NGRAM_RANGE = (3, 5)
+# Batches por presupuesto de tokens estimados (no por nº de chunks)
+EMBEDDING_BATCH_MAX_TOKENS = 60_000
+EMBEDDING_BATCH_MAX_ITEMS = 2048  # Máximo de entradas por petición (API)
+EMBEDDING_CHARS_PER_TOKEN = 3.0  # Estimación conservadora para español
+# Lectura de chunks en páginas ordenadas durante los builds (memoria constante)
+EMBEDDING_CHUNK_PAGE_SIZE = 1000
+# Ejecutor de embeddings: peticiones en vuelo, cuotas por minuto y reintentos
+EMBEDDING_MAX_CONCURRENCY = 4
+EMBEDDING_RPM_LIMIT = 3000
+EMBEDDING_TPM_LIMIT = 1_000_000
+EMBEDDING_MAX_RETRIES = 6
+EMBEDDING_BACKOFF_BASE_S = 1.0
+EMBEDDING_BACKOFF_MAX_S = 60.0
+# Builds incrementales: reutilizar vectores de chunks sin cambios de la versión ACTIVE
+EMBEDDING_INCREMENTAL_REUSE = True
+# Validación de versiones: metadatos leídos en páginas; en builds incrementales
+# solo se validan los chunks añadidos respecto a la versión base (modo rápido)
+VALIDATION_PAGE_SIZE = 2000
+VALIDATION_FAST_INCREMENTAL = True
+# Versiones READY: ficheros de datos compartidos por hardlink con un almacén por
+# contenido del caso (_segments/); las versiones idénticas no duplican disco
+VECTORSTORE_SEGMENT_SHARING = True
+VECTORSTORE_SEGMENT_MIN_BYTES = 64 * 1024  # Ficheros menores: copia propia
+# Caché del puntero ACTIVE: segundos sin tocar disco antes de revalidar (lstat)
+# los cambios hechos por otros procesos
+ACTIVE_POINTER_REVALIDATE_S = 1.0
+# Resumen de todos los casos (manage_vectorstore_versions.py fleet): hilos en paralelo
+FLEET_SCAN_WORKERS = 16
+# Recolector de la flota (scripts/vectorstore_gc.py)
+VECTORSTORE_DISK_BUDGET_BYTES = int(os.getenv("VECTORSTORE_DISK_BUDGET_GB", "0")) * 1024 ** 3 or None
+VECTORSTORE_GC_MIN_READY_PER_CASE = 2  # READY que se conservan siempre (ACTIVE incluida)
+VECTORSTORE_GC_BUILDING_TIMEOUT_S = 6 * 3600  # BUILDING sin escrituras → build caído
+VECTORSTORE_GC_FAILED_RETENTION_S = 24 * 3600  # FAILED se conservan un día para diagnóstico
+VECTORSTORE_GC_WORKERS = 4
+VECTORSTORE_GC_MAX_DELETES_PER_MIN = 120
+VECTORSTORE_GC_MAX_MB_PER_MIN = 20_000
+# Formato de vectores de las versiones nuevas: "float32" (Chroma, por defecto),
+# "int8" o "float16" (índice compacto + re-scoring exacto con el almacén por contenido)
+VECTOR_INDEX_FORMAT = os.getenv("VECTOR_INDEX_FORMAT", "float32")
+QUANTIZED_RESCORE_FACTOR = 4  # Candidatos re-puntuados = factor × top_k
+QUANTIZED_RESCORE_MIN_CANDIDATES = 50
+# Cola persistente de builds de embeddings (workers: scripts/embedding_worker.py)
+EMBEDDING_JOBS_PATH = DATA / "_jobs" / "embedding_jobs.sqlite3"
+EMBEDDING_JOB_STALE_S = 600  # RUNNING sin heartbeat → worker muerto, se reencola
+EMBEDDING_JOB_MAX_ATTEMPTS = 3
+EMBEDDING_JOB_POLL_INTERVAL_S = 2.0
+# Pool de clientes Chroma por proceso: nº máximo de (case_id, version) abiertos
+CHROMA_POOL_MAX_SIZE = 32
+# Caché de embeddings de consultas (memoria por proceso + sqlite compartido)
+QUERY_EMBEDDING_CACHE_ENABLED = True
+QUERY_EMBEDDING_CACHE_MEMORY_SIZE = 1024
+QUERY_EMBEDDING_CACHE_PATH = DATA / "_cache" / "query_embeddings.sqlite3"
+QUERY_EMBEDDING_CACHE_DISK_MAX_ENTRIES = 20000
+# Caché de resultados del RAG legal: clave (consulta, top_k, fuentes, hash del corpus);
+# LRU + TTL en memoria y nivel de disco opcional (sobrevive a reinicios)
+LEGAL_RESULT_CACHE_ENABLED = True
+LEGAL_RESULT_CACHE_MEMORY_SIZE = 512
+LEGAL_RESULT_CACHE_TTL_S = 6 * 3600
+LEGAL_RESULT_CACHE_DISK_ENABLED = True
+LEGAL_RESULT_CACHE_PATH = DATA / "_cache" / "legal_results.sqlite3"
+LEGAL_RESULT_CACHE_DISK_MAX_ENTRIES = 5000
+# Hilos del proceso para consultar ley y jurisprudencia en paralelo
+LEGAL_SEARCH_WORKERS = 8
+# Búsqueda exacta del corpus legal con matriz float32 normalizada (mmap .npy junto
+# al vectorstore) en lugar de Chroma/HNSW; requiere numpy
+LEGAL_MATRIX_INDEX_ENABLED = os.getenv("LEGAL_MATRIX_INDEX", "false").lower() in ("1", "true", "yes")
+# Índice artículo → chunks de la Ley Concursal (se escribe en la ingesta)
+LEGAL_ARTICLE_INDEX_PATH = DATA / "legal" / "ley_concursal" / "article_index.json"
+# Almacén de embeddings por contenido (sha256 del texto, modelo, dimensiones),
+# compartido entre casos, versiones y corpus legal
+EMBEDDING_STORE_ENABLED = True
+EMBEDDING_STORE_PATH = DATA / "_cache" / "content_embeddings.sqlite3"
+EMBEDDING_STORE_MAX_BYTES = 2 * 1024 ** 3  # 2 GiB
 # =========================================================
 # RAG / LLM
 # =========================================================
 RAG_LLM_MODEL = "gpt-4o-mini"
 RAG_TEMPERATURE = 0.0
 RAG_TOP_K_DEFAULT = 5
+# Sin índice ACTIVE → encolar build en segundo plano (cola embedding_jobs)
 RAG_AUTO_BUILD_EMBEDDINGS = True
 # Score mínimo de similitud (distancia máxima permitida)
 # ChromaDB usa distancia L2: menor = más similar
@@ -49,6 +130,8 @@ CRITICAL_DOCUMENT_TYPES = {
     "pyg",
     "extracto_bancario",
 }
+# Resumen de calidad materializado: TTL de seguridad (cambios de otros workers)
+DOCUMENT_QUALITY_CACHE_TTL_SECONDS = 300
 # =========================================================
 # ENDURECIMIENTO OPERACIONAL RAG (EVIDENCIA OBLIGATORIA)
 # =========================================================
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from app.graphs.state import AuditState
 from app.legal.legal_mapping import LEGAL_MAP
+from app.services.legal_article_index import get_article_index
 
 
 def ingest_documents(state: AuditState) -> AuditState:
@@ -365,8 +366,12 @@ def legal_article_mapper(state: AuditState) -> AuditState:
     Nodo: Mapeo de artículos legales (Legal Article Mapper).
     Vincula los legal_findings con artículos concretos de la Ley Concursal
     y clasifica el tipo de riesgo jurídico de forma declarativa.
+    
+    Si existe el índice de artículos del corpus, cada artículo mapeado
+    indica si está en el TRLC ingerido (in_corpus) y sus chunks.
     """
     legal_findings = state.get("legal_findings", [])
+    article_index = get_article_index()
     
     enriched_findings = []
     for finding in legal_findings:
@@ -376,6 +381,15 @@ def legal_article_mapper(state: AuditState) -> AuditState:
         
         if mapping:
             legal_basis = mapping.get("articles", [])
+            if article_index is not None:
+                legal_basis = [
+                    {
+                        **article,
+                        "in_corpus": article_index.has_article(article.get("article", "")),
+                        "chunk_ids": article_index.chunk_ids(article.get("article", "")),
+                    }
+                    for article in legal_basis
+                ]
             risk_classification = mapping.get("risk_types", [])
         else:
             legal_basis = []
@@ -10,13 +10,13 @@ from app.api.documents import router as documents_router
 from app.api.reports import router as reports_router
 
 # 👉 IMPORT DEL AGENTE 1 (AUDITOR)
-from app.agents.agent_1_auditor.runner import run_auditor
+from app.agents.agent_1_auditor.runner import arun_auditor
 
 # 👉 IMPORT DEL AGENTE 2 (PROSECUTOR)
 from app.agents.agent_2_prosecutor.runner import run_prosecutor_from_auditor
 
 # 👉 IMPORT DEL AGENTE LEGAL
-from app.agents.agent_legal.runner import run_legal_agent
+from app.agents.agent_legal.runner import arun_legal_agent
 
 # 👉 IMPORT DEL HANDOFF
 from app.agents.handoff import build_agent2_payload, HandoffPayload
@@ -62,7 +62,7 @@ class LegalAgentInput(BaseModel):
 # =========================================================
 
 @app.post("/auditor/run")
-def run_auditor_agent(
+async def run_auditor_agent(
     payload: AuditorInput,
     db: Session = Depends(get_db),
 ):
@@ -71,8 +71,10 @@ def run_auditor_agent(
     
     El agente usa RAG para recuperar contexto del caso antes de realizar
     el análisis de auditoría.
+    
+    Async: la recuperación no ocupa un hilo del threadpool mientras espera.
     """
-    result, auditor_fallback = run_auditor(
+    result, auditor_fallback = await arun_auditor(
         case_id=payload.case_id,
         question=payload.question,
         db=db,
@@ -111,7 +113,7 @@ def run_prosecutor_from_auditor_endpoint(payload: HandoffPayload):
 # =========================================================
 
 @app.post("/legal/analyze")
-def run_legal_agent_endpoint(
+async def run_legal_agent_endpoint(
     payload: LegalAgentInput,
     db: Session = Depends(get_db),
 ):
@@ -125,8 +127,10 @@ def run_legal_agent_endpoint(
     - Evidencias del caso
     
     El agente puede recibir contexto previo del Auditor (opcional).
+    
+    Async: la recuperación no ocupa un hilo del threadpool mientras espera.
     """
-    result = run_legal_agent(
+    result = await arun_legal_agent(
         case_id=payload.case_id,
         question=payload.question,
         db=db,
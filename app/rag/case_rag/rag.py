@@ -3,14 +3,15 @@ from __future__ import annotations
 from typing import List, Optional
 from datetime import date
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.core.variables import RAG_TOP_K_DEFAULT, RAG_ACTIVE_POLICY
-from app.rag.case_rag.retrieve import rag_answer_internal, ConfidenceLevel
-from app.agents.base.response_builder import build_llm_answer
+from app.rag.case_rag.retrieve import arag_answer_internal, ConfidenceLevel
+from app.agents.base.response_builder import abuild_llm_answer
+from app.services.embedding_jobs import get_embedding_job_queue
 from app.services.confidence_scoring import (
     calculate_confidence_score,
     explain_confidence_score,
@@ -70,6 +71,70 @@ class RAGResponse(BaseModel):
     # CAPA DE PRODUCTO
     confidence_score: Optional[float] = None  # Score 0-1 (REGLA 1)
     response_type: Optional[str] = None  # Tipo de salida (REGLA 3)
+    # Build del índice encolado (status NO_EMBEDDINGS): consultar /rag/embedding-jobs/{id}
+    embedding_job_id: Optional[str] = None
+
+
+class EmbeddingJobStatus(BaseModel):
+    job_id: str
+    case_id: str
+    status: str  # QUEUED | RUNNING | SUCCEEDED | FAILED
+    priority: int
+    attempts: int
+    progress_done: int
+    progress_total: Optional[int] = None
+    progress: Optional[float] = None  # 0-1
+    version_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+# =========================================================
+# ESTADO DE BUILDS DE EMBEDDINGS EN SEGUNDO PLANO
+# =========================================================
+
+def _job_status(job: dict) -> EmbeddingJobStatus:
+    total = job.get("progress_total")
+    progress = None
+    if job["status"] == "SUCCEEDED":
+        progress = 1.0
+    elif total:
+        progress = min(job["progress_done"] / total, 1.0)
+    return EmbeddingJobStatus(
+        job_id=job["job_id"],
+        case_id=job["case_id"],
+        status=job["status"],
+        priority=job["priority"],
+        attempts=job["attempts"],
+        progress_done=job["progress_done"],
+        progress_total=total,
+        progress=progress,
+        version_id=job.get("version_id"),
+        error=job.get("error"),
+        created_at=job["created_at"],
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+    )
+
+
+@router.get("/embedding-jobs/{job_id}", response_model=EmbeddingJobStatus)
+def get_embedding_job_status(job_id: str):
+    """Estado y progreso de un build de embeddings encolado."""
+    job = get_embedding_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} no encontrado")
+    return _job_status(job)
+
+
+@router.get("/cases/{case_id}/embedding-job", response_model=EmbeddingJobStatus)
+def get_latest_embedding_job_status(case_id: str):
+    """Último build de embeddings encolado para un caso."""
+    job = get_embedding_job_queue().latest_for_case(case_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Sin jobs de embeddings para case_id={case_id}")
+    return _job_status(job)
 
 
 # =========================================================
@@ -77,14 +142,16 @@ class RAGResponse(BaseModel):
 # =========================================================
 
 @router.post("/ask", response_model=RAGResponse)
-def ask_rag(
+async def ask_rag(
     payload: RAGRequest,
     db: Session = Depends(get_db),
 ):
     # --------------------------------------------------
     # PASO 1: Recuperar contexto (retrieve.py - datos puros)
     # --------------------------------------------------
-    result = rag_answer_internal(
+    # Async: SQL/Chroma en hilos y embeddings con AsyncOpenAI, el worker
+    # sigue atendiendo otras peticiones mientras espera
+    result = await arag_answer_internal(
         db=db,
         case_id=payload.case_id,
         question=payload.question,
@@ -117,6 +184,7 @@ def ask_rag(
             hallucination_risk=result.hallucination_risk,
             confidence_score=0.0,
             response_type="EVIDENCIA_INSUFICIENTE",
+            embedding_job_id=result.embedding_job_id,
         )
 
     # --------------------------------------------------
@@ -204,7 +272,7 @@ def ask_rag(
     print(f"[CERT] CONTEXT_CHUNKS = {context_chunk_ids}")
     
     # Generar respuesta base del LLM
-    llm_answer = build_llm_answer(
+    llm_answer = await abuild_llm_answer(
         question=payload.question,
         context_text=result.context_text,
     )
@@ -1,15 +1,15 @@
 from __future__ import annotations
 
-from typing import List, Literal, Optional
-from dataclasses import dataclass
+import asyncio
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from dataclasses import dataclass, replace
+from functools import lru_cache
 from datetime import date
 
 from sqlalchemy.orm import Session
-from openai import OpenAI
 
 from app.core.variables import (
     RAG_AUTO_BUILD_EMBEDDINGS,
-    EMBEDDING_MODEL,
     RAG_MIN_SIMILARITY_SCORE,
     RAG_WEAK_RESPONSE_MAX_DISTANCE,
     RAG_HALLUCINATION_RISK_THRESHOLD,
@@ -18,18 +18,28 @@ from app.core.variables import (
     RAG_MIN_CHUNKS_REQUIRED,
     RAG_TRACE_DECISIONS,
 )
-from app.services.embeddings_pipeline import (
-    get_case_collection,
-    build_embeddings_for_case,
-)
+from app.services.embeddings_pipeline import get_case_collection
+from app.services.embedding_jobs import PRIORITY_INTERACTIVE, get_embedding_job_queue
 from app.services.vectorstore_versioning import (
     get_active_version,
     get_active_version_path,
+    read_manifest,
 )
 from app.services.document_chunk_pipeline import (
     build_document_chunks_for_case,
 )
 from app.services.document_quality import get_document_quality_summary
+from app.services.embedding_cache import (
+    aembed_queries,
+    embed_queries,
+    embed_query,
+)
+from app.services.embedding_providers import (
+    EmbeddingProvider,
+    get_embedding_provider,
+    provider_for_manifest,
+)
+from app.services.vector_metadata import build_chunk_where
 from app.models.document import Document
 from app.models.document_chunk import DocumentChunk
 
@@ -58,23 +68,159 @@ class RAGInternalResult:
     confidence: ConfidenceLevel
     warnings: List[str]
     hallucination_risk: bool = False  # True si hay alto riesgo de alucinación
+    embedding_job_id: Optional[str] = None  # Build encolado (status=NO_EMBEDDINGS)
 
 
 # =========================================================
-# FUNCIÓN RAG (CEREBRO ÚNICO)
+# HIDRATACIÓN DE FUENTES (SQL)
 # =========================================================
 
-def rag_answer_internal(
+def _hydrate_chunks(
+    *,
+    db: Session,
+    case_id: str,
+    keys: List[Tuple[str, int]],
+) -> Dict[Tuple[str, int], Tuple[DocumentChunk, Optional[str]]]:
+    """
+    Resuelve en UNA consulta los chunks recuperados por el vectorstore.
+
+    Devuelve {(document_id, chunk_index): (chunk, filename)}. El orden de
+    ranking lo conserva el llamador iterando sus propios hits.
+
+    ✅ SEGURIDAD: Filtra por case_id en chunk y documento (aislamiento por
+    expediente). Los hits de otro caso simplemente no aparecen en el dict.
+    """
+    if not keys:
+        return {}
+
+    document_ids = {document_id for document_id, _ in keys}
+    chunk_indexes = {chunk_index for _, chunk_index in keys}
+
+    rows = (
+        db.query(DocumentChunk, Document.filename)
+        .join(Document, Document.document_id == DocumentChunk.document_id)
+        .filter(
+            DocumentChunk.case_id == case_id,  # ✅ CRÍTICO: Aislamiento por expediente
+            Document.case_id == case_id,
+            DocumentChunk.document_id.in_(document_ids),
+            DocumentChunk.chunk_index.in_(chunk_indexes),
+        )
+        .all()
+    )
+
+    # El IN por columnas puede traer combinaciones cruzadas: quedarse solo con las pedidas
+    wanted = set(keys)
+    hydrated: Dict[Tuple[str, int], Tuple[DocumentChunk, Optional[str]]] = {}
+    for chunk, filename in rows:
+        key = (chunk.document_id, chunk.chunk_index)
+        if key in wanted:
+            hydrated[key] = (chunk, filename)
+
+    return hydrated
+
+
+# =========================================================
+# VALIDACIÓN COMÚN DEL CASO (UNA VEZ POR LOTE DE PREGUNTAS)
+# =========================================================
+
+@dataclass
+class _PreparedRetrieval:
+    """Estado compartido por todas las preguntas de un mismo caso."""
+    collection: object
+    quality_score: float
+    warnings: List[str]
+    hallucination_threshold: float
+    where: Optional[Dict[str, Any]] = None  # Filtros de documento aplicados en Chroma
+    provider: Optional[EmbeddingProvider] = None  # Proveedor del índice (None = configurado)
+
+
+@lru_cache(maxsize=256)
+def _manifest_embedding_provider(case_id: str, version: str) -> EmbeddingProvider:
+    """Proveedor del manifest de una versión (inmutable → cacheable; los errores no se cachean)."""
+    return provider_for_manifest(read_manifest(case_id, version))
+
+
+@lru_cache(maxsize=256)
+def _manifest_metadata_fields(case_id: str, version: str) -> Tuple[str, ...]:
+    """Metadatos filtrables del manifest de una versión (los errores no se cachean)."""
+    return tuple(read_manifest(case_id, version).get("metadata_fields", []))
+
+
+def _version_embedding_provider(case_id: str, version: str) -> EmbeddingProvider:
+    """
+    Proveedor de embeddings con el que se construyó la versión (manifest).
+
+    Versión inmutable → se cachea al leer el manifest. Sin manifest legible
+    → el configurado, SIN cachear: un fallo de E/S pasajero no fija el
+    proveedor equivocado para toda la vida del proceso.
+    """
+    try:
+        return _manifest_embedding_provider(case_id, version)
+    except (FileNotFoundError, ValueError):
+        return get_embedding_provider()
+
+
+def _version_metadata_fields(case_id: str, version: str) -> Tuple[str, ...]:
+    """
+    Metadatos filtrables declarados en el manifest de una versión.
+
+    Las versiones son inmutables una vez READY: se cachea por
+    (case_id, version) al leer el manifest. Versiones antiguas o manifest
+    ilegible → tupla vacía (sin cachear).
+    """
+    try:
+        return _manifest_metadata_fields(case_id, version)
+    except (FileNotFoundError, ValueError):
+        return ()
+
+
+def _no_embeddings_result(case_id: str, warnings: List[str], reason: str) -> RAGInternalResult:
+    """
+    NO_EMBEDDINGS sin índice utilizable.
+    
+    Con RAG_AUTO_BUILD_EMBEDDINGS se encola un build en segundo plano
+    (deduplicado por caso) y se devuelve su job_id para consultar el progreso.
+    """
+    job_id = None
+    if RAG_AUTO_BUILD_EMBEDDINGS:
+        try:
+            job = get_embedding_job_queue().enqueue(
+                case_id, priority=PRIORITY_INTERACTIVE, reason=f"rag: {reason}"
+            )
+            job_id = job["job_id"]
+            warnings = warnings + [
+                f"El índice semántico se está generando en segundo plano (job {job_id}, "
+                f"estado {job['status']}). Vuelve a preguntar cuando termine."
+            ]
+        except Exception as e:
+            warnings = warnings + [f"No se pudo encolar la generación del índice: {e}"]
+    
+    return RAGInternalResult(
+        status="NO_EMBEDDINGS",
+        context_text="",  # Sin embeddings disponibles
+        sources=[],
+        confidence="baja",
+        warnings=warnings,
+        hallucination_risk=False,
+        embedding_job_id=job_id,
+    )
+
+
+def _prepare_case_retrieval(
     *,
     db: Session,
     case_id: str,
-    question: str,
-    top_k: int,
     doc_types: Optional[List[str]] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-) -> RAGInternalResult:
-
+) -> Tuple[Optional[RAGInternalResult], Optional[_PreparedRetrieval]]:
+    """
+    Validaciones comunes a todas las preguntas de un caso (pasos 0️⃣-3️⃣).
+
+    Devuelve (resultado_temprano, None) si el caso no admite búsqueda
+    (bloqueo por calidad, sin documentos, sin chunks, sin embeddings) o
+    (None, preparado) con la colección ACTIVE lista para consultar.
+    """
     warnings: List[str] = []
 
     # --------------------------------------------------
@@ -97,7 +243,7 @@ def rag_answer_internal(
                 "Se requieren conclusiones manuales hasta que la documentación esté completamente procesada."
             ] + legal_risks,
             hallucination_risk=True,  # Baja calidad = alto riesgo de alucinación
-        )
+        ), None
     
     # ✅ ALERTA: Documentos críticos sin embeddings
     if critical_docs_missing > 0:
@@ -145,7 +291,7 @@ def rag_answer_internal(
             confidence="baja",
             warnings=[],
             hallucination_risk=False,
-        )
+        ), None
 
     document_ids = [d.document_id for d in documents]
 
@@ -189,7 +335,7 @@ def rag_answer_internal(
                 confidence="baja",
                 warnings=warnings,
                 hallucination_risk=False,
-            )
+            ), None
 
     # --------------------------------------------------
     # 3️⃣ Validar / generar embeddings (PASO 3)
@@ -198,33 +344,8 @@ def rag_answer_internal(
     active_version = get_active_version(case_id)
     
     if not active_version:
-        # No existe versión activa
-        if not RAG_AUTO_BUILD_EMBEDDINGS:
-            return RAGInternalResult(
-                status="NO_EMBEDDINGS",
-                context_text="",  # Sin embeddings disponibles
-                sources=[],
-                confidence="baja",
-                warnings=warnings,
-                hallucination_risk=False,
-            )
-        
-        # Generar embeddings automáticamente
-        warnings.append(
-            "El índice semántico no existía y se ha generado automáticamente."
-        )
-        try:
-            version_id = build_embeddings_for_case(db=db, case_id=case_id)
-            warnings.append(f"Nueva versión creada: {version_id}")
-        except Exception as e:
-            return RAGInternalResult(
-                status="NO_EMBEDDINGS",
-                context_text="",
-                sources=[],
-                confidence="baja",
-                warnings=warnings + [f"Error generando embeddings: {e}"],
-                hallucination_risk=False,
-            )
+        # No existe versión activa: el build va a la cola, nunca en la petición
+        return _no_embeddings_result(case_id, warnings, "Sin versión ACTIVE"), None
     
     # Obtener colección de la versión activa (o None para usar ACTIVE)
     try:
@@ -233,31 +354,7 @@ def rag_answer_internal(
         # Validar que la colección no esté vacía
         if collection.count() == 0:
             warnings.append("La versión activa del vectorstore está vacía.")
-            if not RAG_AUTO_BUILD_EMBEDDINGS:
-                return RAGInternalResult(
-                    status="NO_EMBEDDINGS",
-                    context_text="",
-                    sources=[],
-                    confidence="baja",
-                    warnings=warnings,
-                    hallucination_risk=False,
-                )
-            
-            # Regenerar embeddings
-            warnings.append("Regenerando embeddings...")
-            try:
-                version_id = build_embeddings_for_case(db=db, case_id=case_id)
-                warnings.append(f"Nueva versión creada: {version_id}")
-                collection = get_case_collection(case_id, version=None)
-            except Exception as e:
-                return RAGInternalResult(
-                    status="NO_EMBEDDINGS",
-                    context_text="",
-                    sources=[],
-                    confidence="baja",
-                    warnings=warnings + [f"Error regenerando embeddings: {e}"],
-                    hallucination_risk=False,
-                )
+            return _no_embeddings_result(case_id, warnings, "Versión ACTIVE vacía"), None
     except Exception as e:
         return RAGInternalResult(
             status="NO_EMBEDDINGS",
@@ -266,27 +363,51 @@ def rag_answer_internal(
             confidence="baja",
             warnings=warnings + [f"Error accediendo al vectorstore: {e}"],
             hallucination_risk=False,
+        ), None
+
+    # Filtros de documento dentro de la búsqueda vectorial: los chunks fuera
+    # de alcance no ocupan huecos del top_k
+    resolved_version = get_active_version(case_id)
+    where = None
+    if doc_types or date_from or date_to:
+        where = build_chunk_where(
+            doc_types=doc_types,
+            date_from=date_from,
+            date_to=date_to,
+            metadata_fields=_version_metadata_fields(case_id, resolved_version) if resolved_version else (),
+            document_ids=document_ids,
         )
 
-    # --------------------------------------------------
-    # 4️⃣ Búsqueda semántica
-    # --------------------------------------------------
-    # Generar embedding de la pregunta usando el mismo modelo que los embeddings almacenados
-    openai_client = OpenAI()
-    question_embedding = openai_client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=[question],
-    ).data[0].embedding
-
-    results = collection.query(
-        query_embeddings=[question_embedding],
-        n_results=top_k,
-        include=["metadatas", "documents", "distances"],  # ✅ Incluir distancias
+    return None, _PreparedRetrieval(
+        collection=collection,
+        quality_score=quality_score,
+        warnings=warnings,
+        hallucination_threshold=quality_adjusted_hallucination_threshold,
+        where=where,
+        # Consultas en el mismo espacio vectorial que el índice
+        provider=_version_embedding_provider(case_id, resolved_version) if resolved_version else None,
     )
 
-    docs_found = results.get("documents", [[]])[0]
-    metas = results.get("metadatas", [[]])[0]
-    distances = results.get("distances", [[]])[0]  # ✅ Obtener distancias (menor = más similar)
+
+# =========================================================
+# CONSTRUCCIÓN DEL RESULTADO POR PREGUNTA
+# =========================================================
+
+def _build_result(
+    *,
+    db: Session,
+    case_id: str,
+    top_k: int,
+    prepared: _PreparedRetrieval,
+    docs_found: List[str],
+    metas: List[dict],
+    distances: List[float],
+) -> RAGInternalResult:
+    """Pasos 5️⃣-6️⃣ a partir de los hits de Chroma de UNA pregunta."""
+    # Cada pregunta parte de los warnings comunes (copia: no se comparten)
+    warnings: List[str] = list(prepared.warnings)
+    quality_score = prepared.quality_score
+    quality_adjusted_hallucination_threshold = prepared.hallucination_threshold
 
     if not docs_found:
         return RAGInternalResult(
@@ -388,26 +509,23 @@ def rag_answer_internal(
         )
 
     # REGLA 3: Evidencia obligatoria - enriquecer sources con metadata completa
+    # Hidratación en bloque: una sola consulta (chunks + documentos) para todos los hits
+    hydrated = _hydrate_chunks(
+        db=db,
+        case_id=case_id,
+        keys=[(meta["document_id"], meta["chunk_index"]) for _, meta, _ in valid_pairs],
+    )
+
     for text, meta, distance in valid_pairs:
         # Los tipos ya están validados y convertidos en el paso anterior
         document_id = meta["document_id"]
         chunk_index = meta["chunk_index"]
         
-        # Obtener chunk desde BD para metadata completa (chunk_id, page, offsets)
-        # ✅ SEGURIDAD: Filtrar por case_id para prevenir acceso cross-case
-        chunk = (
-            db.query(DocumentChunk)
-            .filter(
-                DocumentChunk.case_id == case_id,  # ✅ CRÍTICO: Aislamiento por expediente
-                DocumentChunk.document_id == document_id,
-                DocumentChunk.chunk_index == chunk_index,
-            )
-            .first()
-        )
-        
         # ✅ SEGURIDAD: Si el chunk no pertenece a este case_id, skipear
-        if not chunk:
+        hit = hydrated.get((document_id, chunk_index))
+        if hit is None:
             continue  # Chunk no encontrado o no pertenece a este caso
+        chunk, filename = hit
         
         # Construir fuente con TODA la metadata necesaria para citación
         source = {
@@ -415,19 +533,17 @@ def rag_answer_internal(
             "chunk_index": chunk_index,
             "content": text,
             "similarity_score": round(distance, 4),
+            # REGLA 3: Metadata obligatoria para citación precisa
+            "chunk_id": chunk.chunk_id,
+            "page": chunk.page,
+            "start_char": chunk.start_char,
+            "end_char": chunk.end_char,
+            "section_hint": chunk.section_hint,
         }
         
-        if chunk:
-            # REGLA 3: Metadata obligatoria para citación precisa
-            source["chunk_id"] = chunk.chunk_id
-            source["page"] = chunk.page
-            source["start_char"] = chunk.start_char
-            source["end_char"] = chunk.end_char
-            source["section_hint"] = chunk.section_hint
-            
-            # Obtener filename para citación
-            if chunk.document:
-                source["filename"] = chunk.document.filename
+        # Obtener filename para citación
+        if filename:
+            source["filename"] = filename
         
         context_blocks.append(
             f"[Documento {document_id} | Chunk {chunk_index}]\n{text}"
@@ -494,3 +610,213 @@ def rag_answer_internal(
         hallucination_risk=hallucination_risk,  # ✅ Incluir flag de riesgo de alucinación
     )
 
+
+# =========================================================
+# FUNCIÓN RAG (CEREBRO ÚNICO)
+# =========================================================
+
+def _copy_result(result: RAGInternalResult) -> RAGInternalResult:
+    """Copia independiente (listas incluidas) de un resultado temprano."""
+    return replace(result, sources=list(result.sources), warnings=list(result.warnings))
+
+
+def _unpack_query_results(results: dict, position: int) -> Tuple[List[str], List[dict], List[float]]:
+    """Extrae documentos, metadatos y distancias de la consulta `position`."""
+    def _column(name: str) -> list:
+        column = results.get(name) or []
+        return column[position] if position < len(column) else []
+
+    return _column("documents"), _column("metadatas"), _column("distances")
+
+
+def rag_answer_internal(
+    *,
+    db: Session,
+    case_id: str,
+    question: str,
+    top_k: int,
+    doc_types: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> RAGInternalResult:
+    early, prepared = _prepare_case_retrieval(
+        db=db,
+        case_id=case_id,
+        doc_types=doc_types,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    if early is not None:
+        return early
+
+    # --------------------------------------------------
+    # 4️⃣ Búsqueda semántica
+    # --------------------------------------------------
+    # Generar embedding de la pregunta usando el mismo modelo que los embeddings almacenados
+    # (caché de consultas: preguntas repetidas no hacen llamada de red)
+    question_embedding = embed_query(question, provider=prepared.provider)
+
+    results = prepared.collection.query(
+        query_embeddings=[question_embedding],
+        n_results=top_k,
+        where=prepared.where,  # ✅ doc_type/fechas filtrados dentro de Chroma
+        include=["metadatas", "documents", "distances"],  # ✅ Incluir distancias
+    )
+
+    docs_found, metas, distances = _unpack_query_results(results, 0)
+    return _build_result(
+        db=db,
+        case_id=case_id,
+        top_k=top_k,
+        prepared=prepared,
+        docs_found=docs_found,
+        metas=metas,
+        distances=distances,
+    )
+
+
+def rag_answer_batch(
+    *,
+    db: Session,
+    case_id: str,
+    questions: List[str],
+    top_k: int,
+    doc_types: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[RAGInternalResult]:
+    """
+    Varias preguntas sobre el MISMO caso en una sola pasada.
+
+    - Validación de calidad/documentos/chunks/ACTIVE: una vez
+    - Embeddings de todas las preguntas: una petición (solo misses de caché)
+    - Chroma: un único collection.query con todos los embeddings
+
+    Devuelve un RAGInternalResult por pregunta, en el mismo orden y con el
+    mismo contenido que llamar a rag_answer_internal pregunta a pregunta.
+    """
+    if not questions:
+        return []
+
+    early, prepared = _prepare_case_retrieval(
+        db=db,
+        case_id=case_id,
+        doc_types=doc_types,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    if early is not None:
+        return [_copy_result(early) for _ in questions]
+
+    question_embeddings = embed_queries(list(questions), provider=prepared.provider)
+
+    results = prepared.collection.query(
+        query_embeddings=question_embeddings,
+        n_results=top_k,
+        where=prepared.where,
+        include=["metadatas", "documents", "distances"],
+    )
+
+    answers: List[RAGInternalResult] = []
+    for position in range(len(questions)):
+        docs_found, metas, distances = _unpack_query_results(results, position)
+        answers.append(
+            _build_result(
+                db=db,
+                case_id=case_id,
+                top_k=top_k,
+                prepared=prepared,
+                docs_found=docs_found,
+                metas=metas,
+                distances=distances,
+            )
+        )
+    return answers
+
+
+# =========================================================
+# VARIANTES ASYNC (ENDPOINTS FASTAPI)
+# =========================================================
+# Mismos pasos y mismos resultados que las variantes síncronas:
+# - SQL y Chroma (bloqueantes) se ejecutan en hilos con asyncio.to_thread
+# - Los embeddings usan aembed del proveedor (AsyncOpenAI): la espera de
+#   red no ocupa un hilo
+# Un mismo worker puede mantener muchas preguntas en vuelo.
+
+async def arag_answer_internal(
+    *,
+    db: Session,
+    case_id: str,
+    question: str,
+    top_k: int,
+    doc_types: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> RAGInternalResult:
+    """Variante async de rag_answer_internal."""
+    results = await arag_answer_batch(
+        db=db,
+        case_id=case_id,
+        questions=[question],
+        top_k=top_k,
+        doc_types=doc_types,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    return results[0]
+
+
+async def arag_answer_batch(
+    *,
+    db: Session,
+    case_id: str,
+    questions: List[str],
+    top_k: int,
+    doc_types: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[RAGInternalResult]:
+    """Variante async de rag_answer_batch."""
+    if not questions:
+        return []
+
+    early, prepared = await asyncio.to_thread(
+        _prepare_case_retrieval,
+        db=db,
+        case_id=case_id,
+        doc_types=doc_types,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    if early is not None:
+        return [_copy_result(early) for _ in questions]
+
+    question_embeddings = await aembed_queries(list(questions), provider=prepared.provider)
+
+    results = await asyncio.to_thread(
+        prepared.collection.query,
+        query_embeddings=question_embeddings,
+        n_results=top_k,
+        where=prepared.where,
+        include=["metadatas", "documents", "distances"],
+    )
+
+    def _build_all() -> List[RAGInternalResult]:
+        answers: List[RAGInternalResult] = []
+        for position in range(len(questions)):
+            docs_found, metas, distances = _unpack_query_results(results, position)
+            answers.append(
+                _build_result(
+                    db=db,
+                    case_id=case_id,
+                    top_k=top_k,
+                    prepared=prepared,
+                    docs_found=docs_found,
+                    metas=metas,
+                    distances=distances,
+                )
+            )
+        return answers
+
+    # La hidratación de fuentes hace SQL: también fuera del event loop
+    return await asyncio.to_thread(_build_all)
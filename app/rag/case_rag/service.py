@@ -6,7 +6,7 @@ ocultando detalles de implementación (RAGInternalResult, etc).
 """
 from sqlalchemy.orm import Session
 
-from app.rag.case_rag.retrieve import rag_answer_internal
+from app.rag.case_rag.retrieve import arag_answer_internal, rag_answer_internal
 
 
 def query_case_rag(
@@ -35,3 +35,18 @@ def query_case_rag(
 
     return result.context_text
 
+
+async def aquery_case_rag(
+    db: Session,
+    case_id: str,
+    query: str,
+) -> str:
+    """Variante async de query_case_rag (no bloquea el event loop)."""
+    result = await arag_answer_internal(
+        db=db,
+        case_id=case_id,
+        question=query,
+        top_k=10,  # Default para uso interno
+    )
+
+    return result.context_text
@@ -15,16 +15,25 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 import chromadb
-from openai import OpenAI
-import os
 from dotenv import load_dotenv
 
 from app.core.variables import (
     LEGAL_LEY_VECTORSTORE,
     LEGAL_JURISPRUDENCIA_VECTORSTORE,
-    EMBEDDING_MODEL,
+    LEGAL_MATRIX_INDEX_ENABLED,
     DATA,
 )
+from app.services.embedding_store import get_embedding_store
+from app.services.embedding_executor import get_embedding_executor
+from app.services.embedding_batching import batch_fill_report, pack_by_tokens
+from app.services.legal_result_cache import corpus_fingerprint
+from app.services.legal_article_index import build_article_index, write_article_index
+from app.services.embedding_providers import (
+    EmbeddingProvider,
+    embed_texts,
+    get_embedding_provider,
+    provider_for_manifest,
+)
 
 load_dotenv()
 
@@ -48,18 +57,78 @@ def _get_text_hash(text: str) -> str:
     return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
 
-def _get_openai_client() -> OpenAI:
-    """Obtiene cliente OpenAI."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY no definida en entorno")
-    return OpenAI(api_key=api_key)
+def _embed_texts(provider: EmbeddingProvider, texts: List[str]) -> List[List[float]]:
+    """
+    Genera embeddings en batches por presupuesto de tokens, pasando por el
+    almacén por contenido.
+
+    Re-ingestar el corpus (overwrite=True, nueva redacción de unos pocos
+    artículos) solo llama al proveedor para los textos que han cambiado.
+    """
+    store = get_embedding_store()
+    hits_before, calls_before = store.hits, store.api_calls
+
+    # Varios batches en vuelo; resultados en orden
+    batches = pack_by_tokens(texts)
+    report = batch_fill_report(batches)
+    print(f"   📦 {report['batches']} batches, ~{report['tokens']} tokens, "
+          f"ocupación media {report['mean_fill']:.0%} (mín {report['min_fill']:.0%})")
+    all_embeddings: List[List[float]] = []
+    for _, vectors in get_embedding_executor().run_ordered(
+        batches, lambda batch: embed_texts(batch.items, provider)
+    ):
+        all_embeddings.extend(vectors)
+
+    print(f"   ♻️  Almacén de embeddings: {store.hits - hits_before} servidos sin API, "
+          f"{store.api_calls - calls_before} llamadas al proveedor")
+    return all_embeddings
+
+
+def _embedding_identity(provider: EmbeddingProvider, embeddings: List[List[float]]) -> Dict[str, Any]:
+    """Identidad del espacio vectorial del corpus (se guarda en metadata.json)."""
+    return {
+        "embedding_provider": provider.name,
+        "embedding_model": provider.model,
+        "embedding_dim": len(embeddings[0]) if embeddings else provider.dimensions,
+        "embedding_dimensions": provider.dimensions,
+    }
+
+
+def _ingest_provider(embedding_dimensions: Optional[int]) -> EmbeddingProvider:
+    """Proveedor configurado, con la dimensión reducida pedida si la hay."""
+    provider = get_embedding_provider()
+    if embedding_dimensions and embedding_dimensions != provider.dimensions:
+        provider = provider.with_dimensions(embedding_dimensions)
+    return provider
+
 
+def _is_same_embedding_space(metadata: Dict[str, Any], provider: EmbeddingProvider) -> bool:
+    """
+    True si el corpus ya ingerido usa el mismo modelo y dimensión solicitada.
+
+    Corpus anterior al registro de identidad → OpenAI nativo (como los
+    manifests antiguos): otro proveedor o dimensión obliga a regenerar.
+    """
+    if not metadata.get("hash"):
+        return True  # Nada ingerido todavía
+    return provider_for_manifest(metadata).identity() == provider.identity()
 
-def _get_legal_collection(vectorstore_path: Path, collection_name: str = "chunks"):
-    """Obtiene o crea una colección de ChromaDB para contenido legal."""
+
+def _get_legal_collection(vectorstore_path: Path, collection_name: str = "chunks", reset: bool = False):
+    """
+    Obtiene o crea una colección de ChromaDB para contenido legal.
+
+    reset=True borra la colección entera antes de crearla: el índice HNSW
+    fija la dimensión de los vectores y un delete() de sus elementos no la
+    cambia (re-ingesta con otro proveedor o dimensión).
+    """
     vectorstore_path.mkdir(parents=True, exist_ok=True)
     client = chromadb.PersistentClient(path=str(vectorstore_path))
+    if reset:
+        # list_collections devuelve nombres (Chroma >= 0.6) u objetos Collection
+        existing = {getattr(c, "name", c) for c in client.list_collections()}
+        if collection_name in existing:
+            client.delete_collection(collection_name)
     collection = client.get_or_create_collection(
         name=collection_name,
         metadata={"type": "legal"},
@@ -82,6 +151,28 @@ def _save_metadata(metadata_path: Path, metadata: Dict[str, Any]) -> None:
         json.dump(metadata, f, indent=2, ensure_ascii=False)
 
 
+def _write_matrix_snapshot(vectorstore_path: Path, metadata_path: Path, collection) -> None:
+    """
+    Instantánea matricial del corpus recién ingerido (si LEGAL_MATRIX_INDEX_ENABLED).
+
+    Se vuelca desde la colección (lo que sirve Chroma) y se firma con la
+    huella del metadata.json ya guardado. Si falla, el servicio la
+    reconstruye en la primera consulta.
+    """
+    if not LEGAL_MATRIX_INDEX_ENABLED:
+        return
+    from app.services.legal_matrix_index import build_from_collection, matrix_snapshot_path
+    try:
+        build_from_collection(
+            matrix_snapshot_path(vectorstore_path),
+            collection,
+            corpus_fingerprint([metadata_path]),
+        )
+        print(f"   🧮 Instantánea matricial escrita en {matrix_snapshot_path(vectorstore_path)}")
+    except Exception as e:
+        print(f"   ⚠️  No se pudo escribir la instantánea matricial: {e}")
+
+
 # =========================================================
 # CHUNKING LEY CONCURSAL
 # =========================================================
@@ -269,12 +360,20 @@ def chunk_jurisprudencia(text: str, filename: str) -> List[Dict[str, Any]]:
 # INGESTA LEY CONCURSAL
 # =========================================================
 
-def ingest_ley_concursal(overwrite: bool = False) -> Dict[str, Any]:
+def ingest_ley_concursal(
+    overwrite: bool = False,
+    embedding_dimensions: Optional[int] = None,
+) -> Dict[str, Any]:
     """
     Ingiere TRLC COMPLETO desde documents/ (texto descargado del BOE).
     
     Busca el archivo más reciente con patrón ley_concursal_boe_consolidado_trlc_*.txt
     
+    Args:
+        overwrite: Reprocesar aunque el texto no haya cambiado
+        embedding_dimensions: Dimensión reducida de los vectores
+            (default=la del proveedor configurado)
+    
     Returns:
         Dict con estadísticas de ingesta
     """
@@ -312,6 +411,12 @@ def ingest_ley_concursal(overwrite: bool = False) -> Dict[str, Any]:
     
     # Cargar metadata
     metadata = _load_metadata(LEGAL_LEY_METADATA)
+    provider = _ingest_provider(embedding_dimensions)
+    
+    # Otra dimensión/modelo → la colección entera debe regenerarse
+    if not _is_same_embedding_space(metadata, provider):
+        print("⚠️  Espacio vectorial distinto al ingerido: se regenera la colección")
+        overwrite = True
     
     # Verificar si ya se procesó este hash
     if metadata.get("hash") == text_hash and not overwrite:
@@ -333,16 +438,8 @@ def ingest_ley_concursal(overwrite: bool = False) -> Dict[str, Any]:
     
     # Generar embeddings y guardar
     print("🔢 Generando embeddings...")
-    openai_client = _get_openai_client()
-    collection = _get_legal_collection(LEGAL_LEY_VECTORSTORE, "chunks")
-    
-    # Limpiar colección si overwrite
-    if overwrite:
-        try:
-            collection.delete()
-            collection = _get_legal_collection(LEGAL_LEY_VECTORSTORE, "chunks")
-        except Exception:
-            pass
+    # overwrite → colección nueva (otra dimensión/proveedor incluidos)
+    collection = _get_legal_collection(LEGAL_LEY_VECTORSTORE, "chunks", reset=overwrite)
     
     chunk_ids = []
     chunk_texts = []
@@ -357,17 +454,8 @@ def ingest_ley_concursal(overwrite: bool = False) -> Dict[str, Any]:
         chunk_texts.append(chunk_data["text"])
         chunk_metadatas.append(metadata)
     
-    # Generar embeddings en batch
-    batch_size = 50
-    all_embeddings = []
-    for i in range(0, len(chunk_texts), batch_size):
-        batch = chunk_texts[i:i+batch_size]
-        response = openai_client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=batch,
-        )
-        batch_embeddings = [item.embedding for item in response.data]
-        all_embeddings.extend(batch_embeddings)
+    # Generar embeddings en batch (solo textos no embebidos previamente)
+    all_embeddings = _embed_texts(provider, chunk_texts)
     
     # Guardar en ChromaDB
     collection.add(
@@ -385,12 +473,19 @@ def ingest_ley_concursal(overwrite: bool = False) -> Dict[str, Any]:
         "last_update": datetime.now().strftime("%Y-%m-%d"),
         "ingestion_date": datetime.now().isoformat(),
         "total_articles": len(chunks),
+        **_embedding_identity(provider, all_embeddings),
     })
     # Si no existe version_label, usar un valor por defecto basado en fecha
     if "version_label" not in metadata or not metadata.get("version_label"):
         metadata["version_label"] = f"LC consolidada BOE {metadata['last_update']}"
     _save_metadata(LEGAL_LEY_METADATA, metadata)
     
+    # Índice artículo → chunks (consultas directas y verificación de citas)
+    article_index = build_article_index(text, chunks, text_hash)
+    write_article_index(article_index)
+    print(f"   📑 Índice de artículos: {len(article_index['articles'])} artículos")
+    _write_matrix_snapshot(LEGAL_LEY_VECTORSTORE, LEGAL_LEY_METADATA, collection)
+    
     return {
         "status": "success",
         "chunks": len(chunks),
@@ -403,10 +498,18 @@ def ingest_ley_concursal(overwrite: bool = False) -> Dict[str, Any]:
 # INGESTA JURISPRUDENCIA
 # =========================================================
 
-def ingest_jurisprudencia(overwrite: bool = False) -> Dict[str, Any]:
+def ingest_jurisprudencia(
+    overwrite: bool = False,
+    embedding_dimensions: Optional[int] = None,
+) -> Dict[str, Any]:
     """
     Ingiere jurisprudencia desde raw/*.txt.
     
+    Args:
+        overwrite: Reprocesar aunque los textos no hayan cambiado
+        embedding_dimensions: Dimensión reducida de los vectores
+            (default=la del proveedor configurado)
+    
     Returns:
         Dict con estadísticas de ingesta
     """
@@ -451,6 +554,12 @@ def ingest_jurisprudencia(overwrite: bool = False) -> Dict[str, Any]:
     
     # Cargar metadata
     metadata = _load_metadata(LEGAL_JUR_METADATA)
+    provider = _ingest_provider(embedding_dimensions)
+    
+    # Otra dimensión/modelo → la colección entera debe regenerarse
+    if not _is_same_embedding_space(metadata, provider):
+        print("⚠️  Espacio vectorial distinto al ingerido: se regenera la colección")
+        overwrite = True
     
     # Verificar si ya se procesó
     if metadata.get("hash") == combined_hash and not overwrite:
@@ -460,16 +569,8 @@ def ingest_jurisprudencia(overwrite: bool = False) -> Dict[str, Any]:
     
     # Generar embeddings y guardar
     print("🔢 Generando embeddings...")
-    openai_client = _get_openai_client()
-    collection = _get_legal_collection(LEGAL_JURISPRUDENCIA_VECTORSTORE, "chunks")
-    
-    # Limpiar colección si overwrite
-    if overwrite:
-        try:
-            collection.delete()
-            collection = _get_legal_collection(LEGAL_JURISPRUDENCIA_VECTORSTORE, "chunks")
-        except Exception:
-            pass
+    # overwrite → colección nueva (otra dimensión/proveedor incluidos)
+    collection = _get_legal_collection(LEGAL_JURISPRUDENCIA_VECTORSTORE, "chunks", reset=overwrite)
     
     chunk_ids = []
     chunk_texts = []
@@ -483,17 +584,8 @@ def ingest_jurisprudencia(overwrite: bool = False) -> Dict[str, Any]:
         chunk_texts.append(chunk_data["text"])
         chunk_metadatas.append(metadata_item)
     
-    # Generar embeddings en batch
-    batch_size = 50
-    all_embeddings = []
-    for i in range(0, len(chunk_texts), batch_size):
-        batch = chunk_texts[i:i+batch_size]
-        response = openai_client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=batch,
-        )
-        batch_embeddings = [item.embedding for item in response.data]
-        all_embeddings.extend(batch_embeddings)
+    # Generar embeddings en batch (solo textos no embebidos previamente)
+    all_embeddings = _embed_texts(provider, chunk_texts)
     
     # Guardar en ChromaDB
     collection.add(
@@ -511,11 +603,13 @@ def ingest_jurisprudencia(overwrite: bool = False) -> Dict[str, Any]:
         "last_update": datetime.now().strftime("%Y-%m-%d"),
         "ingestion_date": datetime.now().isoformat(),
         "total_sentences": len(txt_files),
+        **_embedding_identity(provider, all_embeddings),
     })
     # Si no existe version_label, usar un valor por defecto
     if "version_label" not in metadata or not metadata.get("version_label"):
         metadata["version_label"] = f"Jurisprudencia seleccionada {metadata['last_update']}"
     _save_metadata(LEGAL_JUR_METADATA, metadata)
+    _write_matrix_snapshot(LEGAL_JURISPRUDENCIA_VECTORSTORE, LEGAL_JUR_METADATA, collection)
     
     return {
         "status": "success",
@@ -557,6 +651,12 @@ def main():
         action="store_true",
         help="Sobrescribir embeddings existentes",
     )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        default=None,
+        help="Dimensión reducida de los embeddings (default: EMBEDDING_DIMENSIONS)",
+    )
     
     args = parser.parse_args()
     
@@ -571,7 +671,9 @@ def main():
         print("INGESTA LEY CONCURSAL")
         print("="*60)
         try:
-            results["ley"] = ingest_ley_concursal(overwrite=args.overwrite)
+            results["ley"] = ingest_ley_concursal(
+                overwrite=args.overwrite, embedding_dimensions=args.dimensions
+            )
         except Exception as e:
             print(f"❌ Error: {e}")
             results["ley"] = {"status": "error", "error": str(e)}
@@ -581,7 +683,9 @@ def main():
         print("INGESTA JURISPRUDENCIA")
         print("="*60)
         try:
-            results["jurisprudencia"] = ingest_jurisprudencia(overwrite=args.overwrite)
+            results["jurisprudencia"] = ingest_jurisprudencia(
+                overwrite=args.overwrite, embedding_dimensions=args.dimensions
+            )
         except Exception as e:
             print(f"❌ Error: {e}")
             results["jurisprudencia"] = {"status": "error", "error": str(e)}
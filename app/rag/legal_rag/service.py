@@ -5,66 +5,127 @@ Proporciona acceso simplificado al corpus legal para uso en agentes.
 """
 from __future__ import annotations
 
-from typing import List, Dict, Any, Optional, Literal
+from typing import List, Dict, Any, Optional, Literal, Tuple
 from pathlib import Path
 from functools import lru_cache
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import json
+import threading
 
 import chromadb
-from openai import OpenAI
-import os
 from dotenv import load_dotenv
 
 from app.core.variables import (
     LEGAL_LEY_VECTORSTORE,
     LEGAL_JURISPRUDENCIA_VECTORSTORE,
-    EMBEDDING_MODEL,
     RAG_TOP_K_DEFAULT,
+    DATA,
+    LEGAL_SEARCH_WORKERS,
+    LEGAL_MATRIX_INDEX_ENABLED,
+)
+from app.core.logger import logger
+from app.services.embedding_cache import aembed_query, embed_query
+from app.services.legal_article_index import (
+    article_in_query,
+    get_article_index,
+    normalize_article_number,
+)
+from app.services.legal_result_cache import (
+    corpus_fingerprint,
+    get_legal_result_cache,
+    legal_cache_key,
+)
+from app.services.embedding_providers import (
+    EmbeddingProvider,
+    get_embedding_provider,
+    provider_for_manifest,
 )
 
 load_dotenv()
 
 
 # =========================================================
-# CLIENTE OPENAI REUTILIZABLE
+# PROVEEDOR DE EMBEDDINGS DEL CORPUS
 # =========================================================
 
-_openai_client: Optional[OpenAI] = None
+LEGAL_LEY_METADATA = DATA / "legal" / "ley_concursal" / "metadata.json"
+LEGAL_JUR_METADATA = DATA / "legal" / "jurisprudencia" / "metadata.json"
 
 
-def _get_openai_client() -> OpenAI:
-    """Obtiene o crea el cliente OpenAI reutilizable."""
-    global _openai_client
-    if _openai_client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError("OPENAI_API_KEY no definida en entorno")
-        _openai_client = OpenAI(api_key=api_key)
-    return _openai_client
+_LEGAL_METADATA: Dict[str, Path] = {
+    "ley": LEGAL_LEY_METADATA,
+    "jurisprudencia": LEGAL_JUR_METADATA,
+}
 
 
-# =========================================================
-# CACHÉ DE CONSULTAS LEGALES
-# =========================================================
+def _legal_query_provider(source: Literal["ley", "jurisprudencia"] = "ley") -> EmbeddingProvider:
+    """
+    Proveedor con el que se ingirió una fuente legal (su metadata.json).
+
+    Las consultas deben caer en el mismo espacio vectorial que el índice.
+    Corpus ingerido antes de registrar el proveedor → OpenAI nativo, como
+    los manifests antiguos de las versiones de casos.
+    Re-ingerir la fuente cambia la huella y se vuelve a resolver.
+    """
+    metadata_path = _LEGAL_METADATA[source]
+    return _legal_query_provider_for(str(metadata_path), corpus_fingerprint([metadata_path]))
+
+
+@lru_cache(maxsize=4)
+def _legal_query_provider_for(metadata_path: str, fingerprint: str) -> EmbeddingProvider:
+    """Resuelve el proveedor para una huella concreta de metadata.json."""
+    try:
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        # Fuente aún no ingerida: no hay índice con el que coincidir
+        return get_embedding_provider()
+    return provider_for_manifest(metadata)
+
 
-_legal_cache: Dict[str, List[Dict[str, Any]]] = {}
+def _legal_query_providers(sources: List[str]) -> Dict[str, EmbeddingProvider]:
+    """Proveedor de cada fuente (ley y jurisprudencia pueden diferir)."""
+    return {source: _legal_query_provider(source) for source in sources}
 
 
-def _get_cache_key(query: str, include_ley: bool, include_jurisprudencia: bool) -> str:
-    """Genera una clave única para el caché basada en los parámetros de consulta."""
-    key_data = f"{query}::{include_ley}::{include_jurisprudencia}"
-    return hashlib.md5(key_data.encode()).hexdigest()
+def _identity_key(provider: EmbeddingProvider) -> tuple:
+    return tuple(sorted(provider.identity().items()))
 
 
-def _get_cached_result(cache_key: str) -> Optional[List[Dict[str, Any]]]:
-    """Obtiene un resultado del caché si existe."""
-    return _legal_cache.get(cache_key)
+def _embed_for_sources(query: str, sources: List[str]) -> Dict[str, List[float]]:
+    """Embedding de la consulta en el espacio de cada fuente (uno por proveedor distinto)."""
+    providers = _legal_query_providers(sources)
+    by_identity: Dict[tuple, List[float]] = {}
+    for provider in providers.values():
+        key = _identity_key(provider)
+        if key not in by_identity:
+            by_identity[key] = embed_query(query, provider=provider)
+    return {source: by_identity[_identity_key(p)] for source, p in providers.items()}
 
 
-def _cache_result(cache_key: str, result: List[Dict[str, Any]]) -> None:
-    """Almacena un resultado en el caché."""
-    _legal_cache[cache_key] = result
+async def _aembed_for_sources(query: str, sources: List[str]) -> Dict[str, List[float]]:
+    """Variante async de _embed_for_sources (proveedores distintos en paralelo)."""
+    providers = _legal_query_providers(sources)
+    unique = {_identity_key(provider): provider for provider in providers.values()}
+    vectors = await asyncio.gather(*[
+        aembed_query(query, provider=provider) for provider in unique.values()
+    ])
+    by_identity = dict(zip(unique, vectors))
+    return {source: by_identity[_identity_key(p)] for source, p in providers.items()}
+
+
+# =========================================================
+# CACHÉ DE CONSULTAS LEGALES
+# =========================================================
+
+def _get_cache_key(query: str, top_k: int, sources: List[str]) -> str:
+    """
+    Clave de caché: consulta, top_k, fuentes y huella de los metadata.json
+    de esas fuentes (una re-ingesta invalida sus resultados).
+    """
+    corpus_hash = corpus_fingerprint([_LEGAL_METADATA[source] for source in sources])
+    return legal_cache_key(query, top_k, sources, corpus_hash)
 
 
 # =========================================================
@@ -271,82 +332,226 @@ def query_legal_rag(
         - law: Nombre de la ley
         - court: Órgano jurisdiccional (si es jurisprudencia)
         - date: Fecha relevante
+    
+    Una consulta que solo nombra un artículo ("art. 443 LC") toma la ley del
+    índice de artículos, sin embedding ni búsqueda vectorial; solo la
+    jurisprudencia (si se pide) pasa por la búsqueda vectorial.
     """
+    direct = _direct_article_raw_results(query, top_k) if include_ley else None
+    if direct is not None and not include_jurisprudencia:
+        return _finalize_legal_results(direct)
+    
+    sources = _selected_sources(include_ley, include_jurisprudencia)
+    
     # Verificar caché
-    cache_key = _get_cache_key(query, include_ley, include_jurisprudencia)
-    cached = _get_cached_result(cache_key)
+    cache = get_legal_result_cache()
+    cache_key = _get_cache_key(query, top_k, sources)
+    cached = cache.get(cache_key)
     if cached is not None:
         return cached
     
-    # Generar embedding
-    openai_client = _get_openai_client()
-    response = openai_client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=query,
-    )
-    query_embedding = response.data[0].embedding
+    searched = _vector_sources(sources, direct)
     
-    # Recopilar resultados raw
-    raw_results: List[Dict[str, Any]] = []
+    # Generar embedding en el espacio de cada fuente (caché de consultas
+    # compartida con el RAG de casos)
+    query_embeddings = _embed_for_sources(query, searched)
+    
+    # Recopilar resultados raw (ley y jurisprudencia en paralelo)
+    raw_results = (direct or []) + _search_legal_sources(searched, query_embeddings, top_k)
+    
+    result_dicts = _finalize_legal_results(raw_results)
+    
+    # Almacenar en caché
+    cache.put(cache_key, result_dicts)
     
-    # Consultar Ley Concursal
+    return result_dicts
+
+
+async def aquery_legal_rag(
+    query: str,
+    top_k: int = RAG_TOP_K_DEFAULT,
+    include_ley: bool = True,
+    include_jurisprudencia: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Variante async de query_legal_rag para los endpoints FastAPI.
+    
+    - Embedding async del proveedor (sin ocupar un hilo durante la espera de red)
+    - Ley y jurisprudencia se consultan en paralelo, cada una en un hilo
+    
+    Devuelve exactamente el mismo formato que query_legal_rag.
+    """
+    direct = _direct_article_raw_results(query, top_k) if include_ley else None
+    if direct is not None and not include_jurisprudencia:
+        return _finalize_legal_results(direct)
+    
+    sources = _selected_sources(include_ley, include_jurisprudencia)
+    
+    # Caché: el nivel de disco es sqlite → fuera del event loop
+    cache = get_legal_result_cache()
+    cache_key = _get_cache_key(query, top_k, sources)
+    cached = await asyncio.to_thread(cache.get, cache_key)
+    if cached is not None:
+        return cached
+    
+    searched = _vector_sources(sources, direct)
+    query_embeddings = await _aembed_for_sources(query, searched)
+    
+    per_source = await asyncio.gather(*[
+        asyncio.to_thread(_search_legal_source, source, query_embeddings[source], top_k)
+        for source in searched
+    ])
+    raw_results = (direct or []) + [raw for results in per_source for raw in results]
+    
+    result_dicts = _finalize_legal_results(raw_results)
+    await asyncio.to_thread(cache.put, cache_key, result_dicts)
+    
+    return result_dicts
+
+
+# =========================================================
+# CONSULTA DIRECTA POR ARTÍCULO
+# =========================================================
+
+def lookup_legal_article(article: str, top_k: int = RAG_TOP_K_DEFAULT) -> List[Dict[str, Any]]:
+    """
+    Chunks de un artículo de la Ley Concursal desde el índice de artículos.
+
+    Sin embedding ni Chroma. Mismo formato que query_legal_rag; lista vacía
+    si el índice no existe o el artículo no está en el corpus.
+
+    Args:
+        article: Referencia en cualquier formato ("443", "Art. 443 LC", "art. 443.1º")
+        top_k: Máximo de chunks (en orden del texto)
+    """
+    return _finalize_legal_results(_article_raw_results(article, top_k))
+
+
+def _article_raw_results(article: str, top_k: int) -> List[Dict[str, Any]]:
+    """Resultados raw (formato de _search_legal_source) de un artículo del índice."""
+    index = get_article_index()
+    if index is None or not index.has_article(article):
+        return []
+    number = normalize_article_number(article)
+    return [
+        {
+            "content": chunk["text"],
+            "metadata": {**chunk["metadata"], "article": number},
+            "score": 0.0,
+            "source": "ley",
+        }
+        for chunk in index.lookup(article, limit=top_k)
+    ]
+
+
+def _direct_article_raw_results(query: str, top_k: int) -> Optional[List[Dict[str, Any]]]:
+    """Resultados raw del índice si la consulta solo nombra un artículo existente; si no, None."""
+    article = article_in_query(query)
+    if article is None:
+        return None
+    return _article_raw_results(article, top_k) or None
+
+
+def _vector_sources(sources: List[str], direct: Optional[List[Dict[str, Any]]]) -> List[str]:
+    """Fuentes que necesitan búsqueda vectorial (la ley no si ya vino del índice)."""
+    if direct is None:
+        return sources
+    return [source for source in sources if source != "ley"]
+
+
+# =========================================================
+# BÚSQUEDA POR FUENTE (COMPARTIDA SYNC / ASYNC)
+# =========================================================
+
+_LEGAL_SOURCES: Dict[str, Path] = {
+    "ley": LEGAL_LEY_VECTORSTORE,
+    "jurisprudencia": LEGAL_JURISPRUDENCIA_VECTORSTORE,
+}
+
+
+def _selected_sources(include_ley: bool, include_jurisprudencia: bool) -> List[str]:
+    sources = []
     if include_ley:
-        try:
-            collection = _get_legal_collection(LEGAL_LEY_VECTORSTORE, "chunks")
-            
-            if collection.count() > 0:
-                db_results = collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=top_k,
-                    include=["documents", "metadatas", "distances"],
-                )
-                
-                if db_results["ids"] and len(db_results["ids"][0]) > 0:
-                    for doc_id, doc_text, metadata, distance in zip(
-                        db_results["ids"][0],
-                        db_results["documents"][0],
-                        db_results["metadatas"][0],
-                        db_results["distances"][0],
-                    ):
-                        raw_results.append({
-                            "content": doc_text,
-                            "metadata": metadata,
-                            "score": float(distance),
-                            "source": "ley",
-                        })
-        except Exception:
-            # Si falla la consulta, continuar sin ley (no es crítico)
-            pass
-    
-    # Consultar Jurisprudencia
+        sources.append("ley")
     if include_jurisprudencia:
-        try:
-            collection = _get_legal_collection(LEGAL_JURISPRUDENCIA_VECTORSTORE, "chunks")
+        sources.append("jurisprudencia")
+    return sources
+
+
+def _search_legal_source(
+    source: Literal["ley", "jurisprudencia"],
+    query_embedding: List[float],
+    top_k: int,
+) -> List[Dict[str, Any]]:
+    """Consulta una colección legal y devuelve resultados raw (vacío si falla)."""
+    raw_results: List[Dict[str, Any]] = []
+    try:
+        collection = _get_legal_search_backend(source)
+        
+        if collection.count() > 0:
+            db_results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                include=["documents", "metadatas", "distances"],
+            )
             
-            if collection.count() > 0:
-                db_results = collection.query(
-                    query_embeddings=[query_embedding],
-                    n_results=top_k,
-                    include=["documents", "metadatas", "distances"],
-                )
-                
-                if db_results["ids"] and len(db_results["ids"][0]) > 0:
-                    for doc_id, doc_text, metadata, distance in zip(
-                        db_results["ids"][0],
-                        db_results["documents"][0],
-                        db_results["metadatas"][0],
-                        db_results["distances"][0],
-                    ):
-                        raw_results.append({
-                            "content": doc_text,
-                            "metadata": metadata,
-                            "score": float(distance),
-                            "source": "jurisprudencia",
-                        })
-        except Exception:
-            # Si falla la consulta, continuar sin jurisprudencia (no es crítico)
-            pass
-    
+            if db_results["ids"] and len(db_results["ids"][0]) > 0:
+                for doc_id, doc_text, metadata, distance in zip(
+                    db_results["ids"][0],
+                    db_results["documents"][0],
+                    db_results["metadatas"][0],
+                    db_results["distances"][0],
+                ):
+                    raw_results.append({
+                        "content": doc_text,
+                        "metadata": metadata,
+                        "score": float(distance),
+                        "source": source,
+                    })
+    except Exception:
+        # Si falla la consulta, continuar sin esta fuente (no es crítico)
+        pass
+    
+    return raw_results
+
+
+# Hilos compartidos por el proceso para consultar fuentes en paralelo
+# (Chroma libera el GIL durante la búsqueda HNSW)
+_search_executor = ThreadPoolExecutor(
+    max_workers=LEGAL_SEARCH_WORKERS,
+    thread_name_prefix="legal-search",
+)
+
+
+def _search_legal_sources(
+    sources: List[str],
+    query_embeddings: Dict[str, List[float]],
+    top_k: int,
+) -> List[Dict[str, Any]]:
+    """
+    Consulta varias fuentes a la vez y concatena en el orden de `sources`.
+    query_embeddings: embedding de la consulta por fuente.
+
+    La primera fuente se consulta en el hilo llamador; el resto en el
+    executor del proceso.
+    """
+    if len(sources) <= 1:
+        return [
+            raw for source in sources
+            for raw in _search_legal_source(source, query_embeddings[source], top_k)
+        ]
+    futures = [
+        _search_executor.submit(_search_legal_source, source, query_embeddings[source], top_k)
+        for source in sources[1:]
+    ]
+    raw_results = _search_legal_source(sources[0], query_embeddings[sources[0]], top_k)
+    for future in futures:
+        raw_results.extend(future.result())
+    return raw_results
+
+
+def _finalize_legal_results(raw_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normaliza, ordena por relevancia y añade el resumen legal."""
     # Normalizar resultados
     normalized_results: List[LegalResult] = []
     for raw in raw_results:
@@ -369,22 +574,113 @@ def query_legal_rag(
         # Añadir el summary solo al primer resultado para evitar duplicación
         result_dicts[0]["legal_summary"] = legal_summary
     
-    # Almacenar en caché
-    _cache_result(cache_key, result_dicts)
-    
     return result_dicts
 
 
-def _get_legal_collection(vectorstore_path: Path, collection_name: str = "chunks"):
-    """Obtiene o crea una colección de ChromaDB para contenido legal."""
-    # Crear el directorio si no existe
-    vectorstore_path.mkdir(parents=True, exist_ok=True)
-    
+# =========================================================
+# COLECCIONES LEGALES (UNA VEZ POR PROCESO, SOLO LECTURA)
+# =========================================================
+
+# (ruta, colección) → (huella de metadata.json, colección abierta)
+_legal_collections: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+_legal_collections_lock = threading.Lock()
+
+
+def _get_legal_collection(
+    vectorstore_path: Path,
+    collection_name: str = "chunks",
+    metadata_path: Optional[Path] = None,
+):
+    """
+    Obtiene una colección legal abierta en modo consulta.
+
+    Se abre una vez por proceso y se reutiliza. Sin mkdir ni
+    get_or_create: un corpus no ingerido lanza excepción en lugar de
+    crear una colección vacía (la ingesta usa su propio cliente).
+
+    Una re-ingesta recrea la colección y reescribe metadata.json: si su
+    huella cambia, se vuelve a resolver la colección. El cliente no se
+    cierra (Chroma comparte un único System por ruta dentro del proceso).
+
+    Args:
+        vectorstore_path: Directorio del vectorstore (ley o jurisprudencia)
+        collection_name: Nombre de la colección
+        metadata_path: metadata.json del corpus
+    """
+    key = (str(vectorstore_path), collection_name)
+    fingerprint = corpus_fingerprint([metadata_path]) if metadata_path else "-"
+    entry = _legal_collections.get(key)
+    if entry is not None and entry[0] == fingerprint:
+        return entry[1]
+
+    if not vectorstore_path.exists():
+        raise FileNotFoundError(f"Vectorstore legal no encontrado: {vectorstore_path}")
+    logger.info(f"[LEGAL RAG] Abriendo colección '{collection_name}' en {vectorstore_path}")
     client = chromadb.PersistentClient(path=str(vectorstore_path))
-    
-    collection = client.get_or_create_collection(
-        name=collection_name,
-        metadata={"type": "legal"},
-    )
-    
+    collection = client.get_collection(name=collection_name)
+
+    with _legal_collections_lock:
+        _legal_collections[key] = (fingerprint, collection)
     return collection
+
+
+def clear_legal_collections() -> None:
+    """Olvida las colecciones e instantáneas abiertas (tests / tras borrar el corpus)."""
+    with _legal_collections_lock:
+        _legal_collections.clear()
+        _legal_matrices.clear()
+
+
+# =========================================================
+# ÍNDICE MATRICIAL EXACTO (OPCIONAL)
+# =========================================================
+
+# ruta del vectorstore → (huella de metadata.json, LegalMatrixIndex)
+_legal_matrices: Dict[str, Tuple[str, Any]] = {}
+_legal_matrix_build_lock = threading.Lock()
+
+
+def _get_legal_search_backend(source: Literal["ley", "jurisprudencia"]):
+    """
+    Objeto con query()/count() para una fuente: la instantánea matricial si
+    LEGAL_MATRIX_INDEX_ENABLED, si no (o si falla) la colección de Chroma.
+    """
+    vectorstore_path = _LEGAL_SOURCES[source]
+    metadata_path = _LEGAL_METADATA[source]
+    if LEGAL_MATRIX_INDEX_ENABLED:
+        try:
+            return _get_legal_matrix(vectorstore_path, metadata_path)
+        except Exception as e:
+            logger.warning(f"[LEGAL RAG] Índice matricial no disponible ({source}), usando Chroma: {e}")
+    return _get_legal_collection(vectorstore_path, "chunks", metadata_path=metadata_path)
+
+
+def _get_legal_matrix(vectorstore_path: Path, metadata_path: Path):
+    """
+    Instantánea matricial vigente del corpus (se carga una vez por proceso).
+
+    Si falta o es de una ingesta anterior se reconstruye desde Chroma.
+    """
+    from app.services.legal_matrix_index import (
+        build_from_collection,
+        load_matrix_index,
+        matrix_snapshot_path,
+    )
+
+    key = str(vectorstore_path)
+    fingerprint = corpus_fingerprint([metadata_path])
+    entry = _legal_matrices.get(key)
+    if entry is not None and entry[0] == fingerprint:
+        return entry[1]
+
+    snapshot = matrix_snapshot_path(vectorstore_path)
+    with _legal_matrix_build_lock:
+        index = load_matrix_index(snapshot, fingerprint)
+        if index is None:
+            collection = _get_legal_collection(vectorstore_path, "chunks", metadata_path=metadata_path)
+            build_from_collection(snapshot, collection, fingerprint)
+            index = load_matrix_index(snapshot, fingerprint)
+        if index is None:
+            raise RuntimeError(f"No se pudo construir la instantánea {snapshot}")
+        _legal_matrices[key] = (fingerprint, index)
+    return index
@@ -1,23 +1,91 @@
 """
 Servicio para generar resumen de calidad documental por caso.
+
+El resumen se materializa por (case_id, versión ACTIVE) y solo se
+recalcula cuando cambian documentos, chunks o el vectorstore activo.
 """
 
 from __future__ import annotations
 
-from typing import Dict, Any, List
+import copy
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, event, func
 
 from app.models.document import Document
 from app.models.document_chunk import DocumentChunk
 from app.services.embeddings_pipeline import get_case_collection
-from app.core.variables import CRITICAL_DOCUMENT_TYPES
+from app.services.vectorstore_versioning import get_active_version
+from app.core.variables import CRITICAL_DOCUMENT_TYPES, DOCUMENT_QUALITY_CACHE_TTL_SECONDS
+
+
+# =========================================================
+# MATERIALIZACIÓN (por proceso)
+# =========================================================
+# Clave: (case_id, versión ACTIVE). Se invalida:
+# - por eventos ORM (flush/commit de Document/DocumentChunk del caso)
+# - borrados/updates en bloque (query.delete) → se invalidan todos los casos
+# - al cambiar ACTIVE (la versión forma parte de la clave)
+# TTL como red de seguridad para cambios hechos por otros workers.
+
+_summary_cache: Dict[Tuple[str, Optional[str]], Tuple[float, Dict[str, Any]]] = {}
+_summary_lock = threading.Lock()
+_generation = 0  # Se incrementa en cada invalidación (evita guardar cálculos obsoletos)
+
+
+def invalidate_document_quality(case_id: Optional[str] = None) -> None:
+    """Invalida el resumen materializado de un caso (o de todos)."""
+    global _generation
+    with _summary_lock:
+        _generation += 1
+        if case_id is None:
+            _summary_cache.clear()
+            return
+        for key in [k for k in _summary_cache if k[0] == case_id]:
+            _summary_cache.pop(key, None)
+
+
+_TOUCHED_KEY = "document_quality_touched_cases"
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_flush(session, flush_context) -> None:
+    """Cualquier alta/baja/cambio de documento o chunk invalida su caso."""
+    touched = session.info.setdefault(_TOUCHED_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Document, DocumentChunk)):
+            case_id = getattr(obj, "case_id", None)
+            if case_id:
+                touched.add(case_id)
+                invalidate_document_quality(case_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session) -> None:
+    """Segunda invalidación tras commit: otra sesión pudo recalcular con datos previos."""
+    for case_id in session.info.pop(_TOUCHED_KEY, set()):
+        invalidate_document_quality(case_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_bulk(orm_execute_state) -> None:
+    """query.delete()/update() no pasan por flush: invalidar todo (operación rara)."""
+    if not (orm_execute_state.is_delete or orm_execute_state.is_update):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (Document, DocumentChunk):
+        invalidate_document_quality()
 
 
 def get_document_quality_summary(db: Session, case_id: str) -> Dict[str, Any]:
     """
     Genera un resumen de calidad documental para un caso.
     
+    Devuelve el resumen materializado si sigue vigente para la versión
+    ACTIVE actual; si no, lo recalcula con compute_document_quality_summary.
+    
     Parámetros
     ----------
     db : Session
@@ -29,51 +97,83 @@ def get_document_quality_summary(db: Session, case_id: str) -> Dict[str, Any]:
     -------
     Dict con estadísticas de calidad documental
     """
+    key = (case_id, get_active_version(case_id))
+    now = time.monotonic()
     
-    # 1. Estadísticas básicas de documentos
-    total_documents = db.query(Document).filter(Document.case_id == case_id).count()
+    with _summary_lock:
+        cached = _summary_cache.get(key)
+        generation = _generation
+    if cached is not None and now - cached[0] < DOCUMENT_QUALITY_CACHE_TTL_SECONDS:
+        return copy.deepcopy(cached[1])
     
-    # Por formato
-    formats = (
-        db.query(Document.file_format, func.count(Document.document_id))
-        .filter(Document.case_id == case_id)
-        .group_by(Document.file_format)
-        .all()
-    )
-    format_distribution = {fmt: count for fmt, count in formats}
+    summary = compute_document_quality_summary(db=db, case_id=case_id)
     
-    # Por tipo
-    types = (
-        db.query(Document.doc_type, func.count(Document.document_id))
-        .filter(Document.case_id == case_id)
-        .group_by(Document.doc_type)
-        .all()
-    )
-    type_distribution = {doc_type: count for doc_type, count in types}
+    with _summary_lock:
+        # Si hubo una invalidación durante el cálculo, no materializar
+        if generation == _generation:
+            _summary_cache[key] = (now, summary)
+    return copy.deepcopy(summary)
+
+
+def compute_document_quality_summary(db: Session, case_id: str) -> Dict[str, Any]:
+    """
+    Calcula el resumen de calidad SIN materialización.
     
-    # 2. Estadísticas de chunks
-    total_chunks = (
-        db.query(DocumentChunk)
-        .filter(DocumentChunk.case_id == case_id)
-        .count()
-    )
+    Una única consulta agrupada (documentos LEFT JOIN chunks) y, como
+    mucho, dos llamadas a Chroma (count + get de chunks críticos).
+    """
     
-    # Chunks por documento
-    chunks_per_doc = (
+    # 1-2. Documentos y chunks: UNA consulta agrupada por documento
+    rows = (
         db.query(
-            DocumentChunk.document_id,
-            func.count(DocumentChunk.chunk_id).label("chunk_count")
+            Document.document_id,
+            Document.filename,
+            Document.doc_type,
+            Document.file_format,
+            func.count(DocumentChunk.chunk_id),
+        )
+        .outerjoin(
+            DocumentChunk,
+            and_(
+                DocumentChunk.document_id == Document.document_id,
+                DocumentChunk.case_id == case_id,
+            ),
+        )
+        .filter(Document.case_id == case_id)
+        .group_by(
+            Document.document_id,
+            Document.filename,
+            Document.doc_type,
+            Document.file_format,
         )
-        .filter(DocumentChunk.case_id == case_id)
-        .group_by(DocumentChunk.document_id)
         .all()
     )
     
+    total_documents = len(rows)
+    format_distribution: Dict[str, int] = {}
+    type_distribution: Dict[str, int] = {}
+    total_chunks = 0
+    docs_with_chunks = 0
+    critical_docs_without_chunks: List[str] = []  # filenames
+    critical_docs_with_chunks: Dict[str, Tuple[str, int]] = {}  # doc_id -> (filename, chunks)
+    
+    for document_id, filename, doc_type, file_format, chunk_count in rows:
+        format_distribution[file_format] = format_distribution.get(file_format, 0) + 1
+        type_distribution[doc_type] = type_distribution.get(doc_type, 0) + 1
+        total_chunks += chunk_count
+        if chunk_count > 0:
+            docs_with_chunks += 1
+        if doc_type in CRITICAL_DOCUMENT_TYPES:
+            if chunk_count == 0:
+                critical_docs_without_chunks.append(filename)
+            else:
+                critical_docs_with_chunks[document_id] = (filename, chunk_count)
+    
     avg_chunks_per_doc = total_chunks / total_documents if total_documents > 0 else 0
-    docs_with_chunks = len(chunks_per_doc)
     docs_without_chunks = total_documents - docs_with_chunks
     
     # 3. Estadísticas de embeddings
+    collection = None
     try:
         collection = get_case_collection(case_id)
         total_embeddings = collection.count()
@@ -96,55 +196,38 @@ def get_document_quality_summary(db: Session, case_id: str) -> Dict[str, Any]:
         legal_risks.append(f"Riesgo de omisión en análisis: {missing_embeddings} fragmento(s) no indexado(s)")
     
     # ✅ ALERTA CRÍTICA: Documentos críticos sin embeddings
-    critical_docs = (
-        db.query(Document)
-        .filter(
-            Document.case_id == case_id,
-            Document.doc_type.in_(CRITICAL_DOCUMENT_TYPES)
-        )
-        .all()
-    )
-    
-    critical_docs_without_chunks = []
-    critical_docs_without_embeddings = []
-    
-    for doc in critical_docs:
-        chunk_count = (
-            db.query(DocumentChunk)
-            .filter(DocumentChunk.document_id == doc.document_id)
-            .count()
-        )
-        
-        if chunk_count == 0:
-            critical_docs_without_chunks.append(doc)
-        else:
-            # Verificar embeddings (contar chunks que están en el vectorstore)
-            try:
-                collection = get_case_collection(case_id)
-                # Obtener chunk_ids del documento
-                chunk_ids = [
-                    chunk.chunk_id
-                    for chunk in db.query(DocumentChunk)
-                    .filter(DocumentChunk.document_id == doc.document_id)
-                    .all()
-                ]
-                # Verificar cuántos están en el vectorstore
-                if chunk_ids:
-                    existing = collection.get(ids=chunk_ids[:10], include=[])  # Sample
-                    if len(existing.get("ids", [])) < min(10, len(chunk_ids)):
-                        critical_docs_without_embeddings.append(doc)
-            except Exception:
-                critical_docs_without_embeddings.append(doc)
+    # Una sola consulta a Chroma para todos los documentos críticos con chunks
+    critical_docs_without_embeddings: List[str] = []  # filenames
+    if critical_docs_with_chunks:
+        try:
+            if collection is None:
+                raise RuntimeError("Sin colección ACTIVE")
+            embedded = collection.get(
+                where={"document_id": {"$in": list(critical_docs_with_chunks.keys())}},
+                include=["metadatas"],
+            )
+            embedded_per_doc: Dict[str, int] = {}
+            for meta in embedded.get("metadatas") or []:
+                if meta:
+                    doc_id = meta.get("document_id")
+                    embedded_per_doc[doc_id] = embedded_per_doc.get(doc_id, 0) + 1
+            for doc_id, (filename, chunk_count) in critical_docs_with_chunks.items():
+                if embedded_per_doc.get(doc_id, 0) < chunk_count:
+                    critical_docs_without_embeddings.append(filename)
+        except Exception:
+            critical_docs_without_embeddings = [
+                filename for filename, _ in critical_docs_with_chunks.values()
+            ]
     
     if critical_docs_without_chunks:
-        critical_names = [d.filename for d in critical_docs_without_chunks[:5]]
+        critical_names = critical_docs_without_chunks[:5]
         legal_risks.append(
             f"⚠️ ALERTA LEGAL CRÍTICA: {len(critical_docs_without_chunks)} documento(s) legal(es) crítico(s) "
             f"sin procesar: {', '.join(critical_names)}"
         )
     
     if critical_docs_without_embeddings:
-        critical_names = [d.filename for d in critical_docs_without_embeddings[:5]]
+        critical_names = critical_docs_without_embeddings[:5]
         legal_risks.append(
             f"⚠️ ALERTA LEGAL: {len(critical_docs_without_embeddings)} documento(s) legal(es) crítico(s) "
             f"sin índice semántico completo: {', '.join(critical_names)}"
@@ -0,0 +1,136 @@
+"""
+Batching de peticiones de embeddings por PRESUPUESTO DE TOKENS.
+
+Agrupar por nº de chunks desaprovecha peticiones (chunks de ~700
+caracteres) o las hace exceder el límite por petición (chunks de ~3000).
+Aquí se empaquetan los textos, en orden, hasta un presupuesto de tokens
+estimados por petición (EMBEDDING_BATCH_MAX_TOKENS) y un máximo de
+entradas (EMBEDDING_BATCH_MAX_ITEMS, límite de la API).
+
+La estimación es conservadora (caracteres / EMBEDDING_CHARS_PER_TOKEN)
+para no depender de un tokenizador.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, Iterable, Iterator, List, TypeVar
+
+from app.core.variables import (
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_BATCH_MAX_ITEMS,
+    EMBEDDING_CHARS_PER_TOKEN,
+)
+
+
+T = TypeVar("T")
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Tokens estimados de un texto (redondeo hacia arriba)."""
+    return int(len(text) / EMBEDDING_CHARS_PER_TOKEN) + 1
+
+
+def estimate_tokens(texts: List[str]) -> int:
+    """Tokens estimados de una lista de textos."""
+    return sum(estimate_text_tokens(t) for t in texts)
+
+
+@dataclass
+class TokenBatch(Generic[T]):
+    """Batch empaquetado y sus tokens estimados."""
+    items: List[T]
+    tokens: int
+    max_tokens: int
+
+    @property
+    def fill_ratio(self) -> float:
+        """Ocupación del presupuesto de tokens (puede superar 1.0 con un único texto enorme)."""
+        return self.tokens / self.max_tokens if self.max_tokens else 0.0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+def iter_token_batches(
+    items: Iterable[T],
+    text_of: Callable[[T], str] = lambda item: item,
+    *,
+    max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+    max_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+) -> Iterator[TokenBatch[T]]:
+    """
+    Empaqueta items EN ORDEN hasta max_tokens / max_items por batch.
+
+    Generador: consume `items` de forma perezosa (streaming desde BD) y
+    solo retiene el batch en construcción.
+
+    Un item que por sí solo supera max_tokens va en un batch propio (la API
+    lo aceptará o rechazará igual que antes; no se trocea aquí).
+    """
+    current: List[T] = []
+    current_tokens = 0
+
+    for item in items:
+        tokens = estimate_text_tokens(text_of(item))
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            yield TokenBatch(current, current_tokens, max_tokens)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+
+    if current:
+        yield TokenBatch(current, current_tokens, max_tokens)
+
+
+def pack_by_tokens(
+    items: Iterable[T],
+    text_of: Callable[[T], str] = lambda item: item,
+    *,
+    max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+    max_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+) -> List[TokenBatch[T]]:
+    """Variante en lista de iter_token_batches."""
+    return list(iter_token_batches(items, text_of, max_tokens=max_tokens, max_items=max_items))
+
+
+class FillTracker:
+    """
+    Acumula la ocupación de batches ya procesados (sin retener sus items)
+    para el informe final de builds en streaming.
+    """
+
+    def __init__(self):
+        self.fills: List[float] = []
+        self.items = 0
+        self.tokens = 0
+
+    def add(self, batch: TokenBatch) -> None:
+        self.fills.append(batch.fill_ratio)
+        self.items += len(batch)
+        self.tokens += batch.tokens
+
+    def report(self) -> Dict[str, Any]:
+        return _fill_summary(self.fills, self.items, self.tokens)
+
+
+def _fill_summary(fills: List[float], items: int, tokens: int) -> Dict[str, Any]:
+    if not fills:
+        return {"batches": 0, "items": 0, "tokens": 0, "mean_fill": 0.0, "min_fill": 0.0, "max_fill": 0.0}
+    return {
+        "batches": len(fills),
+        "items": items,
+        "tokens": tokens,
+        "mean_fill": round(sum(fills) / len(fills), 3),
+        # El último batch suele ir incompleto: el mínimo relevante es el del resto
+        "min_fill": round(min(fills[:-1] or fills), 3),
+        "max_fill": round(max(fills), 3),
+    }
+
+
+def batch_fill_report(batches: List[TokenBatch]) -> Dict[str, Any]:
+    """Resumen de ocupación de los batches (para logs/métricas)."""
+    return _fill_summary(
+        [b.fill_ratio for b in batches],
+        sum(len(b) for b in batches),
+        sum(b.tokens for b in batches),
+    )
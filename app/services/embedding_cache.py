@@ -0,0 +1,371 @@
+"""
+Caché de embeddings de CONSULTAS (preguntas), compartida por:
+- RAG de casos (rag_answer_internal)
+- RAG legal (query_legal_rag)
+- Medición recall@k (calculate_recall_at_k)
+
+Dos niveles:
+1. Memoria: LRU por proceso (sin I/O)
+2. Disco: sqlite compartido por todos los workers de uvicorn (WAL)
+
+Clave: (modelo, dimensiones, texto normalizado). Cambiar de modelo o de
+dimensión produce claves distintas: nunca se mezclan espacios vectoriales.
+
+NO cachea embeddings de chunks (eso es parte del versionado del vectorstore).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.variables import (
+    EMBEDDING_MODEL,
+    QUERY_EMBEDDING_CACHE_ENABLED,
+    QUERY_EMBEDDING_CACHE_MEMORY_SIZE,
+    QUERY_EMBEDDING_CACHE_PATH,
+    QUERY_EMBEDDING_CACHE_DISK_MAX_ENTRIES,
+)
+from app.core.logger import logger
+from app.services.embedding_providers import (
+    EmbeddingProvider,
+    OpenAIEmbeddingProvider,
+    get_embedding_provider,
+)
+
+
+Vector = List[float]
+
+
+def normalize_query_text(text: str) -> str:
+    """Normaliza espacios para que variaciones triviales compartan entrada."""
+    return " ".join((text or "").split())
+
+
+def _cache_key(model: str, dimensions: Optional[int], normalized_text: str) -> str:
+    dims = str(dimensions) if dimensions else "native"
+    return hashlib.sha256(f"{model}|{dims}|{normalized_text}".encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """
+    Caché de dos niveles para embeddings de consultas.
+
+    El nivel de disco es opcional (disk_path=None → solo memoria).
+    Los vectores se guardan en float64 para devolver EXACTAMENTE lo que
+    devolvió el proveedor.
+    """
+
+    def __init__(
+        self,
+        memory_size: int = QUERY_EMBEDDING_CACHE_MEMORY_SIZE,
+        disk_path: Optional[Path] = QUERY_EMBEDDING_CACHE_PATH,
+        disk_max_entries: int = QUERY_EMBEDDING_CACHE_DISK_MAX_ENTRIES,
+    ):
+        self.memory_size = max(0, memory_size)
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, Vector]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_ready = False
+        self._disk_writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # -----------------------------------------------------
+    # Nivel memoria
+    # -----------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[Vector]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+            return vector
+
+    def _memory_put(self, key: str, vector: Vector) -> None:
+        if self.memory_size == 0:
+            return
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    # -----------------------------------------------------
+    # Nivel disco (sqlite)
+    # -----------------------------------------------------
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self.disk_path is None:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        try:
+            self.disk_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.disk_path), timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._disk_ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    " key TEXT PRIMARY KEY,"
+                    " model TEXT NOT NULL,"
+                    " dimensions INTEGER,"
+                    " vector BLOB NOT NULL,"
+                    " created_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_query_embeddings_created "
+                    "ON query_embeddings(created_at)"
+                )
+                conn.commit()
+                self._disk_ready = True
+            self._local.conn = conn
+            return conn
+        except sqlite3.Error as e:
+            logger.warning(f"[EMBEDDING CACHE] Disco no disponible ({self.disk_path}): {e}")
+            return None
+
+    def _disk_get(self, key: str) -> Optional[Vector]:
+        conn = self._conn()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"[EMBEDDING CACHE] Error leyendo disco: {e}")
+            return None
+        if row is None:
+            return None
+        return array("d", row[0]).tolist()
+
+    def _disk_put(self, key: str, model: str, dimensions: Optional[int], vector: Vector) -> None:
+        conn = self._conn()
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, model, dimensions, vector, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, dimensions, array("d", vector).tobytes(), time.time()),
+            )
+            self._disk_writes += 1
+            # Poda periódica (no en cada escritura)
+            if self._disk_writes % 100 == 0:
+                conn.execute(
+                    "DELETE FROM query_embeddings WHERE key IN ("
+                    " SELECT key FROM query_embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_max_entries,),
+                )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"[EMBEDDING CACHE] Error escribiendo disco: {e}")
+
+    # -----------------------------------------------------
+    # API
+    # -----------------------------------------------------
+
+    def _lookup(
+        self,
+        texts: List[str],
+        model: str,
+        dimensions: Optional[int],
+    ) -> Tuple[List[str], List[Optional[Vector]], Dict[str, List[int]]]:
+        """Resuelve los hits (memoria → disco) y agrupa los misses por clave."""
+        normalized = [normalize_query_text(t) for t in texts]
+        keys = [_cache_key(model, dimensions, n) for n in normalized]
+        results: List[Optional[Vector]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+        memory_hits = disk_hits = 0
+
+        for i, key in enumerate(keys):
+            vector = self._memory_get(key)
+            if vector is not None:
+                memory_hits += 1
+                results[i] = vector
+                continue
+            vector = self._disk_get(key)
+            if vector is not None:
+                disk_hits += 1
+                self._memory_put(key, vector)
+                results[i] = vector
+                continue
+            pending.setdefault(key, []).append(i)
+
+        # Contadores bajo el lock: _lookup corre en varios hilos a la vez
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += disk_hits
+            self.misses += len(pending)
+        return normalized, results, pending
+
+    def _store(
+        self,
+        pending: Dict[str, List[int]],
+        vectors: List[Vector],
+        results: List[Optional[Vector]],
+        model: str,
+        dimensions: Optional[int],
+    ) -> None:
+        """Guarda los vectores calculados en ambos niveles y rellena `results`."""
+        if len(vectors) != len(pending):
+            raise RuntimeError(
+                f"El proveedor devolvió {len(vectors)} embeddings para {len(pending)} textos"
+            )
+        for key, vector in zip(pending.keys(), vectors):
+            vector = list(vector)
+            self._memory_put(key, vector)
+            self._disk_put(key, model, dimensions, vector)
+            for i in pending[key]:
+                results[i] = vector
+
+    def get_many(
+        self,
+        texts: List[str],
+        compute: Callable[[List[str]], List[Vector]],
+        *,
+        model: str = EMBEDDING_MODEL,
+        dimensions: Optional[int] = None,
+    ) -> List[Vector]:
+        """
+        Devuelve embeddings para `texts`, llamando a `compute` SOLO con los
+        textos que no están en ninguno de los dos niveles (una única llamada).
+        """
+        normalized, results, pending = self._lookup(texts, model, dimensions)
+        if pending:
+            miss_texts = [normalized[indexes[0]] for indexes in pending.values()]
+            self._store(pending, compute(miss_texts), results, model, dimensions)
+        return results  # type: ignore[return-value]
+
+    async def aget_many(
+        self,
+        texts: List[str],
+        acompute: Callable[[List[str]], Awaitable[List[Vector]]],
+        *,
+        model: str = EMBEDDING_MODEL,
+        dimensions: Optional[int] = None,
+    ) -> List[Vector]:
+        """
+        Variante async de get_many: el acceso a sqlite va a un hilo y la
+        llamada al proveedor se espera sin bloquear el event loop.
+        """
+        normalized, results, pending = await asyncio.to_thread(
+            self._lookup, texts, model, dimensions
+        )
+        if pending:
+            miss_texts = [normalized[indexes[0]] for indexes in pending.values()]
+            vectors = await acompute(miss_texts)
+            await asyncio.to_thread(self._store, pending, vectors, results, model, dimensions)
+        return results  # type: ignore[return-value]
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de aciertos/fallos para observabilidad."""
+        with self._lock:
+            memory_hits, disk_hits, misses = self.memory_hits, self.disk_hits, self.misses
+            memory_entries = len(self._memory)
+        total = memory_hits + disk_hits + misses
+        return {
+            "memory_hits": memory_hits,
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "hit_rate": round((memory_hits + disk_hits) / total, 4) if total else 0.0,
+            "memory_entries": memory_entries,
+            "memory_size": self.memory_size,
+            "disk_path": str(self.disk_path) if self.disk_path else None,
+        }
+
+
+# Caché única por proceso (el nivel de disco se comparte entre procesos)
+_query_cache = QueryEmbeddingCache(
+    disk_path=QUERY_EMBEDDING_CACHE_PATH if QUERY_EMBEDDING_CACHE_ENABLED else None,
+    memory_size=QUERY_EMBEDDING_CACHE_MEMORY_SIZE if QUERY_EMBEDDING_CACHE_ENABLED else 0,
+)
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Obtiene la caché de embeddings de consultas del proceso."""
+    return _query_cache
+
+
+def _resolve_provider(
+    provider: Optional[EmbeddingProvider],
+    client_factory: Optional[Callable[[], Any]],
+) -> EmbeddingProvider:
+    """Proveedor explícito, cliente OpenAI explícito o el configurado."""
+    if provider is not None:
+        return provider
+    if client_factory is not None:
+        return OpenAIEmbeddingProvider(client_factory=client_factory)
+    return get_embedding_provider()
+
+
+def embed_queries(
+    texts: List[str],
+    *,
+    provider: Optional[EmbeddingProvider] = None,
+    client_factory: Optional[Callable[[], Any]] = None,
+) -> List[Vector]:
+    """
+    Embeddings de varias consultas en UNA sola petición para los misses.
+
+    Usa el proveedor configurado (EMBEDDING_PROVIDER) salvo que se pase
+    otro. El cliente solo se construye si hay algún miss (un hit no
+    necesita API key ni red).
+    """
+    provider = _resolve_provider(provider, client_factory)
+    return _query_cache.get_many(
+        texts, provider.embed, model=provider.model, dimensions=provider.dimensions
+    )
+
+
+def embed_query(
+    text: str,
+    *,
+    provider: Optional[EmbeddingProvider] = None,
+    client_factory: Optional[Callable[[], Any]] = None,
+) -> Vector:
+    """Embedding de una consulta usando la caché de dos niveles."""
+    return embed_queries([text], provider=provider, client_factory=client_factory)[0]
+
+
+async def aembed_queries(
+    texts: List[str],
+    *,
+    provider: Optional[EmbeddingProvider] = None,
+) -> List[Vector]:
+    """Variante async de embed_queries (cliente AsyncOpenAI en el proveedor OpenAI)."""
+    provider = _resolve_provider(provider, None)
+    return await _query_cache.aget_many(
+        texts, provider.aembed, model=provider.model, dimensions=provider.dimensions
+    )
+
+
+async def aembed_query(
+    text: str,
+    *,
+    provider: Optional[EmbeddingProvider] = None,
+) -> Vector:
+    """Variante async de embed_query."""
+    vectors = await aembed_queries([text], provider=provider)
+    return vectors[0]
+
+
+def get_query_embedding_cache_stats() -> Dict[str, Any]:
+    """Atajo para exponer métricas de la caché."""
+    return _query_cache.stats()
@@ -0,0 +1,210 @@
+"""
+Ejecutor concurrente de peticiones de embeddings con límites de cuota.
+
+- Varias peticiones en vuelo (EMBEDDING_MAX_CONCURRENCY)
+- Presupuestos por minuto de peticiones (RPM) y tokens (TPM), compartidos
+  por todo el proceso (las cuotas de OpenAI son por API key, no por build)
+- Reintentos con backoff exponencial + jitter ante errores transitorios
+  (429, 5xx, timeouts, conexión); respeta Retry-After si viene
+- run_ordered(): resultados EN ORDEN mientras el resto sigue en vuelo, de
+  modo que el llamador inserta en Chroma solapado con la red
+
+Un 429 puntual ya no marca la versión como FAILED: solo falla si se agotan
+los reintentos.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from app.core.variables import (
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_RPM_LIMIT,
+    EMBEDDING_TPM_LIMIT,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_BACKOFF_BASE_S,
+    EMBEDDING_BACKOFF_MAX_S,
+)
+from app.core.logger import logger
+from app.services.embedding_batching import estimate_tokens
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Códigos HTTP que merecen reintento
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Excepciones del SDK de OpenAI transitorias (por nombre: sin importar openai)
+_RETRYABLE_ERRORS = {
+    "RateLimitError",
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+}
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """True si el error es transitorio (cuota, 5xx, red)."""
+    if type(exc).__name__ in _RETRYABLE_ERRORS:
+        return True
+    status = getattr(exc, "status_code", None)
+    return status in _RETRYABLE_STATUS
+
+
+def _retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Cabecera Retry-After de la respuesta, si existe."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# =========================================================
+# PRESUPUESTO RPM / TPM
+# =========================================================
+
+class RateBudget:
+    """
+    Doble token bucket (peticiones y tokens por minuto), thread-safe.
+
+    acquire() bloquea hasta que AMBOS presupuestos tienen hueco; así nunca
+    se envía una petición que la API rechazaría por cuota.
+    """
+
+    def __init__(
+        self,
+        rpm: int = EMBEDDING_RPM_LIMIT,
+        tpm: int = EMBEDDING_TPM_LIMIT,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = clock()
+        self.waited_s = 0.0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    def acquire(self, tokens: int) -> None:
+        # Una petición más grande que el bucket entero esperaría para siempre
+        tokens = min(tokens, self.tpm)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    (1 - self._requests) * 60.0 / self.rpm,
+                    (tokens - self._tokens) * 60.0 / self.tpm,
+                )
+            self.waited_s += wait
+            self._sleep(wait)
+
+
+# =========================================================
+# EJECUTOR
+# =========================================================
+
+class EmbeddingExecutor:
+    """Concurrencia acotada + presupuesto de cuota + reintentos."""
+
+    def __init__(
+        self,
+        budget: Optional[RateBudget] = None,
+        *,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        backoff_base_s: float = EMBEDDING_BACKOFF_BASE_S,
+        backoff_max_s: float = EMBEDDING_BACKOFF_MAX_S,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.budget = budget or RateBudget()
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self._sleep = sleep
+        self.retries = 0
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        """Backoff exponencial con full jitter (o Retry-After si es mayor)."""
+        ceiling = min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        retry_after = _retry_after_seconds(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max_s))
+        return delay
+
+    def call(self, compute: Callable[[List[str]], R], texts: List[str]) -> R:
+        """Ejecuta compute(texts) respetando la cuota y reintentando errores transitorios."""
+        tokens = estimate_tokens(texts)
+        attempt = 0
+        while True:
+            self.budget.acquire(tokens)
+            try:
+                return compute(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                logger.warning(
+                    f"[EMBEDDINGS] Error transitorio ({type(e).__name__}), "
+                    f"reintento {attempt}/{self.max_retries} en {delay:.1f}s"
+                )
+                self._sleep(delay)
+
+    def run_ordered(self, items: Iterable[T], fn: Callable[[T], R]) -> Iterator[Tuple[T, R]]:
+        """
+        Aplica fn a cada item con hasta max_concurrency en vuelo y devuelve
+        (item, resultado) EN ORDEN de entrada.
+
+        Mientras el llamador procesa un resultado (p. ej. collection.add),
+        los siguientes siguen ejecutándose. Si uno falla, se cancelan los
+        pendientes y se propaga la excepción.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embeddings")
+        in_flight: Deque = deque()
+        try:
+            for item in items:
+                in_flight.append((item, pool.submit(fn, item)))
+                # Ventana acotada: no encolar más que el doble de la concurrencia
+                if len(in_flight) >= 2 * self.max_concurrency:
+                    head, future = in_flight.popleft()
+                    yield head, future.result()
+            while in_flight:
+                head, future = in_flight.popleft()
+                yield head, future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+# Ejecutor único por proceso (la cuota es por API key)
+_executor = EmbeddingExecutor()
+
+
+def get_embedding_executor() -> EmbeddingExecutor:
+    """Obtiene el ejecutor de embeddings del proceso."""
+    return _executor
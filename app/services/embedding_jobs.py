@@ -0,0 +1,404 @@
+"""
+Cola PERSISTENTE de builds de embeddings (sqlite local) y workers.
+
+El RAG ya no construye índices dentro de la petición HTTP: si un caso no
+tiene versión ACTIVE (o está vacía) se encola un build y se responde
+NO_EMBEDDINGS con el job_id. Los workers (scripts/embedding_worker.py, uno
+o varios procesos) ejecutan build_embeddings_for_case.
+
+- Deduplicación por caso: como mucho UN job QUEUED/RUNNING por case_id
+  (índice único parcial); encolar de nuevo devuelve el existente y, si la
+  prioridad es mayor, la sube
+- Prioridad: mayor primero; a igual prioridad, el más antiguo
+- Claim atómico entre procesos (BEGIN IMMEDIATE)
+- Heartbeat con el progreso del build; un job RUNNING sin heartbeat en
+  EMBEDDING_JOB_STALE_S (worker muerto) vuelve a la cola
+- Un build que falla se reintenta hasta EMBEDDING_JOB_MAX_ATTEMPTS
+- complete/fail solo actúan si el job sigue RUNNING en el mismo worker: un
+  worker lento al que se le reencoló el job no pisa al nuevo dueño
+"""
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app.core.variables import (
+    EMBEDDING_JOBS_PATH,
+    EMBEDDING_JOB_STALE_S,
+    EMBEDDING_JOB_MAX_ATTEMPTS,
+    EMBEDDING_JOB_POLL_INTERVAL_S,
+)
+from app.core.logger import logger
+
+
+JOB_QUEUED = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_SUCCEEDED = "SUCCEEDED"
+JOB_FAILED = "FAILED"
+
+# Prioridades habituales (mayor = antes)
+PRIORITY_BACKGROUND = 0
+PRIORITY_INTERACTIVE = 10
+
+_COLUMNS = (
+    "job_id", "case_id", "status", "priority", "reason", "attempts",
+    "created_at", "started_at", "finished_at", "heartbeat_at", "worker_id",
+    "progress_done", "progress_total", "version_id", "error",
+)
+
+
+def _row_to_job(row) -> Optional[Dict[str, Any]]:
+    return dict(zip(_COLUMNS, row)) if row else None
+
+
+class EmbeddingJobQueue:
+    """Cola de jobs de build de embeddings sobre sqlite (WAL, conexión por hilo)."""
+
+    def __init__(
+        self,
+        db_path: Path = EMBEDDING_JOBS_PATH,
+        stale_after_s: float = EMBEDDING_JOB_STALE_S,
+        max_attempts: int = EMBEDDING_JOB_MAX_ATTEMPTS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.db_path = Path(db_path)
+        self.stale_after_s = stale_after_s
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._local = threading.local()
+        self._ready = False
+
+    # -----------------------------------------------------
+    # Conexión
+    # -----------------------------------------------------
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit: las transacciones se abren explícitamente (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._ready:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " case_id TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " priority INTEGER NOT NULL DEFAULT 0,"
+                " reason TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL,"
+                " heartbeat_at REAL,"
+                " worker_id TEXT,"
+                " progress_done INTEGER NOT NULL DEFAULT 0,"
+                " progress_total INTEGER,"
+                " version_id TEXT,"
+                " error TEXT)"
+            )
+            # Deduplicación: un único job vivo por caso
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_embedding_jobs_live_case "
+                "ON embedding_jobs(case_id) WHERE status IN ('QUEUED', 'RUNNING')"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_embedding_jobs_queue "
+                "ON embedding_jobs(status, priority DESC, created_at)"
+            )
+            self._ready = True
+        self._local.conn = conn
+        return conn
+
+    def _select(self, where: str, params: tuple) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM embedding_jobs WHERE {where}", params
+        ).fetchone()
+        return _row_to_job(row)
+
+    # -----------------------------------------------------
+    # Productor (RAG / API)
+    # -----------------------------------------------------
+
+    def enqueue(
+        self,
+        case_id: str,
+        *,
+        priority: int = PRIORITY_BACKGROUND,
+        reason: str = "",
+    ) -> Dict[str, Any]:
+        """
+        Encola un build para el caso o devuelve el job vivo existente.
+
+        Returns:
+            Dict del job (con "deduplicated"=True si ya existía)
+        """
+        if not case_id or not case_id.strip():
+            raise ValueError("case_id no puede estar vacío")
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = self._select(
+                "case_id = ? AND status IN ('QUEUED', 'RUNNING')", (case_id,)
+            )
+            if existing is not None:
+                if priority > existing["priority"]:
+                    conn.execute(
+                        "UPDATE embedding_jobs SET priority = ? WHERE job_id = ?",
+                        (priority, existing["job_id"]),
+                    )
+                    existing["priority"] = priority
+                conn.execute("COMMIT")
+                return {**existing, "deduplicated": True}
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO embedding_jobs (job_id, case_id, status, priority, reason, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, case_id, JOB_QUEUED, priority, reason, self._clock()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        logger.info(f"[EMBEDDING JOBS] Encolado job={job_id} case_id={case_id} prioridad={priority}")
+        return {**self.get(job_id), "deduplicated": False}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado de un job (None si no existe)."""
+        return self._select("job_id = ?", (job_id,))
+
+    def latest_for_case(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """Último job encolado para un caso."""
+        return self._select("case_id = ? ORDER BY created_at DESC, rowid DESC LIMIT 1", (case_id,))
+
+    # -----------------------------------------------------
+    # Consumidor (workers)
+    # -----------------------------------------------------
+
+    def requeue_stale(self) -> int:
+        """Devuelve a la cola (o falla) los jobs RUNNING sin heartbeat reciente."""
+        conn = self._conn()
+        cutoff = self._clock() - self.stale_after_s
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            failed = conn.execute(
+                "UPDATE embedding_jobs SET status = ?, finished_at = ?, "
+                " error = 'Worker sin heartbeat: reintentos agotados' "
+                "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+                (JOB_FAILED, self._clock(), JOB_RUNNING, cutoff, self.max_attempts),
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE embedding_jobs SET status = ?, worker_id = NULL "
+                "WHERE status = ? AND heartbeat_at < ?",
+                (JOB_QUEUED, JOB_RUNNING, cutoff),
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if requeued or failed:
+            logger.warning(f"[EMBEDDING JOBS] Jobs huérfanos: {requeued} reencolados, {failed} fallidos")
+        return requeued
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Toma el siguiente job (prioridad, antigüedad) y lo marca RUNNING."""
+        self.requeue_stale()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = self._select(
+                "status = 'QUEUED' ORDER BY priority DESC, created_at ASC LIMIT 1", ()
+            )
+            if job is None:
+                conn.execute("COMMIT")
+                return None
+            now = self._clock()
+            conn.execute(
+                "UPDATE embedding_jobs SET status = ?, worker_id = ?, started_at = ?, "
+                " heartbeat_at = ?, attempts = attempts + 1, progress_done = 0 "
+                "WHERE job_id = ?",
+                (JOB_RUNNING, worker_id, now, now, job["job_id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(job["job_id"])
+
+    def heartbeat(self, job_id: str, done: int, total: Optional[int]) -> None:
+        """Progreso del build (chunks indexados / total) y señal de vida."""
+        self._conn().execute(
+            "UPDATE embedding_jobs SET progress_done = ?, progress_total = ?, heartbeat_at = ? "
+            "WHERE job_id = ? AND status = ?",
+            (done, total, self._clock(), job_id, JOB_RUNNING),
+        )
+
+    def complete(self, job_id: str, worker_id: str, version_id: str) -> bool:
+        """
+        Marca SUCCEEDED el job si sigue RUNNING en este worker.
+
+        Returns:
+            False si el job ya no es suyo (reencolado por heartbeat perdido y
+            reclamado por otro worker): no se pisa el estado del nuevo dueño
+        """
+        updated = self._conn().execute(
+            "UPDATE embedding_jobs SET status = ?, version_id = ?, finished_at = ?, error = NULL "
+            "WHERE job_id = ? AND status = ? AND worker_id = ?",
+            (JOB_SUCCEEDED, version_id, self._clock(), job_id, JOB_RUNNING, worker_id),
+        ).rowcount
+        if not updated:
+            logger.warning(f"[EMBEDDING JOBS] Job {job_id} ya no pertenece a {worker_id}: resultado descartado")
+        return bool(updated)
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> Optional[str]:
+        """
+        Registra un intento fallido del job si sigue RUNNING en este worker.
+
+        Vuelve a la cola mientras attempts < max_attempts; después, FAILED.
+
+        Returns:
+            Nuevo estado (QUEUED / FAILED), o None si el job ya no es suyo
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            failed = conn.execute(
+                "UPDATE embedding_jobs SET status = ?, error = ?, finished_at = ? "
+                "WHERE job_id = ? AND status = ? AND worker_id = ? AND attempts >= ?",
+                (JOB_FAILED, error[:2000], self._clock(), job_id, JOB_RUNNING, worker_id, self.max_attempts),
+            ).rowcount
+            requeued = 0 if failed else conn.execute(
+                "UPDATE embedding_jobs SET status = ?, error = ?, worker_id = NULL "
+                "WHERE job_id = ? AND status = ? AND worker_id = ?",
+                (JOB_QUEUED, error[:2000], job_id, JOB_RUNNING, worker_id),
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if failed:
+            return JOB_FAILED
+        if requeued:
+            return JOB_QUEUED
+        logger.warning(f"[EMBEDDING JOBS] Job {job_id} ya no pertenece a {worker_id}: fallo descartado")
+        return None
+
+
+# =========================================================
+# WORKER
+# =========================================================
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_job(
+    queue: EmbeddingJobQueue,
+    job: Dict[str, Any],
+    worker_id: str,
+    build: Optional[Callable[..., str]] = None,
+) -> bool:
+    """
+    Ejecuta un job ya reclamado por worker_id. Devuelve True si el build
+    terminó READY (y el job seguía siendo de este worker).
+
+    `build` es build_embeddings_for_case por defecto (inyectable en tests);
+    recibe progress_callback para el heartbeat.
+    """
+    job_id, case_id = job["job_id"], job["case_id"]
+    logger.info(f"[EMBEDDING JOBS] Inicio job={job_id} case_id={case_id} intento={job['attempts']}")
+
+    def _progress(done: int, total: Optional[int]) -> None:
+        queue.heartbeat(job_id, done, total)
+
+    try:
+        if build is None:
+            from app.core.database import get_session_factory
+            from app.services.embeddings_pipeline import build_embeddings_for_case
+
+            db = get_session_factory()()
+            try:
+                version_id = build_embeddings_for_case(
+                    db=db, case_id=case_id, progress_callback=_progress
+                )
+            finally:
+                db.close()
+        else:
+            version_id = build(case_id=case_id, progress_callback=_progress)
+    except Exception as e:
+        status = queue.fail(job_id, worker_id, str(e))
+        if status == JOB_QUEUED:
+            logger.warning(f"[EMBEDDING JOBS] Job {job_id} fallido (intento {job['attempts']}), reencolado: {e}")
+        else:
+            logger.error(f"[EMBEDDING JOBS] ❌ Job {job_id} fallido: {e}")
+        return False
+
+    if not queue.complete(job_id, worker_id, version_id):
+        return False
+    logger.info(f"[EMBEDDING JOBS] ✅ Job {job_id} completado: versión {version_id}")
+    return True
+
+
+def run_worker(
+    queue: Optional[EmbeddingJobQueue] = None,
+    *,
+    worker_id: Optional[str] = None,
+    poll_interval_s: float = EMBEDDING_JOB_POLL_INTERVAL_S,
+    max_jobs: Optional[int] = None,
+    drain: bool = False,
+    stop_event: Optional[threading.Event] = None,
+    build: Optional[Callable[..., str]] = None,
+) -> int:
+    """
+    Bucle de un worker: reclama y ejecuta jobs hasta stop_event o max_jobs.
+    
+    drain=True: termina cuando la cola queda vacía (CI, cron).
+
+    Returns:
+        Número de jobs ejecutados
+    """
+    queue = queue or get_embedding_job_queue()
+    worker_id = worker_id or default_worker_id()
+    processed = 0
+    logger.info(f"[EMBEDDING JOBS] Worker {worker_id} iniciado")
+
+    while not (stop_event and stop_event.is_set()):
+        if max_jobs is not None and processed >= max_jobs:
+            break
+        job = queue.claim(worker_id)
+        if job is None:
+            if drain:
+                break
+            if stop_event:
+                stop_event.wait(poll_interval_s)
+            else:
+                time.sleep(poll_interval_s)
+            continue
+        run_job(queue, job, worker_id, build=build)
+        processed += 1
+
+    logger.info(f"[EMBEDDING JOBS] Worker {worker_id} detenido ({processed} jobs)")
+    return processed
+
+
+_queue: Optional[EmbeddingJobQueue] = None
+
+
+def get_embedding_job_queue() -> EmbeddingJobQueue:
+    """Cola del proceso (el fichero sqlite se comparte entre procesos)."""
+    global _queue
+    if _queue is None:
+        _queue = EmbeddingJobQueue()
+    return _queue
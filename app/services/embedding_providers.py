@@ -0,0 +1,305 @@
+"""
+Proveedores de embeddings intercambiables por configuración.
+
+EMBEDDING_PROVIDER (variables.py o variable de entorno) elige el backend:
+- "openai":     API de OpenAI (EMBEDDING_MODEL)
+- "local_hash": feature hashing de n-gramas de caracteres en CPU. Rápido,
+                determinista y sin red: CI, benchmarks de extremo a extremo
+                y entornos aislados. NO sustituye la calidad semántica de
+                OpenAI.
+
+Todo embedding (builds de casos, ingesta legal, consultas, recall@k) pasa
+por aquí. La identidad del proveedor (nombre, modelo, dimensión) se guarda
+en el manifest de cada versión: un índice construido con un proveedor
+nunca se consulta con vectores de otro.
+"""
+from __future__ import annotations
+
+import os
+import re
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.variables import (
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_PROVIDER,
+    EMBEDDING_LOCAL_DIM,
+    EMBEDDING_LOCAL_NGRAM_RANGE,
+)
+from app.services.embedding_store import get_embedding_store
+from app.services.embedding_executor import get_embedding_executor
+
+
+Vector = List[float]
+
+
+# =========================================================
+# INTERFAZ
+# =========================================================
+
+class EmbeddingProvider(ABC):
+    """
+    Interfaz común de los backends de embeddings.
+
+    - name:       identificador del backend ("openai", "local_hash")
+    - model:      identidad del espacio vectorial (clave de cachés y manifest)
+    - dimensions: dimensión fija solicitada (None = nativa del modelo)
+    - remote:     True si hay red/cuota (pasa por el ejecutor con reintentos)
+    """
+
+    name = "base"
+    remote = False
+
+    def __init__(self, model: str, dimensions: Optional[int] = None):
+        self.model = model
+        self.dimensions = dimensions
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[Vector]:
+        """Vectores de los textos, en el mismo orden."""
+
+    async def aembed(self, texts: List[str]) -> List[Vector]:
+        return self.embed(texts)
+
+    @abstractmethod
+    def with_dimensions(self, dimensions: Optional[int]) -> "EmbeddingProvider":
+        """Mismo backend y modelo con otra dimensión (otro espacio vectorial)."""
+
+    def identity(self) -> Dict[str, Any]:
+        return {"provider": self.name, "model": self.model, "dimensions": self.dimensions}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(model={self.model!r}, dimensions={self.dimensions!r})"
+
+
+# =========================================================
+# OPENAI
+# =========================================================
+
+def _default_openai_client():
+    """Cliente OpenAI con la API key del entorno."""
+    from openai import OpenAI
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY no definida en entorno")
+    return OpenAI(api_key=api_key)
+
+
+def _default_async_openai_client():
+    """Cliente AsyncOpenAI con la API key del entorno."""
+    from openai import AsyncOpenAI
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY no definida en entorno")
+    return AsyncOpenAI(api_key=api_key)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeddings de la API de OpenAI.
+
+    Los clientes se crean en el primer uso y se reutilizan (pool HTTP
+    compartido); un hit de caché no necesita API key ni red.
+
+    dimensions (default EMBEDDING_DIMENSIONS) recorta los vectores en la
+    propia API: índices más pequeños y búsquedas más rápidas a cambio de
+    algo de recall.
+    """
+
+    name = "openai"
+    remote = True
+
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        dimensions: Optional[int] = EMBEDDING_DIMENSIONS,
+        *,
+        client: Any = None,
+        client_factory: Optional[Callable[[], Any]] = None,
+        async_client_factory: Optional[Callable[[], Any]] = None,
+    ):
+        super().__init__(model, dimensions)
+        self._client = client
+        self._client_factory = client_factory or _default_openai_client
+        self._async_client: Any = None
+        self._async_client_factory = async_client_factory or _default_async_openai_client
+
+    def with_dimensions(self, dimensions: Optional[int]) -> "OpenAIEmbeddingProvider":
+        clone = OpenAIEmbeddingProvider(
+            self.model,
+            dimensions,
+            client=self._client,
+            client_factory=self._client_factory,
+            async_client_factory=self._async_client_factory,
+        )
+        clone._async_client = self._async_client
+        return clone
+
+    def _request_kwargs(self, texts: List[str]) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"model": self.model, "input": texts}
+        if self.dimensions:
+            kwargs["dimensions"] = self.dimensions
+        return kwargs
+
+    def embed(self, texts: List[str]) -> List[Vector]:
+        if self._client is None:
+            self._client = self._client_factory()
+        resp = self._client.embeddings.create(**self._request_kwargs(texts))
+        return [item.embedding for item in resp.data]
+
+    async def aembed(self, texts: List[str]) -> List[Vector]:
+        if self._async_client is None:
+            self._async_client = self._async_client_factory()
+        resp = await self._async_client.embeddings.create(**self._request_kwargs(texts))
+        return [item.embedding for item in resp.data]
+
+
+# =========================================================
+# LOCAL: FEATURE HASHING DE N-GRAMAS
+# =========================================================
+
+_LOCAL_HASH_MODEL_RE = re.compile(r"^local-hash-char(\d+)-(\d+)$")
+
+
+def _local_hash_ngram_range(model: str) -> tuple:
+    """Rango de n-gramas de un modelo local ("local-hash-char3-5" → (3, 5))."""
+    match = _LOCAL_HASH_MODEL_RE.match(model or "")
+    if not match:
+        raise ValueError(f"Modelo local_hash no reconocido: {model!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Vectores por feature hashing de n-gramas de caracteres (y palabras).
+
+    - Texto en minúsculas con espacios normalizados
+    - Cada n-grama (bytes UTF-8) → crc32 → cubeta y signo
+    - Normalización L2 (distancia L2 de Chroma ≡ coseno)
+
+    crc32 es estable entre procesos y plataformas (hash() de Python no):
+    el mismo texto produce siempre el mismo vector.
+    """
+
+    name = "local_hash"
+    remote = False
+
+    def __init__(
+        self,
+        dimensions: int = EMBEDDING_LOCAL_DIM,
+        ngram_range: tuple = EMBEDDING_LOCAL_NGRAM_RANGE,
+    ):
+        self.ngram_min, self.ngram_max = ngram_range
+        super().__init__(f"local-hash-char{self.ngram_min}-{self.ngram_max}", dimensions)
+
+    def with_dimensions(self, dimensions: Optional[int]) -> "HashingEmbeddingProvider":
+        return HashingEmbeddingProvider(
+            dimensions or EMBEDDING_LOCAL_DIM, (self.ngram_min, self.ngram_max)
+        )
+
+    def _vector(self, text: str) -> Vector:
+        normalized = " ".join(text.lower().split())
+        data = f" {normalized} ".encode("utf-8")
+        crc32 = zlib.crc32
+        counts: Counter = Counter()
+        for n in range(self.ngram_min, self.ngram_max + 1):
+            for i in range(len(data) - n + 1):
+                counts[crc32(data[i:i + n])] += 1
+        for word in normalized.split():
+            counts[crc32(b"w:" + word.encode("utf-8"))] += 1
+
+        dims = self.dimensions
+        vector = [0.0] * dims
+        for h, count in counts.items():
+            vector[h % dims] += count if h & 0x80000000 else -count
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed(self, texts: List[str]) -> List[Vector]:
+        return [self._vector(t) for t in texts]
+
+
+# =========================================================
+# SELECCIÓN POR CONFIGURACIÓN
+# =========================================================
+
+_PROVIDERS: Dict[str, Callable[..., EmbeddingProvider]] = {
+    "openai": OpenAIEmbeddingProvider,
+    "local_hash": HashingEmbeddingProvider,
+}
+
+_provider: Optional[EmbeddingProvider] = None
+
+
+def build_embedding_provider(name: str, **kwargs: Any) -> EmbeddingProvider:
+    """Instancia un proveedor por nombre (ValueError si no existe)."""
+    try:
+        factory = _PROVIDERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Proveedor de embeddings desconocido: {name}. Disponibles: {sorted(_PROVIDERS)}"
+        )
+    return factory(**kwargs)
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Proveedor configurado del proceso (EMBEDDING_PROVIDER)."""
+    global _provider
+    if _provider is None:
+        _provider = build_embedding_provider(EMBEDDING_PROVIDER)
+    return _provider
+
+
+def provider_for_manifest(manifest: Dict[str, Any]) -> EmbeddingProvider:
+    """
+    Proveedor con el que se construyó una versión (según su manifest).
+
+    Las consultas de un caso deben usar el mismo espacio vectorial que su
+    índice aunque la configuración haya cambiado después: mismo backend,
+    mismo modelo y misma dimensión solicitada (embedding_dimensions; el
+    backend local siempre la fija = embedding_dim, y su rango de n-gramas
+    sale del modelo registrado, no de EMBEDDING_LOCAL_NGRAM_RANGE).
+    Manifests antiguos sin embedding_provider → OpenAI con dimensión nativa.
+
+    Raises:
+        ValueError: Modelo local_hash con un nombre no reconocible
+    """
+    name = manifest.get("embedding_provider") or "openai"
+    model = manifest.get("embedding_model") or EMBEDDING_MODEL
+    configured = get_embedding_provider()
+    if name == "local_hash":
+        # El modelo codifica el rango de n-gramas: otro rango = otro espacio
+        dimensions = int(manifest["embedding_dim"])
+        ngram_range = _local_hash_ngram_range(model)
+        if configured.name == name and configured.model == model and configured.dimensions == dimensions:
+            return configured
+        return HashingEmbeddingProvider(dimensions=dimensions, ngram_range=ngram_range)
+
+    dimensions = manifest.get("embedding_dimensions")
+    if configured.name == name and configured.model == model:
+        if configured.dimensions == dimensions:
+            return configured
+        return configured.with_dimensions(dimensions)
+    return build_embedding_provider(name, model=model, dimensions=dimensions)
+
+
+def embed_texts(texts: List[str], provider: Optional[EmbeddingProvider] = None) -> List[Vector]:
+    """
+    Embeddings de textos de chunks (builds e ingesta).
+
+    - Almacén por contenido: solo se calculan textos nunca vistos
+    - Proveedores remotos: cuota RPM/TPM y reintentos del ejecutor
+    """
+    provider = provider or get_embedding_provider()
+
+    def _compute(missing: List[str]) -> List[Vector]:
+        if provider.remote:
+            return get_embedding_executor().call(provider.embed, missing)
+        return provider.embed(missing)
+
+    return get_embedding_store().get_many(
+        texts, _compute, model=provider.model, dimensions=provider.dimensions
+    )
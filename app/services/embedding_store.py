@@ -0,0 +1,306 @@
+"""
+Almacén de embeddings DIRECCIONADO POR CONTENIDO, compartido por todos los
+casos, todas las versiones y el corpus legal.
+
+Clave: (sha256 del texto exacto, modelo, dimensiones). Dos chunks con el
+mismo texto (cláusulas tipo, pies de email, el mismo extracto bancario en
+casos relacionados) se embeben UNA sola vez; las siguientes apariciones se
+sirven desde disco sin llamar a OpenAI.
+
+- sqlite (WAL) local, conexión por hilo
+- Vectores en float32 (la precisión que guarda Chroma)
+- Tamaño acotado: evicción LRU por último uso al superar el máximo de bytes
+- Estadísticas de llamadas a la API ahorradas (acumuladas en disco)
+
+Diferencia con embedding_cache: aquella cachea CONSULTAS (texto
+normalizado); este almacén cachea TEXTOS DE CHUNKS exactos.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.variables import (
+    EMBEDDING_MODEL,
+    EMBEDDING_STORE_ENABLED,
+    EMBEDDING_STORE_PATH,
+    EMBEDDING_STORE_MAX_BYTES,
+)
+from app.core.logger import logger
+
+
+Vector = List[float]
+
+# Cada cuántas escrituras se comprueba el tamaño total (no en cada una)
+_PRUNE_EVERY_WRITES = 200
+# Al podar, bajar hasta este porcentaje del máximo (evita podar en cada ciclo)
+_PRUNE_TARGET_RATIO = 0.9
+
+
+def content_hash(text: str) -> str:
+    """sha256 del texto EXACTO del chunk (sin normalizar)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ContentEmbeddingStore:
+    """
+    Almacén persistente de embeddings por contenido.
+
+    disk_path=None → almacén deshabilitado (todas las peticiones van al
+    proveedor), útil en tests y para desactivarlo por configuración.
+    """
+
+    def __init__(
+        self,
+        disk_path: Optional[Path] = EMBEDDING_STORE_PATH,
+        max_bytes: int = EMBEDDING_STORE_MAX_BYTES,
+    ):
+        self.disk_path = disk_path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._ready = False
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self.evicted = 0
+
+    # -----------------------------------------------------
+    # Conexión
+    # -----------------------------------------------------
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self.disk_path is None:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        try:
+            self.disk_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.disk_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    " content_hash TEXT NOT NULL,"
+                    " model TEXT NOT NULL,"
+                    " dimensions INTEGER NOT NULL,"
+                    " vector BLOB NOT NULL,"
+                    " size_bytes INTEGER NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " last_used REAL NOT NULL,"
+                    " PRIMARY KEY (content_hash, model, dimensions))"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings(last_used)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS store_stats ("
+                    " name TEXT PRIMARY KEY,"
+                    " value INTEGER NOT NULL)"
+                )
+                conn.commit()
+                self._ready = True
+            self._local.conn = conn
+            return conn
+        except sqlite3.Error as e:
+            logger.warning(f"[EMBEDDING STORE] Almacén no disponible ({self.disk_path}): {e}")
+            return None
+
+    # -----------------------------------------------------
+    # Lectura / escritura
+    # -----------------------------------------------------
+
+    def _read(self, conn: sqlite3.Connection, hashes: List[str], model: str, dims: int) -> Dict[str, Vector]:
+        found: Dict[str, Vector] = {}
+        # Lotes por debajo del límite de variables de sqlite
+        for i in range(0, len(hashes), 500):
+            part = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = conn.execute(
+                f"SELECT content_hash, vector FROM embeddings "
+                f"WHERE model = ? AND dimensions = ? AND content_hash IN ({placeholders})",
+                (model, dims, *part),
+            ).fetchall()
+            for h, blob in rows:
+                found[h] = array("f", blob).tolist()
+        if found:
+            now = time.time()
+            conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE content_hash = ? AND model = ? AND dimensions = ?",
+                [(now, h, model, dims) for h in found],
+            )
+        return found
+
+    def _write(self, conn: sqlite3.Connection, vectors: Dict[str, Vector], model: str, dims: int) -> None:
+        now = time.time()
+        rows = []
+        for h, vector in vectors.items():
+            blob = array("f", vector).tobytes()
+            rows.append((h, model, dims, blob, len(blob), now, now))
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings "
+            "(content_hash, model, dimensions, vector, size_bytes, created_at, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        with self._lock:
+            self._writes += len(rows)
+            should_prune = self._writes >= _PRUNE_EVERY_WRITES
+            if should_prune:
+                self._writes = 0
+        if should_prune:
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Evicción LRU (por last_used) hasta quedar bajo el máximo de bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * _PRUNE_TARGET_RATIO)
+        to_free = total - target
+        freed = 0
+        victims = []
+        for h, model, dims, size in conn.execute(
+            "SELECT content_hash, model, dimensions, size_bytes FROM embeddings ORDER BY last_used ASC"
+        ):
+            victims.append((h, model, dims))
+            freed += size
+            if freed >= to_free:
+                break
+        conn.executemany(
+            "DELETE FROM embeddings WHERE content_hash = ? AND model = ? AND dimensions = ?",
+            victims,
+        )
+        self.evicted += len(victims)
+        logger.info(
+            f"[EMBEDDING STORE] Evicción LRU: {len(victims)} vectores, {freed / 1e6:.1f} MB liberados"
+        )
+
+    def _bump_stats(self, conn: sqlite3.Connection, saved: int, api_calls: int, embedded: int) -> None:
+        conn.executemany(
+            "INSERT INTO store_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [("texts_served", saved), ("api_calls", api_calls), ("texts_embedded", embedded)],
+        )
+
+    # -----------------------------------------------------
+    # API
+    # -----------------------------------------------------
+
+    def get_many(
+        self,
+        texts: List[str],
+        compute: Callable[[List[str]], List[Vector]],
+        *,
+        model: str = EMBEDDING_MODEL,
+        dimensions: Optional[int] = None,
+    ) -> List[Vector]:
+        """
+        Embeddings para `texts` en el mismo orden.
+
+        `compute` se llama UNA vez con los textos únicos que no están en el
+        almacén (nunca si todos son hits). Textos repetidos dentro del mismo
+        lote también se embeben una sola vez.
+        """
+        if not texts:
+            return []
+
+        dims = dimensions or 0  # 0 = dimensión nativa del modelo
+        hashes = [content_hash(t) for t in texts]
+        conn = self._conn()
+
+        found: Dict[str, Vector] = {}
+        if conn is not None:
+            try:
+                found = self._read(conn, list(dict.fromkeys(hashes)), model, dims)
+            except sqlite3.Error as e:
+                logger.warning(f"[EMBEDDING STORE] Error leyendo almacén: {e}")
+
+        # Textos únicos pendientes (primer índice de cada hash)
+        pending: Dict[str, int] = {}
+        for i, h in enumerate(hashes):
+            if h not in found and h not in pending:
+                pending[h] = i
+
+        fresh: Dict[str, Vector] = {}
+        if pending:
+            miss_texts = [texts[i] for i in pending.values()]
+            vectors = compute(miss_texts)
+            if len(vectors) != len(miss_texts):
+                raise RuntimeError(
+                    f"El proveedor devolvió {len(vectors)} embeddings para {len(miss_texts)} textos"
+                )
+            fresh = {h: [float(x) for x in v] for h, v in zip(pending.keys(), vectors)}
+
+        served = len(texts) - len(pending)
+        with self._lock:
+            self.hits += served
+            self.misses += len(pending)
+            self.api_calls += 1 if pending else 0
+
+        if conn is not None:
+            try:
+                if fresh:
+                    self._write(conn, fresh, model, dims)
+                self._bump_stats(conn, served, 1 if pending else 0, len(pending))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"[EMBEDDING STORE] Error escribiendo almacén: {e}")
+
+        return [found[h] if h in found else fresh[h] for h in hashes]
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas del proceso + acumuladas en disco."""
+        total = self.hits + self.misses
+        result: Dict[str, Any] = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "api_calls": self.api_calls,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evicted": self.evicted,
+            "max_bytes": self.max_bytes,
+            "path": str(self.disk_path) if self.disk_path else None,
+        }
+        conn = self._conn()
+        if conn is None:
+            return result
+        try:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM embeddings"
+            ).fetchone()
+            cumulative = dict(conn.execute("SELECT name, value FROM store_stats").fetchall())
+        except sqlite3.Error as e:
+            logger.warning(f"[EMBEDDING STORE] Error leyendo estadísticas: {e}")
+            return result
+        result.update({
+            "entries": entries,
+            "size_bytes": size,
+            "total_texts_served": cumulative.get("texts_served", 0),
+            "total_texts_embedded": cumulative.get("texts_embedded", 0),
+            "total_api_calls": cumulative.get("api_calls", 0),
+        })
+        return result
+
+
+# Almacén único por proceso (el fichero se comparte entre procesos)
+_store = ContentEmbeddingStore(
+    disk_path=EMBEDDING_STORE_PATH if EMBEDDING_STORE_ENABLED else None,
+)
+
+
+def get_embedding_store() -> ContentEmbeddingStore:
+    """Obtiene el almacén de embeddings por contenido del proceso."""
+    return _store
+
+
+def get_embedding_store_stats() -> Dict[str, Any]:
+    """Atajo para exponer métricas del almacén."""
+    return _store.stats()
@@ -12,10 +12,10 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import chromadb
-from sqlalchemy import select
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
@@ -23,7 +23,11 @@ from openai import OpenAI
 
 from app.core.variables import (
     EMBEDDING_MODEL,
-    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_INCREMENTAL_REUSE,
+    EMBEDDING_CHUNK_PAGE_SIZE,
+    EMBEDDING_STORE_ENABLED,
+    VECTOR_INDEX_FORMAT,
+    VALIDATION_FAST_INCREMENTAL,
 )
 from app.core.logger import logger
 from app.models.document_chunk import DocumentChunk
@@ -32,14 +36,34 @@ from app.services.vectorstore_versioning import (
     create_new_version,
     write_status,
     write_manifest,
+    write_changes,
     validate_version_integrity,
+    seal_version_segments,
     update_active_pointer,
     cleanup_old_versions,
+    get_active_version,
     get_active_version_path,
+    read_manifest,
     _get_index_path,
+    _get_quantized_path,
+    INDEX_FORMATS,
     ManifestData,
     calculate_file_sha256,
 )
+from app.services.vectorstore_pool import get_collection_pool, invalidate_case_collections
+from app.services.embedding_store import get_embedding_store
+from app.services.embedding_executor import get_embedding_executor
+from app.services.embedding_providers import (
+    EmbeddingProvider,
+    OpenAIEmbeddingProvider,
+    embed_texts,
+    get_embedding_provider,
+)
+from app.services.embedding_batching import FillTracker, iter_token_batches
+from app.services.vector_metadata import (
+    FILTERABLE_METADATA_FIELDS,
+    document_filter_metadata,
+)
 
 
 # =========================================================
@@ -62,6 +86,12 @@ def get_case_collection(case_id: str, version: Optional[str] = None):
     IMPORTANTE: Esta función ya NO crea automáticamente la estructura.
     Usa create_new_version() para crear una versión nueva.
     
+    Los clientes se reutilizan desde el pool del proceso, indexado por
+    versión CONCRETA: un cambio de ACTIVE resuelve a otra clave.
+    
+    Versiones compactas (manifest index_format int8/float16): se devuelve
+    la colección envuelta con su índice cuantizado (misma interfaz).
+    
     Args:
         case_id: ID del caso
         version: ID de la versión (opcional, usa ACTIVE si no se especifica)
@@ -80,6 +110,7 @@ def get_case_collection(case_id: str, version: Optional[str] = None):
                 f"No existe versión ACTIVE para case_id={case_id}. "
                 "Debes crear una versión nueva con build_embeddings_for_case()"
             )
+        resolved_version = version_path.name
     else:
         # Usar versión específica
         version_path = _get_index_path(case_id, version)
@@ -87,93 +118,210 @@ def get_case_collection(case_id: str, version: Optional[str] = None):
             raise RuntimeError(
                 f"No existe versión {version} para case_id={case_id}"
             )
+        resolved_version = version
     
-    # Obtener ruta del índice
-    if version:
-        index_path = _get_index_path(case_id, version)
-    else:
-        # version_path ya apunta al directorio de la versión
-        index_path = version_path / "index"
+    index_path = _get_index_path(case_id, resolved_version)
     
-    logger.info(f"[EMBEDDINGS] Inicializando vectorstore (Chroma)")
-    logger.info(f"[EMBEDDINGS] case_id: {case_id}")
-    logger.info(f"[EMBEDDINGS] path: {index_path}")
-    
-    client = chromadb.PersistentClient(path=str(index_path))
+    def _open():
+        logger.info(f"[EMBEDDINGS] Inicializando vectorstore (Chroma)")
+        logger.info(f"[EMBEDDINGS] case_id: {case_id}")
+        logger.info(f"[EMBEDDINGS] path: {index_path}")
+        
+        client = chromadb.PersistentClient(path=str(index_path))
+        
+        collection = client.get_or_create_collection(
+            name="chunks",
+            metadata={"case_id": case_id},
+        )
+        
+        # Debug info (solo al abrir, no en cada consulta)
+        try:
+            count = collection.count()
+            logger.info(f"[EMBEDDINGS] Embeddings actuales en colección: {count}")
+        except Exception:
+            logger.warning("[EMBEDDINGS] No se pudo obtener count() de Chroma")
+        
+        return client, _wrap_compact_index(case_id, resolved_version, collection)
     
-    collection = client.get_or_create_collection(
-        name="chunks",
-        metadata={"case_id": case_id},
-    )
+    return get_collection_pool().get((case_id, resolved_version), _open)
+
+
+def _wrap_compact_index(case_id: str, version: str, collection):
+    """
+    Colección tal cual (float32) o envuelta con el índice compacto.
     
-    # Debug info
+    Una versión en BUILDING aún no tiene manifest: se abre sin envolver
+    (el builder invalida el pool al terminar para reabrirla).
+    """
     try:
-        count = collection.count()
-        logger.info(f"[EMBEDDINGS] Embeddings actuales en colección: {count}")
-    except Exception:
-        logger.warning("[EMBEDDINGS] No se pudo obtener count() de Chroma")
+        manifest = read_manifest(case_id, version)
+    except (FileNotFoundError, ValueError):
+        return collection
+    
+    if manifest.get("index_format", "float32") == "float32":
+        return collection
     
-    return collection
+    from app.services.quantized_index import open_quantized_collection
+    return open_quantized_collection(collection, _get_quantized_path(case_id, version))
 
 
 # =========================================================
 # CHUNKS (SQL)
 # =========================================================
 
-def get_chunks_for_case(db: Session, case_id: str) -> list[DocumentChunk]:
+def iter_chunks_for_case(
+    db: Session,
+    case_id: str,
+    page_size: int = EMBEDDING_CHUNK_PAGE_SIZE,
+) -> Iterator:
     """
-    Carga todos los chunks de un caso desde la base de datos.
-    
-    VALIDACIÓN CRÍTICA: Todos los chunks DEBEN tener case_id correcto.
+    Recorre los chunks de un caso en páginas ordenadas (document_id,
+    chunk_index) sin cargarlos todos en memoria.
+
+    - Paginación por clave (keyset): cada página es una consulta acotada,
+      sin cursor abierto durante todo el build
+    - Solo las columnas necesarias: filas ligeras, fuera del identity map
+      de la sesión (la memoria no crece con el tamaño del caso)
     """
-    logger.info("[EMBEDDINGS] Cargando chunks desde BBDD")
-    logger.info(f"[EMBEDDINGS] case_id: {case_id}")
-    
-    q = (
-        select(DocumentChunk)
-        .where(DocumentChunk.case_id == case_id)
-        .order_by(
-            DocumentChunk.document_id.asc(),
-            DocumentChunk.chunk_index.asc(),
-        )
+    columns = (
+        DocumentChunk.chunk_id,
+        DocumentChunk.case_id,
+        DocumentChunk.document_id,
+        DocumentChunk.chunk_index,
+        DocumentChunk.content,
     )
+    last_key: Optional[Tuple[str, int]] = None
     
-    chunks = db.execute(q).scalars().all()
-    
-    # VALIDACIÓN: Todos los chunks DEBEN tener case_id correcto
-    for chunk in chunks:
-        if chunk.case_id != case_id:
-            raise RuntimeError(
-                f"VIOLACIÓN DE INTEGRIDAD: Chunk {chunk.chunk_id} tiene case_id={chunk.case_id}, "
-                f"esperado case_id={case_id}. Abortando ingesta."
+    while True:
+        q = select(*columns).where(DocumentChunk.case_id == case_id)
+        if last_key is not None:
+            last_doc, last_index = last_key
+            q = q.where(
+                or_(
+                    DocumentChunk.document_id > last_doc,
+                    and_(
+                        DocumentChunk.document_id == last_doc,
+                        DocumentChunk.chunk_index > last_index,
+                    ),
+                )
             )
-    
-    logger.info(f"[EMBEDDINGS] Chunks encontrados: {len(chunks)}")
-    
-    return chunks
+        q = q.order_by(
+            DocumentChunk.document_id.asc(),
+            DocumentChunk.chunk_index.asc(),
+        ).limit(page_size)
+        
+        page = db.execute(q).all()
+        if not page:
+            return
+        yield from page
+        if len(page) < page_size:
+            return
+        last_key = (page[-1].document_id, page[-1].chunk_index)
+
+
+def count_chunks_by_document(db: Session, case_id: str) -> Dict[str, int]:
+    """Nº de chunks por documento del caso en UNA consulta agrupada."""
+    rows = db.execute(
+        select(DocumentChunk.document_id, func.count())
+        .where(DocumentChunk.case_id == case_id)
+        .group_by(DocumentChunk.document_id)
+    ).all()
+    return {doc_id: count for doc_id, count in rows}
 
 
 # =========================================================
-# EMBEDDINGS (OpenAI)
+# EMBEDDINGS (proveedor configurable)
 # =========================================================
 
-def _embed_texts_openai(client: OpenAI, texts: list[str]) -> list[list[float]]:
-    """Genera embeddings usando OpenAI."""
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=texts,
-    )
-    return [item.embedding for item in resp.data]
+def _resolve_build_provider(
+    provider: Optional[EmbeddingProvider],
+    openai_client: Optional[OpenAI],
+) -> EmbeddingProvider:
+    """Proveedor explícito, cliente OpenAI explícito o el configurado."""
+    if provider is not None:
+        return provider
+    if openai_client is not None:
+        return OpenAIEmbeddingProvider(client=openai_client)
+    return get_embedding_provider()
 
 
-def _get_embedding_dimension(client: OpenAI) -> int:
+def _get_embedding_dimension(provider: EmbeddingProvider) -> int:
     """Obtiene la dimensión del modelo de embeddings."""
-    # Generar un embedding de prueba para obtener la dimensión
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=["test"],
+    if provider.dimensions:
+        return provider.dimensions
+    # Embedding de prueba (servido por el almacén tras la primera vez)
+    return len(embed_texts(["test"], provider)[0])
+
+
+# =========================================================
+# REUTILIZACIÓN INCREMENTAL (versión ACTIVE previa)
+# =========================================================
+
+def _open_reuse_source(
+    case_id: str,
+    embedding_dim: int,
+    embedding_model: str = EMBEDDING_MODEL,
+) -> Tuple[Optional[str], Optional[object]]:
+    """
+    Devuelve (version, colección) de la versión ACTIVE si sus vectores son
+    reutilizables: mismo modelo y misma dimensión que el build actual.
+    
+    Si no hay ACTIVE o no es compatible → (None, None): build completo.
+    """
+    active_version = get_active_version(case_id)
+    if not active_version:
+        return None, None
+    
+    try:
+        manifest = read_manifest(case_id, active_version)
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f"[EMBEDDINGS] ⚠️  Manifest ACTIVE ilegible, build completo: {e}")
+        return None, None
+    
+    if manifest.get("embedding_model") != embedding_model or manifest.get("embedding_dim") != embedding_dim:
+        logger.info(
+            f"[EMBEDDINGS] Versión ACTIVE {active_version} no reutilizable "
+            f"(modelo/dimensión distintos): build completo"
+        )
+        return None, None
+    
+    try:
+        return active_version, get_case_collection(case_id, active_version)
+    except Exception as e:
+        logger.warning(f"[EMBEDDINGS] ⚠️  No se pudo abrir la versión ACTIVE, build completo: {e}")
+        return None, None
+
+
+def _fetch_reusable_vectors(previous_collection, chunks: List[DocumentChunk]) -> Dict[str, List[float]]:
+    """
+    Vectores de la versión previa para los chunks SIN CAMBIOS del batch.
+    
+    El chunk_id es determinista (case_id, doc_id, índice, offsets) pero no
+    incluye el texto: un chunk solo se reutiliza si el texto almacenado en
+    la versión previa es idéntico al actual.
+    """
+    if previous_collection is None or not chunks:
+        return {}
+    
+    previous = previous_collection.get(
+        ids=[c.chunk_id for c in chunks],
+        include=["embeddings", "documents"],
     )
-    return len(resp.data[0].embedding)
+    
+    ids = previous.get("ids") or []
+    documents = previous.get("documents")
+    embeddings = previous.get("embeddings")
+    if documents is None or embeddings is None:
+        return {}
+    
+    content_by_id = {c.chunk_id: c.content for c in chunks}
+    reusable: Dict[str, List[float]] = {}
+    for chunk_id, document, embedding in zip(ids, documents, embeddings):
+        if embedding is None or document != content_by_id.get(chunk_id):
+            continue
+        reusable[chunk_id] = [float(x) for x in embedding]
+    
+    return reusable
 
 
 # =========================================================
@@ -186,6 +334,11 @@ def build_embeddings_for_case(
     case_id: str,
     openai_client: Optional[OpenAI] = None,
     keep_versions: int = 3,
+    reuse_active: bool = EMBEDDING_INCREMENTAL_REUSE,
+    provider: Optional[EmbeddingProvider] = None,
+    embedding_dimensions: Optional[int] = None,
+    index_format: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
 ) -> str:
     """
     Crea una nueva versión del vectorstore para un caso.
@@ -199,11 +352,25 @@ def build_embeddings_for_case(
     6. Si KO → status=FAILED y NO tocar ACTIVE
     7. Limpiar versiones antiguas
     
+    INCREMENTAL: los chunks sin cambios respecto a la versión ACTIVE
+    (mismo chunk_id y mismo texto, mismo modelo/dimensión) copian su vector;
+    solo los chunks nuevos o modificados llaman a la API de embeddings.
+    
     Args:
         db: Sesión de base de datos
         case_id: ID del caso
         openai_client: Cliente de OpenAI (opcional)
         keep_versions: Número de versiones a mantener (default=3)
+        reuse_active: Reutilizar vectores de la versión ACTIVE (default=config)
+        provider: Proveedor de embeddings (default=EMBEDDING_PROVIDER, o
+            OpenAI con openai_client si se pasa)
+        embedding_dimensions: Dimensión reducida para esta versión
+            (default=la del proveedor, EMBEDDING_DIMENSIONS para OpenAI)
+        index_format: "float32", "int8" o "float16" (default=VECTOR_INDEX_FORMAT).
+            Los compactos guardan códigos cuantizados y re-puntúan con los
+            vectores exactos del almacén por contenido
+        progress_callback: Llamada tras cada batch insertado con
+            (chunks procesados, chunks esperados) (jobs en segundo plano)
         
     Returns:
         ID de la versión creada
@@ -215,6 +382,13 @@ def build_embeddings_for_case(
     if not case_id or not case_id.strip():
         raise ValueError("case_id no puede estar vacío")
     
+    index_format = index_format or VECTOR_INDEX_FORMAT
+    if index_format not in INDEX_FORMATS:
+        raise ValueError(f"index_format desconocido: {index_format}. Disponibles: {list(INDEX_FORMATS)}")
+    if index_format != "float32" and not EMBEDDING_STORE_ENABLED:
+        # El re-scoring exacto lee los vectores float32 del almacén
+        raise ValueError(f"index_format={index_format} requiere EMBEDDING_STORE_ENABLED")
+    
     logger.info("=" * 60)
     logger.info("[EMBEDDINGS] Inicio pipeline embeddings con versionado")
     logger.info(f"[EMBEDDINGS] case_id: {case_id}")
@@ -232,26 +406,28 @@ def build_embeddings_for_case(
     # A partir de aquí, cualquier error debe marcar la versión como FAILED
     try:
         # --------------------------------------------------
-        # 2. Inicializar cliente OpenAI
+        # 2. Resolver proveedor de embeddings
         # --------------------------------------------------
-        if openai_client is None:
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                raise RuntimeError("OPENAI_API_KEY no definida en entorno")
-            openai_client = OpenAI(api_key=api_key)
+        provider = _resolve_build_provider(provider, openai_client)
+        if embedding_dimensions and embedding_dimensions != provider.dimensions:
+            provider = provider.with_dimensions(embedding_dimensions)
         
         # --------------------------------------------------
         # 3. Obtener dimensión del modelo de embeddings
         # --------------------------------------------------
-        embedding_dim = _get_embedding_dimension(openai_client)
-        logger.info(f"[EMBEDDINGS] Modelo: {EMBEDDING_MODEL}, Dimensión: {embedding_dim}")
+        embedding_dim = _get_embedding_dimension(provider)
+        logger.info(
+            f"[EMBEDDINGS] Proveedor: {provider.name}, Modelo: {provider.model}, Dimensión: {embedding_dim}"
+        )
         
         # --------------------------------------------------
-        # 4. Cargar chunks desde BD
+        # 4. Contar chunks por documento (una consulta agrupada)
         # --------------------------------------------------
-        chunks = get_chunks_for_case(db, case_id)
+        # Los chunks NO se cargan aquí: se leen en páginas durante el paso 7
+        chunk_counts = count_chunks_by_document(db, case_id)
+        expected_chunks = sum(chunk_counts.values())
         
-        if not chunks:
+        if not expected_chunks:
             logger.warning("[EMBEDDINGS] ⚠️  No hay chunks para procesar")
             write_status(case_id, version_id, "FAILED")
             raise RuntimeError(f"No hay chunks para case_id={case_id}. Abortando ingesta.")
@@ -260,11 +436,17 @@ def build_embeddings_for_case(
         # 5. Obtener información de documentos para manifest
         # --------------------------------------------------
         documents_info = []
-        doc_ids = list(set(c.document_id for c in chunks))
+        doc_filter_metadata = {}  # doc_id -> {doc_type, date_start, date_end}
+        doc_ids = sorted(chunk_counts)
+        
+        # Documentos en lotes de IN (no una consulta por documento)
+        docs_by_id = {}
+        for i in range(0, len(doc_ids), 500):
+            for doc in db.query(Document).filter(Document.document_id.in_(doc_ids[i:i + 500])):
+                docs_by_id[doc.document_id] = doc
         
         for doc_id in doc_ids:
-            # Obtener documento de BD
-            doc = db.query(Document).filter(Document.document_id == doc_id).first()
+            doc = docs_by_id.get(doc_id)
             if not doc:
                 logger.warning(f"[EMBEDDINGS] ⚠️  Documento {doc_id} no encontrado en BD")
                 continue
@@ -277,6 +459,9 @@ def build_embeddings_for_case(
                     f"esperado case_id={case_id}. Abortando ingesta."
                 )
             
+            # Metadatos filtrables (doc_type/fechas) que se copian a cada vector
+            doc_filter_metadata[doc_id] = document_filter_metadata(doc)
+            
             # Calcular SHA256 del archivo si existe
             sha256_hash = "NOT_AVAILABLE"
             if doc.storage_path and os.path.exists(doc.storage_path):
@@ -285,14 +470,11 @@ def build_embeddings_for_case(
                 except Exception as e:
                     logger.warning(f"[EMBEDDINGS] ⚠️  No se pudo calcular SHA256 para {doc_id}: {e}")
             
-            # Contar chunks de este documento
-            doc_chunks_count = sum(1 for c in chunks if c.document_id == doc_id)
-            
             documents_info.append({
                 "doc_id": doc_id,
                 "filename": doc.filename,
                 "sha256": sha256_hash,
-                "num_chunks": doc_chunks_count,
+                "num_chunks": chunk_counts[doc_id],
             })
         
         logger.info(f"[EMBEDDINGS] Documentos a procesar: {len(documents_info)}")
@@ -301,25 +483,72 @@ def build_embeddings_for_case(
         # 6. Inicializar colección de ChromaDB en la nueva versión
         # --------------------------------------------------
         collection = get_case_collection(case_id, version_id)
+        quantized_writer = None
+        if index_format != "float32":
+            from app.services.quantized_index import PLACEHOLDER_EMBEDDING, QuantizedIndexWriter
+            quantized_writer = QuantizedIndexWriter(_get_quantized_path(case_id, version_id), index_format)
+            logger.info(f"[EMBEDDINGS] Índice compacto: {index_format} (+ re-scoring exacto)")
         
         # --------------------------------------------------
-        # 7. Generar embeddings por batches
+        # 7. Generar embeddings por batches (reutilizando ACTIVE)
         # --------------------------------------------------
-        all_ids = [c.chunk_id for c in chunks]
+        logger.info(f"[EMBEDDINGS] Total chunks a procesar: {expected_chunks}")
         
-        logger.info(f"[EMBEDDINGS] Total chunks a procesar: {len(chunks)}")
+        reused_from_version, previous_collection = (
+            _open_reuse_source(case_id, embedding_dim, provider.model) if reuse_active else (None, None)
+        )
+        if reused_from_version:
+            logger.info(f"[EMBEDDINGS] Build incremental desde versión ACTIVE: {reused_from_version}")
+        reused_count = 0
+        embedded_count = 0
+        processed_count = 0
+        added_chunk_ids: List[str] = []  # Embebidos de nuevo (validación rápida)
         
-        for i in range(0, len(chunks), EMBEDDING_BATCH_SIZE):
-            batch = chunks[i : i + EMBEDDING_BATCH_SIZE]
-            
+        def _embed_batch(batch: list):
+            # En un hilo del ejecutor: reutilizar vectores de chunks sin
+            # cambios y embeber solo el resto
+            reusable = _fetch_reusable_vectors(previous_collection, batch)
+            pending = [c for c in batch if c.chunk_id not in reusable]
+            fresh = (
+                dict(zip(
+                    [c.chunk_id for c in pending],
+                    embed_texts([c.content for c in pending], provider),
+                ))
+                if pending else {}
+            )
+            return reusable, fresh
+        
+        # Streaming: páginas de BD → batches por presupuesto de tokens (los
+        # chunks varían de ~700 a ~3000 caracteres) → ejecutor con ventana
+        # acotada. En memoria solo hay unos pocos batches a la vez.
+        batches = iter_token_batches(iter_chunks_for_case(db, case_id), lambda c: c.content)
+        executor = get_embedding_executor()
+        fill_tracker = FillTracker()
+        logger.info(f"[EMBEDDINGS] Hasta {executor.max_concurrency} peticiones en vuelo")
+        
+        # Pipeline: mientras se inserta un batch en Chroma, los siguientes
+        # siguen embebiéndose en paralelo
+        for batch_number, (token_batch, (reusable, fresh)) in enumerate(
+            executor.run_ordered(batches, lambda b: _embed_batch(b.items)), start=1
+        ):
+            batch = token_batch.items
+            fill_tracker.add(token_batch)
+            processed_count += len(batch)
             batch_ids = [c.chunk_id for c in batch]
             batch_texts = [c.content for c in batch]
             
-            logger.info(f"[EMBEDDINGS] Procesando batch {i // EMBEDDING_BATCH_SIZE + 1}")
-            logger.info(f"[EMBEDDINGS] Tamaño: {len(batch)}")
+            logger.info(f"[EMBEDDINGS] Procesando batch {batch_number}")
+            logger.info(
+                f"[EMBEDDINGS] Tamaño: {len(batch)}, ~{token_batch.tokens} tokens "
+                f"({token_batch.fill_ratio:.0%} del presupuesto)"
+            )
+            
+            vectors = [reusable[cid] if cid in reusable else fresh[cid] for cid in batch_ids]
+            reused_count += len(reusable)
+            embedded_count += len(fresh)
+            added_chunk_ids.extend(fresh)
             
-            # Generar embeddings
-            vectors = _embed_texts_openai(openai_client, batch_texts)
+            logger.info(f"[EMBEDDINGS] Reutilizados: {len(reusable)}, embebidos: {len(fresh)}")
             
             # VALIDACIÓN: Todos los chunks DEBEN tener case_id correcto
             metadatas = []
@@ -335,9 +564,15 @@ def build_embeddings_for_case(
                     "case_id": c.case_id,
                     "document_id": c.document_id,
                     "chunk_index": c.chunk_index,
+                    # Filtros de retrieval aplicados dentro de Chroma (where)
+                    **doc_filter_metadata.get(c.document_id, {}),
                 })
             
-            # Insertar en ChromaDB
+            # Insertar en ChromaDB (versiones compactas: vector marcador y
+            # códigos cuantizados aparte)
+            if quantized_writer is not None:
+                quantized_writer.add(batch_ids, vectors)
+                vectors = [PLACEHOLDER_EMBEDDING] * len(batch_ids)
             collection.add(
                 ids=batch_ids,
                 embeddings=vectors,
@@ -346,8 +581,23 @@ def build_embeddings_for_case(
             )
             
             logger.info("[EMBEDDINGS] ✅ Batch insertado")
+            if progress_callback is not None:
+                progress_callback(processed_count, expected_chunks)
         
         logger.info("[EMBEDDINGS] ✅ Todos los embeddings generados")
+        if quantized_writer is not None:
+            quantized_writer.close()
+        logger.info(f"[EMBEDDINGS] Reutilizados: {reused_count}, embebidos: {embedded_count}")
+        logger.info(f"[EMBEDDINGS] Ocupación de batches: {fill_tracker.report()}")
+        logger.info(f"[EMBEDDINGS] Almacén por contenido: {get_embedding_store().stats()}")
+        
+        if processed_count != expected_chunks:
+            # Los chunks cambiaron en BD durante el build: el manifest refleja
+            # lo indexado y la validación comprobará la colección
+            logger.warning(
+                f"[EMBEDDINGS] ⚠️  Chunks procesados ({processed_count}) != contados al inicio "
+                f"({expected_chunks})"
+            )
         
         # --------------------------------------------------
         # 8. Generar manifest.json
@@ -355,16 +605,23 @@ def build_embeddings_for_case(
         manifest_data = ManifestData(
             case_id=case_id,
             version=version_id,
-            embedding_model=EMBEDDING_MODEL,
+            embedding_model=provider.model,
             embedding_dim=embedding_dim,
+            embedding_provider=provider.name,
+            embedding_dimensions=provider.dimensions,
             chunking={
                 "strategy": "recursive_text_splitter",
                 "chunk_size": 2000,  # Valor por defecto del chunker
                 "overlap": 200,  # Valor por defecto del chunker
             },
             documents=documents_info,
-            total_chunks=len(chunks),
+            total_chunks=processed_count,
             created_at=version_path.stat().st_ctime if version_path.exists() else "",
+            metadata_fields=list(FILTERABLE_METADATA_FIELDS),
+            reused_from_version=reused_from_version,
+            reused_chunks=reused_count,
+            embedded_chunks=embedded_count,
+            index_format=index_format,
         )
         
         # Convertir timestamp a ISO8601 si es necesario
@@ -374,12 +631,27 @@ def build_embeddings_for_case(
         
         write_manifest(case_id, version_id, manifest_data)
         logger.info("[EMBEDDINGS] ✅ Manifest generado")
+        if reused_from_version:
+            write_changes(case_id, version_id, reused_from_version, added_chunk_ids)
+        
+        if quantized_writer is not None:
+            # Reabrir con el manifest ya escrito → colección con índice compacto
+            invalidate_case_collections(case_id, version=version_id)
+            collection = get_case_collection(case_id, version_id)
         
         # --------------------------------------------------
         # 9. Validar integridad (BLOQUEANTE)
         # --------------------------------------------------
-        logger.info("[EMBEDDINGS] Iniciando validación de integridad...")
-        is_valid, errors = validate_version_integrity(case_id, version_id, collection)
+        # Incremental: solo los chunks nuevos (los reutilizados ya se
+        # validaron en la versión base)
+        validation_mode = "fast" if reused_from_version and VALIDATION_FAST_INCREMENTAL else "full"
+        logger.info(f"[EMBEDDINGS] Iniciando validación de integridad ({validation_mode})...")
+        is_valid, errors = validate_version_integrity(
+            case_id, version_id, collection,
+            expected_model=provider.model,
+            expected_dim=embedding_dim,
+            mode=validation_mode,
+        )
         
         if not is_valid:
             # Marcar como FAILED
@@ -400,6 +672,9 @@ def build_embeddings_for_case(
         write_status(case_id, version_id, "READY")
         logger.info("[EMBEDDINGS] ✅ Versión marcada como READY")
         
+        # READY = inmutable: compartir ficheros idénticos con otras versiones
+        seal_version_segments(case_id, version_id)
+        
         update_active_pointer(case_id, version_id)
         logger.info("[EMBEDDINGS] ✅ Puntero ACTIVE actualizado")
         
@@ -416,7 +691,7 @@ def build_embeddings_for_case(
         logger.info(f"[EMBEDDINGS] ✅ Pipeline completado exitosamente")
         logger.info(f"[EMBEDDINGS] case_id: {case_id}")
         logger.info(f"[EMBEDDINGS] version: {version_id}")
-        logger.info(f"[EMBEDDINGS] total_chunks: {len(chunks)}")
+        logger.info(f"[EMBEDDINGS] total_chunks: {processed_count}")
         logger.info("=" * 60)
         
         return version_id
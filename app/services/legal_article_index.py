@@ -0,0 +1,242 @@
+"""
+Índice ARTÍCULO → chunks del corpus legal (Ley Concursal).
+
+Se construye en la ingesta a partir de las cabeceras "Artículo N." del
+texto consolidado y de los offsets (char_start / char_end) de cada chunk:
+un artículo largo se reparte en varios chunks y un chunk puede contener
+varios artículos.
+
+Formato (LEGAL_ARTICLE_INDEX_PATH, JSON):
+- source_hash: hash del texto ingerido (el mismo que metadata.json)
+- articles:    "443" / "5 bis" → {"title", "chunk_ids"} (chunks en orden del texto)
+- chunks:      chunk_id → {"text", "metadata"}
+
+Usos:
+- Consulta directa por artículo sin embedding ni búsqueda vectorial
+- Comprobación O(1) de que una cita existe en el corpus ingerido
+
+Las claves son números de artículo normalizados ("443", "5", "5 bis"), los
+mismos que usa el filtrado anti-alucinación del Agente Legal.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.core.variables import LEGAL_ARTICLE_INDEX_PATH
+from app.core.logger import logger
+
+
+# =========================================================
+# NORMALIZACIÓN DE REFERENCIAS
+# =========================================================
+
+# Artículos intercalados ("Artículo 5 bis"): son artículos distintos del 5
+_SUFFIX = r"(?:bis|ter|quater|quinquies)\b"
+# Cabecera de artículo en el texto consolidado del BOE: "Artículo 443. Supuestos especiales."
+_ARTICLE_HEADER_RE = re.compile(
+    rf"^Artículo\s+(\d+(?:\s+{_SUFFIX})?)\.\s*(.*)$",
+    re.MULTILINE,
+)
+# "Art. 165 LC", "Art 165", "Art.165", "Artículo 165", "Art. 5 bis"
+_ARTICLE_REF_RE = re.compile(rf"Art(?:ículo|iculo|\.)?\s*(\d+(?:\s+{_SUFFIX})?)", re.IGNORECASE)
+_NUMBER_RE = re.compile(rf"(\d+(?:\s+{_SUFFIX})?)", re.IGNORECASE)
+# Consulta que es SOLO una referencia a artículo: "art. 443", "Artículo 5 LC",
+# "art. 164.2.3 de la Ley Concursal", "art. 5 bis"
+_ARTICLE_QUERY_RE = re.compile(
+    rf"^\s*(?:el\s+)?art(?:ículo|iculo|\.)?\s*(\d+(?:\s+{_SUFFIX})?)(?:\.\d+)*[ºª]?"
+    r"(?:\s+(?:de\s+la\s+)?(?:LC|TRLC|Ley\s+Concursal))?\s*[.?]?\s*$",
+    re.IGNORECASE,
+)
+
+
+def _article_key(number: str) -> str:
+    """Clave normalizada: "443", "5 bis" (minúsculas, un espacio)."""
+    return " ".join(number.lower().split())
+
+
+@lru_cache(maxsize=4096)
+def normalize_article_number(article_str: str) -> Optional[str]:
+    """
+    Número de artículo de una referencia en cualquier formato.
+
+    "Art. 165 LC" → "165", "Artículo 166" → "166", "art. 443.1º" → "443",
+    "Art. 5 bis" → "5 bis", "165" → "165". None si no hay número.
+    """
+    if not article_str:
+        return None
+    match = _ARTICLE_REF_RE.search(article_str) or _NUMBER_RE.search(article_str)
+    return _article_key(match.group(1)) if match else None
+
+
+def extract_article_references(text: str) -> Set[str]:
+    """Números de todos los artículos citados en un texto."""
+    if not text or not isinstance(text, str):
+        return set()
+    return {_article_key(number) for number in _ARTICLE_REF_RE.findall(text)}
+
+
+def article_in_query(query: str) -> Optional[str]:
+    """Número de artículo si la consulta es únicamente una referencia a un artículo."""
+    if not query:
+        return None
+    match = _ARTICLE_QUERY_RE.match(query)
+    return _article_key(match.group(1)) if match else None
+
+
+# =========================================================
+# CONSTRUCCIÓN (INGESTA)
+# =========================================================
+
+def build_article_index(
+    text: str,
+    chunks: Sequence[Dict[str, Any]],
+    source_hash: str,
+) -> Dict[str, Any]:
+    """
+    Construye el índice a partir del texto completo y sus chunks.
+
+    Un chunk pertenece al artículo vigente en su char_start y a todos los
+    artículos cuya cabecera cae dentro de [char_start, char_end).
+    """
+    headers: List[Tuple[int, str, str]] = [
+        (m.start(), _article_key(m.group(1)), m.group(2).strip())
+        for m in _ARTICLE_HEADER_RE.finditer(text)
+    ]
+
+    articles: Dict[str, Dict[str, Any]] = {}
+    indexed_chunks: Dict[str, Dict[str, Any]] = {}
+    header_pos = 0
+    current: Optional[str] = None
+
+    ordered = sorted(chunks, key=lambda c: int(c["metadata"].get("char_start", 0)))
+    for chunk in ordered:
+        metadata = chunk["metadata"]
+        start = int(metadata.get("char_start", 0))
+        end = int(metadata.get("char_end", start))
+
+        # Artículo vigente al inicio del chunk
+        while header_pos < len(headers) and headers[header_pos][0] <= start:
+            current = headers[header_pos][1]
+            header_pos += 1
+        numbers = [current] if current else []
+        for position, number, _title in headers[header_pos:]:
+            if position >= end:
+                break
+            numbers.append(number)
+
+        chunk_id = metadata["chunk_id"]
+        for number in dict.fromkeys(numbers):
+            entry = articles.setdefault(number, {"title": "", "chunk_ids": []})
+            if chunk_id not in entry["chunk_ids"]:
+                entry["chunk_ids"].append(chunk_id)
+        if numbers:
+            indexed_chunks[chunk_id] = {"text": chunk["text"], "metadata": metadata}
+
+    # Título de la cabecera (si aparece repetida, la última)
+    for _position, number, title in headers:
+        if number in articles and title:
+            articles[number]["title"] = title
+
+    return {
+        "source_hash": source_hash,
+        "built_at": datetime.now().isoformat(),
+        "articles": articles,
+        "chunks": indexed_chunks,
+    }
+
+
+def write_article_index(index: Dict[str, Any], path: Path = LEGAL_ARTICLE_INDEX_PATH) -> Path:
+    """Guarda el índice de forma atómica (tmp + os.replace)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    logger.info(
+        f"[LEGAL ARTICLES] Índice escrito: {path} "
+        f"({len(index['articles'])} artículos, {len(index['chunks'])} chunks)"
+    )
+    return path
+
+
+# =========================================================
+# LECTURA
+# =========================================================
+
+class ArticleIndex:
+    """Índice en memoria: búsquedas por número de artículo en O(1)."""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.source_hash: Optional[str] = data.get("source_hash")
+        self._articles: Dict[str, Dict[str, Any]] = data.get("articles", {})
+        self._chunks: Dict[str, Dict[str, Any]] = data.get("chunks", {})
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    def __contains__(self, article: str) -> bool:
+        return self.has_article(article)
+
+    def has_article(self, article: str) -> bool:
+        """True si la referencia (en cualquier formato) existe en el corpus."""
+        number = normalize_article_number(article)
+        return number is not None and number in self._articles
+
+    def title(self, article: str) -> Optional[str]:
+        entry = self._articles.get(normalize_article_number(article) or "")
+        return entry["title"] if entry else None
+
+    def chunk_ids(self, article: str) -> List[str]:
+        entry = self._articles.get(normalize_article_number(article) or "")
+        return list(entry["chunk_ids"]) if entry else []
+
+    def lookup(self, article: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Chunks del artículo en orden del texto: [{"chunk_id", "text", "metadata"}]."""
+        chunk_ids = self.chunk_ids(article)
+        if limit is not None:
+            chunk_ids = chunk_ids[:limit]
+        return [
+            {"chunk_id": chunk_id, **self._chunks[chunk_id]}
+            for chunk_id in chunk_ids
+            if chunk_id in self._chunks
+        ]
+
+
+# ruta → ((mtime_ns, size), ArticleIndex): se recarga solo si el fichero cambió
+_loaded: Dict[str, Tuple[Tuple[int, int], ArticleIndex]] = {}
+_loaded_lock = threading.Lock()
+
+
+def get_article_index(path: Path = LEGAL_ARTICLE_INDEX_PATH) -> Optional[ArticleIndex]:
+    """
+    Índice del corpus ingerido (se carga una vez y se recarga tras re-ingerir).
+
+    Returns:
+        ArticleIndex, o None si aún no se ha construido o es ilegible
+    """
+    path = Path(path)
+    try:
+        info = path.stat()
+    except FileNotFoundError:
+        return None
+    stamp = (info.st_mtime_ns, info.st_size)
+    cached = _loaded.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = ArticleIndex(json.load(f))
+    except (OSError, ValueError) as e:
+        logger.warning(f"[LEGAL ARTICLES] Índice ilegible en {path}: {e}")
+        return None
+    with _loaded_lock:
+        _loaded[str(path)] = (stamp, index)
+    return index
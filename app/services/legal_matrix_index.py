@@ -0,0 +1,261 @@
+"""
+Índice MATRICIAL exacto para el corpus legal (Ley Concursal / jurisprudencia).
+
+El corpus legal es pequeño (~800 chunks) y estático entre ingestas: una
+búsqueda exacta por fuerza bruta es más rápida que sqlite + HNSW de Chroma
+y no pierde recall.
+
+Instantánea junto al vectorstore: <vectorstore>_matrix es un PUNTERO
+(symlink o, si el SO no lo permite, fichero de texto con el nombre) a un
+directorio de generación inmutable .<vectorstore>_matrix.<id>/ con:
+- vectors.npy: matriz N×D float32 contigua con filas L2-normalizadas
+- norms.npy:   norma original de cada vector
+- rows.json:   ids, documentos y metadatos (mismo orden que las filas)
+- meta.json:   dimensión, nº de filas y huella del metadata.json del corpus
+
+Publicar una generación es un único os.replace del puntero (como ACTIVE en
+vectorstore_versioning): los lectores de otros procesos ven la anterior o
+la nueva, nunca ninguna. Se conserva la generación anterior (lectores a
+medio cargar, vuelta atrás); las más antiguas se borran.
+
+vectors.npy se abre mapeado en memoria: los workers de un mismo host
+comparten las páginas a través de la page cache.
+
+Búsqueda (LegalMatrixIndex.query, misma interfaz que Chroma): un producto
+matriz-vector y argpartition. Las distancias devueltas son L2² exactas,
+como las de Chroma con el espacio por defecto: los umbrales de relevancia
+del servicio legal no cambian.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.logger import logger
+
+
+MATRIX_SUFFIX = "_matrix"
+
+
+def matrix_snapshot_path(vectorstore_path: Path) -> Path:
+    """Directorio de la instantánea matricial de un vectorstore legal."""
+    vectorstore_path = Path(vectorstore_path)
+    return vectorstore_path.parent / f"{vectorstore_path.name}{MATRIX_SUFFIX}"
+
+
+def _resolve_snapshot(path: Path) -> Path:
+    """Directorio de generación al que apunta el puntero (symlink o fichero de texto)."""
+    path = Path(path)
+    if path.is_file():
+        return path.parent / path.read_text(encoding="utf-8").strip()
+    return path.resolve()
+
+
+# =========================================================
+# ESCRITURA
+# =========================================================
+
+def _publish(path: Path, generation: Path) -> None:
+    """Apunta `path` a `generation` con un único os.replace."""
+    if path.is_dir() and not path.is_symlink():
+        # Instantánea de antes del puntero: pasa a ser una generación más
+        # (migración única; ese primer swap no es atómico)
+        logger.warning(f"[LEGAL MATRIX] Instantánea sin puntero en {path}: se migra")
+        os.replace(path, path.with_name(f".{path.name}.{uuid.uuid4().hex[:12]}"))
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.ptr")
+    try:
+        tmp.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        tmp.symlink_to(generation.name, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(generation.name)
+    os.replace(tmp, path)
+
+
+def _prune_generations(path: Path, keep: Sequence[Optional[Path]]) -> None:
+    """Borra las generaciones que no son la vigente ni la anterior."""
+    keep_names = {p.name for p in keep if p is not None}
+    for candidate in path.parent.glob(f".{path.name}.*"):
+        if candidate.is_dir() and not candidate.is_symlink() and candidate.name not in keep_names:
+            shutil.rmtree(candidate, ignore_errors=True)
+
+
+def write_matrix_snapshot(
+    path: Path,
+    ids: Sequence[str],
+    documents: Sequence[str],
+    metadatas: Sequence[Dict[str, Any]],
+    embeddings: Sequence[Sequence[float]],
+    corpus_fingerprint: str,
+) -> Path:
+    """
+    Escribe una generación nueva y la publica moviendo el puntero.
+
+    Los lectores que ya tienen mapeada la instantánea anterior la siguen
+    leyendo (el inode vive hasta que la suelten).
+    """
+    if not (len(ids) == len(documents) == len(metadatas) == len(embeddings)):
+        raise ValueError("ids, documents, metadatas y embeddings deben tener la misma longitud")
+
+    # Copia: los embeddings del llamador no deben normalizarse in situ
+    matrix = np.array(embeddings, dtype=np.float32, copy=True, order="C")
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(ids), -1)
+    norms = np.linalg.norm(matrix, axis=1).astype(np.float32)
+    safe = np.where(norms > 0, norms, 1.0).astype(np.float32)
+    matrix /= safe[:, None]
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    generation = path.with_name(f".{path.name}.{uuid.uuid4().hex[:12]}")
+    generation.mkdir()
+
+    np.save(generation / "vectors.npy", matrix)
+    np.save(generation / "norms.npy", norms)
+    with open(generation / "rows.json", "w", encoding="utf-8") as f:
+        json.dump(
+            {"ids": list(ids), "documents": list(documents), "metadatas": list(metadatas)},
+            f,
+            ensure_ascii=False,
+        )
+    with open(generation / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "dim": int(matrix.shape[1]) if len(matrix) else 0,
+                "count": len(ids),
+                "corpus_fingerprint": corpus_fingerprint,
+                "built_at": datetime.now().isoformat(),
+            },
+            f,
+            indent=2,
+        )
+
+    previous = _resolve_snapshot(path) if path.is_symlink() or path.is_file() else None
+    _publish(path, generation)
+    _prune_generations(path, keep=(generation, previous))
+
+    logger.info(f"[LEGAL MATRIX] Instantánea escrita: {path} ({len(ids)} filas)")
+    return path
+
+
+def build_from_collection(path: Path, collection: Any, corpus_fingerprint: str) -> Path:
+    """Vuelca una colección de Chroma (ya ingerida) a la instantánea."""
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    embeddings = data.get("embeddings")
+    return write_matrix_snapshot(
+        path,
+        data.get("ids") or [],
+        data.get("documents") or [],
+        data.get("metadatas") or [],
+        embeddings if embeddings is not None else [],
+        corpus_fingerprint,
+    )
+
+
+# =========================================================
+# LECTURA Y BÚSQUEDA
+# =========================================================
+
+class LegalMatrixIndex:
+    """Instantánea en modo lectura con la interfaz que usa el RAG legal (query, count)."""
+
+    def __init__(self, path: Path):
+        # Resolver el puntero una vez: todos los ficheros de la misma generación
+        self.path = _resolve_snapshot(path)
+        with open(self.path / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(self.path / "rows.json", "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        self.ids: List[str] = rows["ids"]
+        self.documents: List[str] = rows["documents"]
+        self.metadatas: List[Dict[str, Any]] = rows["metadatas"]
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.norms = np.load(self.path / "norms.npy")
+        self._squared_norms = self.norms * self.norms
+        if not (len(self.ids) == len(self.vectors) == len(self.norms) == len(self.documents)):
+            raise ValueError(f"Instantánea matricial inconsistente en {self.path}")
+
+    @property
+    def corpus_fingerprint(self) -> Optional[str]:
+        return self.meta.get("corpus_fingerprint")
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def distances(self, queries) -> "np.ndarray":
+        """Distancias L2² exactas (Q×N): ||q||² + ||v||² - 2·||v||·(q·v̂)."""
+        queries = np.asarray(queries, dtype=np.float32)
+        dots = queries @ self.vectors.T
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        distances = query_norms[:, None] + self._squared_norms[None, :] - 2.0 * dots * self.norms[None, :]
+        return np.maximum(distances, 0.0)
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        include=("metadatas", "documents", "distances"),
+        **_: Any,
+    ) -> Dict[str, Any]:
+        include = list(include)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        result: Dict[str, Any] = {"ids": []}
+        for field in include:
+            result[field] = []
+        if len(self.ids) == 0 or len(queries) == 0 or n_results <= 0:
+            for key in result:
+                result[key] = [[] for _ in range(len(queries))]
+            return result
+        if queries.shape[1] != self.vectors.shape[1]:
+            raise ValueError(
+                f"Dimensión de consulta {queries.shape[1]} != índice {self.vectors.shape[1]}"
+            )
+
+        distances = self.distances(queries)
+        k = min(n_results, len(self.ids))
+        for row in distances:
+            top = np.argpartition(row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+            top = top[np.argsort(row[top], kind="stable")]
+            result["ids"].append([self.ids[i] for i in top])
+            if "documents" in result:
+                result["documents"].append([self.documents[i] for i in top])
+            if "metadatas" in result:
+                result["metadatas"].append([self.metadatas[i] for i in top])
+            if "distances" in result:
+                result["distances"].append([float(row[i]) for i in top])
+        return result
+
+
+def load_matrix_index(path: Path, corpus_fingerprint: Optional[str] = None) -> Optional[LegalMatrixIndex]:
+    """
+    Abre la instantánea si existe y corresponde a la huella del corpus.
+
+    Returns:
+        LegalMatrixIndex, o None si falta, está corrupta o es de otra ingesta
+    """
+    path = Path(path)
+    if not (path.is_file() or (path / "meta.json").exists()):
+        return None
+    try:
+        index = LegalMatrixIndex(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"[LEGAL MATRIX] Instantánea ilegible en {path}: {e}")
+        return None
+    if corpus_fingerprint is not None and index.corpus_fingerprint != corpus_fingerprint:
+        logger.info(f"[LEGAL MATRIX] Instantánea obsoleta en {path} (corpus re-ingerido)")
+        return None
+    return index
@@ -0,0 +1,283 @@
+"""
+Caché de RESULTADOS del RAG legal (query_legal_rag / aquery_legal_rag).
+
+Clave: (consulta normalizada, top_k, fuentes, hash del corpus). El hash sale
+de los metadata.json del corpus legal, que la ingesta reescribe en cada
+rebuild: re-ingerir la Ley Concursal o la jurisprudencia cambia la clave y
+los resultados antiguos dejan de servirse sin invalidación explícita.
+
+Dos niveles, como la caché de embeddings de consultas:
+1. Memoria: LRU acotado con TTL por entrada
+2. Disco (opcional): sqlite compartido entre workers, mismo TTL
+
+Los resultados vacíos no se cachean (una fuente caída devuelve []).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.variables import (
+    LEGAL_RESULT_CACHE_DISK_ENABLED,
+    LEGAL_RESULT_CACHE_DISK_MAX_ENTRIES,
+    LEGAL_RESULT_CACHE_ENABLED,
+    LEGAL_RESULT_CACHE_MEMORY_SIZE,
+    LEGAL_RESULT_CACHE_PATH,
+    LEGAL_RESULT_CACHE_TTL_S,
+)
+from app.core.logger import logger
+from app.services.embedding_cache import normalize_query_text
+
+
+LegalResults = List[Dict[str, Any]]
+
+
+# =========================================================
+# CLAVE Y HUELLA DEL CORPUS
+# =========================================================
+
+# ruta → ((mtime_ns, size), sha256): solo se relee el fichero si cambió
+_fingerprints: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_fingerprints_lock = threading.Lock()
+
+
+def _file_fingerprint(path: Path) -> str:
+    try:
+        info = path.stat()
+    except FileNotFoundError:
+        return "missing"
+    stamp = (info.st_mtime_ns, info.st_size)
+    cached = _fingerprints.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    try:
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return "unreadable"
+    with _fingerprints_lock:
+        _fingerprints[str(path)] = (stamp, digest)
+    return digest
+
+
+def corpus_fingerprint(metadata_paths: Sequence[Path]) -> str:
+    """Hash de los metadata.json del corpus consultado (cambia con cada ingesta)."""
+    combined = "|".join(_file_fingerprint(p) for p in metadata_paths)
+    return hashlib.sha256(combined.encode("utf-8")).hexdigest()[:16]
+
+
+def legal_cache_key(query: str, top_k: int, sources: Sequence[str], corpus_hash: str) -> str:
+    """Clave de caché de una consulta legal."""
+    key_data = f"{normalize_query_text(query)}|{top_k}|{','.join(sorted(sources))}|{corpus_hash}"
+    return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+
+def _copy(results: LegalResults) -> LegalResults:
+    # Los llamadores pueden modificar los dicts: nunca exponer los cacheados
+    return [dict(r) for r in results]
+
+
+# =========================================================
+# CACHÉ
+# =========================================================
+
+class LegalResultCache:
+    """
+    Caché LRU + TTL de resultados legales con nivel de disco opcional
+    (disk_path=None → solo memoria).
+    """
+
+    def __init__(
+        self,
+        memory_size: int = LEGAL_RESULT_CACHE_MEMORY_SIZE,
+        ttl_s: float = LEGAL_RESULT_CACHE_TTL_S,
+        disk_path: Optional[Path] = LEGAL_RESULT_CACHE_PATH,
+        disk_max_entries: int = LEGAL_RESULT_CACHE_DISK_MAX_ENTRIES,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.memory_size = max(0, memory_size)
+        self.ttl_s = ttl_s
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self._clock = clock
+        self._memory: "OrderedDict[str, Tuple[float, LegalResults]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_ready = False
+        self._disk_writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    # -----------------------------------------------------
+    # Nivel memoria
+    # -----------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[LegalResults]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                del self._memory[key]
+                self.expired += 1
+                return None
+            self._memory.move_to_end(key)
+            return entry[1]
+
+    def _memory_put(self, key: str, expires_at: float, results: LegalResults) -> None:
+        if self.memory_size == 0:
+            return
+        with self._lock:
+            self._memory[key] = (expires_at, results)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    # -----------------------------------------------------
+    # Nivel disco (sqlite)
+    # -----------------------------------------------------
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self.disk_path is None:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        try:
+            self.disk_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.disk_path), timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._disk_ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS legal_results ("
+                    " key TEXT PRIMARY KEY,"
+                    " payload TEXT NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " expires_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_legal_results_created "
+                    "ON legal_results(created_at)"
+                )
+                conn.commit()
+                self._disk_ready = True
+            self._local.conn = conn
+            return conn
+        except sqlite3.Error as e:
+            logger.warning(f"[LEGAL CACHE] Disco no disponible ({self.disk_path}): {e}")
+            return None
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, LegalResults]]:
+        conn = self._conn()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT expires_at, payload FROM legal_results WHERE key = ? AND expires_at > ?",
+                (key, self._clock()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"[LEGAL CACHE] Error leyendo disco: {e}")
+            return None
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _disk_put(self, key: str, expires_at: float, results: LegalResults) -> None:
+        conn = self._conn()
+        if conn is None:
+            return
+        try:
+            now = self._clock()
+            conn.execute(
+                "INSERT OR REPLACE INTO legal_results (key, payload, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(results, ensure_ascii=False), now, expires_at),
+            )
+            self._disk_writes += 1
+            # Poda periódica: caducadas + exceso sobre el máximo
+            if self._disk_writes % 100 == 0:
+                conn.execute("DELETE FROM legal_results WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM legal_results WHERE key IN ("
+                    " SELECT key FROM legal_results ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_max_entries,),
+                )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"[LEGAL CACHE] Error escribiendo disco: {e}")
+
+    # -----------------------------------------------------
+    # API
+    # -----------------------------------------------------
+
+    def get(self, key: str) -> Optional[LegalResults]:
+        """Resultados cacheados y vigentes (memoria → disco) o None."""
+        results = self._memory_get(key)
+        if results is not None:
+            self.memory_hits += 1
+            return _copy(results)
+        entry = self._disk_get(key)
+        if entry is not None:
+            self.disk_hits += 1
+            self._memory_put(key, entry[0], entry[1])
+            return _copy(entry[1])
+        self.misses += 1
+        return None
+
+    def put(self, key: str, results: LegalResults) -> None:
+        """Guarda resultados en ambos niveles (los vacíos no se cachean)."""
+        if not results:
+            return
+        results = _copy(results)
+        expires_at = self._clock() + self.ttl_s
+        self._memory_put(key, expires_at, results)
+        self._disk_put(key, expires_at, results)
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de aciertos/fallos para observabilidad."""
+        total = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / total, 4) if total else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_size": self.memory_size,
+            "ttl_s": self.ttl_s,
+            "disk_path": str(self.disk_path) if self.disk_path else None,
+        }
+
+
+# Caché única por proceso (el nivel de disco se comparte entre procesos)
+_legal_result_cache = LegalResultCache(
+    memory_size=LEGAL_RESULT_CACHE_MEMORY_SIZE if LEGAL_RESULT_CACHE_ENABLED else 0,
+    disk_path=(
+        LEGAL_RESULT_CACHE_PATH
+        if LEGAL_RESULT_CACHE_ENABLED and LEGAL_RESULT_CACHE_DISK_ENABLED
+        else None
+    ),
+)
+
+
+def get_legal_result_cache() -> LegalResultCache:
+    """Obtiene la caché de resultados legales del proceso."""
+    return _legal_result_cache
+
+
+def get_legal_result_cache_stats() -> Dict[str, Any]:
+    """Atajo para exponer métricas de la caché."""
+    return _legal_result_cache.stats()
@@ -0,0 +1,361 @@
+"""
+Índice vectorial COMPACTO por versión (int8 / float16) con re-scoring exacto.
+
+Formato "float32" (por defecto): Chroma guarda los vectores completos en
+sqlite + HNSW, una copia por versión y hasta 3 versiones por caso.
+
+Formatos compactos ("int8", "float16"):
+- Junto a la versión: quantized/ (QUANTIZED_DIRNAME) con codes.npy (N×D int8/float16),
+  scales.npy (escala por vector), norms.npy (||v||² exacta), vectors.npy
+  (N×D float32 exactos, para re-scoring) e ids.json
+- Chroma solo guarda documentos y metadatos (vector marcador de 1 dim):
+  sigue sirviendo get(), count() y los filtros where
+- La versión es autocontenida: vectors.npy se abre mapeado en memoria y
+  solo se leen las filas de los candidatos. La consulta NUNCA llama al
+  proveedor de embeddings
+
+Búsqueda (QuantizedCollection.query, misma interfaz que Chroma):
+1. Candidatos: distancia L2² aproximada sobre los códigos, por bloques
+2. Re-scoring: distancia L2² exacta con los vectores float32 de vectors.npy
+   para los top QUANTIZED_RESCORE_FACTOR × n_results candidatos
+
+Las distancias devueltas son L2² exactas, como las de Chroma con el
+espacio por defecto: los umbrales de retrieval no cambian.
+"""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.variables import (
+    QUANTIZED_RESCORE_FACTOR,
+    QUANTIZED_RESCORE_MIN_CANDIDATES,
+)
+from app.core.logger import logger
+
+
+COMPACT_FORMATS = ("int8", "float16")
+# Vector marcador que se guarda en Chroma para versiones compactas
+PLACEHOLDER_EMBEDDING = [0.0]
+# Filas de códigos que se decodifican a la vez durante el escaneo
+_SCAN_BLOCK_ROWS = 8192
+
+
+# =========================================================
+# CUANTIZACIÓN
+# =========================================================
+
+def quantize(vectors: Sequence[Sequence[float]], index_format: str):
+    """
+    Cuantiza vectores float32.
+
+    - int8:    simétrica por vector, scale = max|v| / 127
+    - float16: conversión directa, scale = 1
+
+    Returns:
+        (codes, scales, norms) como arrays de numpy
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(matrix), -1)
+    norms = np.einsum("ij,ij->i", matrix, matrix).astype(np.float32)
+
+    if index_format == "int8":
+        scales = (np.abs(matrix).max(axis=1) / 127.0).astype(np.float32)
+        safe = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(matrix / safe[:, None]), -127, 127).astype(np.int8)
+        return codes, scales, norms
+    if index_format == "float16":
+        return matrix.astype(np.float16), np.ones(len(matrix), dtype=np.float32), norms
+    raise ValueError(f"Formato no compacto: {index_format}")
+
+
+def dequantize(codes, scales):
+    """Reconstrucción aproximada float32 de los códigos."""
+    return codes.astype(np.float32) * scales[:, None]
+
+
+# =========================================================
+# ESCRITURA (durante el build)
+# =========================================================
+
+class QuantizedIndexWriter:
+    """
+    Acumula los códigos de los batches del build y los persiste al cerrar.
+
+    En memoria solo se retienen los códigos compactos (1/4 o 1/2 de los
+    vectores float32); los float32 exactos se vuelcan a disco batch a batch.
+    """
+
+    def __init__(self, path: Path, index_format: str):
+        if index_format not in COMPACT_FORMATS:
+            raise ValueError(f"Formato no compacto: {index_format}")
+        self.path = Path(path)
+        self.index_format = index_format
+        self._ids: List[str] = []
+        self._codes: list = []
+        self._scales: list = []
+        self._norms: list = []
+        self._raw_path = self.path / "vectors.f32.tmp"
+        self._raw = None
+
+    def add(self, ids: List[str], vectors: List[List[float]]) -> None:
+        if not ids:
+            return
+        codes, scales, norms = quantize(vectors, self.index_format)
+        if self._raw is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._raw = open(self._raw_path, "wb")
+        self._raw.write(np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), -1).tobytes())
+        self._ids.extend(ids)
+        self._codes.append(codes)
+        self._scales.append(scales)
+        self._norms.append(norms)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def close(self) -> Dict[str, Any]:
+        """Escribe el índice en disco y devuelve su meta."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        dim = int(self._codes[0].shape[1]) if self._codes else 0
+        dtype = np.int8 if self.index_format == "int8" else np.float16
+        codes = np.concatenate(self._codes) if self._codes else np.zeros((0, dim), dtype=dtype)
+        scales = np.concatenate(self._scales) if self._scales else np.zeros(0, dtype=np.float32)
+        norms = np.concatenate(self._norms) if self._norms else np.zeros(0, dtype=np.float32)
+
+        np.save(self.path / "codes.npy", codes)
+        np.save(self.path / "scales.npy", scales)
+        np.save(self.path / "norms.npy", norms)
+        self._write_exact_vectors(dim)
+        with open(self.path / "ids.json", "w", encoding="utf-8") as f:
+            json.dump(self._ids, f)
+
+        meta = {"format": self.index_format, "dim": dim, "count": len(self._ids)}
+        with open(self.path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        logger.info(
+            f"[QUANTIZED] Índice {self.index_format} escrito: {meta['count']} vectores, "
+            f"dim={dim}, {codes.nbytes / (1024 * 1024):.1f} MB"
+        )
+        return meta
+
+    def _write_exact_vectors(self, dim: int) -> None:
+        """Convierte el volcado float32 en vectors.npy por bloques (sin cargarlo entero)."""
+        count = len(self._ids)
+        exact = np.lib.format.open_memmap(
+            self.path / "vectors.npy", mode="w+", dtype=np.float32, shape=(count, dim)
+        )
+        if self._raw is not None:
+            self._raw.close()
+            self._raw = None
+            raw = np.memmap(self._raw_path, dtype=np.float32, mode="r", shape=(count, dim)) if count else None
+            for start in range(0, count, _SCAN_BLOCK_ROWS):
+                exact[start:start + _SCAN_BLOCK_ROWS] = raw[start:start + _SCAN_BLOCK_ROWS]
+            del raw
+            os.remove(self._raw_path)
+        exact.flush()
+        del exact
+
+
+# =========================================================
+# LECTURA Y BÚSQUEDA
+# =========================================================
+
+class QuantizedIndex:
+    """Índice compacto en modo lectura (codes.npy mapeado en memoria)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(self.path / "ids.json", "r", encoding="utf-8") as f:
+            self.ids: List[str] = json.load(f)
+        self.codes = np.load(self.path / "codes.npy", mmap_mode="r")
+        self.scales = np.load(self.path / "scales.npy")
+        self.norms = np.load(self.path / "norms.npy")
+        exact_path = self.path / "vectors.npy"
+        self.vectors = np.load(exact_path, mmap_mode="r") if exact_path.exists() else None
+        if self.vectors is None:
+            logger.warning(
+                f"[QUANTIZED] {self.path} sin vectors.npy (índice anterior): "
+                "re-scoring con los códigos descuantizados"
+            )
+        self.position = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        if not (len(self.ids) == len(self.codes) == len(self.scales) == len(self.norms)):
+            raise ValueError(f"Índice compacto inconsistente en {self.path}")
+
+    @property
+    def index_format(self) -> str:
+        return self.meta["format"]
+
+    @property
+    def dim(self) -> int:
+        return int(self.meta["dim"])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def exact_vectors(self, positions: Sequence[int]) -> "np.ndarray":
+        """Vectores float32 de las filas pedidas (solo se leen esas páginas)."""
+        rows = np.asarray(positions, dtype=np.int64)
+        if self.vectors is not None:
+            return np.asarray(self.vectors[rows], dtype=np.float32)
+        return dequantize(np.asarray(self.codes[rows]), self.scales[rows])
+
+    def approx_distances(self, queries) -> "np.ndarray":
+        """
+        Distancias L2² aproximadas (Q×N): ||q||² + ||v||² - 2·q·v̂
+
+        ||v||² es exacta; solo el producto escalar usa los códigos.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        dots = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), _SCAN_BLOCK_ROWS):
+            end = start + _SCAN_BLOCK_ROWS
+            block = np.asarray(self.codes[start:end], dtype=np.float32)
+            dots[:, start:end] = (queries @ block.T) * self.scales[start:end]
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        return query_norms[:, None] + self.norms[None, :] - 2.0 * dots
+
+
+def _candidate_count(n_results: int, available: int) -> int:
+    return min(available, max(n_results * QUANTIZED_RESCORE_FACTOR, QUANTIZED_RESCORE_MIN_CANDIDATES))
+
+
+class QuantizedCollection:
+    """
+    Colección de Chroma + índice compacto con la interfaz que usa el RAG
+    (query, get, count).
+
+    get(include=["embeddings"]) devuelve los vectores EXACTOS de vectors.npy
+    (reutilización incremental y validación de dimensión).
+    """
+
+    def __init__(self, collection: Any, index: QuantizedIndex):
+        self._collection = collection
+        self.index = index
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def _exact_vectors(self, ids: List[str]) -> "np.ndarray":
+        # Por posición en el índice: sin proveedor ni almacén por contenido
+        return self.index.exact_vectors([self.index.position[chunk_id] for chunk_id in ids])
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        include = list(include) if include is not None else ["metadatas", "documents"]
+        want_embeddings = "embeddings" in include
+        inner_include = [field for field in include if field != "embeddings"]
+
+        kwargs: Dict[str, Any] = {"include": inner_include}
+        for name, value in (("ids", ids), ("where", where), ("limit", limit), ("offset", offset)):
+            if value is not None:
+                kwargs[name] = value
+        result = dict(self._collection.get(**kwargs))
+
+        if want_embeddings:
+            found = result.get("ids") or []
+            result["embeddings"] = self._exact_vectors(found).tolist() if found else []
+        return result
+
+    def _allowed_mask(self, where: Optional[Dict[str, Any]]):
+        if not where:
+            return None
+        allowed = self._collection.get(where=where, include=[]).get("ids") or []
+        mask = np.zeros(len(self.index), dtype=bool)
+        for chunk_id in allowed:
+            pos = self.index.position.get(chunk_id)
+            if pos is not None:
+                mask[pos] = True
+        return mask
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        include=("metadatas", "documents", "distances"),
+        **_: Any,
+    ) -> Dict[str, Any]:
+        include = list(include)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        empty = {"ids": [[] for _ in range(len(queries))]}
+        for field in include:
+            empty[field] = [[] for _ in range(len(queries))]
+        if len(self.index) == 0 or len(queries) == 0:
+            return empty
+
+        # 1. Candidatos sobre los códigos compactos
+        approx = self.index.approx_distances(queries)
+        mask = self._allowed_mask(where)
+        if mask is not None:
+            approx[:, ~mask] = np.inf
+        available = int(mask.sum()) if mask is not None else len(self.index)
+        if available == 0:
+            return empty
+        n_candidates = _candidate_count(n_results, available)
+        if n_candidates < len(self.index):
+            candidates = np.argpartition(approx, n_candidates - 1, axis=1)[:, :n_candidates]
+        else:
+            candidates = np.tile(np.arange(len(self.index)), (len(queries), 1))
+
+        # 2. Re-scoring exacto (una sola lectura para todas las consultas)
+        candidate_ids = sorted({
+            self.index.ids[pos]
+            for q_index, row in enumerate(candidates)
+            for pos in row
+            if np.isfinite(approx[q_index, pos])
+        })
+        fetched = self._collection.get(ids=candidate_ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: (document, metadata)
+            for chunk_id, document, metadata in zip(
+                fetched.get("ids") or [], fetched.get("documents") or [], fetched.get("metadatas") or []
+            )
+        }
+        present = [chunk_id for chunk_id in candidate_ids if chunk_id in by_id]
+        exact = self._exact_vectors(present)
+        exact_position = {chunk_id: i for i, chunk_id in enumerate(present)}
+
+        result: Dict[str, Any] = {"ids": []}
+        for field in include:
+            result[field] = []
+        for q_index, row in enumerate(candidates):
+            ranked = []
+            for pos in row:
+                if not np.isfinite(approx[q_index, pos]):
+                    continue  # Excluido por where
+                chunk_id = self.index.ids[pos]
+                vector_pos = exact_position.get(chunk_id)
+                if vector_pos is None:
+                    continue
+                diff = exact[vector_pos] - queries[q_index]
+                ranked.append((float(diff @ diff), chunk_id))
+            ranked.sort()
+            ranked = ranked[:n_results]
+
+            result["ids"].append([chunk_id for _, chunk_id in ranked])
+            if "distances" in result:
+                result["distances"].append([distance for distance, _ in ranked])
+            if "documents" in result:
+                result["documents"].append([by_id[c][0] for _, c in ranked])
+            if "metadatas" in result:
+                result["metadatas"].append([by_id[c][1] for _, c in ranked])
+            if "embeddings" in result:
+                result["embeddings"].append([exact[exact_position[c]].tolist() for _, c in ranked])
+        return result
+
+
+def open_quantized_collection(collection: Any, index_path: Path) -> QuantizedCollection:
+    """Envuelve la colección de una versión compacta con su índice."""
+    index = QuantizedIndex(index_path)
+    logger.info(
+        f"[QUANTIZED] Índice {index.index_format} abierto: {len(index)} vectores, dim={index.dim}"
+    )
+    return QuantizedCollection(collection, index)
@@ -4,16 +4,21 @@ Medición objetiva de calidad del retrieval (recall@k).
 REGLA 5: Medición REAL de recall@k con ground truth explícito.
 """
 
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Optional, Set
 from dataclasses import dataclass
 from pathlib import Path
 import json
 
 from sqlalchemy.orm import Session
-from openai import OpenAI
-
 from app.services.embeddings_pipeline import get_case_collection
-from app.core.variables import EMBEDDING_MODEL, DATA
+from app.services.embedding_cache import embed_query
+from app.services.embedding_providers import (
+    EmbeddingProvider,
+    get_embedding_provider,
+    provider_for_manifest,
+)
+from app.services.vectorstore_versioning import get_active_version, read_manifest
+from app.core.variables import DATA
 from app.core.logger import logger
 
 
@@ -214,6 +219,8 @@ def calculate_recall_at_k(
     case_id: str,
     ground_truth_queries: List[GroundTruthQuery],
     k: int = 5,
+    version: Optional[str] = None,
+    provider: Optional[EmbeddingProvider] = None,
 ) -> Dict[str, Any]:
     """
     Calcula recall@k para un conjunto de preguntas con ground truth.
@@ -227,18 +234,23 @@ def calculate_recall_at_k(
         case_id: ID del caso
         ground_truth_queries: Lista de preguntas con chunks esperados
         k: Número de chunks a recuperar (default=5)
+        version: Versión a medir (default=ACTIVE)
+        provider: Proveedor de las consultas (default=el del manifest de la versión)
         
     Returns:
         Dict con métricas agregadas y por pregunta
     """
     logger.info(f"[RECALL@K] Iniciando medición para case_id={case_id}, k={k}")
     
-    # Inicializar cliente OpenAI
-    openai_client = OpenAI()
-    
-    # Obtener colección del vectorstore
+    # Obtener colección del vectorstore y el proveedor con el que se construyó
     try:
-        collection = get_case_collection(case_id, version=None)
+        version = version or get_active_version(case_id)
+        if provider is None:
+            provider = (
+                provider_for_manifest(read_manifest(case_id, version))
+                if version else get_embedding_provider()
+            )
+        collection = get_case_collection(case_id, version=version)
     except Exception as e:
         logger.error(f"[RECALL@K] Error obteniendo colección: {e}")
         return {
@@ -261,11 +273,8 @@ def calculate_recall_at_k(
         
         queries_with_ground_truth += 1
         
-        # Generar embedding de la pregunta
-        question_embedding = openai_client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=[gt_query.query],
-        ).data[0].embedding
+        # Generar embedding de la pregunta (caché de consultas)
+        question_embedding = embed_query(gt_query.query, provider=provider)
         
         # Buscar top-k chunks
         search_results = collection.query(
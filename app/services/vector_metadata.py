@@ -0,0 +1,80 @@
+"""
+Metadatos filtrables de los vectores de un caso.
+
+El builder (build_embeddings_for_case) guarda en cada vector el doc_type y
+el rango de fechas de su documento; el retrieval traduce los filtros de
+rag_answer_internal (doc_types, date_from, date_to) a un `where` de Chroma
+con la MISMA semántica que la consulta SQL sobre Document:
+
+- Document.doc_type IN doc_types
+- Document.date_end   >= date_from
+- Document.date_start <= date_to
+
+Las fechas se guardan como segundos UTC (enteros): Chroma solo compara
+números con $gte/$lte.
+"""
+from __future__ import annotations
+
+import calendar
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+# Campos que el builder escribe en cada vector (se registran en el manifest)
+FILTERABLE_METADATA_FIELDS = ("doc_type", "date_start", "date_end")
+
+
+def date_to_metadata_value(value: date) -> int:
+    """Convierte date/datetime a segundos UTC (date → medianoche)."""
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return calendar.timegm(value.timetuple())
+
+
+def document_filter_metadata(document: Any) -> Dict[str, Any]:
+    """Metadatos filtrables de un Document (se omiten valores nulos)."""
+    metadata: Dict[str, Any] = {}
+    if getattr(document, "doc_type", None):
+        metadata["doc_type"] = document.doc_type
+    for field in ("date_start", "date_end"):
+        value = getattr(document, field, None)
+        if value is not None:
+            metadata[field] = date_to_metadata_value(value)
+    return metadata
+
+
+def build_chunk_where(
+    *,
+    doc_types: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    metadata_fields: Iterable[str] = (),
+    document_ids: Optional[List[str]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Construye el `where` de Chroma para los filtros de documento.
+
+    - Sin filtros → None (consulta sobre toda la colección, como antes)
+    - Versión con metadatos filtrables → condiciones sobre doc_type/fechas
+    - Versión antigua (sin esos metadatos) → document_id IN document_ids
+      (los ids ya filtrados por SQL), para no devolver cero resultados
+    """
+    if not (doc_types or date_from or date_to):
+        return None
+
+    available = set(metadata_fields)
+    if not set(FILTERABLE_METADATA_FIELDS) <= available:
+        if document_ids is None:
+            return None
+        return {"document_id": {"$in": list(document_ids)}}
+
+    conditions: List[Dict[str, Any]] = []
+    if doc_types:
+        conditions.append({"doc_type": {"$in": list(doc_types)}})
+    if date_from:
+        conditions.append({"date_end": {"$gte": date_to_metadata_value(date_from)}})
+    if date_to:
+        conditions.append({"date_start": {"$lte": date_to_metadata_value(date_to)}})
+
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
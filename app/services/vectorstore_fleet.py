@@ -0,0 +1,118 @@
+"""
+Resumen del vectorstore de todos los casos (flota).
+
+Cada caso se resume desde su versions.json (sin abrir status.json por
+versión) y los casos se recorren en paralelo con un pool de hilos: el
+coste es E/S de ficheros pequeños, no CPU.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from app.core.logger import logger
+from app.core.variables import FLEET_SCAN_WORKERS
+from app.services.vectorstore_versioning import (
+    _get_case_vectorstore_root,
+    _get_cases_vectorstore_base,
+    get_active_version,
+    load_versions_index,
+)
+
+
+@dataclass
+class CaseSummary:
+    """Resumen del vectorstore de un caso."""
+    case_id: str
+    active_version: Optional[str]
+    total_versions: int
+    ready: int
+    failed: int
+    building: int
+    bytes_on_disk: Optional[int] = None  # None si no se midió
+    error: Optional[str] = None
+
+
+def _disk_usage(root: Path) -> int:
+    """
+    Bytes ocupados bajo root. Los hardlinks (segmentos compartidos entre
+    versiones) cuentan una sola vez.
+    """
+    total = 0
+    seen_inodes = set()
+    pending = [root]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        info = entry.stat(follow_symlinks=False)
+                        if info.st_nlink > 1:
+                            if (info.st_dev, info.st_ino) in seen_inodes:
+                                continue
+                            seen_inodes.add((info.st_dev, info.st_ino))
+                        total += info.st_size
+        except OSError:
+            continue
+    return total
+
+
+def list_case_ids() -> List[str]:
+    """case_id de todos los casos con vectorstore."""
+    try:
+        with os.scandir(_get_cases_vectorstore_base()) as entries:
+            return sorted(e.name for e in entries if e.is_dir(follow_symlinks=False))
+    except FileNotFoundError:
+        return []
+
+
+def summarize_case(case_id: str, include_sizes: bool = True) -> CaseSummary:
+    """Resume un caso desde su índice de versiones."""
+    try:
+        statuses = [v.get("status") for v in load_versions_index(case_id)["versions"].values()]
+        return CaseSummary(
+            case_id=case_id,
+            active_version=get_active_version(case_id),
+            total_versions=len(statuses),
+            ready=statuses.count("READY"),
+            failed=statuses.count("FAILED"),
+            building=statuses.count("BUILDING"),
+            bytes_on_disk=_disk_usage(_get_case_vectorstore_root(case_id)) if include_sizes else None,
+        )
+    except Exception as e:
+        logger.warning(f"[FLOTA] Error resumiendo case_id={case_id}: {e}")
+        return CaseSummary(case_id, None, 0, 0, 0, 0, error=str(e))
+
+
+def scan_fleet(
+    case_ids: Optional[Sequence[str]] = None,
+    include_sizes: bool = True,
+    max_workers: int = FLEET_SCAN_WORKERS,
+) -> List[CaseSummary]:
+    """
+    Resume todos los casos (o los indicados) en paralelo.
+
+    Args:
+        case_ids: Casos a resumir (default: todos)
+        include_sizes: Medir bytes en disco (recorre los ficheros de cada caso)
+        max_workers: Hilos del pool
+
+    Returns:
+        Lista de CaseSummary ordenada por case_id
+    """
+    case_ids = list(case_ids) if case_ids is not None else list_case_ids()
+    if not case_ids:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(case_ids))),
+                            thread_name_prefix="fleet-scan") as pool:
+        summaries = list(pool.map(lambda c: summarize_case(c, include_sizes), case_ids))
+
+    logger.info(f"[FLOTA] Casos resumidos: {len(summaries)}")
+    return summaries
@@ -0,0 +1,263 @@
+"""
+Recolector de versiones del vectorstore para toda la flota de casos.
+
+cleanup_old_versions solo corre al final de un build correcto y por caso;
+este barrido cubre clients_data/_vectorstore/cases completo:
+
+1. Restos de builds caídos: BUILDING sin escrituras desde hace
+   VECTORSTORE_GC_BUILDING_TIMEOUT_S y FAILED/UNKNOWN más antiguas que
+   VECTORSTORE_GC_FAILED_RETENTION_S.
+2. Presupuesto de disco: si la flota ocupa más de budget_bytes, se borran
+   versiones READY no ACTIVE (las más antiguas primero) respetando un
+   mínimo de READY por caso.
+
+REGLAS:
+- NUNCA se borra la versión ACTIVE (se comprueba otra vez, bajo el lock
+  del caso, justo antes de borrar).
+- Los borrados van en paralelo con un presupuesto de borrados y MB por
+  minuto para no saturar el disco que sirve las consultas.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from app.core.logger import logger
+from app.core.variables import (
+    VECTORSTORE_DISK_BUDGET_BYTES,
+    VECTORSTORE_GC_BUILDING_TIMEOUT_S,
+    VECTORSTORE_GC_FAILED_RETENTION_S,
+    VECTORSTORE_GC_MAX_DELETES_PER_MIN,
+    VECTORSTORE_GC_MAX_MB_PER_MIN,
+    VECTORSTORE_GC_MIN_READY_PER_CASE,
+    VECTORSTORE_GC_WORKERS,
+)
+from app.services.embedding_executor import RateBudget
+from app.services.vectorstore_fleet import _disk_usage, list_case_ids
+from app.services.vectorstore_segments import gc_segments
+from app.services.vectorstore_versioning import (
+    VersionInfo,
+    _get_case_vectorstore_root,
+    _get_cases_vectorstore_base,
+    delete_version,
+    get_active_version,
+    list_versions,
+)
+
+
+_MB = 1024 * 1024
+
+
+@dataclass
+class GCCandidate:
+    """Versión que el barrido va a borrar."""
+    case_id: str
+    version: str
+    status: str
+    path: Path
+    reclaimable_bytes: int
+    reason: str  # building_orphan | failed | budget
+
+
+@dataclass
+class GCReport:
+    """Resultado de un barrido."""
+    dry_run: bool
+    scanned_cases: int = 0
+    bytes_before: int = 0
+    budget_bytes: Optional[int] = None
+    deleted: List[GCCandidate] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    bytes_reclaimed: int = 0
+
+    @property
+    def bytes_after(self) -> int:
+        return self.bytes_before - self.bytes_reclaimed
+
+
+# =========================================================
+# PLAN
+# =========================================================
+
+def _reclaimable_bytes(path: Path) -> int:
+    """
+    Bytes que libera borrar la versión: ficheros propios (1 enlace) y
+    segmentos que solo comparte con el almacén (2 enlaces).
+    """
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                info = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if info.st_nlink <= 2:
+                total += info.st_size
+    return total
+
+
+def _last_write_ts(path: Path) -> float:
+    """Última escritura en la versión (un build vivo toca sus ficheros)."""
+    latest = path.stat().st_mtime
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                latest = max(latest, os.lstat(os.path.join(root, name)).st_mtime)
+            except OSError:
+                continue
+    return latest
+
+
+def _age_s(version: VersionInfo, now: float) -> float:
+    if version.created_at == datetime.min:
+        return now - version.path.stat().st_mtime
+    return now - version.created_at.timestamp()
+
+
+def _candidate(case_id: str, v: VersionInfo, reason: str) -> GCCandidate:
+    return GCCandidate(case_id, v.version, v.status, v.path, _reclaimable_bytes(v.path), reason)
+
+
+def plan_gc(
+    case_ids: Optional[Sequence[str]] = None,
+    budget_bytes: Optional[int] = VECTORSTORE_DISK_BUDGET_BYTES,
+    min_ready_per_case: int = VECTORSTORE_GC_MIN_READY_PER_CASE,
+    building_timeout_s: float = VECTORSTORE_GC_BUILDING_TIMEOUT_S,
+    failed_retention_s: float = VECTORSTORE_GC_FAILED_RETENTION_S,
+    now: Optional[float] = None,
+) -> GCReport:
+    """
+    Calcula qué borrar sin tocar nada (report.deleted = candidatos).
+
+    Args:
+        case_ids: Casos a barrer (default: todos)
+        budget_bytes: Bytes máximos de la flota (None = sin presupuesto)
+        min_ready_per_case: READY que se conservan siempre por caso (ACTIVE incluida)
+        building_timeout_s: BUILDING sin escrituras durante este tiempo = huérfana
+        failed_retention_s: Edad mínima para borrar FAILED/UNKNOWN
+        now: Timestamp de referencia (tests)
+    """
+    if min_ready_per_case < 1:
+        raise ValueError("min_ready_per_case debe ser >= 1")
+    now = time.time() if now is None else now
+    case_ids = list(case_ids) if case_ids is not None else list_case_ids()
+    report = GCReport(dry_run=True, budget_bytes=budget_bytes, scanned_cases=len(case_ids))
+    report.bytes_before = _disk_usage(_get_cases_vectorstore_base()) if case_ids else 0
+
+    budget_pool: List[GCCandidate] = []
+    for case_id in case_ids:
+        active = get_active_version(case_id)
+        versions = list_versions(case_id)  # Más reciente primero
+        ready_kept = 1 if active else 0
+
+        for v in versions:
+            if v.version == active:
+                continue
+            if v.status == "READY":
+                if ready_kept < min_ready_per_case:
+                    ready_kept += 1
+                else:
+                    budget_pool.append(_candidate(case_id, v, "budget"))
+            elif v.status == "BUILDING":
+                if now - _last_write_ts(v.path) >= building_timeout_s:
+                    report.deleted.append(_candidate(case_id, v, "building_orphan"))
+            elif _age_s(v, now) >= failed_retention_s:
+                report.deleted.append(_candidate(case_id, v, "failed"))
+
+    if budget_bytes is not None:
+        excess = report.bytes_before - sum(c.reclaimable_bytes for c in report.deleted) - budget_bytes
+        # Las más antiguas de toda la flota primero (v_YYYYMMDD_HHMMSS ordena por fecha)
+        for c in sorted(budget_pool, key=lambda c: c.version):
+            if excess <= 0:
+                break
+            report.deleted.append(c)
+            excess -= c.reclaimable_bytes
+        if excess > 0:
+            logger.warning(
+                f"[GC] ⚠️  Presupuesto no alcanzable respetando mínimos: "
+                f"sobran {excess / _MB:.1f} MB"
+            )
+
+    return report
+
+
+# =========================================================
+# EJECUCIÓN
+# =========================================================
+
+def run_gc(
+    dry_run: bool = False,
+    max_workers: int = VECTORSTORE_GC_WORKERS,
+    max_deletes_per_min: int = VECTORSTORE_GC_MAX_DELETES_PER_MIN,
+    max_mb_per_min: int = VECTORSTORE_GC_MAX_MB_PER_MIN,
+    **plan_kwargs,
+) -> GCReport:
+    """
+    Barre la flota: planifica y borra en paralelo con throttling.
+
+    Args:
+        dry_run: Solo planificar (report.deleted = lo que se borraría)
+        max_workers: Borrados en paralelo
+        max_deletes_per_min: Presupuesto de versiones borradas por minuto
+        max_mb_per_min: Presupuesto de MB borrados por minuto
+        **plan_kwargs: Parámetros de plan_gc
+
+    Returns:
+        GCReport con versiones borradas, errores y bytes recuperados
+    """
+    plan = plan_gc(**plan_kwargs)
+    logger.info(
+        f"[GC] Plan: {len(plan.deleted)} versiones en {plan.scanned_cases} casos "
+        f"(~{sum(c.reclaimable_bytes for c in plan.deleted) / _MB:.1f} MB)"
+    )
+    if dry_run or not plan.deleted:
+        plan.bytes_reclaimed = sum(c.reclaimable_bytes for c in plan.deleted) if dry_run else 0
+        return plan
+
+    report = GCReport(
+        dry_run=False,
+        scanned_cases=plan.scanned_cases,
+        bytes_before=plan.bytes_before,
+        budget_bytes=plan.budget_bytes,
+    )
+    throttle = RateBudget(rpm=max_deletes_per_min, tpm=max_mb_per_min)
+
+    def _delete(c: GCCandidate) -> Optional[str]:
+        throttle.acquire(max(1, math.ceil(c.reclaimable_bytes / _MB)))
+        try:
+            delete_version(c.case_id, c.version, expected_status=c.status)
+            logger.info(f"[GC] ✅ {c.case_id}/{c.version} eliminada ({c.reason}, status={c.status})")
+            return None
+        except Exception as e:
+            logger.error(f"[GC] ❌ {c.case_id}/{c.version}: {e}")
+            return f"{c.case_id}/{c.version}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="vectorstore-gc") as pool:
+        results = list(pool.map(_delete, plan.deleted))
+
+    touched_cases = set()
+    for c, error in zip(plan.deleted, results):
+        if error:
+            report.errors.append(error)
+        else:
+            report.deleted.append(c)
+            touched_cases.add(c.case_id)
+
+    for case_id in touched_cases:
+        gc_segments(_get_case_vectorstore_root(case_id))
+    # Medido en disco: con segmentos compartidos lo liberado no es la suma
+    # de tamaños de las versiones
+    report.bytes_reclaimed = max(0, plan.bytes_before - _disk_usage(_get_cases_vectorstore_base()))
+
+    logger.info(
+        f"[GC] Completado: {len(report.deleted)} versiones eliminadas, "
+        f"{report.bytes_reclaimed / _MB:.1f} MB recuperados, errores={len(report.errors)}"
+    )
+    return report
@@ -0,0 +1,233 @@
+"""
+Pool de procesos para clientes/colecciones de ChromaDB de casos.
+
+Evita reabrir sqlite + índice HNSW en cada consulta RAG:
+- Clave (case_id, version) → versión CONCRETA, nunca "ACTIVE"
+- LRU acotado (CHROMA_POOL_MAX_SIZE)
+- Invalidación explícita al mover ACTIVE o al borrar versiones
+
+Chroma comparte UN System por ruta (SharedSystemClient): cerrar un cliente
+detiene el System de todos los clientes de esa ruta. Por eso:
+- get() entrega un PooledCollection; cada uno cuenta como un uso del cliente
+  hasta que el llamador lo suelta
+- Una entrada expulsada/invalidada con usos en curso se cierra al soltar el
+  último (las consultas en vuelo de otros hilos no se cortan)
+- El duplicado abierto por el hilo que pierde la carrera se descarta SIN
+  cerrar: su System es el mismo que el de la entrada ganadora
+
+NO conoce el versionado: quien resuelve ACTIVE es el llamador.
+"""
+from __future__ import annotations
+
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.variables import CHROMA_POOL_MAX_SIZE
+from app.core.logger import logger
+
+
+PoolKey = Tuple[str, str]  # (case_id, version)
+PoolEntry = Tuple[Any, Any]  # (client, collection)
+
+
+def _close_client(client: Any) -> None:
+    """
+    Cierra un cliente de Chroma liberando ficheros abiertos.
+
+    chromadb no expone un close() estable entre versiones: se intenta
+    close() y, si no existe, se detiene el System interno y se retira
+    de la caché compartida de Chroma para que no quede referenciado.
+
+    Detiene el System COMPARTIDO de la ruta: solo se llama cuando ningún
+    otro handle del pool la usa.
+    """
+    try:
+        close = getattr(client, "close", None)
+        if callable(close):
+            close()
+            return
+
+        system = getattr(client, "_system", None)
+        if system is not None:
+            system.stop()
+
+        identifier = getattr(client, "_identifier", None)
+        shared = getattr(type(client), "_identifier_to_system", None)
+        if identifier is not None and isinstance(shared, dict):
+            shared.pop(identifier, None)
+    except Exception as e:
+        logger.warning(f"[CHROMA POOL] No se pudo cerrar cliente: {e}")
+
+
+class _Entry:
+    """Cliente abierto del pool y nº de PooledCollection vivos que lo usan."""
+
+    __slots__ = ("client", "collection", "leases", "retired")
+
+    def __init__(self, client: Any, collection: Any):
+        self.client = client
+        self.collection = collection
+        self.leases = 0
+        self.retired = False  # Fuera del pool: se cierra al soltar el último uso
+
+
+class PooledCollection:
+    """
+    Colección del pool entregada a un llamador (delega todo en la real).
+
+    Mientras exista, el cliente de Chroma que la sirve no se cierra aunque
+    la entrada sea expulsada o invalidada. La colección real está en
+    __wrapped__.
+    """
+
+    def __init__(self, collection: Any):
+        self.__wrapped__ = collection
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.__wrapped__, name)
+
+    def __repr__(self) -> str:
+        return f"PooledCollection({self.__wrapped__!r})"
+
+
+class CollectionPool:
+    """
+    LRU thread-safe de colecciones de Chroma abiertas.
+
+    La apertura se hace FUERA del lock (puede tardar segundos en casos
+    grandes); si otro hilo ganó la carrera, se descarta el duplicado.
+    """
+
+    def __init__(self, max_size: int = CHROMA_POOL_MAX_SIZE):
+        if max_size < 1:
+            raise ValueError("max_size debe ser >= 1")
+        self.max_size = max_size
+        self._entries: "OrderedDict[PoolKey, _Entry]" = OrderedDict()
+        # RLock: la liberación de un handle puede dispararse (GC) con el lock tomado
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lease(self, entry: _Entry) -> PooledCollection:
+        """Handle de la entrada; el uso se libera cuando el llamador lo suelta (lock tomado)."""
+        entry.leases += 1
+        handle = PooledCollection(entry.collection)
+        weakref.finalize(handle, self._release, entry)
+        return handle
+
+    def _release(self, entry: _Entry) -> None:
+        with self._lock:
+            entry.leases -= 1
+            close = entry.retired and entry.leases == 0
+        if close:
+            _close_client(entry.client)
+
+    def _retire(self, entries: List[_Entry]) -> None:
+        """Saca entradas del pool: cierra ya las libres, el resto al soltar su último uso."""
+        with self._lock:
+            for entry in entries:
+                entry.retired = True
+            idle = [entry for entry in entries if entry.leases == 0]
+        for entry in idle:
+            _close_client(entry.client)
+
+    def get(self, key: PoolKey, opener: Callable[[], PoolEntry]) -> PooledCollection:
+        """Devuelve la colección de `key`, abriéndola con `opener` si falta."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._lease(entry)
+            self.misses += 1
+
+        client, collection = opener()
+
+        evicted: List[_Entry] = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Otro hilo la abrió mientras tanto: usar la suya. El duplicado
+                # comparte su System (misma ruta): se descarta sin cerrarlo
+                self._entries.move_to_end(key)
+            else:
+                entry = self._entries[key] = _Entry(client, collection)
+                while len(self._entries) > self.max_size:
+                    old_key, old_entry = self._entries.popitem(last=False)
+                    self.evictions += 1
+                    evicted.append(old_entry)
+                    logger.info(f"[CHROMA POOL] Expulsado: case_id={old_key[0]}, version={old_key[1]}")
+            handle = self._lease(entry)
+
+        self._retire(evicted)
+        return handle
+
+    def invalidate(
+        self,
+        case_id: str,
+        version: Optional[str] = None,
+        keep_version: Optional[str] = None,
+    ) -> int:
+        """
+        Cierra y elimina entradas de un caso.
+
+        Las que aún tienen handles vivos se cierran al soltar el último.
+
+        Args:
+            case_id: ID del caso
+            version: Si se indica, solo esa versión
+            keep_version: Versión a conservar (ej. la recién activada)
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        with self._lock:
+            keys = [
+                k for k in self._entries
+                if k[0] == case_id
+                and (version is None or k[1] == version)
+                and k[1] != keep_version
+            ]
+            removed = [self._entries.pop(k) for k in keys]
+
+        self._retire(removed)
+        return len(removed)
+
+    def clear(self) -> None:
+        """Cierra todos los clientes abiertos (los que están en uso, al soltarlos)."""
+        with self._lock:
+            removed = list(self._entries.values())
+            self._entries.clear()
+        self._retire(removed)
+
+    def stats(self) -> Dict[str, int]:
+        """Métricas básicas del pool."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Pool único por proceso (cada worker de uvicorn tiene el suyo)
+_pool = CollectionPool()
+
+
+def get_collection_pool() -> CollectionPool:
+    """Obtiene el pool de colecciones del proceso."""
+    return _pool
+
+
+def invalidate_case_collections(
+    case_id: str,
+    version: Optional[str] = None,
+    keep_version: Optional[str] = None,
+) -> int:
+    """Atajo para invalidar entradas del pool del proceso."""
+    return _pool.invalidate(case_id, version=version, keep_version=keep_version)
@@ -0,0 +1,196 @@
+"""
+Segmentos compartidos entre versiones del vectorstore de un caso.
+
+Una versión READY es inmutable: al sellarla, cada fichero de datos se
+sustituye por un hardlink a un almacén por contenido del caso
+(_segments/<sha256>). Las versiones con ficheros idénticos (rebuilds sin
+cambios, índices compactos iguales, copias retenidas por housekeeping)
+comparten el mismo inodo en disco.
+
+El contador de referencias es el propio nº de enlaces del inodo: un
+segmento con st_nlink == 1 solo lo referencia el almacén y se puede borrar.
+
+REGLAS:
+- Solo se sellan versiones READY (Chroma escribe sus ficheros in situ
+  durante el build).
+- Los ficheros mutables de Chroma (sqlite, journal/WAL) no se comparten.
+- Sin soporte de hardlinks (otro volumen, FS sin enlaces) el fichero se
+  queda como copia propia de la versión.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import stat
+from pathlib import Path
+from typing import Dict
+
+from app.core.logger import logger
+
+
+# =========================================================
+# CONSTANTES
+# =========================================================
+
+SEGMENTS_DIRNAME = "_segments"
+# Ficheros de control de la versión (pequeños, propios de cada versión)
+_VERSION_CONTROL_FILES = {"manifest.json", "status.json", "changes.json"}
+# Ficheros que Chroma puede reescribir al abrir la colección
+_MUTABLE_SUFFIXES = (".sqlite3", ".sqlite3-journal", ".sqlite3-wal", ".sqlite3-shm")
+_HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def get_segments_path(case_root: Path) -> Path:
+    """Almacén de segmentos de un caso ({case_root}/_segments)."""
+    return case_root / SEGMENTS_DIRNAME
+
+
+def _file_sha256(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_BYTES), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _is_shareable(path: Path, version_path: Path, min_bytes: int) -> bool:
+    if path.is_symlink() or not path.is_file():
+        return False
+    if path.parent == version_path and path.name in _VERSION_CONTROL_FILES:
+        return False
+    if path.name.endswith(_MUTABLE_SUFFIXES):
+        return False
+    return path.stat().st_size >= min_bytes
+
+
+def _make_read_only(path: Path) -> None:
+    mode = path.stat().st_mode
+    path.chmod(mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+# =========================================================
+# SELLADO Y RECOLECCIÓN
+# =========================================================
+
+def seal_version(case_root: Path, version_path: Path, min_bytes: int = 0) -> Dict[str, int]:
+    """
+    Sustituye los ficheros de datos de una versión READY por hardlinks a
+    segmentos por contenido.
+
+    Un fichero cuyo contenido ya existe en el almacén se borra y se enlaza
+    al segmento existente (el espacio se libera); uno nuevo se enlaza al
+    almacén sin copiarlo. Idempotente.
+
+    Args:
+        case_root: Directorio del caso (contiene las versiones)
+        version_path: Directorio de la versión a sellar
+        min_bytes: Tamaño mínimo para compartir un fichero
+
+    Returns:
+        Dict con files, new_segments, shared_segments, bytes_shared
+    """
+    segments_path = get_segments_path(case_root)
+    stats = {"files": 0, "new_segments": 0, "shared_segments": 0, "bytes_shared": 0}
+
+    for path in sorted(version_path.rglob("*")):
+        if not _is_shareable(path, version_path, min_bytes):
+            continue
+        stats["files"] += 1
+        try:
+            digest = _file_sha256(path)
+            segment = segments_path / digest[:2] / digest
+            if segment.exists():
+                if os.path.samefile(segment, path):
+                    continue  # Ya sellado
+                # Enlazar a un nombre temporal y reemplazar: la versión nunca
+                # se queda sin el fichero
+                tmp = path.with_name(f".{path.name}.segment")
+                os.link(segment, tmp)
+                os.replace(tmp, path)
+                stats["shared_segments"] += 1
+                stats["bytes_shared"] += segment.stat().st_size
+            else:
+                segment.parent.mkdir(parents=True, exist_ok=True)
+                os.link(path, segment)
+                _make_read_only(segment)
+                stats["new_segments"] += 1
+        except OSError as e:
+            logger.warning(f"[SEGMENTOS] ⚠️  No se pudo compartir {path.name}: {e}. Se mantiene la copia")
+
+    logger.info(
+        f"[SEGMENTOS] Versión sellada: {version_path.name} "
+        f"(ficheros={stats['files']}, nuevos={stats['new_segments']}, "
+        f"compartidos={stats['shared_segments']}, "
+        f"ahorro={stats['bytes_shared'] / (1024 * 1024):.1f} MB)"
+    )
+    return stats
+
+
+def remove_version_tree(version_path: Path) -> None:
+    """
+    Borra el directorio de una versión. Sus ficheros sellados son solo
+    enlaces: el espacio se libera después con gc_segments.
+    """
+    def _retry_writable(func, path, _exc_info):
+        # Windows no borra ficheros de solo lectura (segmentos sellados)
+        os.chmod(path, stat.S_IWRITE)
+        func(path)
+
+    shutil.rmtree(version_path, onerror=_retry_writable)
+
+
+def gc_segments(case_root: Path) -> Dict[str, int]:
+    """
+    Borra los segmentos que ya no referencia ninguna versión
+    (solo queda el enlace del propio almacén).
+
+    Returns:
+        Dict con removed y bytes_reclaimed
+    """
+    segments_path = get_segments_path(case_root)
+    stats = {"removed": 0, "bytes_reclaimed": 0}
+    if not segments_path.exists():
+        return stats
+
+    for segment in segments_path.glob("*/*"):
+        try:
+            info = segment.stat()
+            if info.st_nlink > 1:
+                continue
+            segment.unlink()
+            stats["removed"] += 1
+            stats["bytes_reclaimed"] += info.st_size
+        except OSError as e:
+            logger.warning(f"[SEGMENTOS] ⚠️  No se pudo borrar segmento {segment.name}: {e}")
+
+    for bucket in segments_path.iterdir():
+        try:
+            bucket.rmdir()  # Solo si quedó vacío
+        except OSError:
+            pass
+
+    if stats["removed"]:
+        logger.info(
+            f"[SEGMENTOS] Segmentos liberados: {stats['removed']} "
+            f"({stats['bytes_reclaimed'] / (1024 * 1024):.1f} MB)"
+        )
+    return stats
+
+
+def segment_stats(case_root: Path) -> Dict[str, int]:
+    """
+    Ocupación del almacén: segmentos, bytes en disco y bytes que ocuparían
+    las copias completas (uno por referencia).
+    """
+    stats = {"segments": 0, "bytes_on_disk": 0, "bytes_referenced": 0}
+    segments_path = get_segments_path(case_root)
+    if not segments_path.exists():
+        return stats
+    for segment in segments_path.glob("*/*"):
+        info = segment.stat()
+        stats["segments"] += 1
+        stats["bytes_on_disk"] += info.st_size
+        stats["bytes_referenced"] += info.st_size * max(info.st_nlink - 1, 0)
+    return stats
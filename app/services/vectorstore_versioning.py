@@ -7,6 +7,8 @@ REGLAS CRÍTICAS:
 - Validaciones de integridad BLOQUEANTES antes de activar
 - Puntero ACTIVE solo apunta a versiones válidas (status=READY)
 - Control estricto de case_id en todos los niveles
+- Versiones READY selladas: ficheros idénticos compartidos entre versiones
+  (hardlinks a _segments/, ver vectorstore_segments)
 """
 
 from __future__ import annotations
@@ -15,13 +17,30 @@ import hashlib
 import json
 import os
 import shutil
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from dataclasses import dataclass, field
 
-from app.core.variables import CASES_VECTORSTORE_BASE, EMBEDDING_MODEL
+try:
+    import fcntl
+except ImportError:  # Windows: exclusión solo entre hilos del proceso
+    fcntl = None
+
+from app.core.variables import (
+    CASES_VECTORSTORE_BASE,
+    VALIDATION_PAGE_SIZE,
+    VECTORSTORE_SEGMENT_SHARING,
+    VECTORSTORE_SEGMENT_MIN_BYTES,
+    ACTIVE_POINTER_REVALIDATE_S,
+)
 from app.core.logger import logger
+from app.services.vectorstore_pool import invalidate_case_collections
+from app.services.vectorstore_segments import gc_segments, remove_version_tree, seal_version
+from app.services.embedding_providers import get_embedding_provider
 
 
 # =========================================================
@@ -33,9 +52,23 @@ ACTIVE_POINTER = "ACTIVE"
 MANIFEST_FILENAME = "manifest.json"
 STATUS_FILENAME = "status.json"
 INDEX_DIRNAME = "index"
+QUANTIZED_DIRNAME = "quantized"  # Índice compacto (int8/float16) de la versión
+INDEX_FORMATS = ("float32", "int8", "float16")
+VERSIONS_INDEX_FILENAME = "versions.json"  # Índice compacto de versiones del caso
+_VERSIONS_LOCK_FILENAME = ".versions.lock"
+CHANGES_FILENAME = "changes.json"  # Chunks embebidos de nuevo respecto a la versión base
+VALIDATION_MODES = ("full", "fast")
+# Errores por chunk listados como máximo (el resto se resume en un contador)
+_MAX_CHUNK_ERRORS = 50
 
 VALID_STATUSES = ["BUILDING", "READY", "FAILED"]
 
+# Caché por proceso del puntero ACTIVE: ruta → (comprobado_en, (inode, mtime_ns), versión)
+_active_cache: Dict[str, Tuple[float, Optional[Tuple[int, int]], Optional[str]]] = {}
+_active_cache_lock = threading.Lock()
+# Escrituras del índice de versiones dentro del proceso (entre procesos: flock)
+_versions_index_thread_lock = threading.Lock()
+
 
 # =========================================================
 # DATACLASSES
@@ -69,6 +102,17 @@ class ManifestData:
     total_chunks: int
     created_at: str  # ISO8601
     generator: str = "phoenix-ingestion"
+    metadata_fields: List[str] = field(default_factory=list)  # Metadatos filtrables por vector
+    # Build incremental: vectores copiados de la versión ACTIVE vs embebidos de nuevo
+    reused_from_version: Optional[str] = None
+    reused_chunks: int = 0
+    embedded_chunks: int = 0
+    # Backend que generó los vectores ("openai", "local_hash")
+    embedding_provider: str = "openai"
+    # Dimensión solicitada al modelo (None = nativa); las consultas la repiten
+    embedding_dimensions: Optional[int] = None
+    # Formato de los vectores: "float32" (Chroma) o compacto ("int8", "float16")
+    index_format: str = "float32"
 
 
 # =========================================================
@@ -82,7 +126,17 @@ def _get_case_vectorstore_root(case_id: str) -> Path:
     Estructura:
     clients_data/_vectorstore/cases/{case_id}/
     """
-    return CASES_VECTORSTORE_BASE.parent / "_vectorstore" / "cases" / case_id
+    return _get_cases_vectorstore_base() / case_id
+
+
+def _get_cases_vectorstore_base() -> Path:
+    """Directorio que contiene los vectorstores de todos los casos."""
+    return CASES_VECTORSTORE_BASE.parent / "_vectorstore" / "cases"
+
+
+def _get_versions_index_path(case_id: str) -> Path:
+    """Retorna la ruta del índice de versiones del caso."""
+    return _get_case_vectorstore_root(case_id) / VERSIONS_INDEX_FILENAME
 
 
 def _get_version_path(case_id: str, version: str) -> Path:
@@ -110,6 +164,16 @@ def _get_index_path(case_id: str, version: str) -> Path:
     return _get_version_path(case_id, version) / INDEX_DIRNAME
 
 
+def _get_changes_path(case_id: str, version: str) -> Path:
+    """Retorna la ruta del changes.json de una versión incremental."""
+    return _get_version_path(case_id, version) / CHANGES_FILENAME
+
+
+def _get_quantized_path(case_id: str, version: str) -> Path:
+    """Retorna la ruta del índice compacto (solo versiones int8/float16)."""
+    return _get_version_path(case_id, version) / QUANTIZED_DIRNAME
+
+
 # =========================================================
 # GENERACIÓN DE VERSIONES
 # =========================================================
@@ -214,9 +278,14 @@ def write_status(
         "updated_at": datetime.now().isoformat(),
     }
     
+    def _record(index: Dict[str, Any]) -> None:
+        index["versions"][version] = {"status": status, "updated_at": status_data["updated_at"]}
+    
     try:
-        with open(status_path, "w", encoding="utf-8") as f:
-            json.dump(status_data, f, indent=2, ensure_ascii=False)
+        # status.json e índice de versiones en la misma transacción
+        with _versions_index_transaction(case_id, _record):
+            with open(status_path, "w", encoding="utf-8") as f:
+                json.dump(status_data, f, indent=2, ensure_ascii=False)
         
         logger.info(f"[VERSIONADO] Status actualizado: case_id={case_id}, version={version}, status={status}")
         
@@ -252,9 +321,9 @@ def read_status(case_id: str, version: str) -> Dict[str, Any]:
         
         # Validar campos obligatorios
         required_fields = ["case_id", "version", "status", "updated_at"]
-        for field in required_fields:
-            if field not in data:
-                raise ValueError(f"Campo obligatorio faltante en status.json: {field}")
+        for field_name in required_fields:
+            if field_name not in data:
+                raise ValueError(f"Campo obligatorio faltante en status.json: {field_name}")
         
         # Validar que case_id coincide
         if data["case_id"] != case_id:
@@ -269,6 +338,121 @@ def read_status(case_id: str, version: str) -> Dict[str, Any]:
         raise ValueError(f"status.json corrupto: {e}")
 
 
+# =========================================================
+# ÍNDICE DE VERSIONES (versions.json)
+# =========================================================
+#
+# {"active": "v_...", "versions": {"v_...": {"status", "updated_at"}}}
+#
+# Lo mantienen write_status, update_active_pointer y cleanup_old_versions
+# bajo un lock por caso. list_versions lo usa en lugar de abrir cada
+# status.json; si no coincide con los directorios v_* se reconstruye.
+
+@contextmanager
+def _versions_index_lock(case_id: str):
+    root = _get_case_vectorstore_root(case_id)
+    root.mkdir(parents=True, exist_ok=True)
+    with _versions_index_thread_lock:
+        if fcntl is None:
+            yield
+        else:
+            with open(root / _VERSIONS_LOCK_FILENAME, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_versions_index(case_id: str) -> Optional[Dict[str, Any]]:
+    """Índice de versiones del caso (None si no existe o está corrupto)."""
+    try:
+        with open(_get_versions_index_path(case_id), "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or not isinstance(index.get("versions"), dict):
+        return None
+    return index
+
+
+def _write_versions_index(case_id: str, index: Dict[str, Any]) -> None:
+    index_path = _get_versions_index_path(case_id)
+    tmp_path = index_path.with_name(f".{VERSIONS_INDEX_FILENAME}.{os.getpid()}.tmp")
+    index["updated_at"] = datetime.now().isoformat()
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+
+
+def _list_version_dirs(case_id: str) -> List[str]:
+    root = _get_case_vectorstore_root(case_id)
+    try:
+        with os.scandir(root) as entries:
+            return [
+                e.name for e in entries
+                if e.name.startswith(VERSION_PREFIX) and e.is_dir(follow_symlinks=False)
+            ]
+    except FileNotFoundError:
+        return []
+
+
+def _scan_versions_index(case_id: str) -> Dict[str, Any]:
+    """Reconstruye el índice desde los status.json (ruta lenta)."""
+    versions: Dict[str, Any] = {}
+    for version_id in _list_version_dirs(case_id):
+        try:
+            status_data = read_status(case_id, version_id)
+            versions[version_id] = {
+                "status": status_data["status"],
+                "updated_at": status_data["updated_at"],
+            }
+        except Exception as e:
+            logger.warning(f"[VERSIONADO] Error leyendo status de {version_id}: {e}")
+            versions[version_id] = {"status": "UNKNOWN", "updated_at": None}
+    active_path = _get_active_pointer_path(case_id)
+    return {"active": _read_active_pointer(case_id, active_path), "versions": versions}
+
+
+@contextmanager
+def _versions_index_transaction(case_id: str, mutate: Callable[[Dict[str, Any]], None]):
+    """
+    Bajo el lock del caso: ejecuta el bloque (p. ej. escribir status.json)
+    y, si termina bien, aplica mutate al índice y lo reemplaza atómicamente.
+    """
+    with _versions_index_lock(case_id):
+        yield
+        index = read_versions_index(case_id) or _scan_versions_index(case_id)
+        mutate(index)
+        try:
+            _write_versions_index(case_id, index)
+        except OSError as e:
+            # El índice es derivado: list_versions lo reconstruye si falta
+            logger.warning(f"[VERSIONADO] No se pudo actualizar {VERSIONS_INDEX_FILENAME}: {e}")
+
+
+def rebuild_versions_index(case_id: str) -> Dict[str, Any]:
+    """Reconstruye versions.json desde los status.json del caso."""
+    with _versions_index_lock(case_id):
+        index = _scan_versions_index(case_id)
+        _write_versions_index(case_id, index)
+    logger.info(f"[VERSIONADO] Índice de versiones reconstruido: case_id={case_id}")
+    return index
+
+
+def load_versions_index(case_id: str) -> Dict[str, Any]:
+    """
+    Índice de versiones vigente: el de disco si cubre exactamente los
+    directorios v_* del caso; si no, se reconstruye.
+    """
+    index = read_versions_index(case_id)
+    if index is not None and set(index["versions"]) == set(_list_version_dirs(case_id)):
+        return index
+    if not _get_case_vectorstore_root(case_id).exists():
+        return {"active": None, "versions": {}}
+    return rebuild_versions_index(case_id)
+
+
 # =========================================================
 # MANIFEST.JSON
 # =========================================================
@@ -331,11 +515,18 @@ def write_manifest(
         "version": manifest_data.version,
         "embedding_model": manifest_data.embedding_model,
         "embedding_dim": manifest_data.embedding_dim,
+        "embedding_provider": manifest_data.embedding_provider,
+        "embedding_dimensions": manifest_data.embedding_dimensions,
+        "index_format": manifest_data.index_format,
         "chunking": manifest_data.chunking,
         "documents": manifest_data.documents,
         "total_chunks": manifest_data.total_chunks,
         "created_at": manifest_data.created_at,
         "generator": manifest_data.generator,
+        "metadata_fields": manifest_data.metadata_fields,
+        "reused_from_version": manifest_data.reused_from_version,
+        "reused_chunks": manifest_data.reused_chunks,
+        "embedded_chunks": manifest_data.embedded_chunks,
     }
     
     try:
@@ -382,9 +573,9 @@ def read_manifest(case_id: str, version: str) -> Dict[str, Any]:
             "case_id", "version", "embedding_model", "embedding_dim",
             "chunking", "documents", "total_chunks", "created_at", "generator"
         ]
-        for field in required_fields:
-            if field not in data:
-                raise ValueError(f"Campo obligatorio faltante en manifest.json: {field}")
+        for field_name in required_fields:
+            if field_name not in data:
+                raise ValueError(f"Campo obligatorio faltante en manifest.json: {field_name}")
         
         # Validar que case_id coincide
         if data["case_id"] != case_id:
@@ -399,6 +590,138 @@ def read_manifest(case_id: str, version: str) -> Dict[str, Any]:
         raise ValueError(f"manifest.json corrupto: {e}")
 
 
+def _iter_metadata_pages(collection, page_size: int):
+    """Recorre la colección en ventanas de page_size: (offset, ids, metadatas)."""
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            return
+        yield offset, ids, page.get("metadatas") or []
+        if len(ids) < page_size:
+            return
+        offset += len(ids)
+
+
+def _iter_metadata_pages_by_ids(collection, chunk_ids: List[str], page_size: int):
+    """Lee solo los chunks indicados, en ventanas de page_size."""
+    for offset in range(0, len(chunk_ids), page_size):
+        page = collection.get(ids=chunk_ids[offset:offset + page_size], include=["metadatas"])
+        yield offset, page.get("ids") or [], page.get("metadatas") or []
+
+
+class _ChunkMetadataChecker:
+    """
+    Acumula las comprobaciones de metadatos página a página.
+    
+    Memoria proporcional al nº de documentos, no de chunks.
+    """
+    
+    def __init__(self, case_id: str, manifest: Dict[str, Any]):
+        self.case_id = case_id
+        self.pending_doc_ids = {doc["doc_id"] for doc in manifest.get("documents", [])}
+        self.seen = 0
+        self.chunk_errors: List[str] = []
+        self.chunk_error_count = 0
+    
+    def _error(self, message: str) -> None:
+        self.chunk_error_count += 1
+        if len(self.chunk_errors) < _MAX_CHUNK_ERRORS:
+            self.chunk_errors.append(message)
+    
+    def assume_covered(self, doc_ids) -> None:
+        self.pending_doc_ids.difference_update(doc_ids)
+    
+    def check_page(self, offset: int, metadatas: List[Optional[Dict[str, Any]]]) -> None:
+        for i, meta in enumerate(metadatas, start=offset):
+            self.seen += 1
+            if not meta:
+                self._error(f"Chunk {i} sin metadata")
+                continue
+            
+            chunk_case_id = meta.get("case_id")
+            if not chunk_case_id:
+                self._error(f"Chunk {i} sin case_id en metadata")
+            elif chunk_case_id != self.case_id:
+                self._error(
+                    f"Chunk {i} con case_id incorrecto. "
+                    f"Esperado: {self.case_id}, Encontrado: {chunk_case_id}"
+                )
+            self.pending_doc_ids.discard(meta.get("document_id"))
+    
+    def check_ids_present(self, found_ids: List[str], requested_ids: List[str]) -> None:
+        missing = set(requested_ids) - set(found_ids)
+        for chunk_id in sorted(missing):
+            self._error(f"Chunk cambiado {chunk_id} no está en la colección")
+    
+    def errors(self) -> List[str]:
+        errors = list(self.chunk_errors)
+        if self.chunk_error_count > len(self.chunk_errors):
+            errors.append(
+                f"... y {self.chunk_error_count - len(self.chunk_errors)} errores de chunks más"
+            )
+        return errors
+    
+    def missing_documents(self) -> set:
+        return self.pending_doc_ids
+
+
+def _fast_validation_plan(
+    case_id: str,
+    version: str,
+    manifest: Dict[str, Any],
+) -> Optional[Tuple[set, List[str]]]:
+    """
+    (doc_ids cubiertos por la base, chunks a leer) para el modo rápido,
+    o None si no es aplicable (sin base READY o sin changes.json).
+    
+    Un documento se da por cubierto sin leer sus chunks si la base lo
+    tenía con el MISMO sha256 y con chunks (sus vectores se reutilizaron).
+    """
+    changes = read_changes(case_id, version)
+    base_version = (changes or {}).get("base_version")
+    if not base_version or base_version != manifest.get("reused_from_version"):
+        return None
+    try:
+        if read_status(case_id, base_version)["status"] != "READY":
+            return None
+        base_manifest = read_manifest(case_id, base_version)
+    except (FileNotFoundError, ValueError):
+        return None
+    
+    base_docs = {
+        doc["doc_id"]: doc for doc in base_manifest.get("documents", []) if doc.get("num_chunks")
+    }
+    covered = {
+        doc["doc_id"]
+        for doc in manifest.get("documents", [])
+        if doc["doc_id"] in base_docs
+        and doc.get("sha256") == base_docs[doc["doc_id"]].get("sha256")
+        and doc.get("num_chunks") == base_docs[doc["doc_id"]].get("num_chunks")
+    }
+    return covered, list(changes.get("added_chunk_ids") or [])
+
+
+def write_changes(case_id: str, version: str, base_version: Optional[str], added_chunk_ids: List[str]) -> None:
+    """
+    Registra los chunks AÑADIDOS O MODIFICADOS respecto a la versión base
+    (la READY de la que se reutilizaron vectores). Permite validar en modo
+    rápido solo lo que cambió.
+    """
+    with open(_get_changes_path(case_id, version), "w", encoding="utf-8") as f:
+        json.dump({"base_version": base_version, "added_chunk_ids": added_chunk_ids}, f)
+
+
+def read_changes(case_id: str, version: str) -> Optional[Dict[str, Any]]:
+    """changes.json de una versión (None si no existe o es ilegible)."""
+    try:
+        with open(_get_changes_path(case_id, version), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
 # =========================================================
 # VALIDACIONES DE INTEGRIDAD (BLOQUEANTES)
 # =========================================================
@@ -407,6 +730,10 @@ def validate_version_integrity(
     case_id: str,
     version: str,
     collection,  # ChromaDB collection
+    expected_model: Optional[str] = None,
+    expected_dim: Optional[int] = None,
+    mode: str = "full",
+    page_size: int = VALIDATION_PAGE_SIZE,
 ) -> Tuple[bool, List[str]]:
     """
     Valida la integridad de una versión ANTES de marcarla como READY.
@@ -420,11 +747,25 @@ def validate_version_integrity(
     3. todos los chunks contienen case_id correcto
     4. el índice vectorial existe y es accesible
     5. el modelo de embeddings coincide
+    6. la dimensión de los vectores == embedding_dim del manifest
+    7. versiones compactas: el índice int8/float16 cubre todos los chunks
+    
+    Los metadatos se recorren en páginas de page_size (memoria acotada).
+    
+    mode="fast": solo se leen los chunks añadidos/modificados respecto a la
+    versión READY base (changes.json); los reutilizados ya se validaron en
+    ella. Sin base READY o sin changes.json → validación completa.
     
     Args:
         case_id: ID del caso
         version: ID de la versión
         collection: Colección de ChromaDB
+        expected_model: Modelo con el que se construyó la versión
+            (default: el del proveedor configurado)
+        expected_dim: Dimensión con la que se construyó la versión
+            (default: solo se exige coherencia manifest ↔ vectores)
+        mode: "full" (todos los chunks) o "fast" (solo los cambiados)
+        page_size: Chunks por página al leer metadatos
         
     Returns:
         Tupla (is_valid, errors)
@@ -435,10 +776,14 @@ def validate_version_integrity(
     """
     if not case_id or not case_id.strip():
         raise ValueError("case_id no puede estar vacío")
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"mode desconocido: {mode}. Disponibles: {list(VALIDATION_MODES)}")
     
     errors: List[str] = []
     
-    logger.info(f"[VALIDACIÓN] Iniciando validación de integridad: case_id={case_id}, version={version}")
+    logger.info(
+        f"[VALIDACIÓN] Iniciando validación de integridad: case_id={case_id}, version={version}, modo={mode}"
+    )
     
     # --------------------------------------------------
     # 1. Validar que existen manifest y status
@@ -482,53 +827,100 @@ def validate_version_integrity(
         )
     
     # --------------------------------------------------
-    # 5. Validar que todos los chunks contienen case_id correcto
+    # 5. Validar case_id de los chunks y cobertura de documentos (paginado)
     # --------------------------------------------------
+    checker = _ChunkMetadataChecker(case_id, manifest)
     try:
-        # Obtener todos los metadatos de la colección
-        all_data = collection.get(include=["metadatas"])
-        all_metadatas = all_data.get("metadatas", [])
+        fast_plan = _fast_validation_plan(case_id, version, manifest) if mode == "fast" else None
+        if mode == "fast" and fast_plan is None:
+            logger.info("[VALIDACIÓN] Modo rápido no aplicable: validación completa")
         
-        for i, meta in enumerate(all_metadatas):
-            if not meta:
-                errors.append(f"Chunk {i} sin metadata")
-                continue
-            
-            chunk_case_id = meta.get("case_id")
-            if not chunk_case_id:
-                errors.append(f"Chunk {i} sin case_id en metadata")
-            elif chunk_case_id != case_id:
+        if fast_plan is not None:
+            base_doc_ids, added_chunk_ids = fast_plan
+            logger.info(f"[VALIDACIÓN] Modo rápido: {len(added_chunk_ids)} chunks cambiados")
+            checker.assume_covered(base_doc_ids)
+            for offset, ids, metadatas in _iter_metadata_pages_by_ids(collection, added_chunk_ids, page_size):
+                checker.check_page(offset, metadatas)
+                checker.check_ids_present(ids, added_chunk_ids[offset:offset + page_size])
+        else:
+            for offset, ids, metadatas in _iter_metadata_pages(collection, page_size):
+                checker.check_page(offset, metadatas)
+            if checker.seen != chunk_count:
                 errors.append(
-                    f"Chunk {i} con case_id incorrecto. "
-                    f"Esperado: {case_id}, Encontrado: {chunk_case_id}"
+                    f"Chunks recorridos ({checker.seen}) != count() de ChromaDB ({chunk_count})"
                 )
     except Exception as e:
         errors.append(f"Error validando metadatos de chunks: {e}")
     
+    errors.extend(checker.errors())
+    
     # --------------------------------------------------
     # 6. Validar modelo de embeddings
     # --------------------------------------------------
     manifest_model = manifest.get("embedding_model")
+    system_model = expected_model or get_embedding_provider().model
     if not manifest_model:
         errors.append("Manifest sin embedding_model")
-    elif manifest_model != EMBEDDING_MODEL:
+    elif manifest_model != system_model:
         errors.append(
             f"Modelo de embeddings no coincide. "
-            f"Manifest: {manifest_model}, Sistema: {EMBEDDING_MODEL}"
+            f"Manifest: {manifest_model}, Sistema: {system_model}"
         )
     
+    # --------------------------------------------------
+    # 6b. Validar dimensión de embeddings (manifest, build y vectores)
+    # --------------------------------------------------
+    manifest_dim = manifest.get("embedding_dim")
+    if not isinstance(manifest_dim, int) or manifest_dim <= 0:
+        errors.append(f"Manifest con embedding_dim inválido: {manifest_dim!r}")
+    else:
+        if expected_dim is not None and manifest_dim != expected_dim:
+            errors.append(
+                f"Dimensión de embeddings no coincide. "
+                f"Manifest: {manifest_dim}, Build: {expected_dim}"
+            )
+        # Chroma exige la misma dimensión en toda la colección: basta una muestra
+        try:
+            sample = collection.get(limit=1, include=["embeddings"])
+            sample_embeddings = sample.get("embeddings")
+            if sample_embeddings is not None and len(sample_embeddings) > 0:
+                stored_dim = len(sample_embeddings[0])
+                if stored_dim != manifest_dim:
+                    errors.append(
+                        f"Dimensión de vectores no coincide con el manifest. "
+                        f"Manifest: {manifest_dim}, ChromaDB: {stored_dim}"
+                    )
+        except Exception as e:
+            errors.append(f"Error validando dimensión de vectores: {e}")
+    
+    # --------------------------------------------------
+    # 6c. Índice compacto: existe y cubre todos los chunks
+    # --------------------------------------------------
+    index_format = manifest.get("index_format", "float32")
+    if index_format != "float32":
+        quantized_meta_path = _get_quantized_path(case_id, version) / "meta.json"
+        try:
+            with open(quantized_meta_path, "r", encoding="utf-8") as f:
+                quantized_meta = json.load(f)
+            if quantized_meta.get("format") != index_format:
+                errors.append(
+                    f"Formato del índice compacto no coincide. "
+                    f"Manifest: {index_format}, Índice: {quantized_meta.get('format')}"
+                )
+            if quantized_meta.get("count") != expected_chunks:
+                errors.append(
+                    f"Vectores en índice compacto no coinciden. "
+                    f"Manifest: {expected_chunks}, Índice: {quantized_meta.get('count')}"
+                )
+        except (OSError, ValueError) as e:
+            errors.append(f"Índice compacto ilegible ({index_format}): {e}")
+    
     # --------------------------------------------------
     # 7. Validar que todos los doc_id del manifest existen en chunks
     # --------------------------------------------------
-    try:
-        manifest_doc_ids = set(doc["doc_id"] for doc in manifest["documents"])
-        chunk_doc_ids = set(meta.get("document_id") for meta in all_metadatas if meta)
-        
-        missing_docs = manifest_doc_ids - chunk_doc_ids
-        if missing_docs:
-            errors.append(f"Documentos en manifest sin chunks: {missing_docs}")
-    except Exception as e:
-        errors.append(f"Error validando document_ids: {e}")
+    missing_docs = checker.missing_documents()
+    if missing_docs:
+        errors.append(f"Documentos en manifest sin chunks: {missing_docs}")
     
     # --------------------------------------------------
     # Resultado final
@@ -588,74 +980,163 @@ def update_active_pointer(case_id: str, version: str) -> None:
     
     logger.info(f"[VERSIONADO] Actualizando ACTIVE: case_id={case_id}, version={version}")
     
-    # Eliminar puntero ACTIVE anterior si existe
-    if active_path.exists():
-        if active_path.is_symlink():
-            active_path.unlink()
-        elif active_path.is_file():
-            active_path.unlink()
-        elif active_path.is_dir():
-            # NUNCA debería ser un directorio, pero por seguridad
-            logger.warning(f"[VERSIONADO] ACTIVE es un directorio (inesperado). Eliminando...")
-            shutil.rmtree(active_path)
-    
-    # Intentar crear symlink
+    if active_path.is_dir() and not active_path.is_symlink():
+        # NUNCA debería ser un directorio, pero por seguridad
+        logger.warning(f"[VERSIONADO] ACTIVE es un directorio (inesperado). Eliminando...")
+        shutil.rmtree(active_path)
+    
+    # Swap atómico: el puntero nuevo se crea aparte y se renombra encima del
+    # anterior (os.replace). Los lectores ven la versión vieja o la nueva,
+    # nunca un ACTIVE inexistente.
+    tmp_path = active_path.with_name(f".{ACTIVE_POINTER}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp_path.unlink()
+    except FileNotFoundError:
+        pass
+    
+    # Intentar symlink
     try:
-        active_path.symlink_to(version_path, target_is_directory=True)
+        tmp_path.symlink_to(version_path, target_is_directory=True)
+        with _versions_index_transaction(case_id, lambda index: index.update(active=version)):
+            os.replace(tmp_path, active_path)
         logger.info(f"[VERSIONADO] Symlink creado: {active_path} -> {version_path}")
+        _remember_active_version(active_path, version)
+        # Cerrar handles pooled de versiones que dejan de ser ACTIVE
+        invalidate_case_collections(case_id, keep_version=version)
         return
     except (OSError, NotImplementedError) as e:
         logger.warning(f"[VERSIONADO] No se pudo crear symlink: {e}. Usando archivo de texto...")
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
     
-    # Si symlink falla, crear archivo de texto
+    # Si symlink falla, archivo de texto (mismo swap atómico)
     try:
-        with open(active_path, "w", encoding="utf-8") as f:
+        with open(tmp_path, "w", encoding="utf-8") as f:
             f.write(version)
+        with _versions_index_transaction(case_id, lambda index: index.update(active=version)):
+            os.replace(tmp_path, active_path)
         logger.info(f"[VERSIONADO] Archivo ACTIVE creado: {active_path} (contenido: {version})")
+        _remember_active_version(active_path, version)
+        invalidate_case_collections(case_id, keep_version=version)
     except Exception as e:
         error_msg = f"Error creando puntero ACTIVE: {e}"
         logger.error(f"[VERSIONADO] {error_msg}")
         raise RuntimeError(error_msg)
 
 
-def get_active_version(case_id: str) -> Optional[str]:
+def seal_version_segments(case_id: str, version: str) -> Dict[str, int]:
     """
-    Obtiene la versión activa para un caso.
+    Comparte los ficheros de datos de una versión READY con el resto de
+    versiones del caso (hardlinks a segmentos por contenido).
+    
+    REGLA: solo versiones READY (inmutables). Durante el build Chroma
+    escribe sus ficheros in situ y no se pueden compartir.
     
     Args:
         case_id: ID del caso
+        version: ID de la versión
         
     Returns:
-        ID de la versión activa o None si no existe
+        Estadísticas de seal_version (vacío si el sellado está desactivado)
+        
+    Raises:
+        RuntimeError: Si la versión no está READY
     """
-    active_path = _get_active_pointer_path(case_id)
-    
-    if not active_path.exists():
-        logger.warning(f"[VERSIONADO] No existe puntero ACTIVE para case_id={case_id}")
+    if read_status(case_id, version)["status"] != "READY":
+        raise RuntimeError(f"Solo se pueden sellar versiones READY: {version}")
+    if not VECTORSTORE_SEGMENT_SHARING:
+        return {}
+    
+    # Cerrar el cliente pooled del build: ningún handle de escritura abierto
+    invalidate_case_collections(case_id, version=version)
+    return seal_version(
+        _get_case_vectorstore_root(case_id),
+        _get_version_path(case_id, version),
+        min_bytes=VECTORSTORE_SEGMENT_MIN_BYTES,
+    )
+
+
+def _pointer_stamp(active_path: Path) -> Optional[Tuple[int, int]]:
+    """(inode, mtime_ns) del puntero sin seguir el symlink; None si no existe."""
+    try:
+        info = os.lstat(active_path)
+    except FileNotFoundError:
         return None
-    
-    # Si es symlink
+    return info.st_ino, info.st_mtime_ns
+
+
+def _remember_active_version(active_path: Path, version: Optional[str]) -> None:
+    with _active_cache_lock:
+        _active_cache[str(active_path)] = (time.monotonic(), _pointer_stamp(active_path), version)
+
+
+def clear_active_version_cache() -> None:
+    """Vacía la caché de punteros ACTIVE del proceso."""
+    with _active_cache_lock:
+        _active_cache.clear()
+
+
+def _read_active_pointer(case_id: str, active_path: Path) -> Optional[str]:
+    """Lee el puntero ACTIVE del disco (symlink o archivo de texto)."""
     if active_path.is_symlink():
-        target = active_path.resolve()
-        version = target.name
-        logger.info(f"[VERSIONADO] ACTIVE (symlink): case_id={case_id}, version={version}")
-        return version
+        return Path(os.readlink(active_path)).name
     
-    # Si es archivo de texto
     if active_path.is_file():
         try:
             with open(active_path, "r", encoding="utf-8") as f:
-                version = f.read().strip()
-            logger.info(f"[VERSIONADO] ACTIVE (archivo): case_id={case_id}, version={version}")
-            return version
+                return f.read().strip() or None
         except Exception as e:
             logger.error(f"[VERSIONADO] Error leyendo ACTIVE: {e}")
             return None
     
-    logger.error(f"[VERSIONADO] ACTIVE en estado inesperado: {active_path}")
+    if active_path.exists():
+        logger.error(f"[VERSIONADO] ACTIVE en estado inesperado: {active_path}")
     return None
 
 
+def get_active_version(case_id: str) -> Optional[str]:
+    """
+    Obtiene la versión activa para un caso.
+    
+    Caché por proceso: dentro de ACTIVE_POINTER_REVALIDATE_S no toca el
+    disco; después basta un lstat del puntero (inode + mtime) para saber
+    si otro proceso lo cambió. Los cambios de este proceso
+    (update_active_pointer) actualizan la caché al instante.
+    
+    Args:
+        case_id: ID del caso
+        
+    Returns:
+        ID de la versión activa o None si no existe
+    """
+    active_path = _get_active_pointer_path(case_id)
+    key = str(active_path)
+    now = time.monotonic()
+    
+    cached = _active_cache.get(key)
+    if cached is not None and now - cached[0] < ACTIVE_POINTER_REVALIDATE_S:
+        return cached[2]
+    
+    stamp = _pointer_stamp(active_path)
+    if cached is not None and stamp == cached[1]:
+        with _active_cache_lock:
+            _active_cache[key] = (now, stamp, cached[2])
+        return cached[2]
+    
+    version = _read_active_pointer(case_id, active_path) if stamp is not None else None
+    with _active_cache_lock:
+        _active_cache[key] = (now, stamp, version)
+    
+    # Log solo cuando cambia lo resuelto (no en cada consulta)
+    if version:
+        logger.info(f"[VERSIONADO] ACTIVE: case_id={case_id}, version={version}")
+    else:
+        logger.warning(f"[VERSIONADO] No existe puntero ACTIVE para case_id={case_id}")
+    return version
+
+
 def get_active_version_path(case_id: str) -> Optional[Path]:
     """
     Obtiene la ruta de la versión activa para un caso.
@@ -693,39 +1174,19 @@ def list_versions(case_id: str) -> List[VersionInfo]:
         logger.info(f"[VERSIONADO] No existen versiones para case_id={case_id}")
         return []
     
-    versions: List[VersionInfo] = []
-    
-    for item in root.iterdir():
-        # Ignorar ACTIVE
-        if item.name == ACTIVE_POINTER:
-            continue
-        
-        # Solo directorios que empiezan con VERSION_PREFIX
-        if not item.is_dir() or not item.name.startswith(VERSION_PREFIX):
-            continue
-        
-        version_id = item.name
-        
-        # Leer status
-        try:
-            status_data = read_status(case_id, version_id)
-            status = status_data["status"]
-            created_at_str = status_data["updated_at"]
-            created_at = datetime.fromisoformat(created_at_str)
-        except Exception as e:
-            logger.warning(f"[VERSIONADO] Error leyendo status de {version_id}: {e}")
-            status = "UNKNOWN"
-            created_at = datetime.min
-        
-        versions.append(
-            VersionInfo(
-                case_id=case_id,
-                version=version_id,
-                status=status,
-                path=item,
-                created_at=created_at,
-            )
+    # versions.json en lugar de abrir cada status.json
+    versions = [
+        VersionInfo(
+            case_id=case_id,
+            version=version_id,
+            status=entry.get("status", "UNKNOWN"),
+            path=root / version_id,
+            created_at=(
+                datetime.fromisoformat(entry["updated_at"]) if entry.get("updated_at") else datetime.min
+            ),
         )
+        for version_id, entry in load_versions_index(case_id)["versions"].items()
+    ]
     
     # Ordenar por fecha de creación (más reciente primero)
     versions.sort(key=lambda v: v.created_at, reverse=True)
@@ -735,6 +1196,46 @@ def list_versions(case_id: str) -> List[VersionInfo]:
     return versions
 
 
+def delete_version(case_id: str, version: str, expected_status: Optional[str] = None) -> None:
+    """
+    Borra una versión del caso y la quita del índice de versiones.
+    
+    Bajo el lock del caso: un update_active_pointer concurrente no puede
+    activarla mientras se borra. Los segmentos compartidos se liberan
+    después con gc_segments.
+    
+    Args:
+        case_id: ID del caso
+        version: ID de la versión
+        expected_status: Si se indica, solo se borra si el status sigue siendo este
+        
+    Raises:
+        RuntimeError: Si la versión es la ACTIVE o su status cambió
+    """
+    with _versions_index_lock(case_id):
+        # Puntero leído del disco (no de la caché): puede haberlo movido otro proceso
+        if _read_active_pointer(case_id, _get_active_pointer_path(case_id)) == version:
+            raise RuntimeError(f"No se puede borrar la versión ACTIVE: {version}")
+        if expected_status is not None:
+            try:
+                current_status = read_status(case_id, version)["status"]
+            except (FileNotFoundError, ValueError):
+                current_status = "UNKNOWN"
+            if current_status != expected_status:
+                raise RuntimeError(
+                    f"Status de {version} cambió: esperado {expected_status}, actual {current_status}"
+                )
+        
+        # Cerrar el cliente pooled ANTES de borrar sus ficheros
+        invalidate_case_collections(case_id, version=version)
+        remove_version_tree(_get_version_path(case_id, version))
+        
+        index = read_versions_index(case_id)
+        if index is not None:
+            index["versions"].pop(version, None)
+            _write_versions_index(case_id, index)
+
+
 def cleanup_old_versions(case_id: str, keep_last: int = 3) -> int:
     """
     Elimina versiones antiguas manteniendo las N más recientes.
@@ -804,7 +1305,7 @@ def cleanup_old_versions(case_id: str, keep_last: int = 3) -> int:
     deleted_count = 0
     for v in versions_to_delete:
         try:
-            shutil.rmtree(v.path)
+            delete_version(case_id, v.version)
             logger.info(
                 f"[HOUSEKEEPING] ✅ Versión eliminada: {v.version} "
                 f"(status={v.status}, created_at={v.created_at.isoformat()})"
@@ -813,6 +1314,10 @@ def cleanup_old_versions(case_id: str, keep_last: int = 3) -> int:
         except Exception as e:
             logger.error(f"[HOUSEKEEPING] ❌ Error eliminando versión {v.version}: {e}")
     
+    # Liberar los segmentos que solo referenciaban las versiones borradas
+    if deleted_count:
+        gc_segments(_get_case_vectorstore_root(case_id))
+    
     logger.info(
         f"[HOUSEKEEPING] Limpieza completada: "
         f"case_id={case_id}, eliminadas={deleted_count}"
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Benchmark de throughput concurrente: retrieval síncrono vs async.
+
+Compara, con N peticiones concurrentes sobre un caso real (versión ACTIVE):
+- sync:  rag_answer_internal / query_legal_rag en un threadpool del mismo
+         tamaño que el de FastAPI (como los endpoints síncronos)
+- async: arag_answer_internal / aquery_legal_rag en un único event loop
+
+Los embeddings los sirve un servidor STUB local compatible con la API de
+OpenAI (latencia configurable): no hay coste ni red externa. Cada petición
+usa una pregunta distinta para que la caché de embeddings no interfiera.
+
+Uso:
+    python scripts/benchmark_async_retrieval.py --case-id CASE_001
+    python scripts/benchmark_async_retrieval.py --target legal --requests 400 --embed-latency-ms 150
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+
+# =========================================================
+# SERVIDOR STUB DE EMBEDDINGS (compatible OpenAI)
+# =========================================================
+
+def _stub_vector(text: str, dim: int) -> List[float]:
+    """Vector determinista y normalizado a partir del texto."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    values = [rng.uniform(-1.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+def start_stub_embedding_server(dim: int, latency_ms: float) -> ThreadingHTTPServer:
+    """Arranca el stub en 127.0.0.1 (puerto libre) en un hilo daemon."""
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            inputs = payload.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+
+            time.sleep(latency_ms / 1000.0)  # Latencia de red/proveedor simulada
+
+            size = payload.get("dimensions") or dim
+            body = json.dumps({
+                "object": "list",
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": _stub_vector(text, size)}
+                    for i, text in enumerate(inputs)
+                ],
+                "model": payload.get("model", "stub"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # Silenciar access log
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# =========================================================
+# MEDICIÓN
+# =========================================================
+
+def _summary(label: str, latencies: List[float], wall_s: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mode": label,
+        "requests": len(latencies),
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(latencies) / wall_s, 2) if wall_s else 0.0,
+        "p50_ms": round(statistics.median(ordered) * 1000, 1),
+        "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 1),
+    }
+
+
+def run_sync(call: Callable[[int], None], requests: int, threadpool: int) -> dict:
+    """Peticiones síncronas en un threadpool (como un endpoint `def` de FastAPI)."""
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def _one(i: int):
+        t0 = time.perf_counter()
+        call(i)
+        with lock:
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threadpool) as pool:
+        list(pool.map(_one, range(requests)))
+    return _summary(f"sync (threadpool={threadpool})", latencies, time.perf_counter() - start)
+
+
+def run_async(acall, requests: int, concurrency: int) -> dict:
+    """Peticiones async en un único event loop (como un endpoint `async def`)."""
+    latencies: List[float] = []
+
+    async def _main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one(i: int):
+            async with semaphore:
+                t0 = time.perf_counter()
+                await acall(i)
+                latencies.append(time.perf_counter() - t0)
+
+        await asyncio.gather(*[_one(i) for i in range(requests)])
+
+    start = time.perf_counter()
+    asyncio.run(_main())
+    return _summary(f"async (concurrency={concurrency})", latencies, time.perf_counter() - start)
+
+
+# =========================================================
+# OBJETIVOS
+# =========================================================
+
+def build_case_calls(case_id: str, top_k: int):
+    from app.core.database import get_session_factory
+    from app.rag.case_rag.retrieve import arag_answer_internal, rag_answer_internal
+
+    SessionLocal = get_session_factory()
+
+    def call(i: int):
+        db = SessionLocal()
+        try:
+            rag_answer_internal(db=db, case_id=case_id, question=f"¿Pagos preferentes? #sync-{i}", top_k=top_k)
+        finally:
+            db.close()
+
+    async def acall(i: int):
+        db = SessionLocal()
+        try:
+            await arag_answer_internal(db=db, case_id=case_id, question=f"¿Pagos preferentes? #async-{i}", top_k=top_k)
+        finally:
+            db.close()
+
+    return call, acall
+
+
+def build_legal_calls(top_k: int):
+    from app.rag.legal_rag.service import aquery_legal_rag, query_legal_rag
+
+    def call(i: int):
+        query_legal_rag(query=f"Responsabilidad del administrador #sync-{i}", top_k=top_k)
+
+    async def acall(i: int):
+        await aquery_legal_rag(query=f"Responsabilidad del administrador #async-{i}", top_k=top_k)
+
+    return call, acall
+
+
+def resolve_case_dim(case_id: str) -> int:
+    from app.services.vectorstore_versioning import get_active_version, read_manifest
+
+    version = get_active_version(case_id)
+    if not version:
+        raise SystemExit(f"❌ El caso {case_id} no tiene versión ACTIVE")
+    return int(read_manifest(case_id, version)["embedding_dim"])
+
+
+# =========================================================
+# MAIN
+# =========================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark de throughput: retrieval síncrono vs async (stub de embeddings local)",
+    )
+    parser.add_argument("--target", choices=["case", "legal"], default="case")
+    parser.add_argument("--case-id", help="Caso con versión ACTIVE (target=case)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100, help="Peticiones en vuelo (async)")
+    parser.add_argument("--threadpool", type=int, default=40, help="Hilos del threadpool (sync; FastAPI usa 40)")
+    parser.add_argument("--embed-latency-ms", type=float, default=120.0)
+    parser.add_argument("--dim", type=int, default=None, help="Dimensión del stub (por defecto la del manifest)")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.target == "case" and not args.case_id:
+        parser.error("--case-id es obligatorio con --target case")
+
+    dim = args.dim or (resolve_case_dim(args.case_id) if args.target == "case" else 3072)
+    server = start_stub_embedding_server(dim, args.embed_latency_ms)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "stub"
+
+    if args.target == "case":
+        call, acall = build_case_calls(args.case_id, args.top_k)
+    else:
+        call, acall = build_legal_calls(args.top_k)
+
+    # Silenciar trazas [RAG DECISIÓN]/[CERT] durante la medición
+    with contextlib.redirect_stdout(io.StringIO()):
+        sync_result = run_sync(call, args.requests, args.threadpool)
+        async_result = run_async(acall, args.requests, args.concurrency)
+
+    server.shutdown()
+
+    print("=" * 80)
+    print(f"BENCHMARK RETRIEVAL CONCURRENTE - target={args.target} "
+          f"embed_latency_ms={args.embed_latency_ms} dim={dim}")
+    print("=" * 80)
+    for result in (sync_result, async_result):
+        print(f"{result['mode']:<28} wall={result['wall_s']:>7}s  "
+              f"throughput={result['throughput_rps']:>7} req/s  "
+              f"p50={result['p50_ms']:>7}ms  p95={result['p95_ms']:>7}ms")
+    if sync_result["throughput_rps"]:
+        speedup = async_result["throughput_rps"] / sync_result["throughput_rps"]
+        print(f"\nSpeedup throughput async/sync: x{speedup:.2f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark de dimensiones de embeddings: recall@k vs tamaño del índice vs latencia.
+
+Para un caso real, construye una versión del vectorstore por cada dimensión
+solicitada (text-embedding-3-* acepta `dimensions`) y mide:
+- recall@k con el ground truth del caso (retrieval_quality)
+- tamaño en disco de la versión
+- latencia de collection.query (embedding de la consulta precalculado)
+
+Cada versión registra su dimensión en el manifest; las consultas usan la
+misma. Al terminar se restaura la versión ACTIVE previa (las versiones del
+benchmark quedan en disco para inspección; limpiar con
+manage_vectorstore_versions.py cleanup).
+
+Uso:
+    python scripts/benchmark_embedding_dimensions.py CASE_001
+    python scripts/benchmark_embedding_dimensions.py CASE_001 --dims 3072 1024 512 256 --k 10
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import statistics
+import time
+from typing import List
+
+
+def _dir_size_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _query_latencies_ms(collection, query_embeddings: List[List[float]], k: int, rounds: int) -> List[float]:
+    latencies = []
+    for _ in range(rounds):
+        for embedding in query_embeddings:
+            t0 = time.perf_counter()
+            collection.query(query_embeddings=[embedding], n_results=k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark de dimensiones de embeddings (recall@k / tamaño / latencia)"
+    )
+    parser.add_argument("case_id", help="ID del caso (con ground truth en clients_data/cases/<case_id>)")
+    parser.add_argument(
+        "--dims", type=int, nargs="+", default=[3072, 1536, 1024, 512, 256],
+        help="Dimensiones a comparar (default: 3072 1536 1024 512 256)",
+    )
+    parser.add_argument("--k", type=int, default=5, help="k de recall@k y de las consultas")
+    parser.add_argument("--rounds", type=int, default=20, help="Repeticiones de cada consulta para latencia")
+    args = parser.parse_args()
+
+    from app.core.database import SessionLocal
+    from app.services.embedding_cache import embed_queries
+    from app.services.embeddings_pipeline import build_embeddings_for_case, get_case_collection
+    from app.services.embedding_providers import provider_for_manifest
+    from app.services.retrieval_quality import calculate_recall_at_k, load_ground_truth_for_case
+    from app.services.vectorstore_versioning import (
+        get_active_version,
+        list_versions,
+        read_manifest,
+        update_active_pointer,
+    )
+
+    case_id = args.case_id
+    ground_truth = load_ground_truth_for_case(case_id)
+    queries = [q.query for q in ground_truth]
+    if not any(q.expected_chunk_ids for q in ground_truth):
+        print("⚠️  Sin ground truth: recall@k no será significativo (solo tamaño y latencia)")
+
+    original_active = get_active_version(case_id)
+    # Conservar todas las versiones del benchmark además de las existentes
+    keep_versions = len(list_versions(case_id)) + len(args.dims) + 1
+    rows = []
+
+    db = SessionLocal()
+    try:
+        for dims in args.dims:
+            print(f"\n🔢 Construyendo versión con dimensión {dims}...")
+            t0 = time.perf_counter()
+            version = build_embeddings_for_case(
+                db=db,
+                case_id=case_id,
+                keep_versions=keep_versions,
+                embedding_dimensions=dims,
+            )
+            build_s = time.perf_counter() - t0
+
+            manifest = read_manifest(case_id, version)
+            provider = provider_for_manifest(manifest)
+            collection = get_case_collection(case_id, version=version)
+            version_path = next(v.path for v in list_versions(case_id) if v.version == version)
+
+            recall = calculate_recall_at_k(db, case_id, ground_truth, k=args.k, version=version)
+            latencies = _query_latencies_ms(
+                collection, embed_queries(queries, provider=provider), args.k, args.rounds
+            )
+            rows.append({
+                "dims": manifest["embedding_dim"],
+                "version": version,
+                "recall": recall.get("avg_recall_at_k", 0.0),
+                "size_mb": _dir_size_bytes(version_path) / (1024 * 1024),
+                "p50_ms": statistics.median(latencies),
+                "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+                "build_s": build_s,
+            })
+    finally:
+        db.close()
+        if original_active:
+            update_active_pointer(case_id, original_active)
+            print(f"\n↩️  ACTIVE restaurado: {original_active}")
+
+    print("=" * 80)
+    print(f"BENCHMARK DIMENSIONES - case_id={case_id} k={args.k}")
+    print("=" * 80)
+    print(f"{'dim':>6} {'recall@k':>9} {'tamaño MB':>10} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}  versión")
+    for row in rows:
+        print(
+            f"{row['dims']:>6} {row['recall']:>9.2%} {row['size_mb']:>10.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['build_s']:>8.1f}  {row['version']}"
+        )
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ingesta + retrieval de extremo a extremo SIN red.
+
+Usa el proveedor local (feature hashing de n-gramas, EMBEDDING_PROVIDER=
+local_hash) con los mismos componentes que un build real:
+- batching por presupuesto de tokens (pack_by_tokens)
+- ejecutor con varios batches en vuelo e inserción en Chroma solapada
+- consultas con collection.query sobre el índice resultante
+
+El corpus es sintético (chunks de longitud variable con vocabulario
+concursal) y se indexa en un directorio temporal: no toca clients_data.
+
+Uso:
+    python scripts/benchmark_local_embeddings.py
+    python scripts/benchmark_local_embeddings.py --chunks 20000 --dim 768 --queries 500
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from typing import List
+
+
+_VOCABULARIO = (
+    "acreedor deudor concurso insolvencia administrador concursal pago preferente "
+    "crédito privilegiado balance cuenta pérdidas ganancias tesorería embargo "
+    "préstamo garantía hipoteca factura proveedor nómina trabajador seguridad social "
+    "hacienda aplazamiento liquidación convenio junta socios acta retraso solicitud "
+    "responsabilidad culpable vinculado transferencia extracto bancario fecha importe"
+).split()
+
+
+def synthetic_corpus(n: int, seed: int) -> List[str]:
+    """Chunks de ~700 a ~3000 caracteres (como los del chunker real)."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        target = rng.randint(700, 3000)
+        words = []
+        length = 0
+        while length < target:
+            word = rng.choice(_VOCABULARIO)
+            words.append(word)
+            length += len(word) + 1
+        corpus.append(f"Documento {i}. " + " ".join(words))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local de ingesta + retrieval (sin red)")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=None, help="Dimensión (default EMBEDDING_LOCAL_DIM)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import chromadb
+
+    from app.core.variables import EMBEDDING_LOCAL_DIM
+    from app.services.embedding_batching import batch_fill_report, pack_by_tokens
+    from app.services.embedding_executor import get_embedding_executor
+    from app.services.embedding_providers import HashingEmbeddingProvider
+
+    provider = HashingEmbeddingProvider(dimensions=args.dim or EMBEDDING_LOCAL_DIM)
+    corpus = synthetic_corpus(args.chunks, args.seed)
+    batches = pack_by_tokens(list(enumerate(corpus)), lambda item: item[1])
+    report = batch_fill_report(batches)
+
+    with tempfile.TemporaryDirectory(prefix="phoenix_bench_") as tmp:
+        collection = chromadb.PersistentClient(path=tmp).get_or_create_collection("chunks")
+
+        # --------------------------------------------------
+        # Ingesta: embeddings en paralelo + inserción solapada
+        # --------------------------------------------------
+        embed_s = 0.0
+        start = time.perf_counter()
+
+        def _embed(batch):
+            t0 = time.perf_counter()
+            vectors = provider.embed([text for _, text in batch.items])
+            return vectors, time.perf_counter() - t0
+
+        for batch, (vectors, elapsed) in get_embedding_executor().run_ordered(batches, _embed):
+            embed_s += elapsed
+            collection.add(
+                ids=[f"chunk_{i}" for i, _ in batch.items],
+                embeddings=vectors,
+                documents=[text for _, text in batch.items],
+            )
+        ingest_s = time.perf_counter() - start
+
+        # --------------------------------------------------
+        # Retrieval: embedding de la consulta + búsqueda
+        # --------------------------------------------------
+        rng = random.Random(args.seed + 1)
+        latencies = []
+        for _ in range(args.queries):
+            query = " ".join(rng.choice(_VOCABULARIO) for _ in range(8))
+            t0 = time.perf_counter()
+            collection.query(
+                query_embeddings=provider.embed([query]),
+                n_results=args.top_k,
+            )
+            latencies.append(time.perf_counter() - t0)
+
+    latencies.sort()
+    print("=" * 80)
+    print(f"BENCHMARK LOCAL - proveedor={provider.name} modelo={provider.model} dim={provider.dimensions}")
+    print("=" * 80)
+    print(f"Chunks:              {args.chunks} en {report['batches']} batches "
+          f"(ocupación media {report['mean_fill']:.0%})")
+    print(f"Ingesta total:       {ingest_s:.2f}s  ({args.chunks / ingest_s:.0f} chunks/s)")
+    print(f"  CPU embeddings:    {embed_s:.2f}s  (suma de hilos)")
+    print(f"Consultas:           {args.queries}  "
+          f"p50={statistics.median(latencies) * 1000:.1f}ms  "
+          f"p95={latencies[int(0.95 * (len(latencies) - 1))] * 1000:.1f}ms")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
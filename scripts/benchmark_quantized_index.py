@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark del índice compacto: float32 (Chroma) vs int8 / float16 + re-scoring.
+
+Para un caso real construye una versión por formato (los vectores salen del
+almacén por contenido: solo el primer build llama a la API) y mide:
+- tamaño en disco de la versión
+- latencia de query (embedding de la consulta precalculado)
+- recall@k con el ground truth del caso (retrieval_quality)
+- solapamiento del top-k con el formato float32 (recall frente al actual)
+
+Al terminar se restaura la versión ACTIVE previa (las versiones del
+benchmark quedan en disco; limpiar con manage_vectorstore_versions.py cleanup).
+
+Uso:
+    python scripts/benchmark_quantized_index.py CASE_001
+    python scripts/benchmark_quantized_index.py CASE_001 --formats float32 int8 --k 10
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import statistics
+import time
+from typing import Dict, List
+
+
+def _dir_size_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark de índice compacto (tamaño / latencia / recall)"
+    )
+    parser.add_argument("case_id", help="ID del caso")
+    parser.add_argument(
+        "--formats", nargs="+", default=["float32", "int8", "float16"],
+        help="Formatos a comparar (el primero es la referencia; default: float32 int8 float16)",
+    )
+    parser.add_argument("--k", type=int, default=5, help="k de recall@k y de las consultas")
+    parser.add_argument("--rounds", type=int, default=20, help="Repeticiones de cada consulta para latencia")
+    args = parser.parse_args()
+
+    from app.core.database import SessionLocal
+    from app.services.embedding_cache import embed_queries
+    from app.services.embeddings_pipeline import build_embeddings_for_case, get_case_collection
+    from app.services.embedding_providers import provider_for_manifest
+    from app.services.retrieval_quality import calculate_recall_at_k, load_ground_truth_for_case
+    from app.services.vectorstore_versioning import (
+        get_active_version,
+        list_versions,
+        read_manifest,
+        update_active_pointer,
+    )
+
+    case_id = args.case_id
+    ground_truth = load_ground_truth_for_case(case_id)
+    queries = [q.query for q in ground_truth]
+
+    original_active = get_active_version(case_id)
+    keep_versions = len(list_versions(case_id)) + len(args.formats) + 1
+    reference: Dict[str, List[str]] = {}
+    rows = []
+
+    db = SessionLocal()
+    try:
+        for index_format in args.formats:
+            print(f"\n🔢 Construyendo versión {index_format}...")
+            version = build_embeddings_for_case(
+                db=db,
+                case_id=case_id,
+                keep_versions=keep_versions,
+                index_format=index_format,
+            )
+            manifest = read_manifest(case_id, version)
+            query_embeddings = embed_queries(queries, provider=provider_for_manifest(manifest))
+            collection = get_case_collection(case_id, version=version)
+            version_path = next(v.path for v in list_versions(case_id) if v.version == version)
+
+            latencies = []
+            top_ids: Dict[str, List[str]] = {}
+            for _ in range(args.rounds):
+                for query, embedding in zip(queries, query_embeddings):
+                    t0 = time.perf_counter()
+                    results = collection.query(
+                        query_embeddings=[embedding], n_results=args.k, include=["distances"]
+                    )
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                    top_ids[query] = results["ids"][0]
+            latencies.sort()
+
+            if not reference:
+                reference = top_ids
+            overlap = statistics.mean(
+                len(set(top_ids[q]) & set(reference[q])) / max(len(reference[q]), 1) for q in queries
+            )
+            recall = calculate_recall_at_k(db, case_id, ground_truth, k=args.k, version=version)
+            rows.append({
+                "format": index_format,
+                "version": version,
+                "size_mb": _dir_size_bytes(version_path) / (1024 * 1024),
+                "p50_ms": statistics.median(latencies),
+                "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+                "overlap": overlap,
+                "recall": recall.get("avg_recall_at_k", 0.0),
+            })
+    finally:
+        db.close()
+        if original_active:
+            update_active_pointer(case_id, original_active)
+            print(f"\n↩️  ACTIVE restaurado: {original_active}")
+
+    print("=" * 80)
+    print(f"BENCHMARK ÍNDICE COMPACTO - case_id={case_id} k={args.k} (referencia: {args.formats[0]})")
+    print("=" * 80)
+    print(f"{'formato':>8} {'tamaño MB':>10} {'p50 ms':>8} {'p95 ms':>8} {'top-k =':>8} {'recall@k':>9}  versión")
+    for row in rows:
+        print(
+            f"{row['format']:>8} {row['size_mb']:>10.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+            f"{row['overlap']:>8.1%} {row['recall']:>9.2%}  {row['version']}"
+        )
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
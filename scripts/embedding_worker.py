@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Workers de la cola persistente de builds de embeddings.
+
+El RAG encola un build cuando un caso no tiene índice ACTIVE y responde
+NO_EMBEDDINGS con el job_id; estos procesos ejecutan los builds.
+
+Uso:
+    python scripts/embedding_worker.py                     # 1 worker, indefinido
+    python scripts/embedding_worker.py --workers 3         # 3 procesos
+    python scripts/embedding_worker.py --drain             # procesar la cola y salir
+    python scripts/embedding_worker.py --enqueue CASE_001 --priority 5
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import multiprocessing
+import signal
+import threading
+
+
+def _worker_main(drain: bool) -> None:
+    from app.services.embedding_jobs import run_worker
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    try:
+        run_worker(stop_event=stop_event, drain=drain)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers de builds de embeddings en segundo plano")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos worker (default: 1)")
+    parser.add_argument("--drain", action="store_true", help="Procesar los jobs pendientes y salir")
+    parser.add_argument("--enqueue", metavar="CASE_ID", help="Encolar un build para un caso y salir")
+    parser.add_argument("--priority", type=int, default=0, help="Prioridad al encolar (mayor = antes)")
+    args = parser.parse_args()
+
+    if args.enqueue:
+        from app.services.embedding_jobs import get_embedding_job_queue
+
+        job = get_embedding_job_queue().enqueue(args.enqueue, priority=args.priority, reason="cli")
+        state = "existente" if job["deduplicated"] else "nuevo"
+        print(f"✅ Job {state}: {job['job_id']} ({job['status']}, prioridad {job['priority']})")
+        return
+
+    if args.workers <= 1:
+        _worker_main(args.drain)
+        return
+
+    processes = [
+        multiprocessing.Process(target=_worker_main, args=(args.drain,), name=f"embedding-worker-{i}")
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ Comandos disponibles:
 - cleanup: Limpiar versiones antiguas
 - validate: Validar integridad de una versión
 - rebuild: Reconstruir embeddings para un caso
+- seal: Compartir ficheros idénticos entre versiones READY (segmentos)
+- fleet: Resumen de todos los casos (versión ACTIVE, READY/FAILED, disco)
 """
 
 import sys
@@ -30,7 +32,11 @@ from app.services.vectorstore_versioning import (
     read_manifest,
     read_status,
     validate_version_integrity,
+    seal_version_segments,
+    _get_case_vectorstore_root,
 )
+from app.services.vectorstore_segments import segment_stats
+from app.services.vectorstore_fleet import scan_fleet
 from app.services.embeddings_pipeline import (
     build_embeddings_for_case,
     get_case_collection,
@@ -74,6 +80,15 @@ def cmd_list(args):
         
         print(f"{v.version:<25} {status_icon} {v.status:<9} {created_str:<25} {is_active:<8}")
     
+    stats = segment_stats(_get_case_vectorstore_root(case_id))
+    if stats["segments"]:
+        mb = 1024 * 1024
+        print(
+            f"\nSegmentos compartidos: {stats['segments']} "
+            f"({stats['bytes_on_disk'] / mb:.1f} MB en disco, "
+            f"{stats['bytes_referenced'] / mb:.1f} MB referenciados)"
+        )
+    
     print()
 
 
@@ -185,6 +200,7 @@ def cmd_validate(args):
     print("=" * 80)
     print(f"case_id: {case_id}")
     print(f"version: {version}")
+    print(f"modo: {'rápido (solo chunks cambiados)' if args.fast else 'completo'}")
     print()
     
     try:
@@ -192,7 +208,9 @@ def cmd_validate(args):
         collection = get_case_collection(case_id, version=version)
         
         # Validar
-        is_valid, errors = validate_version_integrity(case_id, version, collection)
+        is_valid, errors = validate_version_integrity(
+            case_id, version, collection, mode="fast" if args.fast else "full"
+        )
         
         if is_valid:
             print("✅ Versión VÁLIDA - Todas las validaciones pasaron correctamente")
@@ -205,6 +223,56 @@ def cmd_validate(args):
         print(f"❌ Error en validación: {e}")
 
 
+def cmd_seal(args):
+    """Sella versiones READY (p. ej. creadas antes de compartir segmentos)."""
+    case_id = args.case_id
+    versions = [args.version] if args.version else [
+        v.version for v in list_versions(case_id) if v.is_ready()
+    ]
+    
+    for version in versions:
+        try:
+            stats = seal_version_segments(case_id, version)
+            print(
+                f"✅ {version}: {stats.get('new_segments', 0)} segmentos nuevos, "
+                f"{stats.get('shared_segments', 0)} compartidos "
+                f"({stats.get('bytes_shared', 0) / (1024 * 1024):.1f} MB ahorrados)"
+            )
+        except Exception as e:
+            print(f"❌ {version}: {e}")
+
+
+def cmd_fleet(args):
+    """Resume el vectorstore de todos los casos."""
+    summaries = scan_fleet(include_sizes=not args.no_sizes, max_workers=args.workers)
+    
+    print("=" * 80)
+    print(f"VECTORSTORE DE LA FLOTA - {len(summaries)} casos")
+    print("=" * 80)
+    print(f"{'CASE_ID':<30} {'ACTIVE':<20} {'READY':>5} {'FAILED':>6} {'BUILD':>5} {'MB':>9}")
+    print("-" * 80)
+    
+    total_bytes = 0
+    for c in summaries:
+        if c.error:
+            print(f"{c.case_id:<30} ❌ {c.error}")
+            continue
+        size = f"{c.bytes_on_disk / (1024 * 1024):.1f}" if c.bytes_on_disk is not None else "-"
+        total_bytes += c.bytes_on_disk or 0
+        print(
+            f"{c.case_id:<30} {c.active_version or '⚠️  sin ACTIVE':<20} "
+            f"{c.ready:>5} {c.failed:>6} {c.building:>5} {size:>9}"
+        )
+    
+    print("-" * 80)
+    print(
+        f"Sin ACTIVE: {sum(1 for c in summaries if not c.active_version)}  "
+        f"FAILED: {sum(c.failed for c in summaries)}  "
+        + (f"Disco: {total_bytes / (1024 * 1024):.1f} MB" if not args.no_sizes else "")
+    )
+    print()
+
+
 def cmd_rebuild(args):
     """Reconstruye los embeddings para un caso."""
     case_id = args.case_id
@@ -227,7 +295,9 @@ def cmd_rebuild(args):
     try:
         db = SessionLocal()
         try:
-            version_id = build_embeddings_for_case(db=db, case_id=case_id)
+            version_id = build_embeddings_for_case(
+                db=db, case_id=case_id, embedding_dimensions=args.dimensions
+            )
             print(f"\n✅ Embeddings reconstruidos exitosamente")
             print(f"Nueva versión: {version_id}")
         finally:
@@ -269,11 +339,29 @@ def main():
     parser_validate = subparsers.add_parser("validate", help="Validar integridad")
     parser_validate.add_argument("case_id", help="ID del caso")
     parser_validate.add_argument("version", help="ID de la versión")
+    parser_validate.add_argument(
+        "--fast", action="store_true",
+        help="Validar solo los chunks añadidos desde la versión READY base (builds incrementales)",
+    )
+    
+    # Comando: seal
+    parser_seal = subparsers.add_parser("seal", help="Compartir ficheros idénticos entre versiones READY")
+    parser_seal.add_argument("case_id", help="ID del caso")
+    parser_seal.add_argument("version", nargs="?", help="ID de la versión (default: todas las READY)")
+    
+    # Comando: fleet
+    parser_fleet = subparsers.add_parser("fleet", help="Resumen de todos los casos")
+    parser_fleet.add_argument("--no-sizes", action="store_true", help="No medir bytes en disco (más rápido)")
+    parser_fleet.add_argument("--workers", type=int, default=16, help="Casos en paralelo (default: 16)")
     
     # Comando: rebuild
     parser_rebuild = subparsers.add_parser("rebuild", help="Reconstruir embeddings")
     parser_rebuild.add_argument("case_id", help="ID del caso")
     parser_rebuild.add_argument("-y", "--yes", action="store_true", help="No pedir confirmación")
+    parser_rebuild.add_argument(
+        "--dimensions", type=int, default=None,
+        help="Dimensión reducida de los embeddings (default: EMBEDDING_DIMENSIONS)",
+    )
     
     args = parser.parse_args()
     
@@ -288,6 +376,8 @@ def main():
         "activate": cmd_activate,
         "cleanup": cmd_cleanup,
         "validate": cmd_validate,
+        "seal": cmd_seal,
+        "fleet": cmd_fleet,
         "rebuild": cmd_rebuild,
     }
     
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Recolector de versiones del vectorstore de todos los casos.
+
+Borra restos de builds caídos (BUILDING huérfanas, FAILED antiguas) y, si
+hay presupuesto de disco, versiones READY antiguas hasta cumplirlo. Nunca
+borra la versión ACTIVE ni baja de --min-ready READY por caso.
+
+Uso:
+    python scripts/vectorstore_gc.py --dry-run
+    python scripts/vectorstore_gc.py --budget-gb 200
+    python scripts/vectorstore_gc.py --budget-gb 200 --min-ready 3 --building-timeout-h 12
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+
+
+def main():
+    from app.core.variables import (
+        VECTORSTORE_DISK_BUDGET_BYTES,
+        VECTORSTORE_GC_BUILDING_TIMEOUT_S,
+        VECTORSTORE_GC_FAILED_RETENTION_S,
+        VECTORSTORE_GC_MAX_MB_PER_MIN,
+        VECTORSTORE_GC_MIN_READY_PER_CASE,
+        VECTORSTORE_GC_WORKERS,
+    )
+
+    parser = argparse.ArgumentParser(description="Recolector de versiones del vectorstore (toda la flota)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo mostrar lo que se borraría")
+    parser.add_argument(
+        "--budget-gb", type=float, default=None,
+        help="Presupuesto de disco de la flota en GB (default: VECTORSTORE_DISK_BUDGET_GB o sin límite)",
+    )
+    parser.add_argument("--min-ready", type=int, default=VECTORSTORE_GC_MIN_READY_PER_CASE,
+                        help="READY a conservar por caso, ACTIVE incluida")
+    parser.add_argument("--building-timeout-h", type=float, default=VECTORSTORE_GC_BUILDING_TIMEOUT_S / 3600,
+                        help="Horas sin escrituras para considerar huérfana una versión BUILDING")
+    parser.add_argument("--failed-retention-h", type=float, default=VECTORSTORE_GC_FAILED_RETENTION_S / 3600,
+                        help="Horas que se conservan las versiones FAILED")
+    parser.add_argument("--workers", type=int, default=VECTORSTORE_GC_WORKERS, help="Borrados en paralelo")
+    parser.add_argument("--max-mb-per-min", type=int, default=VECTORSTORE_GC_MAX_MB_PER_MIN,
+                        help="Throttling de E/S: MB borrados por minuto")
+    args = parser.parse_args()
+
+    from app.services.vectorstore_gc import run_gc
+
+    budget_bytes = int(args.budget_gb * 1024 ** 3) if args.budget_gb is not None else VECTORSTORE_DISK_BUDGET_BYTES
+    report = run_gc(
+        dry_run=args.dry_run,
+        max_workers=args.workers,
+        max_mb_per_min=args.max_mb_per_min,
+        budget_bytes=budget_bytes,
+        min_ready_per_case=args.min_ready,
+        building_timeout_s=args.building_timeout_h * 3600,
+        failed_retention_s=args.failed_retention_h * 3600,
+    )
+
+    mb = 1024 * 1024
+    print("=" * 80)
+    print(f"GC DEL VECTORSTORE{' (DRY RUN)' if report.dry_run else ''} - {report.scanned_cases} casos")
+    print("=" * 80)
+    for c in report.deleted:
+        print(f"  {'·' if report.dry_run else '🗑️ '} {c.case_id}/{c.version} "
+              f"[{c.status}, {c.reason}] ~{c.reclaimable_bytes / mb:.1f} MB")
+    for error in report.errors:
+        print(f"  ❌ {error}")
+    print("-" * 80)
+    budget = f"{report.budget_bytes / mb:.1f} MB" if report.budget_bytes else "sin límite"
+    print(f"Disco antes: {report.bytes_before / mb:.1f} MB  (presupuesto: {budget})")
+    verb = "Se recuperarían" if report.dry_run else "Recuperados"
+    print(f"{verb}: {report.bytes_reclaimed / mb:.1f} MB en {len(report.deleted)} versiones")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -44,17 +44,17 @@ def test_prosecutor_enriches_with_legal_citations():
         mock_legal_rag.return_value = mock_legal_results
         
         # Mock del RAG de casos
-        with patch('app.agents.agent_2_prosecutor.logic.rag_answer_internal') as mock_rag:
+        with patch('app.agents.agent_2_prosecutor.logic.rag_answer_batch') as mock_rag:
             from app.rag.case_rag.retrieve import RAGInternalResult, ConfidenceLevel
             
-            mock_rag.return_value = RAGInternalResult(
+            mock_rag.side_effect = lambda *, questions, **kwargs: [RAGInternalResult(
                 status="OK",
                 context_text="Contexto de prueba",
                 sources=[{"document_id": "test-doc", "content": "Test content"}],
                 confidence="alta",
                 warnings=[],
                 hallucination_risk=False,
-            )
+            ) for _ in questions]
             
             # Mock de build_llm_answer
             with patch('app.agents.agent_2_prosecutor.logic.build_llm_answer') as mock_llm:
@@ -104,15 +104,11 @@ def test_legal_rag_normalization():
     
     from app.rag.legal_rag.service import query_legal_rag
     
-    # Mock de OpenAI client
+    # Mock del embedding de la consulta
     mock_embedding = [0.1] * 1536  # Embedding simulado
     
-    with patch('app.rag.legal_rag.service._get_openai_client') as mock_openai:
-        mock_client = MagicMock()
-        mock_response = MagicMock()
-        mock_response.data = [MagicMock(embedding=mock_embedding)]
-        mock_client.embeddings.create.return_value = mock_response
-        mock_openai.return_value = mock_client
+    with patch('app.rag.legal_rag.service.embed_query') as mock_embed:
+        mock_embed.return_value = mock_embedding
         
         # Mock de ChromaDB
         mock_collection = MagicMock()
@@ -0,0 +1,98 @@
+"""
+Tests del puntero ACTIVE: caché por proceso y swap atómico.
+"""
+import os
+from itertools import count
+from unittest.mock import patch
+
+import pytest
+
+import app.services.vectorstore_versioning as versioning
+from app.services.vectorstore_versioning import (
+    _get_active_pointer_path,
+    _get_version_path,
+    clear_active_version_cache,
+    create_new_version,
+    get_active_version,
+    update_active_pointer,
+    write_status,
+)
+
+
+CASE_ID = "case_active"
+
+
+@pytest.fixture(autouse=True)
+def cases_base(tmp_path, monkeypatch):
+    monkeypatch.setattr(versioning, "CASES_VECTORSTORE_BASE", tmp_path / "cases")
+    ids = count()
+    monkeypatch.setattr(versioning, "generate_version_id", lambda: f"v_20260101_0000{next(ids):02d}")
+    clear_active_version_cache()
+    yield
+    clear_active_version_cache()
+
+
+def _ready_version():
+    version_id, _ = create_new_version(CASE_ID)
+    write_status(CASE_ID, version_id, "READY")
+    return version_id
+
+
+def test_cached_lookup_does_not_touch_disk():
+    version = _ready_version()
+    update_active_pointer(CASE_ID, version)
+
+    with patch.object(versioning.os, "lstat", side_effect=AssertionError("syscall")), \
+            patch.object(versioning.logger, "info") as info:
+        for _ in range(5):
+            assert get_active_version(CASE_ID) == version
+
+    info.assert_not_called()
+
+
+def test_external_pointer_change_is_detected(monkeypatch):
+    v1, v2 = _ready_version(), _ready_version()
+    update_active_pointer(CASE_ID, v1)
+    monkeypatch.setattr(versioning, "ACTIVE_POINTER_REVALIDATE_S", 0.0)
+    assert get_active_version(CASE_ID) == v1
+
+    # Otro proceso cambia el puntero
+    active_path = _get_active_pointer_path(CASE_ID)
+    tmp = active_path.with_name("ACTIVE.other")
+    tmp.symlink_to(_get_version_path(CASE_ID, v2), target_is_directory=True)
+    os.replace(tmp, active_path)
+
+    assert get_active_version(CASE_ID) == v2
+
+
+def test_swap_never_leaves_pointer_missing():
+    v1, v2 = _ready_version(), _ready_version()
+    update_active_pointer(CASE_ID, v1)
+    active_path = _get_active_pointer_path(CASE_ID)
+    real_replace = os.replace
+    seen_during_swap = []
+
+    def _replace(src, dst):
+        if str(dst) == str(active_path):
+            seen_during_swap.append(os.path.lexists(active_path))
+        real_replace(src, dst)
+
+    with patch.object(versioning.os, "replace", side_effect=_replace):
+        update_active_pointer(CASE_ID, v2)
+
+    assert seen_during_swap == [True]
+    assert get_active_version(CASE_ID) == v2
+    assert [p.name for p in active_path.parent.iterdir() if p.name.endswith(".tmp")] == []
+
+
+def test_text_pointer_fallback_without_symlinks():
+    version = _ready_version()
+
+    with patch.object(versioning.Path, "symlink_to", side_effect=OSError("sin symlinks")):
+        update_active_pointer(CASE_ID, version)
+    clear_active_version_cache()
+
+    active_path = _get_active_pointer_path(CASE_ID)
+    assert not active_path.is_symlink()
+    assert active_path.read_text(encoding="utf-8") == version
+    assert get_active_version(CASE_ID) == version
@@ -86,7 +86,10 @@ def mock_deps():
     # get_session_factory() retorna una función que cuando se llama retorna la sesión
     mock_session_maker = lambda: mock_db
     
-    with patch("app.agents.agent_2_prosecutor.logic.rag_answer_internal", return_value=mock_rag_result) as m_rag, \
+    def _batch(*, questions, **kwargs):
+        return [mock_rag_result for _ in questions]
+    
+    with patch("app.agents.agent_2_prosecutor.logic.rag_answer_batch", side_effect=_batch) as m_rag, \
          patch("app.agents.agent_2_prosecutor.logic.query_legal_rag", return_value=mock_legal) as m_legal, \
          patch("app.agents.agent_2_prosecutor.logic.get_session_factory", return_value=mock_session_maker):
         
@@ -0,0 +1,97 @@
+"""
+Tests de la materialización del resumen de calidad documental.
+
+ESTRATEGIA: Pre-mock de sys.modules (sin BD ni Chroma) y parche del
+cálculo real para contar recálculos.
+"""
+import sys
+from unittest.mock import MagicMock, patch
+
+# ============================================================================
+# PRE-MOCK: ANTES de cualquier import de app
+# ============================================================================
+
+mock_sa = MagicMock()
+mock_sa.orm.Session = MagicMock
+sys.modules.setdefault('sqlalchemy', mock_sa)
+sys.modules.setdefault('sqlalchemy.orm', mock_sa.orm)
+sys.modules.setdefault('chromadb', MagicMock())
+sys.modules.setdefault('app.models.document', MagicMock())
+sys.modules.setdefault('app.models.document_chunk', MagicMock())
+sys.modules.setdefault('app.services.embeddings_pipeline', MagicMock())
+
+# Otros tests sustituyen el módulo bajo prueba por un MagicMock: forzar el real
+if isinstance(sys.modules.get('app.services.document_quality'), MagicMock):
+    del sys.modules['app.services.document_quality']
+
+# ============================================================================
+# Imports después de pre-mock
+# ============================================================================
+
+import pytest
+
+import app.services.document_quality as document_quality
+
+
+@pytest.fixture
+def counted_compute():
+    calls = []
+
+    def _compute(db, case_id):
+        calls.append(case_id)
+        return {"case_id": case_id, "quality_score": 90.0, "legal_risks": []}
+
+    document_quality.invalidate_document_quality()
+    with patch.object(document_quality, "compute_document_quality_summary", side_effect=_compute), \
+         patch.object(document_quality, "get_active_version", return_value="v_1") as active:
+        yield calls, active
+    document_quality.invalidate_document_quality()
+
+
+def test_second_call_is_served_materialized(counted_compute):
+    calls, _ = counted_compute
+
+    document_quality.get_document_quality_summary(db=None, case_id="case_1")
+    document_quality.get_document_quality_summary(db=None, case_id="case_1")
+
+    assert calls == ["case_1"]
+
+
+def test_invalidation_forces_recompute(counted_compute):
+    calls, _ = counted_compute
+
+    document_quality.get_document_quality_summary(db=None, case_id="case_1")
+    document_quality.invalidate_document_quality("case_1")
+    document_quality.get_document_quality_summary(db=None, case_id="case_1")
+
+    assert calls == ["case_1", "case_1"]
+
+
+def test_invalidation_is_per_case(counted_compute):
+    calls, _ = counted_compute
+
+    document_quality.get_document_quality_summary(db=None, case_id="case_1")
+    document_quality.get_document_quality_summary(db=None, case_id="case_2")
+    document_quality.invalidate_document_quality("case_2")
+    document_quality.get_document_quality_summary(db=None, case_id="case_1")
+
+    assert calls == ["case_1", "case_2"]
+
+
+def test_active_version_change_recomputes(counted_compute):
+    calls, active = counted_compute
+
+    document_quality.get_document_quality_summary(db=None, case_id="case_1")
+    active.return_value = "v_2"
+    document_quality.get_document_quality_summary(db=None, case_id="case_1")
+
+    assert calls == ["case_1", "case_1"]
+
+
+def test_callers_cannot_mutate_materialized_summary(counted_compute):
+    first = document_quality.get_document_quality_summary(db=None, case_id="case_1")
+    first["legal_risks"].append("mutación del llamador")
+
+    second = document_quality.get_document_quality_summary(db=None, case_id="case_1")
+
+    assert second["legal_risks"] == []
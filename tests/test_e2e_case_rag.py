@@ -25,7 +25,7 @@ from app.models.document_chunk import DocumentChunk
 from app.services.folder_ingestion import ingest_file_from_path
 from app.services.document_chunk_pipeline import build_document_chunks_for_case
 from app.services.embeddings_pipeline import (
-    get_chunks_for_case,
+    iter_chunks_for_case,
     get_case_collection,
     build_embeddings_for_case
 )
@@ -176,7 +176,7 @@ def test_case_rag_end_to_end(test_document):
             "La respuesta debe contener términos relacionados con el préstamo"
         
         # Verificar integridad
-        db_chunks = get_chunks_for_case(db, TEST_CASE_ID)
+        db_chunks = list(iter_chunks_for_case(db, TEST_CASE_ID))
         assert len(db_chunks) == len(chunks), "Los chunks en DB deben coincidir"
 
 
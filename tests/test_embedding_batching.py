@@ -0,0 +1,83 @@
+"""
+Tests del batching por presupuesto de tokens (embedding_batching).
+"""
+import itertools
+
+from app.services.embedding_batching import (
+    FillTracker,
+    batch_fill_report,
+    estimate_text_tokens,
+    iter_token_batches,
+    pack_by_tokens,
+)
+
+
+def test_packs_in_order_up_to_token_budget():
+    short = "a" * 700
+    long = "b" * 3000
+    texts = [short, short, long, short, long, long]
+    budget = estimate_text_tokens(long) * 2
+
+    batches = pack_by_tokens(texts, max_tokens=budget, max_items=100)
+
+    assert [t for b in batches for t in b.items] == texts
+    assert all(b.tokens <= budget for b in batches)
+    # Los chunks cortos se agrupan más que los largos
+    assert len(batches[0]) > len(batches[-1])
+
+
+def test_max_items_caps_batch():
+    batches = pack_by_tokens(["x"] * 10, max_tokens=10_000, max_items=4)
+
+    assert [len(b) for b in batches] == [4, 4, 2]
+
+
+def test_oversized_text_goes_alone():
+    huge = "z" * 10_000
+    batches = pack_by_tokens(["a", huge, "b"], max_tokens=100, max_items=100)
+
+    assert [b.items for b in batches] == [["a"], [huge], ["b"]]
+    assert batches[1].fill_ratio > 1.0
+
+
+def test_text_of_extracts_content_from_items():
+    chunks = [{"id": i, "content": "c" * 300} for i in range(6)]
+    batches = pack_by_tokens(chunks, lambda c: c["content"], max_tokens=250, max_items=100)
+
+    assert [[c["id"] for c in b.items] for b in batches] == [[0, 1], [2, 3], [4, 5]]
+
+
+def test_fill_report_ignores_trailing_partial_batch_for_min():
+    batches = pack_by_tokens(["a" * 300] * 5, max_tokens=202, max_items=100)
+
+    report = batch_fill_report(batches)
+
+    assert report["batches"] == 3
+    assert report["items"] == 5
+    assert report["min_fill"] == round(batches[0].fill_ratio, 3)
+    assert report["min_fill"] > batches[-1].fill_ratio
+    assert batch_fill_report([])["batches"] == 0
+
+
+def test_iter_token_batches_consumes_lazily():
+    consumed = []
+
+    def stream():
+        for i in itertools.count():
+            consumed.append(i)
+            yield "x" * 300
+
+    first = next(iter_token_batches(stream(), max_tokens=250, max_items=100))
+
+    assert len(first) == 2
+    # Solo se ha leído el item que cierra el primer batch
+    assert len(consumed) == 3
+
+
+def test_fill_tracker_matches_list_report():
+    batches = pack_by_tokens(["a" * 300] * 5, max_tokens=202, max_items=100)
+    tracker = FillTracker()
+    for batch in batches:
+        tracker.add(batch)
+
+    assert tracker.report() == batch_fill_report(batches)
@@ -0,0 +1,129 @@
+"""
+Tests de la dimensión de embeddings registrada por versión.
+
+Verifica:
+- validate_version_integrity exige embedding_dim == dimensión de los vectores
+  y == dimensión del build
+- Las consultas de una versión usan la dimensión de su manifest
+"""
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import app.services.embedding_providers as providers
+import app.services.vectorstore_versioning as versioning
+from app.services.embedding_providers import (
+    HashingEmbeddingProvider,
+    OpenAIEmbeddingProvider,
+    provider_for_manifest,
+)
+from app.services.vectorstore_versioning import (
+    ManifestData,
+    create_new_version,
+    read_manifest,
+    validate_version_integrity,
+    write_manifest,
+)
+
+
+CASE_ID = "case_dims"
+
+
+class _Collection:
+    def __init__(self, dim, count=2):
+        self.dim = dim
+        self._count = count
+
+    def count(self):
+        return self._count
+
+    def get(self, include, limit=None, offset=0):
+        n = max(0, min(self._count if limit is None else limit, self._count - offset))
+        return {
+            "ids": [f"chunk_{offset + i}" for i in range(n)],
+            "metadatas": [{"case_id": CASE_ID, "document_id": "doc_1"}] * n,
+            "embeddings": [[0.0] * self.dim] * n,
+        }
+
+
+@pytest.fixture
+def version(tmp_path, monkeypatch):
+    monkeypatch.setattr(versioning, "CASES_VECTORSTORE_BASE", tmp_path / "cases")
+    version_id, _ = create_new_version(CASE_ID)
+    write_manifest(CASE_ID, version_id, ManifestData(
+        case_id=CASE_ID,
+        version=version_id,
+        embedding_model="text-embedding-3-large",
+        embedding_dim=256,
+        chunking={},
+        documents=[{"doc_id": "doc_1"}],
+        total_chunks=2,
+        created_at=datetime.now().isoformat(),
+        embedding_dimensions=256,
+    ))
+    return version_id
+
+
+def test_manifest_records_requested_dimensions(version):
+    manifest = read_manifest(CASE_ID, version)
+
+    assert manifest["embedding_dim"] == 256
+    assert manifest["embedding_dimensions"] == 256
+
+
+def test_validation_accepts_matching_dimensions(version):
+    is_valid, errors = validate_version_integrity(
+        CASE_ID, version, _Collection(256),
+        expected_model="text-embedding-3-large", expected_dim=256,
+    )
+
+    assert is_valid, errors
+
+
+def test_validation_rejects_vectors_of_other_dimension(version):
+    is_valid, errors = validate_version_integrity(
+        CASE_ID, version, _Collection(3072), expected_model="text-embedding-3-large",
+    )
+
+    assert not is_valid
+    assert any("ChromaDB: 3072" in e for e in errors)
+
+
+def test_validation_rejects_build_dimension_mismatch(version):
+    is_valid, errors = validate_version_integrity(
+        CASE_ID, version, _Collection(256),
+        expected_model="text-embedding-3-large", expected_dim=1024,
+    )
+
+    assert not is_valid
+    assert any("Build: 1024" in e for e in errors)
+
+
+def test_query_provider_uses_manifest_dimensions():
+    configured = OpenAIEmbeddingProvider("text-embedding-3-large", None, client=SimpleNamespace())
+
+    with patch.object(providers, "get_embedding_provider", return_value=configured):
+        reduced = provider_for_manifest({
+            "embedding_provider": "openai",
+            "embedding_model": "text-embedding-3-large",
+            "embedding_dim": 256,
+            "embedding_dimensions": 256,
+        })
+        native = provider_for_manifest({
+            "embedding_provider": "openai",
+            "embedding_model": "text-embedding-3-large",
+            "embedding_dim": 3072,
+        })
+
+    assert reduced.dimensions == 256
+    assert reduced._client is configured._client  # Mismo cliente HTTP
+    assert native is configured
+
+
+def test_with_dimensions_changes_vector_size():
+    provider = HashingEmbeddingProvider(dimensions=512).with_dimensions(64)
+
+    assert provider.model == HashingEmbeddingProvider().model
+    assert len(provider.embed(["texto"])[0]) == 64
@@ -0,0 +1,129 @@
+"""
+Tests del ejecutor de embeddings (embedding_executor).
+
+Sin red ni esperas reales: reloj y sleep inyectados.
+"""
+import threading
+import time
+
+import pytest
+
+from app.services.embedding_executor import EmbeddingExecutor, RateBudget
+
+
+class RateLimitError(Exception):
+    """Mismo nombre que el error 429 del SDK de OpenAI."""
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _executor(**kwargs):
+    clock = _FakeClock()
+    budget = RateBudget(rpm=60_000, tpm=10_000_000, clock=clock, sleep=clock.sleep)
+    return EmbeddingExecutor(budget, sleep=lambda s: None, **kwargs)
+
+
+def test_budget_waits_when_requests_per_minute_exhausted():
+    clock = _FakeClock()
+    budget = RateBudget(rpm=2, tpm=1_000_000, clock=clock, sleep=clock.sleep)
+
+    budget.acquire(10)
+    budget.acquire(10)
+    budget.acquire(10)  # Tercera petición del minuto: espera a que se recargue
+
+    assert clock.now == pytest.approx(30.0)
+
+
+def test_budget_waits_for_tokens_per_minute():
+    clock = _FakeClock()
+    budget = RateBudget(rpm=1000, tpm=600, clock=clock, sleep=clock.sleep)
+
+    budget.acquire(600)
+    budget.acquire(300)
+
+    assert clock.now == pytest.approx(30.0)
+
+
+def test_transient_error_is_retried():
+    executor = _executor(max_retries=3)
+    attempts = []
+
+    def flaky(texts):
+        attempts.append(texts)
+        if len(attempts) < 3:
+            raise RateLimitError("429")
+        return [[1.0] for _ in texts]
+
+    assert executor.call(flaky, ["a"]) == [[1.0]]
+    assert len(attempts) == 3
+    assert executor.retries == 2
+
+
+def test_non_transient_error_is_not_retried():
+    executor = _executor(max_retries=3)
+    attempts = []
+
+    def broken(texts):
+        attempts.append(texts)
+        raise ValueError("entrada inválida")
+
+    with pytest.raises(ValueError):
+        executor.call(broken, ["a"])
+    assert len(attempts) == 1
+
+
+def test_retries_exhausted_raises():
+    executor = _executor(max_retries=2)
+
+    def always_429(texts):
+        raise RateLimitError("429")
+
+    with pytest.raises(RateLimitError):
+        executor.call(always_429, ["a"])
+    assert executor.retries == 2
+
+
+def test_run_ordered_keeps_order_and_overlaps_calls():
+    executor = _executor(max_concurrency=4)
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow(item):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02 * (5 - item % 5))  # Los primeros terminan los últimos
+        with lock:
+            active -= 1
+        return item * 10
+
+    results = list(executor.run_ordered(range(10), slow))
+
+    assert results == [(i, i * 10) for i in range(10)]
+    assert peak > 1
+
+
+def test_run_ordered_propagates_failure():
+    executor = _executor(max_concurrency=2)
+
+    def fn(item):
+        if item == 3:
+            raise RuntimeError("fallo batch 3")
+        return item
+
+    consumed = []
+    with pytest.raises(RuntimeError):
+        for item, _ in executor.run_ordered(range(6), fn):
+            consumed.append(item)
+    assert consumed == [0, 1, 2]
@@ -0,0 +1,135 @@
+"""
+Tests de la cola persistente de builds de embeddings (embedding_jobs).
+
+sqlite en tmp_path, reloj falso y build inyectado (sin BD ni Chroma).
+"""
+import pytest
+
+from app.services.embedding_jobs import (
+    PRIORITY_INTERACTIVE,
+    EmbeddingJobQueue,
+    run_worker,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return EmbeddingJobQueue(tmp_path / "jobs.sqlite3", stale_after_s=60, max_attempts=2, clock=clock)
+
+
+def test_enqueue_deduplicates_live_job_per_case(queue):
+    first = queue.enqueue("case_a")
+    again = queue.enqueue("case_a", priority=PRIORITY_INTERACTIVE)
+
+    assert not first["deduplicated"]
+    assert again["deduplicated"]
+    assert again["job_id"] == first["job_id"]
+    # Re-encolar con más prioridad la sube
+    assert queue.get(first["job_id"])["priority"] == PRIORITY_INTERACTIVE
+
+
+def test_claim_orders_by_priority_then_age(queue, clock):
+    queue.enqueue("case_old")
+    clock.now += 1
+    queue.enqueue("case_new")
+    clock.now += 1
+    queue.enqueue("case_urgent", priority=PRIORITY_INTERACTIVE)
+
+    claimed = [queue.claim("w1")["case_id"] for _ in range(3)]
+
+    assert claimed == ["case_urgent", "case_old", "case_new"]
+    assert queue.claim("w1") is None
+
+
+def test_finished_job_allows_new_build_for_case(queue):
+    job = queue.enqueue("case_a")
+    queue.claim("w1")
+    assert queue.complete(job["job_id"], "w1", "v_1")
+
+    new = queue.enqueue("case_a")
+
+    assert new["job_id"] != job["job_id"]
+    assert queue.get(job["job_id"])["status"] == "SUCCEEDED"
+    assert queue.latest_for_case("case_a")["job_id"] == new["job_id"]
+
+
+def test_stale_running_job_is_requeued_then_failed(queue, clock):
+    job = queue.enqueue("case_a")
+    queue.claim("dead_worker")
+
+    clock.now += 61
+    retried = queue.claim("w2")
+    assert retried["job_id"] == job["job_id"]
+    assert retried["attempts"] == 2
+
+    clock.now += 61
+    assert queue.claim("w3") is None
+    assert queue.get(job["job_id"])["status"] == "FAILED"
+
+
+def test_worker_runs_builds_and_reports_progress(queue):
+    ok = queue.enqueue("case_ok")
+    ko = queue.enqueue("case_ko")
+    progress = []
+
+    def build(*, case_id, progress_callback):
+        if case_id == "case_ko":
+            raise RuntimeError("validación fallida")
+        progress_callback(50, 100)
+        progress.append(queue.get(ok["job_id"])["progress_done"])
+        return "v_20260101"
+
+    processed = run_worker(queue, worker_id="w1", drain=True, build=build)
+
+    # case_ko se reintenta hasta max_attempts (2)
+    assert processed == 3
+    assert progress == [50]
+    assert queue.get(ok["job_id"])["status"] == "SUCCEEDED"
+    assert queue.get(ok["job_id"])["version_id"] == "v_20260101"
+    failed = queue.get(ko["job_id"])
+    assert failed["status"] == "FAILED"
+    assert failed["attempts"] == 2
+    assert "validación fallida" in failed["error"]
+
+
+def test_failed_build_is_requeued_until_max_attempts(queue):
+    job = queue.enqueue("case_a")
+    queue.claim("w1")
+
+    assert queue.fail(job["job_id"], "w1", "timeout OpenAI") == "QUEUED"
+    requeued = queue.get(job["job_id"])
+    assert requeued["worker_id"] is None
+    assert "timeout OpenAI" in requeued["error"]
+
+    queue.claim("w2")
+    assert queue.fail(job["job_id"], "w2", "timeout OpenAI") == "FAILED"
+    assert queue.claim("w3") is None
+
+
+def test_stale_worker_cannot_overwrite_new_owner(queue, clock):
+    job = queue.enqueue("case_a")
+    queue.claim("slow_worker")
+    clock.now += 61
+    queue.claim("w2")
+
+    # El worker lento termina después de perder el job
+    assert not queue.complete(job["job_id"], "slow_worker", "v_old")
+    assert queue.fail(job["job_id"], "slow_worker", "error tardío") is None
+
+    current = queue.get(job["job_id"])
+    assert (current["status"], current["worker_id"], current["version_id"]) == ("RUNNING", "w2", None)
+    assert queue.complete(job["job_id"], "w2", "v_new")
+    assert queue.get(job["job_id"])["version_id"] == "v_new"
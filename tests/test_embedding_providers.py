@@ -0,0 +1,123 @@
+"""
+Tests de los proveedores de embeddings (embedding_providers).
+
+Sin red: backend local por hashing y cliente OpenAI falso.
+"""
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import app.services.embedding_providers as providers
+from app.services.embedding_providers import (
+    EmbeddingProvider,
+    HashingEmbeddingProvider,
+    OpenAIEmbeddingProvider,
+    build_embedding_provider,
+    embed_texts,
+    provider_for_manifest,
+)
+from app.services.embedding_store import ContentEmbeddingStore
+
+
+def _distance(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b)) ** 0.5
+
+
+def test_hashing_provider_is_deterministic_and_normalized():
+    provider = HashingEmbeddingProvider(dimensions=256)
+
+    first = provider.embed(["Pago preferente a un acreedor vinculado"])[0]
+    again = HashingEmbeddingProvider(dimensions=256).embed(["Pago preferente a un acreedor vinculado"])[0]
+
+    assert first == again
+    assert len(first) == 256
+    assert sum(v * v for v in first) == pytest.approx(1.0)
+
+
+def test_hashing_provider_keeps_lexical_similarity():
+    provider = HashingEmbeddingProvider(dimensions=512)
+    query, related, unrelated = provider.embed([
+        "retraso en la solicitud de concurso",
+        "El administrador retrasó la solicitud del concurso de acreedores",
+        "Factura de suministro eléctrico de marzo",
+    ])
+
+    assert _distance(query, related) < _distance(query, unrelated)
+
+
+def test_openai_provider_passes_model_and_dimensions():
+    calls = []
+
+    class _Embeddings:
+        def create(self, **kwargs):
+            calls.append(kwargs)
+            return SimpleNamespace(data=[SimpleNamespace(embedding=[0.1, 0.2]) for _ in kwargs["input"]])
+
+    provider = OpenAIEmbeddingProvider(
+        "text-embedding-3-large", 256, client=SimpleNamespace(embeddings=_Embeddings())
+    )
+
+    assert provider.embed(["a", "b"]) == [[0.1, 0.2], [0.1, 0.2]]
+    assert calls == [{"model": "text-embedding-3-large", "input": ["a", "b"], "dimensions": 256}]
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError):
+        build_embedding_provider("desconocido")
+
+
+def test_provider_for_manifest_restores_build_identity():
+    provider = provider_for_manifest({
+        "embedding_provider": "local_hash",
+        "embedding_model": HashingEmbeddingProvider().model,
+        "embedding_dim": 128,
+    })
+    assert isinstance(provider, HashingEmbeddingProvider)
+    assert provider.dimensions == 128
+
+    # Manifests antiguos sin proveedor → OpenAI con el modelo registrado
+    legacy = provider_for_manifest({"embedding_model": "text-embedding-3-small", "embedding_dim": 1536})
+    assert legacy.name == "openai"
+    assert legacy.model == "text-embedding-3-small"
+
+
+def test_local_manifest_keeps_its_ngram_range():
+    built = HashingEmbeddingProvider(dimensions=64, ngram_range=(2, 4))
+
+    with patch.object(providers, "get_embedding_provider", return_value=HashingEmbeddingProvider(dimensions=64)):
+        restored = provider_for_manifest({
+            "embedding_provider": "local_hash",
+            "embedding_model": built.model,
+            "embedding_dim": 64,
+        })
+
+    assert (restored.ngram_min, restored.ngram_max) == (2, 4)
+    assert restored.embed(["alzamiento de bienes"]) == built.embed(["alzamiento de bienes"])
+
+    with pytest.raises(ValueError):
+        provider_for_manifest({"embedding_provider": "local_hash", "embedding_model": "otro", "embedding_dim": 64})
+
+
+def test_incomplete_provider_fails_on_creation():
+    class _OnlyEmbed(EmbeddingProvider):
+        def embed(self, texts):
+            return [[0.0] for _ in texts]
+
+    with pytest.raises(TypeError):
+        _OnlyEmbed("modelo")
+
+
+def test_embed_texts_uses_store_keyed_by_provider_identity(tmp_path):
+    store = ContentEmbeddingStore(disk_path=tmp_path / "store.sqlite3")
+    small = HashingEmbeddingProvider(dimensions=64)
+    large = HashingEmbeddingProvider(dimensions=128)
+
+    with patch.object(providers, "get_embedding_store", return_value=store):
+        embed_texts(["texto"], small)
+        embed_texts(["texto"], small)
+        vectors = embed_texts(["texto"], large)
+
+    assert len(vectors[0]) == 128
+    assert store.stats()["hits"] == 1
+    assert store.stats()["entries"] == 2
@@ -0,0 +1,84 @@
+"""
+Tests del almacén de embeddings por contenido (embedding_store).
+
+Sin red: el proveedor es una función que cuenta llamadas.
+"""
+from app.services.embedding_store import ContentEmbeddingStore
+
+
+class _CountingProvider:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 0.5, -0.25] for t in texts]
+
+
+def test_shared_text_embedded_once_across_stores(tmp_path):
+    path = tmp_path / "store.sqlite3"
+    provider = _CountingProvider()
+
+    # Dos builds distintos (otro caso, otro proceso) comparten el fichero
+    ContentEmbeddingStore(disk_path=path).get_many(["Cláusula tipo", "Caso A"], provider)
+    store = ContentEmbeddingStore(disk_path=path)
+    vectors = store.get_many(["Caso B", "Cláusula tipo"], provider)
+
+    assert provider.calls == [["Cláusula tipo", "Caso A"], ["Caso B"]]
+    assert vectors[1] == [float(len("Cláusula tipo")), 0.5, -0.25]
+    stats = store.stats()
+    assert stats["hits"] == 1
+    assert stats["total_texts_served"] == 1
+    assert stats["total_texts_embedded"] == 3
+
+
+def test_duplicates_in_batch_and_full_hit_skip_provider(tmp_path):
+    store = ContentEmbeddingStore(disk_path=tmp_path / "store.sqlite3")
+    provider = _CountingProvider()
+
+    store.get_many(["igual", "igual", "otro"], provider)
+    store.get_many(["otro", "igual"], provider)
+
+    assert provider.calls == [["igual", "otro"]]
+    assert store.stats()["api_calls"] == 1
+
+
+def test_model_and_dimensions_are_part_of_the_key(tmp_path):
+    store = ContentEmbeddingStore(disk_path=tmp_path / "store.sqlite3")
+    provider = _CountingProvider()
+
+    store.get_many(["texto"], provider, model="m1")
+    store.get_many(["texto"], provider, model="m2")
+    store.get_many(["texto"], provider, model="m1", dimensions=256)
+
+    assert len(provider.calls) == 3
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path, monkeypatch):
+    import app.services.embedding_store as embedding_store
+
+    monkeypatch.setattr(embedding_store, "_PRUNE_EVERY_WRITES", 1)
+    # 3 floats32 = 12 bytes por vector → caben 2 (también tras podar al 90%)
+    store = ContentEmbeddingStore(disk_path=tmp_path / "store.sqlite3", max_bytes=30)
+    provider = _CountingProvider()
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(embedding_store.time, "time", lambda: float(next(clock)))
+
+    store.get_many(["a"], provider)
+    store.get_many(["b"], provider)
+    store.get_many(["a"], provider)  # "a" pasa a ser el más reciente
+    store.get_many(["c"], provider)  # supera el máximo → sale "b"
+
+    assert store.stats()["entries"] == 2
+    store.get_many(["a", "c"], provider)
+    assert provider.calls == [["a"], ["b"], ["c"]]
+
+
+def test_disabled_store_always_calls_provider():
+    store = ContentEmbeddingStore(disk_path=None)
+    provider = _CountingProvider()
+
+    store.get_many(["x"], provider)
+    store.get_many(["x"], provider)
+
+    assert len(provider.calls) == 2
@@ -22,7 +22,7 @@ from app.models.document_chunk import DocumentChunk
 from app.services.folder_ingestion import ingest_file_from_path
 from app.services.document_chunk_pipeline import build_document_chunks_for_case
 from app.services.embeddings_pipeline import (
-    get_chunks_for_case,
+    iter_chunks_for_case,
     get_case_collection,
     build_embeddings_for_case
 )
@@ -268,7 +268,7 @@ def test_end_to_end_flow(test_document_path):
         print("\n[VERIFICACIONES FINALES]")
         
         # Verificar integridad de datos
-        db_chunks = get_chunks_for_case(db, TEST_CASE_ID)
+        db_chunks = list(iter_chunks_for_case(db, TEST_CASE_ID))
         assert len(db_chunks) == len(chunks), "Los chunks en DB deben coincidir"
         
         print(f"  ✅ Integridad de datos verificada")
@@ -0,0 +1,93 @@
+"""
+Tests de la reutilización incremental de vectores (embeddings_pipeline).
+
+ESTRATEGIA: Pre-mock de sys.modules (sin Chroma, BD ni OpenAI) y colección
+previa falsa.
+
+Verifica:
+- Solo se reutilizan chunks con el MISMO texto en la versión previa
+- Chunks nuevos o modificados quedan pendientes de embeber
+- Versión ACTIVE con otro modelo/dimensión → build completo
+"""
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# ============================================================================
+# PRE-MOCK: ANTES de cualquier import de app
+# ============================================================================
+
+mock_sa = MagicMock()
+mock_sa.orm.Session = MagicMock
+sys.modules.setdefault('sqlalchemy', mock_sa)
+sys.modules.setdefault('sqlalchemy.orm', mock_sa.orm)
+sys.modules.setdefault('openai', MagicMock())
+sys.modules.setdefault('chromadb', MagicMock())
+sys.modules.setdefault('dotenv', MagicMock())
+sys.modules.setdefault('app.models.document', MagicMock())
+sys.modules.setdefault('app.models.document_chunk', MagicMock())
+
+# Otros tests sustituyen el módulo bajo prueba por un MagicMock: forzar el real
+if isinstance(sys.modules.get('app.services.embeddings_pipeline'), MagicMock):
+    del sys.modules['app.services.embeddings_pipeline']
+
+# ============================================================================
+# Imports después de pre-mock
+# ============================================================================
+
+import app.services.embeddings_pipeline as pipeline
+
+
+class _PreviousCollection:
+    def __init__(self, stored):
+        self.stored = stored  # chunk_id -> (texto, vector)
+
+    def get(self, *, ids, include):
+        found = [i for i in ids if i in self.stored]
+        return {
+            "ids": found,
+            "documents": [self.stored[i][0] for i in found],
+            "embeddings": [self.stored[i][1] for i in found],
+        }
+
+
+def _chunk(chunk_id, content):
+    return SimpleNamespace(chunk_id=chunk_id, content=content)
+
+
+def test_only_unchanged_chunks_are_reused():
+    previous = _PreviousCollection({
+        "chunk_a": ("texto a", [0.1, 0.2]),
+        "chunk_b": ("texto b ANTIGUO", [0.3, 0.4]),
+    })
+    batch = [_chunk("chunk_a", "texto a"), _chunk("chunk_b", "texto b"), _chunk("chunk_c", "nuevo")]
+
+    reusable = pipeline._fetch_reusable_vectors(previous, batch)
+
+    assert reusable == {"chunk_a": [0.1, 0.2]}
+
+
+def test_no_previous_version_reuses_nothing():
+    assert pipeline._fetch_reusable_vectors(None, [_chunk("chunk_a", "x")]) == {}
+
+
+def test_incompatible_active_version_forces_full_build():
+    manifest = {"embedding_model": "otro-modelo", "embedding_dim": 3072}
+    with patch.object(pipeline, "get_active_version", return_value="v_1"), \
+         patch.object(pipeline, "read_manifest", return_value=manifest), \
+         patch.object(pipeline, "get_case_collection") as open_collection:
+        version, collection = pipeline._open_reuse_source("case_1", 3072)
+
+    assert (version, collection) == (None, None)
+    open_collection.assert_not_called()
+
+
+def test_compatible_active_version_is_opened():
+    manifest = {"embedding_model": pipeline.EMBEDDING_MODEL, "embedding_dim": 3072}
+    with patch.object(pipeline, "get_active_version", return_value="v_1"), \
+         patch.object(pipeline, "read_manifest", return_value=manifest), \
+         patch.object(pipeline, "get_case_collection", return_value="coleccion") as open_collection:
+        version, collection = pipeline._open_reuse_source("case_1", 3072)
+
+    assert (version, collection) == ("v_1", "coleccion")
+    open_collection.assert_called_once_with("case_1", "v_1")
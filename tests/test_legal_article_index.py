@@ -0,0 +1,161 @@
+"""
+Tests del índice artículo → chunks de la Ley Concursal (legal_article_index)
+y de la consulta directa por artículo del servicio legal.
+
+ESTRATEGIA: Pre-mock de chromadb/dotenv; texto consolidado sintético con
+offsets de chunk conocidos.
+"""
+import sys
+from unittest.mock import MagicMock
+
+# ============================================================================
+# PRE-MOCK: ANTES de cualquier import de app
+# ============================================================================
+
+sys.modules.setdefault('chromadb', MagicMock())
+sys.modules.setdefault('dotenv', MagicMock())
+
+# ============================================================================
+# Imports después de pre-mock
+# ============================================================================
+
+import pytest
+
+from app.rag.legal_rag import service
+from app.services.legal_article_index import (
+    ArticleIndex,
+    article_in_query,
+    build_article_index,
+    get_article_index,
+    write_article_index,
+)
+
+
+TEXT = (
+    "ÍNDICE\n"
+    "Artículo 5\n"
+    "Artículo 443\n"
+    "Artículo 5. Deber de solicitar la declaración de concurso.\n"
+    "1. El deudor deberá solicitar la declaración de concurso dentro de los dos meses.\n"
+    "Artículo 443. Supuestos especiales.\n"
+    "En todo caso, el concurso se calificará como culpable en los siguientes supuestos:\n"
+    "1.º Cuando el deudor se hubiera alzado con la totalidad o parte de sus bienes.\n"
+    "2.º Cuando hubieran salido fraudulentamente del patrimonio del deudor bienes.\n"
+)
+
+
+def _chunks(bounds):
+    return [
+        {
+            "text": TEXT[start:end],
+            "metadata": {"chunk_id": f"LC-FULL-{i:04d}", "char_start": str(start), "char_end": str(end)},
+        }
+        for i, (start, end) in enumerate(bounds)
+    ]
+
+
+@pytest.fixture
+def index():
+    art5 = TEXT.index("Artículo 5.")
+    art443 = TEXT.index("Artículo 443.")
+    middle = TEXT.index("1.º")
+    # chunk 0: índice del BOE; chunk 1: art. 5 + cabecera 443; chunks 2-3: resto del 443
+    chunks = _chunks([(0, art5), (art5, middle), (middle, middle + 60), (middle + 60, len(TEXT))])
+    return ArticleIndex(build_article_index(TEXT, chunks, "hash"))
+
+
+def test_articles_map_to_every_chunk_they_span(index):
+    assert index.chunk_ids("5") == ["LC-FULL-0001"]
+    assert index.chunk_ids("443") == ["LC-FULL-0001", "LC-FULL-0002", "LC-FULL-0003"]
+    assert index.title("Art. 443 LC") == "Supuestos especiales."
+    assert "LC-FULL-0000" not in index.chunk_ids("5")  # Índice del BOE sin cabeceras reales
+
+
+def test_citation_checks_accept_any_format(index):
+    assert index.has_article("Art. 443 LC")
+    assert index.has_article("art. 443.1º")
+    assert "Artículo 5" in index
+    assert not index.has_article("Art. 999")
+    assert not index.has_article("sin número")
+
+
+def test_lookup_returns_chunks_in_text_order(index):
+    chunks = index.lookup("443", limit=2)
+
+    assert [c["chunk_id"] for c in chunks] == ["LC-FULL-0001", "LC-FULL-0002"]
+    assert chunks[1]["text"].startswith("1.º")
+
+
+def test_index_reloads_after_reingest(tmp_path):
+    path = tmp_path / "article_index.json"
+    write_article_index(build_article_index(TEXT, _chunks([(0, len(TEXT))]), "h1"), path)
+    assert get_article_index(path).source_hash == "h1"
+
+    write_article_index(build_article_index(TEXT, _chunks([(0, len(TEXT))]), "h2-nuevo"), path)
+
+    assert get_article_index(path).source_hash == "h2-nuevo"
+    assert get_article_index(tmp_path / "no_existe.json") is None
+
+
+def test_article_queries_are_detected():
+    assert article_in_query("art. 443 LC") == "443"
+    assert article_in_query("Artículo 5 de la Ley Concursal") == "5"
+    assert article_in_query("culpabilidad por alzamiento de bienes art. 443") is None
+
+
+def test_query_naming_an_article_skips_vector_search(index, monkeypatch):
+    monkeypatch.setattr(service, "get_article_index", lambda: index)
+    monkeypatch.setattr(service, "embed_query", MagicMock(side_effect=AssertionError("embedding")))
+    monkeypatch.setattr(service, "_search_legal_sources", MagicMock(side_effect=AssertionError("Chroma")))
+
+    results = service.query_legal_rag("art. 443 LC", top_k=5, include_jurisprudencia=False)
+
+    assert [r["citation"] for r in results] == ["Art. 443 Ley Concursal"] * 3
+    assert results[0]["relevance"] == "alta"
+    assert service.lookup_legal_article("Art. 999") == []
+
+
+def test_article_query_still_searches_jurisprudencia(index, monkeypatch):
+    searched = []
+    monkeypatch.setattr(service, "get_article_index", lambda: index)
+    monkeypatch.setattr(service, "get_legal_result_cache", lambda: MagicMock(get=MagicMock(return_value=None)))
+    monkeypatch.setattr(
+        service, "_embed_for_sources",
+        lambda query, sources: {source: [0.1] for source in sources},
+    )
+
+    def _search(sources, query_embeddings, top_k):
+        searched.extend(sources)
+        return [{
+            "content": "El alzamiento de bienes determina la culpabilidad.",
+            "metadata": {"court": "TS", "date": "2023-01-15"},
+            "score": 0.5,
+            "source": "jurisprudencia",
+        }]
+
+    monkeypatch.setattr(service, "_search_legal_sources", _search)
+
+    results = service.query_legal_rag("art. 443 LC", top_k=5, include_jurisprudencia=True)
+
+    assert searched == ["jurisprudencia"]  # La ley sale del índice
+    assert sorted(r["source"] for r in results) == ["jurisprudencia"] + ["ley"] * 3
+
+
+def test_bis_articles_are_distinct_keys():
+    text = (
+        "Artículo 5. Deber de solicitar la declaración de concurso.\n"
+        "Texto del cinco.\n"
+        "Artículo 5 bis. Comunicación de negociaciones.\n"
+        "Texto del cinco bis.\n"
+    )
+    bis = text.index("Artículo 5 bis")
+    chunks = [
+        {"text": text[:bis], "metadata": {"chunk_id": "c0", "char_start": "0", "char_end": str(bis)}},
+        {"text": text[bis:], "metadata": {"chunk_id": "c1", "char_start": str(bis), "char_end": str(len(text))}},
+    ]
+    index = ArticleIndex(build_article_index(text, chunks, "hash"))
+
+    assert index.chunk_ids("Art. 5") == ["c0"]
+    assert index.chunk_ids("Art. 5 bis LC") == ["c1"]
+    assert index.title("artículo 5 BIS") == "Comunicación de negociaciones."
+    assert article_in_query("art. 5 bis") == "5 bis"
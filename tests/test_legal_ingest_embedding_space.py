@@ -0,0 +1,119 @@
+"""
+Tests del cambio de espacio vectorial en la ingesta legal
+(ingest_legal._is_same_embedding_space y re-ingesta con otra dimensión).
+
+ESTRATEGIA: Pre-mock de chromadb/dotenv; proveedores sin red y un cliente
+Chroma falso que, como el HNSW real, fija la dimensión de la colección.
+"""
+import sys
+from unittest.mock import MagicMock
+
+# ============================================================================
+# PRE-MOCK: ANTES de cualquier import de app
+# ============================================================================
+
+sys.modules.setdefault('chromadb', MagicMock())
+sys.modules.setdefault('dotenv', MagicMock())
+
+# ============================================================================
+# Imports después de pre-mock
+# ============================================================================
+
+import json
+
+import pytest
+
+import app.rag.legal_rag.ingest_legal as ingest
+from app.rag.legal_rag.ingest_legal import _is_same_embedding_space
+from app.services.embedding_providers import HashingEmbeddingProvider, provider_for_manifest
+
+
+LEGACY = {"hash": "abc", "total_articles": 837}  # Sin embedding_provider
+
+
+def test_legacy_corpus_is_openai_native():
+    native = provider_for_manifest({})
+
+    assert _is_same_embedding_space(LEGACY, native)
+    assert not _is_same_embedding_space(LEGACY, native.with_dimensions(256))
+    assert not _is_same_embedding_space(LEGACY, HashingEmbeddingProvider(dimensions=64))
+
+
+def test_recorded_identity_must_match():
+    metadata = {
+        "hash": "abc",
+        "embedding_provider": "local_hash",
+        "embedding_model": HashingEmbeddingProvider().model,
+        "embedding_dim": 64,
+    }
+
+    assert _is_same_embedding_space(metadata, HashingEmbeddingProvider(dimensions=64))
+    assert not _is_same_embedding_space(metadata, HashingEmbeddingProvider(dimensions=128))
+
+
+def test_nothing_ingested_yet_needs_no_rebuild():
+    assert _is_same_embedding_space({}, HashingEmbeddingProvider(dimensions=64))
+
+
+class _FakeCollection:
+    def __init__(self):
+        self.dim = None
+        self.ids = []
+
+    def delete(self, ids=None, where=None):
+        # Como Chroma: sin ids/where no borra nada y la dimensión se queda
+        pass
+
+    def add(self, ids, documents, metadatas, embeddings):
+        dim = len(embeddings[0])
+        if self.dim is not None and dim != self.dim:
+            raise ValueError(f"Embedding dimension {dim} does not match collection dimensionality {self.dim}")
+        self.dim = dim
+        self.ids.extend(ids)
+
+
+class _FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def list_collections(self):
+        return list(self.collections)
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+    def get_or_create_collection(self, name, metadata=None):
+        return self.collections.setdefault(name, _FakeCollection())
+
+
+@pytest.fixture
+def jurisprudencia(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "ts_2024_01_01.txt").write_text("Sentencia " * 40, encoding="utf-8")
+    client = _FakeClient()
+    monkeypatch.setattr(ingest.chromadb, "PersistentClient", lambda path: client)
+    monkeypatch.setattr(ingest, "LEGAL_JUR_RAW", raw)
+    monkeypatch.setattr(ingest, "LEGAL_JUR_METADATA", tmp_path / "metadata.json")
+    monkeypatch.setattr(ingest, "LEGAL_JURISPRUDENCIA_VECTORSTORE", tmp_path / "vectorstore")
+    monkeypatch.setattr(ingest, "LEGAL_MATRIX_INDEX_ENABLED", False)
+    monkeypatch.setattr(ingest, "get_embedding_provider", lambda: HashingEmbeddingProvider(dimensions=64))
+    monkeypatch.setattr(ingest, "_embed_texts", lambda provider, texts: provider.embed(texts))
+    monkeypatch.setattr(
+        ingest, "chunk_jurisprudencia",
+        lambda text, filename: [{"text": text, "metadata": {"chunk_id": f"jur_{filename}_0"}}],
+    )
+    return client, tmp_path / "metadata.json"
+
+
+def test_reingest_at_new_dimension_recreates_collection(jurisprudencia):
+    client, metadata_path = jurisprudencia
+    ingest.ingest_jurisprudencia()
+    assert client.collections["chunks"].dim == 64
+
+    result = ingest.ingest_jurisprudencia(embedding_dimensions=32)
+
+    assert result["status"] == "success"
+    assert client.collections["chunks"].dim == 32
+    assert client.collections["chunks"].ids == ["jur_ts_2024_01_01.txt_0"]
+    assert json.loads(metadata_path.read_text(encoding="utf-8"))["embedding_dim"] == 32
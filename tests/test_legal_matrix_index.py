@@ -0,0 +1,146 @@
+"""
+Tests del índice matricial exacto del corpus legal (legal_matrix_index).
+
+Vectores aleatorios fijos: los resultados se comparan con la fuerza bruta
+L2² (lo que devolvería Chroma con el espacio por defecto).
+"""
+import os
+import shutil
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import app.services.legal_matrix_index as matrix_module
+from app.services.legal_matrix_index import (
+    LegalMatrixIndex,
+    build_from_collection,
+    load_matrix_index,
+    matrix_snapshot_path,
+    write_matrix_snapshot,
+)
+
+
+def _corpus(n=40, dim=16, seed=7):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"ley_{i}" for i in range(n)]
+    documents = [f"Artículo {i}" for i in range(n)]
+    metadatas = [{"article": str(i)} for i in range(n)]
+    return ids, documents, metadatas, vectors
+
+
+def test_snapshot_is_normalized_and_memory_mapped(tmp_path):
+    ids, documents, metadatas, vectors = _corpus()
+    path = write_matrix_snapshot(tmp_path / "ley_matrix", ids, documents, metadatas, vectors, "h1")
+
+    index = LegalMatrixIndex(path)
+
+    assert isinstance(index.vectors, np.memmap)
+    assert index.vectors.dtype == np.float32 and index.vectors.flags["C_CONTIGUOUS"]
+    assert np.allclose(np.linalg.norm(index.vectors, axis=1), 1.0, atol=1e-5)
+    assert index.count() == len(ids)
+
+
+def test_query_matches_exact_l2_search(tmp_path):
+    ids, documents, metadatas, vectors = _corpus()
+    index = LegalMatrixIndex(
+        write_matrix_snapshot(tmp_path / "ley_matrix", ids, documents, metadatas, vectors, "h1")
+    )
+    query = vectors[3] + 0.05
+
+    result = index.query([query.tolist()], n_results=5, include=["documents", "metadatas", "distances"])
+
+    expected = ((vectors - query) ** 2).sum(axis=1)
+    order = np.argsort(expected)[:5]
+    assert result["ids"][0] == [ids[i] for i in order]
+    assert result["documents"][0][0] == "Artículo 3"
+    assert np.allclose(result["distances"][0], expected[order], rtol=1e-4, atol=1e-4)
+
+
+def test_stale_or_missing_snapshot_is_not_loaded(tmp_path):
+    ids, documents, metadatas, vectors = _corpus()
+    path = write_matrix_snapshot(tmp_path / "ley_matrix", ids, documents, metadatas, vectors, "h1")
+
+    assert load_matrix_index(path, "h1") is not None
+    assert load_matrix_index(path, "h2") is None
+    assert load_matrix_index(tmp_path / "no_existe", "h1") is None
+
+
+def test_rebuild_replaces_snapshot_atomically(tmp_path):
+    ids, documents, metadatas, vectors = _corpus()
+    path = tmp_path / "ley_matrix"
+    write_matrix_snapshot(path, ids, documents, metadatas, vectors, "h1")
+
+    class _Collection:
+        def get(self, include):
+            return {"ids": ids[:10], "documents": documents[:10],
+                    "metadatas": metadatas[:10], "embeddings": vectors[:10]}
+
+    build_from_collection(path, _Collection(), "h2")
+
+    index = load_matrix_index(path, "h2")
+    assert index.count() == 10
+    # Puntero + generación vigente + la anterior; sin temporales
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names[-1] == "ley_matrix" and len(names) == 3
+    assert not any(name.endswith((".tmp", ".ptr")) for name in names)
+
+
+def test_snapshot_path_never_disappears_while_publishing(tmp_path, monkeypatch):
+    ids, documents, metadatas, vectors = _corpus()
+    path = tmp_path / "ley_matrix"
+    write_matrix_snapshot(path, ids, documents, metadatas, vectors, "h1")
+    real_replace = os.replace
+    seen = []
+
+    def _replace(src, dst):
+        seen.append(load_matrix_index(path) is not None)
+        real_replace(src, dst)
+
+    monkeypatch.setattr(matrix_module.os, "replace", _replace)
+    write_matrix_snapshot(path, ids, documents, metadatas, vectors, "h2")
+
+    assert seen == [True]  # Un único swap, con la instantánea anterior visible
+    assert load_matrix_index(path, "h2") is not None
+
+
+def test_old_generations_are_pruned(tmp_path):
+    ids, documents, metadatas, vectors = _corpus()
+    path = tmp_path / "ley_matrix"
+    for fingerprint in ("h1", "h2", "h3"):
+        write_matrix_snapshot(path, ids, documents, metadatas, vectors, fingerprint)
+
+    generations = [p for p in tmp_path.iterdir() if p.name != "ley_matrix"]
+    assert len(generations) == 2
+    assert load_matrix_index(path, "h3") is not None
+
+
+def test_snapshot_without_pointer_is_migrated(tmp_path):
+    ids, documents, metadatas, vectors = _corpus()
+    path = tmp_path / "ley_matrix"
+    write_matrix_snapshot(path, ids, documents, metadatas, vectors, "h1")
+    legacy = tmp_path / "legacy"
+    shutil.copytree(path, legacy)  # Formato anterior: directorio real
+    path.unlink()
+    legacy.rename(path)
+
+    write_matrix_snapshot(path, ids, documents, metadatas, vectors, "h2")
+
+    assert not (path.is_dir() and not path.is_symlink())
+    assert load_matrix_index(path, "h2") is not None
+
+
+def test_snapshot_lives_next_to_vectorstore(tmp_path):
+    assert matrix_snapshot_path(tmp_path / "legal" / "ley_concursal") == (
+        tmp_path / "legal" / "ley_concursal_matrix"
+    )
+
+
+def test_snapshot_does_not_modify_caller_embeddings(tmp_path):
+    ids, documents, metadatas, vectors = _corpus()
+    original = vectors.copy()
+
+    write_matrix_snapshot(tmp_path / "ley_matrix", ids, documents, metadatas, vectors, "h1")
+
+    assert np.array_equal(vectors, original)
@@ -0,0 +1,167 @@
+"""
+Tests de las colecciones legales del proceso y la búsqueda concurrente
+de ley y jurisprudencia (legal_rag.service).
+
+ESTRATEGIA: Pre-mock de chromadb/dotenv y colecciones falsas.
+
+Verifica:
+- La colección se abre una sola vez (sin get_or_create) y se reutiliza
+- Una re-ingesta (metadata.json nuevo) la vuelve a resolver
+- Ley y jurisprudencia se consultan a la vez, en el orden de fuentes
+"""
+import json
+import sys
+import threading
+from unittest.mock import MagicMock
+
+# ============================================================================
+# PRE-MOCK: ANTES de cualquier import de app
+# ============================================================================
+
+sys.modules.setdefault('chromadb', MagicMock())
+sys.modules.setdefault('dotenv', MagicMock())
+
+# ============================================================================
+# Imports después de pre-mock
+# ============================================================================
+
+import pytest
+
+import app.services.embedding_providers as providers
+from app.rag.legal_rag import service
+from app.services.embedding_providers import HashingEmbeddingProvider
+
+
+class _Collection:
+    def __init__(self, source, barrier=None):
+        self.source = source
+        self.barrier = barrier
+
+    def count(self):
+        return 1
+
+    def query(self, query_embeddings, n_results, include):
+        if self.barrier is not None:
+            # Solo pasa si la otra fuente se consulta a la vez
+            self.barrier.wait(timeout=5)
+        return {
+            "ids": [[f"{self.source}_1"]],
+            "documents": [[f"Texto {self.source}"]],
+            "metadatas": [[{"article": "165", "court": "TS"}]],
+            "distances": [[0.5]],
+        }
+
+
+@pytest.fixture(autouse=True)
+def fresh_collections():
+    service.clear_legal_collections()
+    yield
+    service.clear_legal_collections()
+
+
+def test_collection_opened_once_read_only(tmp_path, monkeypatch):
+    client = MagicMock()
+    client.get_collection.return_value = _Collection("ley")
+    persistent = MagicMock(return_value=client)
+    monkeypatch.setattr(service.chromadb, "PersistentClient", persistent)
+    metadata = tmp_path / "metadata.json"
+    metadata.write_text("{}", encoding="utf-8")
+
+    first = service._get_legal_collection(tmp_path, "chunks", metadata_path=metadata)
+    second = service._get_legal_collection(tmp_path, "chunks", metadata_path=metadata)
+
+    assert first is second
+    assert persistent.call_count == 1
+    client.get_or_create_collection.assert_not_called()
+
+
+def test_reingest_reopens_collection(tmp_path, monkeypatch):
+    client = MagicMock()
+    client.get_collection.side_effect = [_Collection("old"), _Collection("new")]
+    monkeypatch.setattr(service.chromadb, "PersistentClient", MagicMock(return_value=client))
+    metadata = tmp_path / "metadata.json"
+    metadata.write_text('{"hash": "a"}', encoding="utf-8")
+
+    old = service._get_legal_collection(tmp_path, "chunks", metadata_path=metadata)
+    metadata.write_text('{"hash": "bb"}', encoding="utf-8")
+    new = service._get_legal_collection(tmp_path, "chunks", metadata_path=metadata)
+
+    assert (old.source, new.source) == ("old", "new")
+
+
+def test_missing_vectorstore_is_not_created(tmp_path):
+    missing = tmp_path / "no_ingerido"
+
+    with pytest.raises(FileNotFoundError):
+        service._get_legal_collection(missing, "chunks")
+    assert not missing.exists()
+
+
+def test_sources_are_searched_concurrently(monkeypatch):
+    barrier = threading.Barrier(2)
+    collections = {
+        service.LEGAL_LEY_VECTORSTORE: _Collection("ley", barrier),
+        service.LEGAL_JURISPRUDENCIA_VECTORSTORE: _Collection("jurisprudencia", barrier),
+    }
+    monkeypatch.setattr(
+        service, "_get_legal_collection",
+        lambda path, name="chunks", metadata_path=None: collections[path],
+    )
+
+    raw = service._search_legal_sources(
+        ["ley", "jurisprudencia"], {"ley": [0.1, 0.2], "jurisprudencia": [0.3, 0.4]}, 5
+    )
+
+    assert [r["source"] for r in raw] == ["ley", "jurisprudencia"]
+    assert not barrier.broken
+
+
+def test_matrix_backend_falls_back_to_chroma(monkeypatch):
+    collection = _Collection("ley")
+    monkeypatch.setattr(service, "LEGAL_MATRIX_INDEX_ENABLED", True)
+    monkeypatch.setattr(service, "_get_legal_matrix", MagicMock(side_effect=RuntimeError("sin numpy")))
+    monkeypatch.setattr(
+        service, "_get_legal_collection",
+        lambda path, name="chunks", metadata_path=None: collection,
+    )
+
+    assert service._get_legal_search_backend("ley") is collection
+
+
+@pytest.fixture
+def legal_metadata(tmp_path, monkeypatch):
+    paths = {"ley": tmp_path / "ley.json", "jurisprudencia": tmp_path / "jur.json"}
+    monkeypatch.setattr(service, "_LEGAL_METADATA", paths)
+    # Configuración actual distinta de la del corpus ingerido
+    monkeypatch.setattr(providers, "get_embedding_provider", lambda: HashingEmbeddingProvider(dimensions=64))
+    service._legal_query_provider_for.cache_clear()
+    yield paths
+    service._legal_query_provider_for.cache_clear()
+
+
+def test_legacy_legal_metadata_resolves_to_openai_native(legal_metadata):
+    legal_metadata["ley"].write_text(json.dumps({"hash": "abc"}), encoding="utf-8")
+
+    provider = service._legal_query_provider("ley")
+
+    assert provider.name == "openai"
+    assert provider.dimensions is None
+
+
+def test_each_source_uses_its_own_provider(legal_metadata, monkeypatch):
+    legal_metadata["ley"].write_text(json.dumps({"hash": "abc"}), encoding="utf-8")
+    legal_metadata["jurisprudencia"].write_text(json.dumps({
+        "embedding_provider": "local_hash",
+        "embedding_model": HashingEmbeddingProvider().model,
+        "embedding_dim": 32,
+    }), encoding="utf-8")
+    calls = []
+    monkeypatch.setattr(
+        service, "embed_query",
+        lambda query, provider: calls.append(provider.name) or [float(len(calls))],
+    )
+
+    embeddings = service._embed_for_sources("culpabilidad", ["ley", "jurisprudencia"])
+
+    assert sorted(calls) == ["local_hash", "openai"]
+    assert embeddings["ley"] != embeddings["jurisprudencia"]
@@ -0,0 +1,85 @@
+"""
+Tests de la caché de resultados del RAG legal (legal_result_cache).
+
+Sin Chroma ni red: resultados fijos, reloj falso y metadata.json en tmp_path.
+"""
+import os
+
+from app.services.legal_result_cache import (
+    LegalResultCache,
+    corpus_fingerprint,
+    legal_cache_key,
+)
+
+
+RESULTS = [{"citation": "Art. 165 LC", "text": "Culpabilidad...", "source": "ley"}]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_depends_on_top_k_sources_and_corpus():
+    base = legal_cache_key("culpabilidad", 5, ["ley"], "h1")
+
+    assert legal_cache_key("  culpabilidad ", 5, ["ley"], "h1") == base
+    assert legal_cache_key("culpabilidad", 10, ["ley"], "h1") != base
+    assert legal_cache_key("culpabilidad", 5, ["ley", "jurisprudencia"], "h1") != base
+    assert legal_cache_key("culpabilidad", 5, ["ley"], "h2") != base
+
+
+def test_reingest_changes_corpus_fingerprint(tmp_path):
+    metadata = tmp_path / "metadata.json"
+    metadata.write_text('{"ingestion_date": "2026-01-01"}', encoding="utf-8")
+    before = corpus_fingerprint([metadata])
+
+    metadata.write_text('{"ingestion_date": "2026-02-01"}', encoding="utf-8")
+    os.utime(metadata, ns=(1, 1))
+
+    assert corpus_fingerprint([metadata]) != before
+    assert corpus_fingerprint([tmp_path / "no_existe.json"]) != before
+
+
+def test_lru_bound_and_ttl_expiry():
+    clock = _Clock()
+    cache = LegalResultCache(memory_size=2, ttl_s=60, disk_path=None, clock=clock)
+    for key in ("a", "b", "c"):
+        cache.put(key, RESULTS)
+
+    assert cache.get("a") is None  # Desalojada por LRU
+    assert cache.get("c") == RESULTS
+
+    clock.now += 61
+    assert cache.get("c") is None
+    stats = cache.stats()
+    assert stats["memory_entries"] == 1
+    assert stats["expired"] == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_disk_tier_survives_restart_and_respects_ttl(tmp_path):
+    clock = _Clock()
+    path = tmp_path / "legal.sqlite3"
+    LegalResultCache(disk_path=path, ttl_s=60, clock=clock).put("k", RESULTS)
+
+    restarted = LegalResultCache(disk_path=path, ttl_s=60, clock=clock)
+    assert restarted.get("k") == RESULTS
+    assert restarted.stats()["disk_hits"] == 1
+
+    clock.now += 61
+    assert LegalResultCache(disk_path=path, ttl_s=60, clock=clock).get("k") is None
+
+
+def test_returns_copies_and_skips_empty_results():
+    cache = LegalResultCache(disk_path=None)
+    cache.put("k", RESULTS)
+    cache.get("k")[0]["legal_summary"] = "mutado"
+    cache.put("vacio", [])
+
+    assert "legal_summary" not in cache.get("k")[0]
+    assert cache.get("vacio") is None
+    assert cache.stats()["hit_rate"] == 0.6667
@@ -0,0 +1,138 @@
+"""
+Tests del índice compacto (int8 / float16) con re-scoring exacto.
+
+Colección de Chroma falsa (documentos + metadatos) y proveedor local por
+hashing: los vectores exactos salen del almacén por contenido.
+"""
+from unittest.mock import patch
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import app.services.embedding_providers as providers
+from app.services.embedding_providers import HashingEmbeddingProvider
+from app.services.embedding_store import ContentEmbeddingStore
+from app.services.quantized_index import (
+    QuantizedCollection,
+    QuantizedIndex,
+    QuantizedIndexWriter,
+    dequantize,
+    quantize,
+)
+
+
+TEXTS = [
+    "Pago preferente a un acreedor vinculado antes del concurso",
+    "Retraso en la solicitud de concurso de acreedores",
+    "Factura de suministro eléctrico de marzo",
+    "Embargo de cuentas por la Seguridad Social",
+    "Acta de la junta de socios aprobando las cuentas",
+    "Transferencia al administrador sin justificación",
+]
+
+
+class _FakeChroma:
+    def __init__(self, ids, documents, metadatas):
+        self.rows = {i: (d, m) for i, d, m in zip(ids, documents, metadatas)}
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=()):
+        selected = [i for i in (ids or self.rows) if i in self.rows]
+        if where:
+            selected = [i for i in selected if all(self.rows[i][1].get(k) == v for k, v in where.items())]
+        selected = selected[:limit] if limit else selected
+        result = {"ids": selected}
+        if "documents" in include:
+            result["documents"] = [self.rows[i][0] for i in selected]
+        if "metadatas" in include:
+            result["metadatas"] = [self.rows[i][1] for i in selected]
+        return result
+
+
+@pytest.fixture
+def provider(tmp_path):
+    store = ContentEmbeddingStore(disk_path=tmp_path / "store.sqlite3")
+    with patch.object(providers, "get_embedding_store", return_value=store):
+        yield HashingEmbeddingProvider(dimensions=64)
+
+
+def _build(tmp_path, provider, index_format):
+    ids = [f"chunk_{i}" for i in range(len(TEXTS))]
+    metadatas = [{"doc_type": "factura" if i % 2 else "acta"} for i in range(len(TEXTS))]
+    writer = QuantizedIndexWriter(tmp_path / "quantized", index_format)
+    writer.add(ids[:3], providers.embed_texts(TEXTS[:3], provider))
+    writer.add(ids[3:], providers.embed_texts(TEXTS[3:], provider))
+    writer.close()
+    index = QuantizedIndex(tmp_path / "quantized")
+    return QuantizedCollection(_FakeChroma(ids, TEXTS, metadatas), index)
+
+
+def _brute_force(provider, query, k):
+    q = np.asarray(query, dtype=np.float32)
+    vectors = np.asarray(provider.embed(TEXTS), dtype=np.float32)
+    distances = ((vectors - q) ** 2).sum(axis=1)
+    order = np.argsort(distances)[:k]
+    return [f"chunk_{i}" for i in order], distances[order]
+
+
+def test_int8_roundtrip_is_close():
+    vectors = np.random.default_rng(0).normal(size=(10, 32)).astype(np.float32)
+
+    codes, scales, norms = quantize(vectors, "int8")
+
+    assert codes.dtype == np.int8
+    assert np.abs(dequantize(codes, scales) - vectors).max() <= scales.max()
+    assert np.allclose(norms, (vectors ** 2).sum(axis=1), rtol=1e-5)
+
+
+@pytest.mark.parametrize("index_format", ["int8", "float16"])
+def test_query_rescores_with_exact_distances(tmp_path, provider, index_format):
+    collection = _build(tmp_path, provider, index_format)
+    query = provider.embed(["pago a acreedor vinculado"])[0]
+
+    result = collection.query(query_embeddings=[query], n_results=3,
+                              include=["documents", "metadatas", "distances"])
+
+    expected_ids, expected_distances = _brute_force(provider, query, 3)
+    assert result["ids"][0] == expected_ids
+    assert np.allclose(result["distances"][0], expected_distances, atol=1e-5)
+    assert result["documents"][0][0] == TEXTS[int(expected_ids[0].split("_")[1])]
+
+
+def test_where_filter_restricts_candidates(tmp_path, provider):
+    collection = _build(tmp_path, provider, "int8")
+    query = provider.embed(["factura"])[0]
+
+    result = collection.query(query_embeddings=[query], n_results=10,
+                              where={"doc_type": "acta"}, include=["metadatas"])
+
+    assert len(result["ids"][0]) == 3
+    assert all(m["doc_type"] == "acta" for m in result["metadatas"][0])
+
+
+def test_get_embeddings_returns_exact_vectors(tmp_path, provider):
+    collection = _build(tmp_path, provider, "int8")
+
+    result = collection.get(ids=["chunk_2"], include=["embeddings"])
+
+    assert "documents" not in result
+    assert np.allclose(result["embeddings"][0], provider.embed([TEXTS[2]])[0], atol=1e-6)
+
+
+def test_query_never_calls_the_embedding_provider(tmp_path, provider):
+    collection = _build(tmp_path, provider, "int8")
+    query = provider.embed(["pago a acreedor vinculado"])[0]
+    expected_ids, _ = _brute_force(provider, query, 3)
+
+    # Almacén por contenido vacío/podado y proveedor caído: la versión es autocontenida
+    with patch.object(providers, "embed_texts", side_effect=AssertionError("embedding en consulta")), \
+            patch.object(providers, "get_embedding_store", side_effect=AssertionError("almacén")):
+        result = collection.query(query_embeddings=[query], n_results=3, include=["distances"])
+        exact = collection.get(ids=["chunk_2"], include=["embeddings"])
+
+    assert result["ids"][0] == expected_ids
+    assert np.allclose(exact["embeddings"][0], provider.embed([TEXTS[2]])[0], atol=1e-6)
+    assert not (tmp_path / "quantized" / "vectors.f32.tmp").exists()
@@ -0,0 +1,136 @@
+"""
+Tests de la caché de embeddings de consultas (embedding_cache).
+
+Sin red: el proveedor es una función que cuenta llamadas.
+"""
+from app.services.embedding_cache import (
+    QueryEmbeddingCache,
+    normalize_query_text,
+)
+
+
+class _CountingProvider:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 0.5, -0.25] for t in texts]
+
+
+def test_memory_hit_avoids_provider_call():
+    cache = QueryEmbeddingCache(memory_size=8, disk_path=None)
+    provider = _CountingProvider()
+
+    first = cache.get_many(["¿Cuándo se solicitó el concurso?"], provider)
+    second = cache.get_many(["¿Cuándo se solicitó el concurso?"], provider)
+
+    assert first == second
+    assert len(provider.calls) == 1
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_whitespace_normalization_shares_entry():
+    cache = QueryEmbeddingCache(memory_size=8, disk_path=None)
+    provider = _CountingProvider()
+
+    cache.get_many(["  Resumen   general\ndel caso "], provider)
+    cache.get_many(["Resumen general del caso"], provider)
+
+    assert len(provider.calls) == 1
+    assert normalize_query_text(" a \n b ") == "a b"
+
+
+def test_only_misses_are_sent_in_one_call():
+    cache = QueryEmbeddingCache(memory_size=8, disk_path=None)
+    provider = _CountingProvider()
+
+    cache.get_many(["uno"], provider)
+    vectors = cache.get_many(["uno", "dos", "tres", "dos"], provider)
+
+    assert provider.calls[-1] == ["dos", "tres"]
+    assert len(vectors) == 4
+    assert vectors[1] == vectors[3]
+
+
+def test_model_and_dimensions_are_part_of_key():
+    cache = QueryEmbeddingCache(memory_size=8, disk_path=None)
+    provider = _CountingProvider()
+
+    cache.get_many(["texto"], provider, model="m1")
+    cache.get_many(["texto"], provider, model="m2")
+    cache.get_many(["texto"], provider, model="m1", dimensions=256)
+
+    assert len(provider.calls) == 3
+
+
+def test_disk_tier_survives_new_process_cache(tmp_path):
+    db_path = tmp_path / "query_embeddings.sqlite3"
+    provider = _CountingProvider()
+
+    writer = QueryEmbeddingCache(memory_size=8, disk_path=db_path)
+    original = writer.get_many(["pagos preferentes"], provider)
+
+    # Simula otro worker: memoria vacía, mismo fichero
+    reader = QueryEmbeddingCache(memory_size=8, disk_path=db_path)
+    restored = reader.get_many(["pagos preferentes"], provider)
+
+    assert restored == original
+    assert len(provider.calls) == 1
+    assert reader.stats()["disk_hits"] == 1
+
+
+def test_memory_lru_is_bounded():
+    cache = QueryEmbeddingCache(memory_size=2, disk_path=None)
+    provider = _CountingProvider()
+
+    cache.get_many(["a"], provider)
+    cache.get_many(["b"], provider)
+    cache.get_many(["c"], provider)
+    cache.get_many(["a"], provider)
+
+    assert cache.stats()["memory_entries"] == 2
+    assert len(provider.calls) == 4
+
+
+def test_async_get_many_shares_entries_with_sync_path():
+    import asyncio
+
+    cache = QueryEmbeddingCache(memory_size=8, disk_path=None)
+    provider = _CountingProvider()
+    async_calls = []
+
+    async def _acompute(texts):
+        async_calls.append(list(texts))
+        return provider(texts)
+
+    cache.get_many(["uno"], provider)
+    vectors = asyncio.run(cache.aget_many(["uno", "dos"], _acompute))
+
+    assert async_calls == [["dos"]]
+    assert vectors == [[3.0, 0.5, -0.25], [3.0, 0.5, -0.25]]
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_counters_are_exact_under_concurrency():
+    import threading
+
+    cache = QueryEmbeddingCache(memory_size=8, disk_path=None)
+    provider = _CountingProvider()
+    cache.get_many(["Resumen del caso"], provider)
+    barrier = threading.Barrier(8)
+
+    def _worker():
+        barrier.wait()
+        for _ in range(500):
+            cache.get_many(["Resumen del caso"], provider)
+
+    threads = [threading.Thread(target=_worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert cache.stats()["memory_hits"] == 8 * 500
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,196 @@
+"""
+Tests de la recuperación en lote del RAG de casos (retrieve.rag_answer_batch).
+
+ESTRATEGIA: Pre-mock de sys.modules y colección Chroma falsa que responde
+de forma determinista a cada embedding.
+
+Verifica:
+- Resultados idénticos al camino secuencial (rag_answer_internal)
+- Validación del caso, embeddings y consulta Chroma UNA sola vez
+- Resultado temprano replicado (copias independientes) por pregunta
+"""
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# ============================================================================
+# PRE-MOCK: ANTES de cualquier import de app
+# ============================================================================
+
+mock_sa = MagicMock()
+mock_sa.orm.Session = MagicMock
+sys.modules.setdefault('sqlalchemy', mock_sa)
+sys.modules.setdefault('sqlalchemy.orm', mock_sa.orm)
+sys.modules.setdefault('openai', MagicMock())
+sys.modules.setdefault('chromadb', MagicMock())
+sys.modules.setdefault('app.models.document', MagicMock())
+sys.modules.setdefault('app.models.document_chunk', MagicMock())
+sys.modules.setdefault('app.services.embeddings_pipeline', MagicMock())
+sys.modules.setdefault('app.services.document_chunk_pipeline', MagicMock())
+sys.modules.setdefault('app.services.document_quality', MagicMock())
+
+# ============================================================================
+# Imports después de pre-mock
+# ============================================================================
+
+import pytest
+
+from app.rag.case_rag import retrieve
+from app.rag.case_rag.retrieve import RAGInternalResult, _PreparedRetrieval
+
+QUESTIONS = ["pagos preferentes", "alzamiento de bienes", "retraso en la solicitud"]
+
+
+def _embedding(text):
+    return [float(len(text)), 1.0]
+
+
+class _FakeCollection:
+    """Cada embedding devuelve hits distintos (dependen de su primera componente)."""
+
+    def __init__(self):
+        self.query_calls = []
+
+    def query(self, *, query_embeddings, n_results, include, where=None):
+        self.query_calls.append(len(query_embeddings))
+        columns = {"documents": [], "metadatas": [], "distances": []}
+        for emb in query_embeddings:
+            seed = int(emb[0])
+            columns["documents"].append([f"texto {seed}-{i}" for i in range(n_results)])
+            columns["metadatas"].append(
+                [{"document_id": f"doc_{seed}", "chunk_index": i} for i in range(n_results)]
+            )
+            columns["distances"].append([0.1 * (i + 1) + seed / 100 for i in range(n_results)])
+        return columns
+
+
+def _hydrate(*, db, case_id, keys):
+    return {
+        key: (SimpleNamespace(chunk_id=f"c_{key[0]}_{key[1]}", page=1, start_char=0,
+                              end_char=10, section_hint=None), "doc.pdf")
+        for key in keys
+    }
+
+
+@pytest.fixture
+def fake_retrieval():
+    collection = _FakeCollection()
+    prepare_calls = []
+
+    def _prepare(**kwargs):
+        prepare_calls.append(kwargs["case_id"])
+        return None, _PreparedRetrieval(
+            collection=collection,
+            quality_score=80.0,
+            warnings=["aviso común"],
+            hallucination_threshold=1.4,
+        )
+
+    embed_batches = []
+
+    def _embed_queries(texts, **kwargs):
+        embed_batches.append(list(texts))
+        return [_embedding(t) for t in texts]
+
+    with patch.object(retrieve, "_prepare_case_retrieval", side_effect=_prepare), \
+         patch.object(retrieve, "_hydrate_chunks", side_effect=_hydrate), \
+         patch.object(retrieve, "embed_query", side_effect=lambda t, **kw: _embedding(t)), \
+         patch.object(retrieve, "embed_queries", side_effect=_embed_queries):
+        yield SimpleNamespace(
+            collection=collection,
+            prepare_calls=prepare_calls,
+            embed_batches=embed_batches,
+        )
+
+
+def test_batch_matches_sequential_path(fake_retrieval):
+    sequential = [
+        retrieve.rag_answer_internal(db=None, case_id="case_1", question=q, top_k=3)
+        for q in QUESTIONS
+    ]
+    batched = retrieve.rag_answer_batch(db=None, case_id="case_1", questions=QUESTIONS, top_k=3)
+
+    assert batched == sequential
+    assert [r.sources[0]["document_id"] for r in batched] == [
+        f"doc_{len(q)}" for q in QUESTIONS
+    ]
+
+
+def test_batch_shares_validation_embedding_and_query(fake_retrieval):
+    retrieve.rag_answer_batch(db=None, case_id="case_1", questions=QUESTIONS, top_k=3)
+
+    assert fake_retrieval.prepare_calls == ["case_1"]
+    assert fake_retrieval.embed_batches == [QUESTIONS]
+    assert fake_retrieval.collection.query_calls == [len(QUESTIONS)]
+
+
+def test_per_question_warnings_are_independent(fake_retrieval):
+    results = retrieve.rag_answer_batch(db=None, case_id="case_1", questions=QUESTIONS, top_k=3)
+
+    results[0].warnings.append("solo para la primera")
+
+    assert "solo para la primera" not in results[1].warnings
+    assert all(r.warnings[0] == "aviso común" for r in results)
+
+
+def test_early_result_is_copied_per_question():
+    blocked = RAGInternalResult(
+        status="NO_EMBEDDINGS",
+        context_text="",
+        sources=[],
+        confidence="baja",
+        warnings=["sin índice"],
+    )
+    with patch.object(retrieve, "_prepare_case_retrieval", return_value=(blocked, None)), \
+         patch.object(retrieve, "embed_queries") as embed:
+        results = retrieve.rag_answer_batch(db=None, case_id="case_1", questions=QUESTIONS, top_k=3)
+
+    assert [r.status for r in results] == ["NO_EMBEDDINGS"] * 3
+    assert results[0].warnings is not results[1].warnings
+    embed.assert_not_called()
+
+
+def test_empty_questions_returns_empty_list():
+    assert retrieve.rag_answer_batch(db=None, case_id="case_1", questions=[], top_k=3) == []
+
+
+def test_async_batch_matches_sync_path(fake_retrieval):
+    import asyncio
+
+    async def _aembed(texts, **kwargs):
+        return [_embedding(t) for t in texts]
+
+    sync_results = retrieve.rag_answer_batch(db=None, case_id="case_1", questions=QUESTIONS, top_k=3)
+    with patch.object(retrieve, "aembed_queries", side_effect=_aembed):
+        async_results = asyncio.run(
+            retrieve.arag_answer_batch(db=None, case_id="case_1", questions=QUESTIONS, top_k=3)
+        )
+        single = asyncio.run(
+            retrieve.arag_answer_internal(db=None, case_id="case_1", question=QUESTIONS[1], top_k=3)
+        )
+
+    assert async_results == sync_results
+    assert single == sync_results[1]
+
+
+def test_unreadable_manifest_is_not_cached():
+    retrieve._manifest_embedding_provider.cache_clear()
+    retrieve._manifest_metadata_fields.cache_clear()
+    manifest = {
+        "embedding_provider": "local_hash",
+        "embedding_model": "local-hash-char3-5",
+        "embedding_dim": 64,
+        "metadata_fields": ["doc_type"],
+    }
+    # Primer intento: error de E/S pasajero; después el manifest se lee bien
+    read = MagicMock(side_effect=[FileNotFoundError("disco"), manifest, FileNotFoundError("disco"), manifest])
+
+    with patch.object(retrieve, "read_manifest", read):
+        assert retrieve._version_metadata_fields("case_1", "v_1") == ()
+        assert retrieve._version_metadata_fields("case_1", "v_1") == ("doc_type",)
+        assert retrieve._version_metadata_fields("case_1", "v_1") == ("doc_type",)
+        retrieve._version_embedding_provider("case_1", "v_1")
+        provider = retrieve._version_embedding_provider("case_1", "v_1")
+
+    assert provider.name == "local_hash" and provider.dimensions == 64
+    assert read.call_count == 4
@@ -0,0 +1,127 @@
+"""
+Tests de la hidratación en bloque de fuentes RAG (retrieve._hydrate_chunks).
+
+ESTRATEGIA: Pre-mock de sys.modules para evitar imports de BD/vectorstore.
+
+Verifica:
+- Una sola consulta SQL para todos los hits
+- Solo se devuelven las parejas (document_id, chunk_index) pedidas
+- Sin hits → sin consulta
+"""
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# ============================================================================
+# PRE-MOCK: ANTES de cualquier import de app
+# ============================================================================
+
+mock_sa = MagicMock()
+mock_sa.orm.Session = MagicMock
+sys.modules.setdefault('sqlalchemy', mock_sa)
+sys.modules.setdefault('sqlalchemy.orm', mock_sa.orm)
+sys.modules.setdefault('openai', MagicMock())
+sys.modules.setdefault('chromadb', MagicMock())
+sys.modules.setdefault('app.models.document', MagicMock())
+sys.modules.setdefault('app.models.document_chunk', MagicMock())
+sys.modules.setdefault('app.services.embeddings_pipeline', MagicMock())
+sys.modules.setdefault('app.services.document_chunk_pipeline', MagicMock())
+sys.modules.setdefault('app.services.document_quality', MagicMock())
+
+# ============================================================================
+# Imports después de pre-mock
+# ============================================================================
+
+from app.rag.case_rag.retrieve import _hydrate_chunks
+
+
+class _FakeQuery:
+    """Query encadenable que devuelve filas fijas en .all()."""
+
+    def __init__(self, rows):
+        self._rows = rows
+
+    def join(self, *args, **kwargs):
+        return self
+
+    def filter(self, *args, **kwargs):
+        return self
+
+    def all(self):
+        return self._rows
+
+
+class _FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.query_calls = 0
+
+    def query(self, *args, **kwargs):
+        self.query_calls += 1
+        return _FakeQuery(self.rows)
+
+
+def _chunk(document_id, chunk_index):
+    return SimpleNamespace(
+        document_id=document_id,
+        chunk_index=chunk_index,
+        chunk_id=f"chunk_{document_id}_{chunk_index}",
+    )
+
+
+def test_single_query_for_all_hits():
+    rows = [
+        (_chunk("doc_a", 0), "a.pdf"),
+        (_chunk("doc_a", 3), "a.pdf"),
+        (_chunk("doc_b", 1), "b.pdf"),
+    ]
+    db = _FakeSession(rows)
+
+    hydrated = _hydrate_chunks(
+        db=db,
+        case_id="case_1",
+        keys=[("doc_b", 1), ("doc_a", 0), ("doc_a", 3)],
+    )
+
+    assert db.query_calls == 1
+    assert set(hydrated) == {("doc_b", 1), ("doc_a", 0), ("doc_a", 3)}
+    assert hydrated[("doc_b", 1)][1] == "b.pdf"
+
+
+def test_cross_combinations_are_discarded():
+    # doc_b/0 coincide con los IN por columna pero no es un hit pedido
+    rows = [
+        (_chunk("doc_a", 0), "a.pdf"),
+        (_chunk("doc_b", 0), "b.pdf"),
+        (_chunk("doc_b", 1), "b.pdf"),
+    ]
+    db = _FakeSession(rows)
+
+    hydrated = _hydrate_chunks(
+        db=db,
+        case_id="case_1",
+        keys=[("doc_a", 0), ("doc_b", 1)],
+    )
+
+    assert ("doc_b", 0) not in hydrated
+    assert len(hydrated) == 2
+
+
+def test_missing_chunk_is_absent():
+    """Chunks de otro caso no vuelven de la consulta → no aparecen."""
+    db = _FakeSession([(_chunk("doc_a", 0), "a.pdf")])
+
+    hydrated = _hydrate_chunks(
+        db=db,
+        case_id="case_1",
+        keys=[("doc_a", 0), ("doc_foreign", 2)],
+    )
+
+    assert ("doc_foreign", 2) not in hydrated
+
+
+def test_no_keys_no_query():
+    db = _FakeSession([])
+
+    assert _hydrate_chunks(db=db, case_id="case_1", keys=[]) == {}
+    assert db.query_calls == 0
@@ -0,0 +1,72 @@
+"""
+Tests de los filtros de documento aplicados dentro de Chroma (vector_metadata).
+
+Verifica:
+- Sin filtros → sin where (colección completa)
+- doc_types/fechas → condiciones con la semántica de la consulta SQL
+- Versiones antiguas sin metadatos → document_id IN (ids filtrados por SQL)
+"""
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from app.services.vector_metadata import (
+    FILTERABLE_METADATA_FIELDS,
+    build_chunk_where,
+    date_to_metadata_value,
+    document_filter_metadata,
+)
+
+
+def test_no_filters_no_where():
+    assert build_chunk_where(metadata_fields=FILTERABLE_METADATA_FIELDS) is None
+
+
+def test_single_doc_type_filter():
+    where = build_chunk_where(
+        doc_types=["balance", "pyg"],
+        metadata_fields=FILTERABLE_METADATA_FIELDS,
+    )
+
+    assert where == {"doc_type": {"$in": ["balance", "pyg"]}}
+
+
+def test_date_range_mirrors_sql_semantics():
+    where = build_chunk_where(
+        doc_types=["extracto_bancario"],
+        date_from=date(2024, 1, 1),
+        date_to=date(2024, 6, 30),
+        metadata_fields=FILTERABLE_METADATA_FIELDS,
+    )
+
+    assert where == {
+        "$and": [
+            {"doc_type": {"$in": ["extracto_bancario"]}},
+            {"date_end": {"$gte": date_to_metadata_value(date(2024, 1, 1))}},
+            {"date_start": {"$lte": date_to_metadata_value(date(2024, 6, 30))}},
+        ]
+    }
+
+
+def test_legacy_version_falls_back_to_document_ids():
+    where = build_chunk_where(
+        doc_types=["balance"],
+        metadata_fields=(),
+        document_ids=["doc_1", "doc_2"],
+    )
+
+    assert where == {"document_id": {"$in": ["doc_1", "doc_2"]}}
+
+
+def test_document_metadata_encodes_dates_as_comparable_ints():
+    doc = SimpleNamespace(
+        doc_type="acta",
+        date_start=datetime(2023, 3, 1, 10, 30),
+        date_end=datetime(2023, 3, 31),
+    )
+
+    metadata = document_filter_metadata(doc)
+
+    assert metadata["doc_type"] == "acta"
+    assert metadata["date_start"] < metadata["date_end"]
+    # Igual que en SQL: una fecha con hora es posterior a la medianoche del día
+    assert metadata["date_start"] > date_to_metadata_value(date(2023, 3, 1))
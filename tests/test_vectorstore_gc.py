@@ -0,0 +1,107 @@
+"""
+Tests del recolector de versiones de la flota (vectorstore_gc).
+
+Versiones en tmp_path con ficheros de índice de tamaño conocido.
+"""
+import os
+import time
+from itertools import count
+
+import pytest
+
+import app.services.vectorstore_versioning as versioning
+from app.services.vectorstore_gc import plan_gc, run_gc
+from app.services.vectorstore_versioning import (
+    clear_active_version_cache,
+    create_new_version,
+    delete_version,
+    list_versions,
+    update_active_pointer,
+    write_status,
+)
+
+
+DAY = 24 * 3600
+KB = 1024
+
+
+@pytest.fixture(autouse=True)
+def cases_base(tmp_path, monkeypatch):
+    monkeypatch.setattr(versioning, "CASES_VECTORSTORE_BASE", tmp_path / "cases")
+    ids = count()
+    monkeypatch.setattr(versioning, "generate_version_id", lambda: f"v_20260101_0000{next(ids):02d}")
+    clear_active_version_cache()
+
+
+def _version(case_id, status, size=10 * KB, idle_s=0):
+    version_id, path = create_new_version(case_id)
+    data = path / "index" / "data.bin"
+    data.write_bytes(os.urandom(size))
+    write_status(case_id, version_id, status)
+    if idle_s:
+        past = time.time() - idle_s
+        for p in (data, path / "index", path / "status.json", path / "manifest.json", path):
+            if p.exists():
+                os.utime(p, (past, past))
+    return version_id
+
+
+def _versions(case_id):
+    return {v.version for v in list_versions(case_id)}
+
+
+def test_reclaims_orphaned_building_and_old_failed_only():
+    active = _version("case_a", "READY")
+    update_active_pointer("case_a", active)
+    orphan = _version("case_a", "BUILDING", idle_s=2 * DAY)
+    live = _version("case_a", "BUILDING")
+    failed = _version("case_a", "FAILED")
+
+    report = run_gc(building_timeout_s=DAY, failed_retention_s=0, budget_bytes=None)
+
+    assert {c.version for c in report.deleted} == {orphan, failed}
+    assert _versions("case_a") == {active, live}
+    assert report.bytes_reclaimed >= 20 * KB
+
+
+def test_budget_deletes_oldest_ready_but_keeps_minimum_and_active():
+    a = [_version("case_a", "READY") for _ in range(3)]
+    update_active_pointer("case_a", a[0])  # ACTIVE = la más antigua
+    b = [_version("case_b", "READY") for _ in range(2)]
+    update_active_pointer("case_b", b[-1])
+
+    report = run_gc(budget_bytes=1, min_ready_per_case=2)
+
+    # case_a: ACTIVE + la READY más reciente; case_b: ya en el mínimo
+    assert {c.version for c in report.deleted} == {a[1]}
+    assert _versions("case_a") == {a[0], a[2]}
+    assert _versions("case_b") == set(b)
+
+
+def test_budget_stops_once_under_budget():
+    versions = [_version("case_a", "READY") for _ in range(4)]
+    update_active_pointer("case_a", versions[-1])
+    total = plan_gc(budget_bytes=None).bytes_before
+
+    report = run_gc(budget_bytes=total - 5 * KB, min_ready_per_case=1)
+
+    assert [c.version for c in report.deleted] == [versions[0]]
+
+
+def test_dry_run_deletes_nothing():
+    _version("case_a", "FAILED")
+
+    report = run_gc(dry_run=True, failed_retention_s=0, budget_bytes=None)
+
+    assert len(report.deleted) == 1
+    assert len(_versions("case_a")) == 1
+
+
+def test_active_version_is_never_deleted():
+    active = _version("case_a", "READY")
+    update_active_pointer("case_a", active)
+
+    with pytest.raises(RuntimeError):
+        delete_version("case_a", active)
+    with pytest.raises(RuntimeError):
+        delete_version("case_a", _version("case_a", "READY"), expected_status="FAILED")
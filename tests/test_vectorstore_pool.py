@@ -0,0 +1,170 @@
+"""
+Tests del pool de colecciones Chroma por proceso (vectorstore_pool).
+
+Sin Chroma real: el opener devuelve clientes falsos que registran close().
+Los clientes de una misma ruta comparten un System falso, como en Chroma.
+"""
+import gc
+import threading
+
+import pytest
+
+from app.services.vectorstore_pool import CollectionPool
+
+
+class _FakeClient:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _opener(name, opened):
+    def _open():
+        client = _FakeClient(name)
+        opened.append(client)
+        return client, f"collection_{name}"
+    return _open
+
+
+def test_reuses_open_collection():
+    pool = CollectionPool(max_size=4)
+    opened = []
+
+    first = pool.get(("case_1", "v_1"), _opener("a", opened))
+    second = pool.get(("case_1", "v_1"), _opener("b", opened))
+
+    assert first.__wrapped__ == second.__wrapped__ == "collection_a"
+    assert len(opened) == 1
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 1
+
+
+def test_lru_eviction_closes_client():
+    pool = CollectionPool(max_size=2)
+    opened = []
+
+    pool.get(("case_1", "v_1"), _opener("a", opened))
+    pool.get(("case_2", "v_1"), _opener("b", opened))
+    gc.collect()  # Handles soltados (PyPy / ciclos)
+    # Tocar case_1 → case_2 pasa a ser el menos usado
+    pool.get(("case_1", "v_1"), _opener("unused", opened))
+    pool.get(("case_3", "v_1"), _opener("c", opened))
+
+    assert opened[1].closed is True  # case_2 expulsado
+    assert opened[0].closed is False
+    assert pool.stats()["evictions"] == 1
+    assert pool.stats()["size"] == 2
+
+
+def test_invalidate_keeps_new_active_version():
+    pool = CollectionPool(max_size=8)
+    opened = []
+
+    pool.get(("case_1", "v_old"), _opener("old", opened))
+    pool.get(("case_1", "v_new"), _opener("new", opened))
+    pool.get(("case_2", "v_old"), _opener("other", opened))
+
+    removed = pool.invalidate("case_1", keep_version="v_new")
+
+    assert removed == 1
+    assert opened[0].closed is True
+    assert opened[1].closed is False
+    assert opened[2].closed is False
+
+
+def test_invalidate_single_version():
+    pool = CollectionPool(max_size=8)
+    opened = []
+
+    pool.get(("case_1", "v_1"), _opener("a", opened))
+    pool.get(("case_1", "v_2"), _opener("b", opened))
+
+    assert pool.invalidate("case_1", version="v_1") == 1
+    assert opened[0].closed is True
+    assert pool.stats()["size"] == 1
+
+
+def test_clear_closes_everything():
+    pool = CollectionPool(max_size=8)
+    opened = []
+
+    pool.get(("case_1", "v_1"), _opener("a", opened))
+    pool.get(("case_2", "v_1"), _opener("b", opened))
+    pool.clear()
+
+    assert all(c.closed for c in opened)
+    assert pool.stats()["size"] == 0
+
+
+def test_invalid_max_size():
+    with pytest.raises(ValueError):
+        CollectionPool(max_size=0)
+
+
+class _SharedSystem:
+    """System de Chroma compartido por todos los clientes de una ruta."""
+
+    def __init__(self):
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+class _PathClient:
+    _identifier_to_system = {}
+
+    def __init__(self, path):
+        self._identifier = path
+        self._system = self._identifier_to_system.setdefault(path, _SharedSystem())
+
+
+def test_evicted_path_stays_open_while_handles_are_alive():
+    pool = CollectionPool(max_size=1)
+    client = _PathClient("/casos/case_1/v_1")
+    opener = lambda: (client, "collection_1")
+
+    # Dos handles (dos hilos consultando) sobre la misma ruta
+    first = pool.get(("case_1", "v_1"), opener)
+    second = pool.get(("case_1", "v_1"), opener)
+    pool.get(("case_2", "v_1"), lambda: (_PathClient("/casos/case_2/v_1"), "collection_2"))
+
+    assert pool.stats()["evictions"] == 1
+    assert not client._system.stopped
+
+    del first
+    gc.collect()
+    assert not client._system.stopped  # `second` sigue consultando
+
+    system = client._system
+    del second
+    gc.collect()
+    assert system.stopped
+    assert "/casos/case_1/v_1" not in _PathClient._identifier_to_system
+
+
+def test_duplicate_from_lost_race_does_not_stop_shared_system():
+    pool = CollectionPool(max_size=4)
+    path = "/casos/case_1/v_race"
+    opened = threading.Event()
+    release = threading.Event()
+    handles = []
+
+    def slow_opener():
+        opened.set()
+        release.wait(timeout=5)
+        return _PathClient(path), "collection_slow"
+
+    loser = threading.Thread(target=lambda: handles.append(pool.get(("case_1", "v_race"), slow_opener)))
+    loser.start()
+    opened.wait(timeout=5)
+    winner = pool.get(("case_1", "v_race"), lambda: (_PathClient(path), "collection_fast"))
+    release.set()
+    loser.join(timeout=5)
+
+    # El perdedor usa la entrada ganadora y el System compartido sigue vivo
+    assert handles[0].__wrapped__ == winner.__wrapped__ == "collection_fast"
+    assert not _PathClient._identifier_to_system[path].stopped
@@ -0,0 +1,93 @@
+"""
+Tests de los segmentos compartidos entre versiones (hardlinks por contenido).
+
+Versiones en tmp_path con ficheros de índice falsos: sin Chroma.
+"""
+from itertools import count
+
+import pytest
+
+import app.services.vectorstore_versioning as versioning
+from app.services.vectorstore_segments import gc_segments, segment_stats
+from app.services.vectorstore_versioning import (
+    _get_case_vectorstore_root,
+    cleanup_old_versions,
+    create_new_version,
+    seal_version_segments,
+    update_active_pointer,
+    write_status,
+)
+
+
+CASE_ID = "case_segments"
+
+
+@pytest.fixture(autouse=True)
+def cases_base(tmp_path, monkeypatch):
+    monkeypatch.setattr(versioning, "CASES_VECTORSTORE_BASE", tmp_path / "cases")
+    monkeypatch.setattr(versioning, "VECTORSTORE_SEGMENT_MIN_BYTES", 0)
+    ids = count()
+    monkeypatch.setattr(versioning, "generate_version_id", lambda: f"v_20260101_0000{next(ids):02d}")
+
+
+def _ready_version(hnsw: bytes, sqlite: bytes = b"sqlite"):
+    version_id, path = create_new_version(CASE_ID)
+    segment_dir = path / "index" / "segment-uuid"
+    segment_dir.mkdir()
+    (segment_dir / "data_level0.bin").write_bytes(hnsw)
+    (path / "index" / "chroma.sqlite3").write_bytes(sqlite)
+    write_status(CASE_ID, version_id, "READY")
+    return version_id, path
+
+
+def test_identical_files_share_one_inode():
+    v1, p1 = _ready_version(b"vectores" * 100)
+    v2, p2 = _ready_version(b"vectores" * 100)
+
+    seal_version_segments(CASE_ID, v1)
+    stats = seal_version_segments(CASE_ID, v2)
+
+    a = p1 / "index" / "segment-uuid" / "data_level0.bin"
+    b = p2 / "index" / "segment-uuid" / "data_level0.bin"
+    assert stats["shared_segments"] == 1
+    assert a.stat().st_ino == b.stat().st_ino
+    assert b.read_bytes() == b"vectores" * 100
+    # sqlite de Chroma: mutable, nunca compartido
+    assert (p1 / "index" / "chroma.sqlite3").stat().st_nlink == 1
+
+
+def test_sealing_is_idempotent():
+    v1, _ = _ready_version(b"abc" * 50)
+
+    seal_version_segments(CASE_ID, v1)
+    stats = seal_version_segments(CASE_ID, v1)
+
+    assert stats["new_segments"] == 0 and stats["shared_segments"] == 0
+    assert segment_stats(_get_case_vectorstore_root(CASE_ID))["segments"] == 1
+
+
+def test_only_ready_versions_are_sealed():
+    version_id, _ = create_new_version(CASE_ID)
+
+    with pytest.raises(RuntimeError):
+        seal_version_segments(CASE_ID, version_id)
+
+
+def test_cleanup_reclaims_only_unreferenced_segments():
+    shared = b"compartido" * 100
+    old, _ = _ready_version(b"solo_v1" * 100)
+    seal_version_segments(CASE_ID, old)
+    versions = [_ready_version(shared)[0] for _ in range(2)]
+    for v in versions:
+        seal_version_segments(CASE_ID, v)
+    update_active_pointer(CASE_ID, versions[-1])
+    root = _get_case_vectorstore_root(CASE_ID)
+
+    deleted = cleanup_old_versions(CASE_ID, keep_last=1)
+
+    assert deleted == 2
+    stats = segment_stats(root)
+    # Solo sobrevive el segmento de la versión ACTIVE
+    assert stats["segments"] == 1
+    assert stats["bytes_on_disk"] == len(shared)
+    assert gc_segments(root)["removed"] == 0
@@ -0,0 +1,156 @@
+"""
+Tests de la validación de integridad paginada y del modo rápido.
+
+Colección falsa con get paginado (limit/offset) o por ids; registra las
+lecturas para comprobar cuántos chunks se tocan en cada modo.
+"""
+from datetime import datetime
+from itertools import count
+
+import pytest
+
+import app.services.vectorstore_versioning as versioning
+from app.services.vectorstore_versioning import (
+    ManifestData,
+    create_new_version,
+    validate_version_integrity,
+    write_changes,
+    write_manifest,
+    write_status,
+)
+
+
+CASE_ID = "case_validation"
+MODEL = "text-embedding-3-large"
+
+
+class _PagedCollection:
+    def __init__(self, rows):
+        self.rows = rows  # [(chunk_id, metadata)]
+        self.read_ids = []
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, ids=None, include=(), limit=None, offset=0):
+        if ids is not None:
+            selected = [r for r in self.rows if r[0] in set(ids)]
+        else:
+            selected = self.rows[offset:offset + limit if limit else None]
+        if "metadatas" in include:
+            self.read_ids.extend(r[0] for r in selected)
+        result = {"ids": [r[0] for r in selected], "metadatas": [r[1] for r in selected]}
+        if "embeddings" in include:
+            result["embeddings"] = [[0.0] * 8 for _ in selected]
+        return result
+
+
+def _rows(case_id, docs):
+    return [
+        (f"{doc}_{i}", {"case_id": case_id, "document_id": doc})
+        for doc, n in docs.items()
+        for i in range(n)
+    ]
+
+
+def _write_version(docs, reused_from_version=None, status="READY"):
+    version_id, _ = create_new_version(CASE_ID)
+    write_manifest(CASE_ID, version_id, ManifestData(
+        case_id=CASE_ID,
+        version=version_id,
+        embedding_model=MODEL,
+        embedding_dim=8,
+        chunking={},
+        documents=[{"doc_id": d, "sha256": f"sha_{d}", "num_chunks": n} for d, n in docs.items()],
+        total_chunks=sum(docs.values()),
+        created_at=datetime.now().isoformat(),
+        reused_from_version=reused_from_version,
+    ))
+    write_status(CASE_ID, version_id, status)
+    return version_id
+
+
+@pytest.fixture(autouse=True)
+def cases_base(tmp_path, monkeypatch):
+    monkeypatch.setattr(versioning, "CASES_VECTORSTORE_BASE", tmp_path / "cases")
+    # IDs con resolución de segundos: varias versiones en el mismo test
+    ids = count()
+    monkeypatch.setattr(versioning, "generate_version_id", lambda: f"v_20260101_0000{next(ids):02d}")
+
+
+def _validate(version, collection, **kwargs):
+    return validate_version_integrity(
+        CASE_ID, version, collection, expected_model=MODEL, expected_dim=8, **kwargs
+    )
+
+
+def test_full_validation_pages_through_collection():
+    docs = {"doc_a": 7, "doc_b": 5}
+    version = _write_version(docs)
+    collection = _PagedCollection(_rows(CASE_ID, docs))
+
+    is_valid, errors = _validate(version, collection, page_size=5)
+
+    assert is_valid, errors
+    assert len(collection.read_ids) == 12
+
+
+def test_full_validation_reports_wrong_case_and_missing_document():
+    version = _write_version({"doc_a": 3, "doc_b": 2})
+    rows = _rows(CASE_ID, {"doc_a": 3}) + _rows("otro_caso", {"doc_x": 2})
+    collection = _PagedCollection(rows)
+
+    is_valid, errors = _validate(version, collection, page_size=2)
+
+    assert not is_valid
+    assert sum("case_id incorrecto" in e for e in errors) == 2
+    assert any("Chunk 4 con case_id incorrecto" in e for e in errors)
+    assert any("doc_b" in e and "sin chunks" in e for e in errors)
+
+
+def test_chunk_errors_are_capped():
+    version = _write_version({"doc_a": 60})
+    collection = _PagedCollection(_rows("otro_caso", {"doc_a": 60}))
+
+    _, errors = _validate(version, collection, page_size=25)
+
+    assert sum("case_id incorrecto" in e for e in errors) == versioning._MAX_CHUNK_ERRORS
+    assert any("10 errores de chunks más" in e for e in errors)
+
+
+def test_fast_validation_reads_only_changed_chunks():
+    base = _write_version({"doc_a": 4, "doc_b": 3})
+    docs = {"doc_a": 4, "doc_b": 3, "doc_c": 2}
+    version = _write_version(docs, reused_from_version=base, status="BUILDING")
+    write_changes(CASE_ID, version, base, ["doc_c_0", "doc_c_1"])
+    collection = _PagedCollection(_rows(CASE_ID, docs))
+
+    is_valid, errors = _validate(version, collection, mode="fast")
+
+    assert is_valid, errors
+    assert collection.read_ids == ["doc_c_0", "doc_c_1"]
+
+
+def test_fast_validation_detects_missing_changed_chunk():
+    base = _write_version({"doc_a": 2})
+    docs = {"doc_a": 2, "doc_c": 1}
+    version = _write_version(docs, reused_from_version=base, status="BUILDING")
+    write_changes(CASE_ID, version, base, ["doc_c_0", "doc_c_9"])
+    collection = _PagedCollection(_rows(CASE_ID, docs))
+
+    is_valid, errors = _validate(version, collection, mode="fast")
+
+    assert not is_valid
+    assert any("doc_c_9" in e for e in errors)
+
+
+def test_fast_validation_falls_back_without_ready_base():
+    base = _write_version({"doc_a": 2}, status="FAILED")
+    version = _write_version({"doc_a": 2}, reused_from_version=base, status="BUILDING")
+    write_changes(CASE_ID, version, base, [])
+    collection = _PagedCollection(_rows(CASE_ID, {"doc_a": 2}))
+
+    is_valid, errors = _validate(version, collection, mode="fast")
+
+    assert is_valid, errors
+    assert len(collection.read_ids) == 2
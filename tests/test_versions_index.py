@@ -0,0 +1,91 @@
+"""
+Tests del índice de versiones por caso (versions.json) y del resumen de flota.
+"""
+from itertools import count
+from unittest.mock import patch
+
+import pytest
+
+import app.services.vectorstore_versioning as versioning
+from app.services.vectorstore_fleet import scan_fleet
+from app.services.vectorstore_versioning import (
+    _get_versions_index_path,
+    cleanup_old_versions,
+    clear_active_version_cache,
+    create_new_version,
+    list_versions,
+    read_versions_index,
+    update_active_pointer,
+    write_status,
+)
+
+
+@pytest.fixture(autouse=True)
+def cases_base(tmp_path, monkeypatch):
+    monkeypatch.setattr(versioning, "CASES_VECTORSTORE_BASE", tmp_path / "cases")
+    ids = count()
+    monkeypatch.setattr(versioning, "generate_version_id", lambda: f"v_20260101_0000{next(ids):02d}")
+    clear_active_version_cache()
+
+
+def _version(case_id, status):
+    version_id, path = create_new_version(case_id)
+    (path / "index" / "data.bin").write_bytes(b"x" * 100)
+    write_status(case_id, version_id, status)
+    return version_id
+
+
+def test_index_tracks_status_and_active():
+    v1 = _version("case_a", "READY")
+    v2 = _version("case_a", "FAILED")
+    update_active_pointer("case_a", v1)
+
+    index = read_versions_index("case_a")
+
+    assert index["active"] == v1
+    assert index["versions"][v1]["status"] == "READY"
+    assert index["versions"][v2]["status"] == "FAILED"
+
+
+def test_list_versions_uses_index_without_reading_status_files():
+    v1 = _version("case_a", "READY")
+    v2 = _version("case_a", "READY")
+
+    with patch.object(versioning, "read_status", side_effect=AssertionError("status.json leído")):
+        versions = list_versions("case_a")
+
+    assert {v.version for v in versions} == {v1, v2}
+    assert all(v.is_ready() for v in versions)
+
+
+def test_missing_or_stale_index_is_rebuilt():
+    v1 = _version("case_a", "READY")
+    _get_versions_index_path("case_a").unlink()
+
+    assert [v.version for v in list_versions("case_a")] == [v1]
+    assert v1 in read_versions_index("case_a")["versions"]
+
+
+def test_cleanup_removes_deleted_versions_from_index():
+    versions = [_version("case_a", "READY") for _ in range(3)]
+    update_active_pointer("case_a", versions[-1])
+
+    cleanup_old_versions("case_a", keep_last=1)
+
+    assert list(read_versions_index("case_a")["versions"]) == [versions[-1]]
+
+
+def test_scan_fleet_summarizes_cases_in_parallel():
+    ready = _version("case_a", "READY")
+    _version("case_a", "FAILED")
+    update_active_pointer("case_a", ready)
+    _version("case_b", "BUILDING")
+
+    summaries = {s.case_id: s for s in scan_fleet(max_workers=4)}
+
+    assert summaries["case_a"].active_version == ready
+    assert (summaries["case_a"].ready, summaries["case_a"].failed) == (1, 1)
+    assert summaries["case_a"].bytes_on_disk >= 200
+    assert summaries["case_b"].active_version is None
+    assert summaries["case_b"].building == 1
+    assert scan_fleet(include_sizes=False)[0].bytes_on_disk is None